@@ -1,19 +1,269 @@
+import os
+import sys
 import socket
+import select
 import json
 import argparse
+import threading
+from collections import deque
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from HeiderDB.protocol import (
+    send_frame, recv_frame, ProtocolError,
+    available_formats, decode_payload, decode_rows,
+)
+
+
+class Connection:
+    """
+    Socket con el formato de respuesta negociado al conectarse.
+
+    Los pedidos siempre van como texto/JSON; las respuestas llegan en
+    json, msgpack o columnar (ver HeiderDB/protocol.py).
+    """
+
+    def __init__(self, sock, fmt="json"):
+        self.sock = sock
+        self.format = fmt
+
+    @classmethod
+    def open(cls, host, port, timeout=None, formats=("json",)):
+        sock = socket.create_connection((host, port), timeout=timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        conn = cls(sock)
+        formats = [fmt for fmt in formats if fmt in available_formats()]
+        if formats and formats != ["json"]:
+            try:
+                send_frame(sock, json.dumps({"hello": True, "formats": formats}))
+                reply = json.loads(conn._recv_payload().decode())
+            except (OSError, ProtocolError):
+                sock.close()
+                raise
+            conn.format = reply.get("format", "json")
+        return conn
+
+    def send(self, request):
+        send_frame(self.sock, request)
+
+    def closed_by_peer(self):
+        """
+        True si una conexión ociosa ya no sirve: no debería haber nada para
+        leer, así que si el socket está legible el servidor la cerró (EOF)
+        o quedó algo a medio leer.
+        """
+        try:
+            readable, _, _ = select.select([self.sock], [], [], 0)
+        except (OSError, ValueError):
+            return True
+        return bool(readable)
+
+    def _recv_payload(self):
+        payload = recv_frame(self.sock)
+        if payload is None:
+            raise ProtocolError("El servidor cerró la conexión")
+        return payload
+
+    def recv(self):
+        """Siguiente mensaje ya decodificado, con las filas como dicts"""
+        message = decode_payload(self._recv_payload(), self.format)
+        if "rows" in message:
+            message["rows"] = decode_rows(message["rows"])
+        result = message.get("result")
+        if isinstance(result, list) and len(result) == 2:
+            message["result"] = [decode_rows(result[0]), result[1]]
+        return message
+
+    def close(self):
+        self.sock.close()
+
+
+class ConnectionPool:
+    """
+    Conexiones TCP persistentes al servidor, reutilizables entre hilos.
+
+    acquire() entrega una conexión ociosa o abre una nueva; release() la
+    devuelve al pool (se guardan hasta max_idle, el resto se cierra).
+    """
+
+    def __init__(self, host='localhost', port=54321, max_idle=4, timeout=None, formats=("json",)):
+        self.host = host
+        self.port = port
+        self.max_idle = max_idle
+        self.timeout = timeout
+        self.formats = formats
+        self.idle = []
+        self.lock = threading.Lock()
+
+    def connect(self):
+        return Connection.open(self.host, self.port, self.timeout, self.formats)
+
+    def acquire(self):
+        """Retorna (conexión, reutilizada)"""
+        while True:
+            with self.lock:
+                if not self.idle:
+                    break
+                conn = self.idle.pop()
+            # Las que el servidor cerró mientras estaban ociosas se descartan
+            if not conn.closed_by_peer():
+                return conn, True
+            conn.close()
+        return self.connect(), False
+
+    def release(self, conn):
+        with self.lock:
+            if len(self.idle) < self.max_idle:
+                self.idle.append(conn)
+                return
+        conn.close()
+
+    def close(self):
+        with self.lock:
+            idle, self.idle = self.idle, []
+        for conn in idle:
+            conn.close()
+
+
+class Cursor:
+    """
+    Resultado de una consulta que el servidor manda por partes.
+
+    Las filas se leen de la conexión recién cuando se piden (fetchmany,
+    fetchone o iterando), así que en memoria hay a lo sumo un frame. Si la
+    consulta no devuelve filas, su resultado queda en result; los errores
+    quedan en error. La conexión vuelve al pool al leer el último frame;
+    close() antes de eso la descarta.
+    """
+
+    def __init__(self, client, conn):
+        self.client = client
+        self.conn = conn
+        self.buffer = deque()
+        self.result = None
+        self.error = None
+        self.done = False
+
+    def _read_frame(self):
+        try:
+            message = self.conn.recv()
+        except (OSError, ProtocolError):
+            self.close()
+            raise
+        if "rows" in message:
+            self.buffer.extend(message["rows"])
+            return
+        self.done = True
+        if message.get("status") == "error":
+            self.error = message.get("message")
+        elif "result" in message:
+            self.result, self.error = message["result"]
+        self.client.pool.release(self.conn)
+        self.conn = None
+
+    def fetchmany(self, size=100):
+        while len(self.buffer) < size and not self.done:
+            self._read_frame()
+        return [self.buffer.popleft() for _ in range(min(size, len(self.buffer)))]
+
+    def fetchone(self):
+        rows = self.fetchmany(1)
+        return rows[0] if rows else None
+
+    def fetchall(self):
+        rows = list(self.buffer)
+        self.buffer.clear()
+        while not self.done:
+            self._read_frame()
+            rows.extend(self.buffer)
+            self.buffer.clear()
+        return rows
+
+    def __iter__(self):
+        while True:
+            if not self.buffer:
+                if self.done:
+                    return
+                self._read_frame()
+                continue
+            yield self.buffer.popleft()
+
+    def close(self):
+        """Descarta lo que falte: la conexión queda a medio leer y se cierra"""
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+        self.done = True
+        self.buffer.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
 
 class HeiderClient:
-    def __init__(self, host='localhost', port=54321):
+    """
+    Cliente de HeiderDB. Usa el protocolo con frames sobre conexiones
+    persistentes, así que una misma instancia se puede compartir entre los
+    hilos de una app (por ejemplo, los backends Flask).
+
+    format elige cómo llegan las respuestas: "json", "msgpack" (por
+    defecto) o "columnar", que conviene para traer muchas filas numéricas.
+    Si el servidor o este lado no lo soportan se usa JSON; en todos los
+    casos send_query y los cursores entregan filas como dicts.
+    """
+
+    def __init__(self, host='localhost', port=54321, pool_size=4, timeout=None, format="msgpack"):
         self.host = host
         self.port = port
+        formats = (format, "json") if format != "json" else ("json",)
+        self.pool = ConnectionPool(host, port, max_idle=pool_size, timeout=timeout, formats=formats)
+
+    def _send(self, request):
+        """
+        Manda request y retorna la conexión usada. Solo se reintenta si falla
+        el envío por una conexión reutilizada (el servidor la cerró mientras
+        estaba ociosa); si falla después, el pedido ya pudo haberse ejecutado
+        y reintentarlo repetiría un INSERT o DELETE.
+        """
+        while True:
+            conn, reused = self.pool.acquire()
+            try:
+                conn.send(request)
+                return conn
+            except (OSError, ProtocolError):
+                conn.close()
+                if reused:
+                    continue
+                raise
 
     def send_query(self, query):
-        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-            s.connect((self.host, self.port))
-            s.sendall(query.encode())
-            response = s.recv(4096).decode()
-            return json.loads(response)
-        
+        conn = self._send(query)
+        try:
+            message = conn.recv()
+        except (OSError, ProtocolError):
+            conn.close()
+            raise
+        self.pool.release(conn)
+        return message
+
+    def execute(self, query, fetch_size=500):
+        """
+        Ejecuta la consulta como cursor: el servidor va mandando las filas
+        de a fetch_size mientras las lee. Retorna un Cursor.
+        """
+        request = json.dumps({"query": query, "cursor": True, "fetch_size": fetch_size})
+        cursor = Cursor(self, self._send(request))
+        # Si falla la lectura el cursor cierra la conexión y se propaga
+        cursor._read_frame()
+        return cursor
+
+    def close(self):
+        self.pool.close()
+
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Cliente HeiderDB")
     parser.add_argument("--host", default="localhost", help="Host del servidor")
@@ -30,3 +280,4 @@ if __name__ == "__main__":
 
     res = client.send_query(args.query)
     print("Respuesta del servidor:", res)
+    client.close()
@@ -0,0 +1,198 @@
+import threading
+from collections import OrderedDict
+
+
+class Frame:
+    """
+    Marco del buffer pool: guarda la página ya decodificada y su estado.
+    """
+    def __init__(self, page, writer, dirty=False):
+        self.page = page
+        self.writer = writer  # función que persiste la página en disco
+        self.dirty = dirty
+        self.referenced = True  # bit de referencia para la política clock
+
+
+class BufferPool:
+    """
+    Buffer pool compartido de páginas con desalojo LRU o clock.
+
+    Las páginas se identifican por (archivo, page_id) y se guardan ya
+    decodificadas (por ejemplo, objetos Node del B+ Tree), así los nodos
+    internos más usados se quedan en memoria sin volver a leer ni parsear.
+    Las páginas modificadas se marcan como sucias y se escriben a disco al
+    ser desalojadas o al hacer flush. Todas las operaciones toman un lock,
+    así varios hilos pueden compartir el pool.
+    """
+
+    POLICIES = ("lru", "clock")
+
+    def __init__(self, capacity=1024, policy="lru"):
+        if policy not in self.POLICIES:
+            raise ValueError(f"Política de reemplazo no soportada: {policy}")
+        self.capacity = max(1, int(capacity))
+        self.policy = policy
+        self.frames = OrderedDict()
+        self.dirty_pages = {}  # file_id -> conjunto de page_id sucios
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.writes = 0
+        self.lock = threading.RLock()
+
+    def get(self, file_id, page_id, loader, writer=None):
+        """
+        Obtiene una página del pool. Si no está, la carga con loader(page_id).
+        """
+        key = (file_id, page_id)
+        with self.lock:
+            frame = self.frames.get(key)
+            if frame is not None:
+                self.hits += 1
+                self._touch(key, frame)
+                return frame.page
+
+            self.misses += 1
+            page = loader(page_id)
+            self._insert(key, Frame(page, writer))
+            return page
+
+    def put(self, file_id, page_id, page, writer, dirty=True):
+        """
+        Coloca (o reemplaza) una página en el pool. Por defecto queda sucia
+        y se escribirá a disco cuando se desaloje o se haga flush.
+        """
+        key = (file_id, page_id)
+        with self.lock:
+            frame = self.frames.get(key)
+            if frame is not None:
+                frame.page = page
+                frame.writer = writer
+                self._touch(key, frame)
+            else:
+                frame = Frame(page, writer)
+                self._insert(key, frame)
+            if dirty:
+                self._mark(key, frame)
+
+    def mark_dirty(self, file_id, page_id):
+        key = (file_id, page_id)
+        with self.lock:
+            frame = self.frames.get(key)
+            if frame is not None:
+                self._mark(key, frame)
+
+    def flush(self, file_id=None):
+        """Escribe a disco las páginas sucias (de un archivo o de todos)"""
+        with self.lock:
+            file_ids = [file_id] if file_id is not None else list(self.dirty_pages)
+            for fid in file_ids:
+                for page_id in sorted(self.dirty_pages.pop(fid, ())):
+                    frame = self.frames.get((fid, page_id))
+                    if frame is not None:
+                        self._write_back(page_id, frame)
+
+    def invalidate(self, file_id):
+        """Descarta todas las páginas de un archivo sin escribirlas"""
+        with self.lock:
+            for key in [k for k in self.frames if k[0] == file_id]:
+                del self.frames[key]
+            self.dirty_pages.pop(file_id, None)
+
+    def clear(self):
+        """Descarta todas las páginas sin escribirlas"""
+        with self.lock:
+            self.frames.clear()
+            self.dirty_pages.clear()
+
+    def resize(self, capacity):
+        with self.lock:
+            self.capacity = max(1, int(capacity))
+            while len(self.frames) > self.capacity:
+                self._evict()
+
+    def stats(self):
+        with self.lock:
+            return self._stats()
+
+    def _stats(self):
+        return {
+            "capacity": self.capacity,
+            "policy": self.policy,
+            "pages": len(self.frames),
+            "dirty_pages": sum(len(p) for p in self.dirty_pages.values()),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "writes": self.writes,
+        }
+
+    def _touch(self, key, frame):
+        if self.policy == "lru":
+            self.frames.move_to_end(key)
+        else:
+            frame.referenced = True
+
+    def _mark(self, key, frame):
+        frame.dirty = True
+        self.dirty_pages.setdefault(key[0], set()).add(key[1])
+
+    def _insert(self, key, frame):
+        while len(self.frames) >= self.capacity:
+            self._evict()
+        self.frames[key] = frame
+
+    def _evict(self):
+        if self.policy == "lru":
+            key = next(iter(self.frames))
+        else:
+            key = self._clock_victim()
+
+        frame = self.frames.pop(key)
+        if frame.dirty:
+            self.dirty_pages.get(key[0], set()).discard(key[1])
+            self._write_back(key[1], frame)
+        self.evictions += 1
+
+    def _clock_victim(self):
+        """
+        Segunda oportunidad: el frente del OrderedDict hace de manecilla; los
+        marcos referenciados pierden el bit y pasan al final de la vuelta.
+        """
+        while True:
+            key, frame = next(iter(self.frames.items()))
+            if not frame.referenced:
+                return key
+            frame.referenced = False
+            self.frames.move_to_end(key)
+
+    def _write_back(self, page_id, frame):
+        if frame.dirty and frame.writer is not None:
+            frame.writer(page_id, frame.page)
+            self.writes += 1
+        frame.dirty = False
+
+
+_shared_pool = BufferPool()
+
+
+def get_buffer_pool():
+    """Devuelve el buffer pool compartido por todos los índices"""
+    return _shared_pool
+
+
+def configure_buffer_pool(capacity=None, policy=None):
+    """
+    Reconfigura el pool compartido. Cambiar la política vacía el pool
+    después de escribir las páginas sucias.
+    """
+    if policy is not None and policy != _shared_pool.policy:
+        if policy not in BufferPool.POLICIES:
+            raise ValueError(f"Política de reemplazo no soportada: {policy}")
+        with _shared_pool.lock:
+            _shared_pool.flush()
+            _shared_pool.clear()
+            _shared_pool.policy = policy
+    if capacity is not None:
+        _shared_pool.resize(capacity)
+    return _shared_pool
@@ -1,14 +1,34 @@
 import os
 import json
 import sys
+import pickle
+import queue
+import tempfile
+import threading
+from contextlib import contextmanager
+from itertools import islice
 from HeiderDB.database.table import Table
+from HeiderDB.database.locks import RWLock
 from HeiderDB.database.parser import parse_query
 
 
 class Database:
-    def __init__(self, data_dir="./data"):
+    # Consultas que cambian el catálogo de tablas: lock exclusivo de la base
+    CATALOG_QUERIES = {"CREATE_TABLE", "CREATE_TABLE_FROM_FILE", "DROP_TABLE"}
+    # Consultas que solo leen: lock compartido de la tabla
+    READ_QUERIES = {"SELECT"}
+    # execute_query_iter: filas que se juntan por pickle y memoria que usa
+    # la copia del resultado antes de pasar a un archivo temporal
+    SPOOL_BATCH_ROWS = 1000
+    SPOOL_MEMORY_BYTES = 8 * 1024 * 1024
+
+    def __init__(self, data_dir="./data", extraction_workers=None):
         self.data_dir = data_dir
         self.tables = {}
+        # procesos para extraer características multimedia (None = uno por CPU)
+        self.extraction_workers = extraction_workers
+        # lock del catálogo; cada tabla tiene además su propio table.lock
+        self.lock = RWLock()
 
         os.makedirs(os.path.join(data_dir, "tables"), exist_ok=True)
         os.makedirs(os.path.join(data_dir, "indexes"), exist_ok=True)
@@ -24,6 +44,7 @@ class Database:
         spatial_columns=None,
         page_size=4096,
         text_columns=None,
+        secondary_indexes=None,
     ):
         """
         Crea una nueva tabla en la base de datos.
@@ -35,6 +56,7 @@ class Database:
             index_type (str): Tipo de índice a utilizar.
             spatial_columns (list): Columnas espaciales para índices R-Tree.
             page_size (int): Tamaño de página para estructuras de índice.
+            secondary_indexes (dict): Columna -> tipo de índice secundario.
 
         Returns:
             tuple: (bool, str) - Éxito y mensaje informativo.
@@ -57,8 +79,12 @@ class Database:
                 index_type=index_type,
                 spatial_columns=spatial_columns,
                 text_columns=text_columns,
+                data_dir=self.data_dir,
             )
 
+            for column, secondary_type in (secondary_indexes or {}).items():
+                table.create_index(column, secondary_type)
+
             self.tables[table_name] = table
 
             elapsed = __import__("time").time() - start_time
@@ -162,58 +188,26 @@ class Database:
                     page_size=page_size,
                     index_type=index_type,
                     spatial_columns=spatial_columns,
+                    data_dir=self.data_dir,
                 )
 
                 # Segunda pasada: cargar datos
-                records_loaded = 0
-                records_total = 0
-
                 print(f"Cargando datos desde {file_path}...")
                 start_time = __import__("time").time()
-                batch_size = 1000
-                batch = []
-
-                with open(file_path, "rb") as f:
-                    # Leer el archivo JSON como un stream nuevamente
-                    parser = ijson.items(f, "item")
-
-                    for record in parser:
-                        records_total += 1
-
-                        try:
-                            # Procesar datos para que coincidan con los tipos definidos
-                            processed_record = self._process_record_for_table(
-                                record, columns
-                            )
-
-                            # Añadir al batch
-                            batch.append(processed_record)
-
-                            # Insertar batch cuando alcanza el tamaño definido
-                            if len(batch) >= batch_size:
-                                for rec in batch:
-                                    table.add(rec)
-                                    records_loaded += 1
 
-                                batch = []
-
-                                # Mostrar progreso
-                                elapsed = __import__("time").time() - start_time
-                                print(
-                                    f"Progreso: {records_loaded} registros cargados en {elapsed:.2f}s",
-                                    end="\r",
-                                )
-
-                        except Exception as e:
-                            print(f"\nError cargando registro #{records_total}: {e}")
+                def json_records():
+                    with open(file_path, "rb") as f:
+                        # Leer el archivo JSON como un stream nuevamente
+                        for records_total, record in enumerate(
+                            ijson.items(f, "item"), start=1
+                        ):
+                            try:
+                                # Procesar datos para que coincidan con los tipos definidos
+                                yield self._process_record_for_table(record, columns)
+                            except Exception as e:
+                                print(f"\nError cargando registro #{records_total}: {e}")
 
-                    # Cargar registros restantes del batch
-                    for rec in batch:
-                        try:
-                            table.add(rec)
-                            records_loaded += 1
-                        except Exception as e:
-                            print(f"\nError cargando registro: {e}")
+                records_loaded = self._load_records(table, json_records(), start_time)
 
             elif file_path.lower().endswith(".csv"):
                 # Primera pasada: contar registros y analizar estructura
@@ -320,78 +314,43 @@ class Database:
                     page_size=page_size,
                     index_type=index_type,
                     spatial_columns=spatial_columns,
+                    data_dir=self.data_dir,
                 )
 
                 # Segunda pasada: cargar datos
-                records_loaded = 0
-                batch_size = 1000
-                batch = []
-
                 print(f"Cargando {total_records} registros desde {file_path}...")
                 start_time = __import__("time").time()
 
-                with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
-                    csv_reader = csv.reader(f)
-                    headers = next(csv_reader)  # Leer headers de nuevo
-
-                    for i, row in enumerate(csv_reader):
-                        try:
-                            record = {}
-                            for j, col in enumerate(headers):
-                                if j < len(row):
-                                    val = row[j]
-                                    # Convertir según tipo inferido
-                                    col_type = columns[col]
-
-                                    if col_type == "INT" and val:
-                                        record[col] = int(val)
-                                    elif col_type == "FLOAT" and val:
-                                        record[col] = float(val)
-                                    elif col_type == "BOOLEAN":
-                                        record[col] = val.lower() in ("true", "1")
-                                    else:
-                                        record[col] = val
-
-                            # Añadir al batch
-                            batch.append(record)
-
-                            # Insertar batch cuando alcanza el tamaño definido
-                            if len(batch) >= batch_size:
-                                for rec in batch:
-                                    table.add(rec)
-                                    records_loaded += 1
+                def csv_records():
+                    with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
+                        csv_reader = csv.reader(f)
+                        headers = next(csv_reader)  # Leer headers de nuevo
 
-                                batch = []
-
-                                # Mostrar progreso cada 10,000 registros
-                                if records_loaded % 10000 == 0:
-                                    elapsed = __import__("time").time() - start_time
-                                    rate = (
-                                        records_loaded / elapsed if elapsed > 0 else 0
-                                    )
-                                    eta = (
-                                        (total_records - records_loaded) / rate
-                                        if rate > 0
-                                        else "desconocido"
-                                    )
-                                    eta_str = (
-                                        f"{eta:.0f}s" if isinstance(eta, float) else eta
-                                    )
-                                    print(
-                                        f"Progreso: {records_loaded}/{total_records} registros ({records_loaded/total_records*100:.1f}%) - Velocidad: {rate:.1f} reg/s - ETA: {eta_str}",
-                                        end="\r",
-                                    )
+                        for i, row in enumerate(csv_reader):
+                            try:
+                                record = {}
+                                for j, col in enumerate(headers):
+                                    if j < len(row):
+                                        val = row[j]
+                                        # Convertir según tipo inferido
+                                        col_type = columns[col]
+
+                                        if col_type == "INT" and val:
+                                            record[col] = int(val)
+                                        elif col_type == "FLOAT" and val:
+                                            record[col] = float(val)
+                                        elif col_type == "BOOLEAN":
+                                            record[col] = val.lower() in ("true", "1")
+                                        else:
+                                            record[col] = val
+                                yield record
 
-                        except Exception as e:
-                            print(f"\nError cargando registro #{i+2}: {e}")
+                            except Exception as e:
+                                print(f"\nError cargando registro #{i+2}: {e}")
 
-                    # Cargar registros restantes del batch
-                    for rec in batch:
-                        try:
-                            table.add(rec)
-                            records_loaded += 1
-                        except Exception as e:
-                            print(f"\nError cargando registro: {e}")
+                records_loaded = self._load_records(
+                    table, csv_records(), start_time, total_records
+                )
 
             else:
                 return False, "Formato de archivo no soportado. Use JSON o CSV."
@@ -408,10 +367,92 @@ class Database:
             traceback.print_exc()
             return False, f"Error creando tabla desde archivo: {e}"
 
+    def _load_records(self, table, records, start_time, total_records=None):
+        """
+        Inserta los registros leídos de un archivo. Si la tabla está vacía y usa
+        B+ Tree se hace una carga masiva (ordenamiento externo y construcción del
+        árbol de abajo hacia arriba) en lugar de insertar uno por uno.
+
+        Returns:
+            int: Número de registros cargados
+        """
+        if table.index_type == "bplus_tree" and table.get_record_count() == 0:
+            print("Tabla vacía con índice B+ Tree: usando carga masiva")
+            return table.bulk_load(records)
+
+        # Metadatos e índices se guardan cada 10,000 registros, no en cada add
+        table.begin_batch(max_operations=10000)
+        try:
+            return self._add_records(table, records, start_time, total_records)
+        finally:
+            table.commit_batch()
+
+    def _add_records(self, table, records, start_time, total_records):
+        records_loaded = 0
+        for rec in records:
+            try:
+                table.add(rec)
+                records_loaded += 1
+            except Exception as e:
+                print(f"\nError cargando registro: {e}")
+                continue
+
+            # Mostrar progreso cada 10,000 registros
+            if records_loaded % 10000 == 0:
+                elapsed = __import__("time").time() - start_time
+                rate = records_loaded / elapsed if elapsed > 0 else 0
+                if total_records:
+                    eta_str = (
+                        f"{(total_records - records_loaded) / rate:.0f}s"
+                        if rate > 0
+                        else "desconocido"
+                    )
+                    print(
+                        f"Progreso: {records_loaded}/{total_records} registros ({records_loaded/total_records*100:.1f}%) - Velocidad: {rate:.1f} reg/s - ETA: {eta_str}",
+                        end="\r",
+                    )
+                else:
+                    print(
+                        f"Progreso: {records_loaded} registros cargados en {elapsed:.2f}s",
+                        end="\r",
+                    )
+
+        return records_loaded
+
+    @contextmanager
+    def table_locked(self, table_name, write=False):
+        """
+        Toma el lock compartido de la base y el de la tabla, en modo
+        lectura o escritura. Si la tabla no existe solo toma el de la base.
+        """
+        with self.lock.read_locked():
+            table = self.tables.get(table_name)
+            if table is None:
+                yield None
+            else:
+                table_lock = table.lock.write_locked() if write else table.lock.read_locked()
+                with table_lock:
+                    yield table
+
+    @contextmanager
+    def _query_locked(self, parsed):
+        query_type = parsed.get("type", "").upper()
+        if query_type in self.CATALOG_QUERIES:
+            with self.lock.write_locked():
+                yield
+        else:
+            write = query_type not in self.READ_QUERIES
+            with self.table_locked(parsed.get("table_name"), write=write):
+                yield
+
     def execute_query(self, query):
         """
         Ejecuta una consulta SQL.
 
+        Es seguro llamarlo desde varios hilos: los SELECT sobre una tabla
+        corren en paralelo, INSERT/DELETE/CREATE INDEX la toman en exclusiva
+        y CREATE/DROP TABLE bloquean toda la base.
+
         Params:
             query (str): Consulta SQL a ejecutar.
 
@@ -420,10 +461,110 @@ class Database:
         """
         try:
             parsed = parse_query(query)
+        except Exception as e:
+            return None, f"Error ejecutando consulta: {e}"
+
+        if parsed.get("error_message"):
+            return None, parsed["error_message"]
 
-            if parsed.get("error_message"):
-                return None, parsed["error_message"]
+        with self._query_locked(parsed):
+            return self._run_query(parsed)
 
+    def execute_query_iter(self, query, first_rows=None):
+        """
+        Como execute_query, pero un SELECT devuelve un iterador sobre las
+        filas en vez de una lista.
+
+        La consulta corre en un hilo aparte con los locks tomados: las
+        primeras first_rows filas (SPOOL_BATCH_ROWS por defecto) se entregan
+        apenas salen del scan, y el resto se copia a un archivo temporal (en
+        memoria mientras sea chico) antes de soltar los locks. Así la primera
+        fila no espera al scan entero y un cliente lento leyendo un cursor no
+        frena los INSERT, DELETE ni CREATE/DROP de nadie: los locks duran lo
+        que dura el scan, no lo que tarda el cliente en leer. Las demás
+        consultas devuelven lo mismo que execute_query.
+
+        Returns:
+            tuple: (filas o resultado, error)
+        """
+        try:
+            parsed = parse_query(query)
+        except Exception as e:
+            return None, f"Error ejecutando consulta: {e}"
+
+        if parsed.get("error_message"):
+            return None, parsed["error_message"]
+
+        if first_rows is None:
+            first_rows = self.SPOOL_BATCH_ROWS
+        head, rest = queue.Queue(maxsize=1), queue.Queue(maxsize=1)
+        threading.Thread(
+            target=self._run_cursor, args=(parsed, first_rows, head, rest), daemon=True
+        ).start()
+        rows, result = head.get()
+        if rows is None:
+            return result
+        return self._cursor_rows(rows, rest), None
+
+    def _run_cursor(self, parsed, first_rows, head, rest):
+        """
+        Hilo de execute_query_iter: pasa las primeras filas por head y el
+        archivo con el resto por rest, todo con los locks tomados.
+        """
+        sent = False
+        try:
+            with self._query_locked(parsed):
+                result, error = self._run_query(parsed, stream=True)
+                if error is not None or parsed.get("type", "").upper() != "SELECT":
+                    head.put((None, (result, error)))
+                    return
+                head.put((list(islice(result, first_rows)), None))
+                sent = True
+                spool = self._spool_rows(result)
+            rest.put((spool, None))
+        except Exception as e:
+            if sent:
+                rest.put((None, e))
+            else:
+                head.put((None, (None, f"Error ejecutando consulta: {e}")))
+
+    def _cursor_rows(self, rows, rest):
+        """Entrega las primeras filas y después las del archivo temporal"""
+        yield from rows
+        spool, error = rest.get()
+        if error is not None:
+            raise error
+        yield from self._spooled_rows(spool)
+
+    def _spool_rows(self, rows):
+        """Copia las filas a un archivo temporal, en lotes de SPOOL_BATCH_ROWS"""
+        spool = tempfile.SpooledTemporaryFile(max_size=self.SPOOL_MEMORY_BYTES)
+        try:
+            for batch in iter(lambda: list(islice(rows, self.SPOOL_BATCH_ROWS)), []):
+                pickle.dump(batch, spool, protocol=pickle.HIGHEST_PROTOCOL)
+        except BaseException:
+            spool.close()
+            raise
+        spool.seek(0)
+        return spool
+
+    @staticmethod
+    def _spooled_rows(spool):
+        """Lee las filas copiadas por _spool_rows"""
+        with spool:
+            while True:
+                try:
+                    batch = pickle.load(spool)
+                except EOFError:
+                    return
+                yield from batch
+
+    def _run_query(self, parsed, stream=False):
+        """
+        Ejecuta una consulta ya parseada, con los locks tomados. Con
+        stream=True un SELECT devuelve las filas como iterador.
+        """
+        try:
             query_type = parsed.get("type", "").upper()
 
             print(query_type)
@@ -437,6 +578,7 @@ class Database:
                     index_type=parsed["index_type"],
                     spatial_columns=parsed.get("spatial_columns", []),
                     text_columns=parsed.get("text_columns", []),
+                    secondary_indexes=parsed.get("secondary_indexes", {}),
                 )
                 return message, not success
 
@@ -485,11 +627,54 @@ class Database:
                 if column_name not in table.text_columns:
                     table.text_columns.append(column_name)
                     table._create_text_indexes()
+                    # Indexar los registros que ya tiene la tabla
+                    if table.record_count:
+                        table.text_indexes[column_name].rebuild()
                     table._save_metadata()
                     return f"Índice invertido creado para '{column_name}'", None
                 else:
                     return None, f"Ya existe un índice invertido para '{column_name}'"
 
+            # VACUUM INDEX
+            elif query_type == "VACUUM_INDEX":
+                table_name = parsed["table_name"]
+                column_name = parsed["column_name"]
+
+                if table_name not in self.tables:
+                    return None, f"Tabla '{table_name}' no encontrada"
+
+                table = self.tables[table_name]
+
+                if column_name is None:
+                    columns = list(table.text_indexes)
+                    if not columns:
+                        return None, f"La tabla '{table_name}' no tiene índices invertidos"
+                elif column_name in table.text_indexes:
+                    columns = [column_name]
+                else:
+                    return (
+                        None,
+                        f"No hay índice invertido en columna '{column_name}'",
+                    )
+
+                freed = sum(table.text_indexes[column].vacuum() for column in columns)
+                return (
+                    f"Índice invertido compactado ({', '.join(columns)}): {freed} bytes liberados",
+                    None,
+                )
+
+            # CREATE INDEX (secundario)
+            elif query_type == "CREATE_INDEX":
+                success, message = self.create_index(
+                    parsed["table_name"],
+                    parsed["column_name"],
+                    parsed["index_type"],
+                    parsed["index_name"],
+                )
+                if success:
+                    return message, None
+                return None, message
+
             # CREATE SPATIAL INDEX
             elif query_type == "CREATE_SPATIAL_INDEX":
                 table_name = parsed["table_name"]
@@ -533,6 +718,7 @@ class Database:
                 column_name = parsed["column_name"]
                 media_type = parsed["media_type"]
                 method = parsed["method"]
+                ann = parsed.get("ann", False)
                 train_folder = parsed.get("train_folder")  # Nuevo: folder de entrenamiento
 
                 if table_name not in self.tables:
@@ -568,11 +754,12 @@ class Database:
                 try:
                     # Crear el índice multimedia usando table.create_index
                     multimedia_index = table.create_index(
-                        column_name, "multimedia", media_type=media_type, method=method
+                        column_name, "multimedia", media_type=media_type, method=method, ann=ann
                     )
 
                     # Inicializar el índice multimedia
-                    multimedia_index.initialize(media_type=media_type, method=method)
+                    multimedia_index.initialize(media_type=media_type, method=method, ann=ann)
+                    multimedia_index.extraction_workers = self.extraction_workers
 
 
                     print("holi")
@@ -596,7 +783,8 @@ class Database:
                             # Entrenar el vocabulario visual
                             multimedia_index.vector_index.train_visual_vocabulary(
                                 folder_path=train_folder,
-                                feature_extractor=multimedia_index.feature_extractor
+                                feature_extractor=multimedia_index.feature_extractor,
+                                workers=self.extraction_workers,
                             )
                             print(f"✓ Vocabulario visual entrenado exitosamente con {multimedia_index.vector_index.num_clusters} clusters")
                         except Exception as e:
@@ -605,22 +793,25 @@ class Database:
 
                     print("oli 2")
                     # Indexar registros existentes en la tabla
-                    records = table.get_all()
-
-                    for i, record in enumerate(records):
-                        if column_name in record and record[column_name]:
-                            # Obtener la clave primaria del registro
-                            primary_key_column = table.primary_key
-                            if primary_key_column and primary_key_column in record:
-                                key = record[primary_key_column]
-                                image_path = record[column_name]
-                                if isinstance(image_path, bytes):
-                                    image_path = image_path.decode("utf-8").rstrip("\x00")
+                    records = table.scan()
+                    primary_key_column = table.primary_key
+
+                    # La extracción de todos los archivos va en paralelo en add_many
+                    to_index = [
+                        (record, record[primary_key_column])
+                        for record in records
+                        if column_name in record and record[column_name]
+                        and primary_key_column and primary_key_column in record
+                    ]
+                    for key, error in multimedia_index.add_many(to_index):
+                        print(f"⚠ Error indexando registro {key}: {error}")
 
-                                try:
-                                    multimedia_index.add(record, key)
-                                except Exception as e:
-                                    print(f"⚠ Error indexando registro {key}: {e}")
+                    # Con USING ANN se arma el índice aproximado si ya hay datos suficientes;
+                    # si no, se arma al insertar el vector número ANN_MIN_VECTORS
+                    vector_index = multimedia_index.vector_index
+                    if ann and vector_index.is_trained and vector_index.get_vector_count() >= vector_index.ANN_MIN_VECTORS:
+                        vector_index.build_ann()
+                        vector_index.save()
 
                     success_msg = f"Índice multimedia creado exitosamente para '{column_name}' con método '{method}'"
                     if train_folder:
@@ -807,7 +998,10 @@ class Database:
                         # Ejecutar búsqueda por similitud
                         try:
                             similarity_results = multimedia_index.knn_search(
-                                query_file, k=limit
+                                query_file,
+                                k=limit,
+                                nprobe=parsed.get("nprobe"),
+                                ef_search=parsed.get("ef_search"),
                             )
 
                             if not similarity_results:
@@ -868,55 +1062,27 @@ class Database:
                         operator = parsed["operator"]
                         value = parsed["value"]
 
-                        if operator == "=":
-                            results = table.search(column, value)
-                            if not isinstance(results, list):
-                                results = [results] if results else []
-                        else:
-                            # Para otros operadores, realizar búsqueda completa y filtrar
-                            all_records = table.get_all()
-                            results = []
-
-                            for record in all_records:
-                                record_val = record.get(column)
-
-                                if operator == "!=":
-                                    if record_val != value:
-                                        results.append(record)
-                                elif operator == "<":
-                                    if record_val < value:
-                                        results.append(record)
-                                elif operator == ">":
-                                    if record_val > value:
-                                        results.append(record)
-                                elif operator == "<=":
-                                    if record_val <= value:
-                                        results.append(record)
-                                elif operator == ">=":
-                                    if record_val >= value:
-                                        results.append(record)
+                        # Usa el índice primario o secundario si la columna lo tiene
+                        results = table.iter_filter(column, operator, value)
                     else:
                         return None, f"Tipo de condición no soportado: {condition}"
 
                 else:
-                    # Sin condiciones, recuperar todos los registros
-                    results = table.get_all()
-
-                # Aplicar límite TOP N si está especificado
-                if top_limit is not None and isinstance(results, list):
-                    results = results[:top_limit]
+                    # Sin condiciones, recorrer la tabla de a un registro
+                    results = table.scan()
 
-                print(results)
+                # Con TOP N se deja de leer apenas hay N filas
+                if top_limit is not None:
+                    results = islice(results, top_limit)
 
                 # Filtrar solo las columnas solicitadas
-                filtered_results = []
-                for record in results:
-                    filtered_record = {
-                        col: record[col] for col in selected_columns if col in record
-                    }
-                    filtered_results.append(filtered_record)
-
-                return filtered_results, None
+                filtered_results = (
+                    {col: record[col] for col in selected_columns if col in record}
+                    for record in results
+                )
+                if stream:
+                    return filtered_results, None
+                return list(filtered_results), None
 
             # INSERT
             elif query_type == "INSERT":
@@ -957,6 +1123,17 @@ class Database:
         """
         return list(self.tables.keys())
 
+    def close(self):
+        """
+        Cierra todas las tablas: baja las páginas sucias de los índices y
+        libera los descriptores de archivo abiertos.
+        """
+        for table in self.tables.values():
+            try:
+                table.close()
+            except Exception as e:
+                print(f"Error cerrando tabla {table.name}: {e}")
+
     def get_table(self, table_name):
         """
         Params:
@@ -1065,42 +1242,20 @@ class Database:
                     operator = where_clause.get("operator")
                     value = where_clause.get("value")
 
-                    if operator == "=":
-                        result = table.search(column, value)
-                        results = [result] if result else []
-                    elif operator == "between":
+                    if operator == "between":
                         begin_value = where_clause.get("begin_value")
                         end_value = where_clause.get("end_value")
                         results = table.range_search(column, begin_value, end_value)
                     else:
-                        # Operadores !=, <, >, <=, >= requieren filtro secuencial
-                        all_records = table.get_all()
-                        results = []
-
-                        for record in all_records:
-                            record_val = record.get(column)
-
-                            if operator == "!=":
-                                if record_val != value:
-                                    results.append(record)
-                            elif operator == "<":
-                                if record_val < value:
-                                    results.append(record)
-                            elif operator == ">":
-                                if record_val > value:
-                                    results.append(record)
-                            elif operator == "<=":
-                                if record_val <= value:
-                                    results.append(record)
-                            elif operator == ">=":
-                                if record_val >= value:
-                                    results.append(record)
+                        results = table.filter(column, operator, value)
                 else:
                     return [], "Condición WHERE no válida"
 
-            # Sin filtros, recuperar todos los registros
+            # Sin filtros, recorrer todos los registros
             else:
-                results = table.get_all()
+                if selected_columns == ["*"]:
+                    return list(table.scan()), None
+                return list(table.scan(columns=selected_columns)), None
 
             # Filtrar solo las columnas solicitadas
             if selected_columns == ["*"]:
@@ -1415,6 +1570,42 @@ class Database:
             return f"Error obteniendo información de tabla: {e}"
 
     # Métodos adicionales para capacidades espaciales
+    def create_index(self, table_name, column, index_type="bplus_tree", index_name=None):
+        """
+        Crea un índice secundario (B+ Tree o hash) sobre una columna que no es
+        la clave primaria. Se usa en búsquedas por igualdad y, si es B+ Tree,
+        también en rangos y comparaciones.
+
+        Params:
+            table_name (str): Nombre de la tabla.
+            column (str): Columna a indexar.
+            index_type (str): "bplus_tree" o "extendible_hash".
+            index_name (str): Nombre del índice.
+
+        Returns:
+            tuple: (bool, str) - Éxito y mensaje.
+        """
+        if table_name not in self.tables:
+            return False, f"Tabla '{table_name}' no encontrada"
+
+        table = self.tables[table_name]
+
+        if column not in table.columns:
+            return False, f"Columna '{column}' no encontrada en tabla '{table_name}'"
+
+        if column == table.primary_key:
+            return False, f"La columna '{column}' ya está indexada como clave primaria"
+
+        if column in table.secondary_indexes:
+            return False, f"Ya existe un índice secundario para la columna '{column}'"
+
+        try:
+            table.create_index(column, index_type, name=index_name)
+        except Exception as e:
+            return False, f"Error creando índice: {e}"
+
+        return True, f"Índice '{index_name or column}' ({index_type}) creado para la columna '{column}'"
+
     def create_spatial_index(self, table_name, column):
         """
         Crea un índice espacial para una columna existente.
@@ -1469,6 +1660,10 @@ class Database:
             # Obtener objeto de la tabla y rutas a archivos
             table = self.tables[table_name]
 
+            # Cerrar descriptores antes de borrar (en Windows no se puede
+            # eliminar un archivo abierto)
+            table.close()
+
             # Eliminar archivos de datos y metadatos
             tables_path = os.path.join(self.data_dir, "tables")
             data_file = os.path.join(tables_path, f"{table_name}.dat")
@@ -1544,6 +1739,10 @@ class Database:
                     ]
                 )
 
+            # Eliminar archivos de índices secundarios
+            for secondary_index in table.secondary_indexes.values():
+                index_files.extend(secondary_index.files())
+
             # Eliminar archivos de índices espaciales
             if hasattr(table, "spatial_columns") and table.spatial_columns:
                 for col in table.spatial_columns:
@@ -1560,18 +1759,9 @@ class Database:
                 for index_name, index_obj in table.indexes.items():
                     if hasattr(index_obj, "knn_search"):  # Es un MultimediaIndex
                         try:
-                            # Eliminar archivos del VectorIndex
-                            if (
-                                hasattr(index_obj, "vector_index")
-                                and index_obj.vector_index
-                            ):
-                                vector_files = [
-                                    getattr(index_obj.vector_index, "index_file", ""),
-                                    getattr(
-                                        index_obj.vector_index, "metadata_file", ""
-                                    ),
-                                ]
-                                index_files.extend([f for f in vector_files if f])
+                            # Archivos del VectorIndex (páginas, matriz, clusters...)
+                            # y metadatos del MultimediaIndex
+                            index_files.extend(index_obj.files())
 
                             # Eliminar archivos del MultimediaStorage
                             if hasattr(index_obj, "storage") and index_obj.storage:
@@ -1589,11 +1779,6 @@ class Database:
                                             f"Error eliminando directorio multimedia {storage_dir}: {e}"
                                         )
 
-                            # Eliminar archivo de metadatos del MultimediaIndex
-                            metadata_file_mm = getattr(index_obj, "metadata_file", "")
-                            if metadata_file_mm:
-                                index_files.append(metadata_file_mm)
-
                         except Exception as e:
                             errors.append(
                                 f"Error eliminando índice multimedia {index_name}: {e}"
@@ -0,0 +1,142 @@
+import os
+import json
+import threading
+
+
+def atomic_write(path, data):
+    """
+    Escribe data en un archivo temporal y lo renombra sobre path, así un
+    corte a mitad de escritura nunca deja el archivo a medias.
+    """
+    tmp_path = f"{path}.tmp"
+    mode = "wb" if isinstance(data, (bytes, bytearray)) else "w"
+    with open(tmp_path, mode) as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def atomic_write_json(path, obj, indent=4):
+    atomic_write(path, json.dumps(obj, indent=indent))
+
+
+class PagedFile:
+    """
+    Archivo abierto una sola vez con lecturas y escrituras posicionales.
+
+    Usa os.pread/os.pwrite cuando existen (Linux/macOS), así no hay que
+    abrir el archivo ni mover el cursor por cada registro. En Windows cae a
+    lseek + read protegido con un lock.
+    """
+
+    _HAS_PREAD = hasattr(os, "pread") and hasattr(os, "pwrite")
+
+    def __init__(self, path):
+        self.path = path
+        flags = os.O_RDWR | os.O_CREAT | getattr(os, "O_BINARY", 0)
+        self.fd = os.open(path, flags, 0o644)
+        self.lock = threading.Lock()
+
+    @property
+    def closed(self):
+        return self.fd is None
+
+    def read_at(self, offset, size):
+        """Lee hasta size bytes desde offset"""
+        if self._HAS_PREAD:
+            data = os.pread(self.fd, size, offset)
+            # pread puede devolver menos bytes de los pedidos sin llegar al EOF
+            while len(data) < size:
+                chunk = os.pread(self.fd, size - len(data), offset + len(data))
+                if not chunk:
+                    break
+                data += chunk
+            return data
+
+        with self.lock:
+            os.lseek(self.fd, offset, os.SEEK_SET)
+            chunks = []
+            remaining = size
+            while remaining > 0:
+                chunk = os.read(self.fd, remaining)
+                if not chunk:
+                    break
+                chunks.append(chunk)
+                remaining -= len(chunk)
+            return b"".join(chunks)
+
+    def write_at(self, offset, data):
+        """Escribe data en offset (sobrescribe o extiende el archivo)"""
+        if self._HAS_PREAD:
+            view = memoryview(data)
+            while view:
+                written = os.pwrite(self.fd, view, offset)
+                view = view[written:]
+                offset += written
+            return
+
+        with self.lock:
+            self._write_locked(offset, data)
+
+    def append(self, data):
+        """Agrega data al final y retorna la posición donde quedó"""
+        with self.lock:
+            offset = os.fstat(self.fd).st_size
+            self._write_locked(offset, data)
+            return offset
+
+    def _write_locked(self, offset, data):
+        os.lseek(self.fd, offset, os.SEEK_SET)
+        view = memoryview(data)
+        while view:
+            written = os.write(self.fd, view)
+            view = view[written:]
+
+    def size(self):
+        return os.fstat(self.fd).st_size
+
+    def truncate(self, size):
+        with self.lock:
+            os.ftruncate(self.fd, size)
+
+    def sync(self):
+        os.fsync(self.fd)
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+
+class FileManager:
+    """
+    Registro de archivos abiertos de una tabla (datos e índices).
+    Cada ruta se abre una sola vez y se reutiliza hasta close_all().
+    """
+
+    def __init__(self):
+        self.files = {}
+        self.lock = threading.Lock()
+
+    def get(self, path):
+        handle = self.files.get(path)
+        if handle is None or handle.closed:
+            with self.lock:
+                handle = self.files.get(path)
+                if handle is None or handle.closed:
+                    handle = PagedFile(path)
+                    self.files[path] = handle
+        return handle
+
+    def close(self, path):
+        """Cierra un archivo, por ejemplo antes de borrarlo o reemplazarlo"""
+        with self.lock:
+            handle = self.files.pop(path, None)
+        if handle is not None:
+            handle.close()
+
+    def close_all(self):
+        with self.lock:
+            handles = list(self.files.values())
+            self.files.clear()
+        for handle in handles:
+            handle.close()
@@ -93,6 +93,20 @@ class IndexBase(ABC):
         """
         pass
 
+    def iter_all(self):
+        """
+        Lazily yield every record in the index, one at a time
+
+        Indexes that expose iter_positions() read each record on demand;
+        the rest fall back to get_all()
+        """
+        iter_positions = getattr(self, "iter_positions", None)
+        if iter_positions is None:
+            yield from self.get_all()
+            return
+        for position in iter_positions():
+            yield self.table_ref.read_record(position)
+
     @abstractmethod
     def count(self):
         """
@@ -102,3 +116,63 @@ class IndexBase(ABC):
             int: Number of records indexed
         """
         pass
+
+    def begin_batch(self):
+        """
+        Defer metadata writes until end_batch(). Batches can be nested;
+        only the outermost end_batch() persists.
+        """
+        self._batch_depth = getattr(self, "_batch_depth", 0) + 1
+
+    def end_batch(self):
+        """
+        Close a batch started with begin_batch() and persist pending metadata
+        """
+        depth = getattr(self, "_batch_depth", 0)
+        if depth == 0:
+            return
+        self._batch_depth = depth - 1
+        if self._batch_depth == 0:
+            self.checkpoint()
+
+    def in_batch(self):
+        return getattr(self, "_batch_depth", 0) > 0
+
+    def checkpoint(self):
+        """
+        Persist metadata now if there are deferred changes (also inside a batch)
+        """
+        if getattr(self, "_metadata_dirty", False):
+            self.flush()
+
+    def flush(self):
+        """
+        Write the index metadata to disk
+        """
+        self._metadata_dirty = False
+        self._flush_metadata()
+
+    def _flush_metadata(self):
+        """
+        Hook for indexes that keep metadata files (JSON, dictionaries...)
+        """
+        pass
+
+    def _persist_metadata(self):
+        """
+        Called after each write: saves metadata right away, or marks it
+        dirty when inside a batch
+        """
+        if self.in_batch():
+            self._metadata_dirty = True
+        else:
+            self.flush()
+
+    def _notify_relocated(self):
+        """
+        Tell the table that record positions changed (e.g. after rewriting
+        the data file), so indexes that store offsets can be rebuilt
+        """
+        callback = getattr(self.table_ref, "_on_records_relocated", None)
+        if callback is not None:
+            callback()
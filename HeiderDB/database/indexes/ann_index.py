@@ -0,0 +1,320 @@
+import os
+import numpy as np
+
+
+def nearest_centroids(data, centroids, chunk_size=4096, centroid_sq=None):
+    """
+    Índice del centroide más cercano a cada fila de data.
+
+    Usa ||x - c||² = ||x||² - 2·x·c + ||c||² por bloques: ||x||² no cambia el
+    argmin, así que basta un producto de matrices por bloque. centroid_sq
+    (las ||c||²) se puede pasar precalculado si los centroides no cambian.
+    """
+    centroids = np.asarray(centroids, dtype=np.float32)
+    if centroid_sq is None:
+        centroid_sq = np.einsum("ij,ij->i", centroids, centroids)
+    result = np.empty(len(data), dtype=np.int64)
+    for start in range(0, len(data), chunk_size):
+        block = np.asarray(data[start:start + chunk_size], dtype=np.float32)
+        result[start:start + len(block)] = np.argmin(centroid_sq - 2.0 * (block @ centroids.T), axis=1)
+    return result
+
+
+def kmeans(data, k, iterations=20, seed=0):
+    """K-means de Lloyd en NumPy. Retorna los centroides (k x dim)."""
+    data = np.asarray(data, dtype=np.float32)
+    rng = np.random.default_rng(seed)
+    k = min(k, len(data))
+    centroids = data[rng.choice(len(data), k, replace=False)].copy()
+
+    for _ in range(iterations):
+        assignments = nearest_centroids(data, centroids)
+        order = np.argsort(assignments, kind="stable")
+        counts = np.bincount(assignments, minlength=k)
+        filled = np.flatnonzero(counts)
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))[filled]
+        sums = np.add.reduceat(data[order], starts, axis=0)
+        new_centroids = centroids.copy()
+        new_centroids[filled] = sums / counts[filled, None]
+
+        # Los centroides que se quedaron sin puntos se reubican al azar
+        empty = np.flatnonzero(counts == 0)
+        if len(empty):
+            new_centroids[empty] = data[rng.choice(len(data), len(empty), replace=False)]
+
+        if np.allclose(new_centroids, centroids):
+            break
+        centroids = new_centroids
+    return centroids
+
+
+class IVFPQIndex:
+    """
+    Índice aproximado IVF-PQ (en NumPy) sobre los vectores TF-IDF.
+
+    Los vectores se normalizan, así la distancia coseno es ||a - b||² / 2.
+    - IVF: un k-means grueso reparte los vectores en nlist celdas y una
+      búsqueda solo visita las nprobe celdas más cercanas a la consulta.
+    - PQ: de cada vector se guarda su residuo respecto al centro de la celda
+      comprimido a m bytes (un código de 8 bits por subespacio). La distancia
+      aproximada se suma de tablas precalculadas por consulta, sin leer los
+      vectores.
+
+    Cada código apunta a una fila de la VectorMatrix, que es la que tiene el
+    vector completo para reordenar los candidatos con la distancia exacta.
+    Si una fila se reutiliza, vale el código más nuevo de esa fila.
+
+    Archivos: <prefix>.npz (cuantizadores), <prefix>_codes.u8 (códigos) y
+    <prefix>_entries.i32 (celda y fila de cada código). Los dos últimos solo
+    crecen al final.
+    """
+
+    KSUB = 256
+
+    def __init__(self, prefix, dim):
+        self._set_prefix(prefix)
+        self.dim = dim
+
+        self.coarse = None  # centros de las celdas (nlist x dim)
+        self.codebooks = []  # por subespacio: centroides (ksub x sub_dim)
+        self.bounds = []  # por subespacio: (inicio, fin) de sus dimensiones
+        self.trained_on = 0
+        self._tensor = None
+        self._reset_entries()
+        self.load()
+
+    @property
+    def trained(self):
+        return self.coarse is not None
+
+    @property
+    def nlist(self):
+        return 0 if self.coarse is None else len(self.coarse)
+
+    @property
+    def m(self):
+        return len(self.codebooks)
+
+    def __len__(self):
+        return len(self.entry_rows)
+
+    def _reset_entries(self):
+        self.codes = np.empty((0, self.m), dtype=np.uint8)
+        self.entry_cells = np.empty(0, dtype=np.int32)
+        self.entry_rows = np.empty(0, dtype=np.int32)
+        self._lists = None
+
+    # ========== PERSISTENCIA ==========
+
+    def _set_prefix(self, prefix):
+        self.prefix = prefix
+        self.quantizer_path = f"{prefix}.npz"
+        self.codes_path = f"{prefix}_codes.u8"
+        self.entries_path = f"{prefix}_entries.i32"
+
+    def move_to(self, prefix):
+        """
+        Mueve los archivos a prefix, reemplazando el índice que hubiera ahí.
+        Los cuantizadores se borran primero y se mueven al final: si se corta
+        a la mitad queda un índice sin entrenar, nunca códigos de otro.
+        """
+        target = IVFPQIndex.__new__(IVFPQIndex)
+        target._set_prefix(prefix)
+        if os.path.exists(target.quantizer_path):
+            os.remove(target.quantizer_path)
+        for src, dst in ((self.codes_path, target.codes_path), (self.entries_path, target.entries_path)):
+            if os.path.exists(src):
+                os.replace(src, dst)
+            elif os.path.exists(dst):
+                os.remove(dst)
+        os.replace(self.quantizer_path, target.quantizer_path)
+        self._set_prefix(prefix)
+
+    def load(self):
+        if not os.path.exists(self.quantizer_path):
+            return
+        with np.load(self.quantizer_path) as data:
+            if int(data["dim"]) != self.dim:
+                return
+            self.coarse = data["coarse"]
+            bounds = data["bounds"]
+            self.bounds = [(int(start), int(end)) for start, end in bounds]
+            self.codebooks = [data[f"codebook_{j}"] for j in range(len(bounds))]
+            self.trained_on = int(data["trained_on"])
+
+        codes = np.fromfile(self.codes_path, dtype=np.uint8) if os.path.exists(self.codes_path) else np.empty(0, np.uint8)
+        entries = np.fromfile(self.entries_path, dtype="<i4") if os.path.exists(self.entries_path) else np.empty(0, np.int32)
+        # Si se cortó a mitad de un agregado se descarta el último código incompleto
+        count = min(len(codes) // self.m, len(entries) // 2)
+        self.codes = codes[:count * self.m].reshape(count, self.m)
+        entries = entries[:count * 2].reshape(count, 2)
+        self.entry_cells = entries[:, 0].astype(np.int32)
+        self.entry_rows = entries[:, 1].astype(np.int32)
+        self._lists = None
+
+    def _save_quantizers(self):
+        arrays = {
+            "dim": np.int64(self.dim),
+            "coarse": self.coarse,
+            "bounds": np.array(self.bounds, dtype=np.int64),
+            "trained_on": np.int64(self.trained_on),
+        }
+        for j, codebook in enumerate(self.codebooks):
+            arrays[f"codebook_{j}"] = codebook
+        tmp_path = f"{self.prefix}.tmp.npz"
+        np.savez(tmp_path, **arrays)
+        os.replace(tmp_path, self.quantizer_path)
+
+    def clear(self):
+        for path in (self.quantizer_path, self.codes_path, self.entries_path):
+            if os.path.exists(path):
+                os.remove(path)
+        self.coarse = None
+        self.codebooks = []
+        self.bounds = []
+        self.trained_on = 0
+        self._tensor = None
+        self._reset_entries()
+
+    # ========== ENTRENAMIENTO Y CODIFICACIÓN ==========
+
+    @staticmethod
+    def _normalize(vectors):
+        vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms > 0, norms, 1.0)
+
+    def train(self, vectors, nlist=None, m=None, seed=0):
+        """
+        Entrena los cuantizadores con una muestra de vectores y borra los
+        códigos anteriores (hay que volver a agregar todo con add()).
+        Mientras tanto el índice queda sin entrenar: para no cortar las
+        búsquedas se entrena uno aparte y se reemplaza al terminar.
+        """
+        sample = self._normalize(vectors)
+        if len(sample) == 0:
+            raise ValueError("No hay vectores para entrenar el índice ANN")
+
+        if nlist is None:
+            nlist = int(4 * np.sqrt(len(sample)))
+        nlist = max(1, min(nlist, len(sample)))
+        if m is None:
+            m = max(1, min(self.dim // 4, 64))
+        m = max(1, min(m, self.dim))
+
+        coarse = kmeans(sample, nlist, seed=seed)
+        residuals = sample - coarse[nearest_centroids(sample, coarse)]
+
+        bounds = [(int(part[0]), int(part[-1]) + 1) for part in np.array_split(np.arange(self.dim), m)]
+        codebooks = [
+            kmeans(residuals[:, start:end], self.KSUB, iterations=10, seed=seed + j + 1)
+            for j, (start, end) in enumerate(bounds)
+        ]
+
+        # trained depende de coarse, así que se asigna último
+        self.clear()
+        self.bounds = bounds
+        self.codebooks = codebooks
+        self.trained_on = len(sample)
+        self._reset_entries()
+        self.coarse = coarse
+        self._save_quantizers()
+
+    def encode(self, vectors):
+        """Celda y códigos PQ de cada vector"""
+        vectors = self._normalize(vectors)
+        cells = nearest_centroids(vectors, self.coarse)
+        residuals = vectors - self.coarse[cells]
+        codes = np.empty((len(vectors), self.m), dtype=np.uint8)
+        for j, (start, end) in enumerate(self.bounds):
+            codes[:, j] = nearest_centroids(residuals[:, start:end], self.codebooks[j])
+        return cells.astype(np.int32), codes
+
+    def add(self, rows, vectors):
+        """Agrega los vectores de las filas rows de la matriz"""
+        rows = np.atleast_1d(np.asarray(rows, dtype=np.int32))
+        if len(rows) == 0:
+            return
+        cells, codes = self.encode(vectors)
+
+        with open(self.codes_path, "ab") as f:
+            f.write(codes.tobytes())
+        with open(self.entries_path, "ab") as f:
+            f.write(np.stack([cells, rows], axis=1).astype("<i4").tobytes())
+
+        self.codes = np.concatenate([self.codes, codes])
+        self.entry_cells = np.concatenate([self.entry_cells, cells])
+        self.entry_rows = np.concatenate([self.entry_rows, rows])
+        self._lists = None
+
+    # ========== BÚSQUEDA ==========
+
+    def _codebook_tensor(self):
+        """
+        Codebooks como un solo arreglo (m, KSUB, ancho máximo) rellenado con
+        ceros, con el índice de dimensión de cada columna (-1 en el relleno),
+        para armar las tablas de distancias de una celda en una operación.
+        """
+        if self._tensor is None:
+            width = max(end - start for start, end in self.bounds)
+            tensor = np.zeros((self.m, self.KSUB, width), dtype=np.float32)
+            dims = np.full((self.m, width), -1, dtype=np.int64)
+            for j, ((start, end), codebook) in enumerate(zip(self.bounds, self.codebooks)):
+                tensor[j, :len(codebook), :end - start] = codebook
+                # Los códigos que no existen (ksub < 256) quedan lejos
+                tensor[j, len(codebook):, :] = np.inf
+                dims[j, :end - start] = np.arange(start, end)
+            self._tensor = (tensor, dims)
+        return self._tensor
+
+    def _inverted_lists(self):
+        """Códigos ordenados por celda, con el rango de cada celda"""
+        if self._lists is None:
+            order = np.argsort(self.entry_cells, kind="stable")
+            starts = np.searchsorted(self.entry_cells[order], np.arange(self.nlist + 1))
+            # Solo el código más nuevo de cada fila es válido
+            latest = np.full(int(self.entry_rows.max(initial=-1)) + 1, -1, dtype=np.int64)
+            latest[self.entry_rows] = np.arange(len(self.entry_rows))
+            valid = latest[self.entry_rows] == np.arange(len(self.entry_rows))
+            self._lists = (order, starts, valid)
+        return self._lists
+
+    def search(self, query_vector, nprobe=8, candidates=64):
+        """
+        Filas candidatas ordenadas por distancia aproximada (las candidates
+        mejores entre las nprobe celdas más cercanas a la consulta).
+        """
+        if not self.trained or len(self) == 0:
+            return np.empty(0, dtype=np.int64)
+        query = self._normalize(query_vector)[0]
+        order, starts, valid = self._inverted_lists()
+
+        nprobe = max(1, min(nprobe, self.nlist))
+        cell_distances = np.einsum("ij,ij->i", self.coarse, self.coarse) - 2.0 * (self.coarse @ query)
+        probe = np.argpartition(cell_distances, nprobe - 1)[:nprobe]
+
+        tensor, dims = self._codebook_tensor()
+        padding = dims < 0
+        sub_ids = np.arange(self.m)
+        all_entries, all_distances = [], []
+        for cell in probe.tolist():
+            entries = order[starts[cell]:starts[cell + 1]]
+            entries = entries[valid[entries]]
+            if len(entries) == 0:
+                continue
+            residual = (query - self.coarse[cell])[dims]
+            residual[padding] = 0.0
+            # tabla[j, c] = distancia del subvector j de la consulta al centroide c
+            diff = tensor - residual[:, None, :]
+            table = np.einsum("jcd,jcd->jc", diff, diff)
+            all_entries.append(entries)
+            all_distances.append(table[sub_ids, self.codes[entries]].sum(axis=1))
+
+        if not all_entries:
+            return np.empty(0, dtype=np.int64)
+        entries = np.concatenate(all_entries)
+        distances = np.concatenate(all_distances)
+        if len(entries) > candidates:
+            best = np.argpartition(distances, candidates - 1)[:candidates]
+            entries, distances = entries[best], distances[best]
+        return self.entry_rows[entries[np.argsort(distances, kind="stable")]].astype(np.int64)
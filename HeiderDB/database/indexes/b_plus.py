@@ -2,7 +2,10 @@ import os
 import struct
 import json
 import math
+from bisect import bisect_left, bisect_right
 from HeiderDB.database.index_base import IndexBase
+from HeiderDB.database.buffer_pool import get_buffer_pool
+from HeiderDB.database.file_manager import atomic_write_json
 
 class Node:
     """
@@ -20,7 +23,7 @@ class BPlusTree(IndexBase):
     Implementación de índice B+ Tree para una tabla.
     """
     
-    def __init__(self, table_name, column_name, data_path, table_ref, page_size):
+    def __init__(self, table_name, column_name, data_path, table_ref, page_size, buffer_pool=None):
         super().__init__(table_name, column_name, data_path, table_ref, page_size)
         self.table_name = table_name
         self.column_name = column_name
@@ -31,12 +34,21 @@ class BPlusTree(IndexBase):
         self.metadata_file = os.path.join(os.path.dirname(data_path), f"{table_name}_{column_name}_index_metadata.json")
         
         # Determinar tamaño de la clave según el tipo de columna
-        self.key_size = table_ref.get_column_size(column_name)
         self.ptr_size = 8
         self.col_type = table_ref.columns.get(column_name)
+        self.key_size = self._get_key_size()
         
         self.key_format = self._get_key_format()
         
+        # Claves y punteros de un nodo se decodifican con un solo unpack_from.
+        # Si el formato no coincide con el tamaño de la columna se usa la
+        # serialización de Table clave por clave.
+        self._key_code = self.key_format[1:]
+        self._key_fields = len(struct.unpack(self.key_format, bytes(struct.calcsize(self.key_format))))
+        self._key_is_text = self.col_type.startswith("VARCHAR")
+        self._packed_keys = struct.calcsize(self.key_format) == self.key_size
+        self._node_structs = {}
+        
         # Cálculo del orden: (orden-1) claves + orden punteros deben caber en una página
         self.order = math.floor((page_size - 20) / (self.key_size + self.ptr_size))
         
@@ -47,8 +59,15 @@ class BPlusTree(IndexBase):
         self.height = 0
         self.num_pages = 0
         
+        # Los nodos se leen y escriben a través del buffer pool compartido
+        self.buffer_pool = buffer_pool if buffer_pool is not None else get_buffer_pool()
+        
         self._init_index()
 
+    def _get_key_size(self):
+        """Bytes que ocupa una clave dentro de un nodo"""
+        return self.table_ref.get_column_size(self.column_name)
+
     def _get_key_format(self):
         """Formato de struct para serializar/deserializar la clave"""
         if self.col_type == "INT":
@@ -78,6 +97,8 @@ class BPlusTree(IndexBase):
                 with open(self.index_file, 'wb') as f:
                     pass  # Crear archivo vacío
             
+            # Descartar páginas de un índice anterior con el mismo nombre
+            self.buffer_pool.invalidate(self.index_file)
             
             root = Node(is_leaf=True)
             root.page_id = self._allocate_page()
@@ -110,8 +131,13 @@ class BPlusTree(IndexBase):
             'free_pages': self.free_pages
         }
         
-        with open(self.metadata_file, 'w') as f:
-            json.dump(metadata, f, indent=4)
+        # Las páginas sucias van a disco antes que los metadatos que las referencian
+        self.flush_pages()
+        
+        atomic_write_json(self.metadata_file, metadata)
+
+    def _flush_metadata(self):
+        self._save_metadata()
     
     def _allocate_page(self):
         """
@@ -128,50 +154,91 @@ class BPlusTree(IndexBase):
             self.num_pages += 1
             return page_id
     
+    def flush_pages(self):
+        """Escribe a disco los nodos modificados que siguen en el buffer pool"""
+        self.buffer_pool.flush(self.index_file)
+    
+    def close(self):
+        """Baja los nodos sucios a disco y los saca del buffer pool"""
+        self.flush_pages()
+        self.buffer_pool.invalidate(self.index_file)
+    
     def _read_node(self, page_id):
-        """Lee un nodo desde disco dado su ID de página"""
+        """Obtiene un nodo dado su ID de página, desde el buffer pool o disco"""
         if page_id is None:
             return None
-            
-        with open(self.index_file, 'rb') as f:
-            f.seek(page_id * self.page_size)
-            page_data = f.read(self.page_size)
-            
-            node = Node()
-            node.page_id = page_id
-            
-            # Primer byte indica si es hoja
-            node.is_leaf = bool(page_data[0])
-            
-            # Siguientes 4 bytes (int) indican número de claves
-            num_keys = struct.unpack('!i', page_data[1:5])[0]
-            
-            # Si es hoja, leer puntero next_leaf (4 bytes)
-            if node.is_leaf:
-                next_leaf = struct.unpack('!i', page_data[5:9])[0]
-                node.next_leaf = next_leaf if next_leaf != -1 else None
-                offset = 9
-            else:
-                offset = 5
-            
-            # Leer claves y punteros
-            for i in range(num_keys):
-                key = self._deserialize_key(page_data[offset:offset+self.key_size])
-                offset += self.key_size
-                node.keys.append(key)
-                
-                ptr = struct.unpack('!q', page_data[offset:offset+8])[0]
-                node.children.append(ptr)
-                offset += 8
-            
-            # Para nodos internos, leer un puntero adicional
-            if not node.is_leaf and num_keys > 0:
-                ptr = struct.unpack('!q', page_data[offset:offset+8])[0]
-                node.children.append(ptr)
-            
-            return node
+        return self.buffer_pool.get(self.index_file, page_id, self._load_node, self._store_node)
     
     def _write_node(self, node):
+        """Deja el nodo en el buffer pool marcado como sucio"""
+        self.buffer_pool.put(self.index_file, node.page_id, node, self._store_node)
+    
+    def _node_struct(self, num_keys, is_leaf):
+        """Struct (cacheado) para las claves y punteros intercalados de un nodo"""
+        cache_key = (num_keys, is_leaf)
+        node_struct = self._node_structs.get(cache_key)
+        if node_struct is None:
+            extra = "q" if not is_leaf and num_keys > 0 else ""
+            node_struct = struct.Struct("!" + (self._key_code + "q") * num_keys + extra)
+            self._node_structs[cache_key] = node_struct
+        return node_struct
+    
+    def _load_node(self, page_id):
+        """Lee un nodo desde disco dado su ID de página"""
+        page_data = self.table_ref.get_file(self.index_file).read_at(page_id * self.page_size, self.page_size)
+        node = Node()
+        node.page_id = page_id
+        
+        # Primer byte indica si es hoja
+        node.is_leaf = bool(page_data[0])
+        
+        # Siguientes 4 bytes (int) indican número de claves
+        num_keys = struct.unpack_from('!i', page_data, 1)[0]
+        
+        # Si es hoja, leer puntero next_leaf (4 bytes)
+        if node.is_leaf:
+            next_leaf = struct.unpack_from('!i', page_data, 5)[0]
+            node.next_leaf = next_leaf if next_leaf != -1 else None
+            offset = 9
+        else:
+            offset = 5
+        
+        if not self._packed_keys:
+            return self._load_entries_slow(node, page_data, offset, num_keys)
+        
+        # Claves y punteros en una sola llamada: k0, p0, k1, p1, ... [, p_n]
+        # (una clave compuesta ocupa varios campos seguidos)
+        values = self._node_struct(num_keys, node.is_leaf).unpack_from(page_data, offset)
+        width = self._key_fields + 1
+        end = width * num_keys
+        if self._key_fields == 1:
+            keys = values[0:end:width]
+            if self._key_is_text:
+                keys = [k.decode("utf-8").rstrip("\x00") for k in keys]
+        else:
+            keys = zip(*(values[f:end:width] for f in range(self._key_fields)))
+            if self._key_is_text:
+                keys = [(k[0].decode("utf-8").rstrip("\x00"),) + k[1:] for k in keys]
+        node.keys = list(keys)
+        node.children = list(values[self._key_fields:end:width])
+        if len(values) > end:
+            node.children.append(values[-1])
+        
+        return node
+    
+    def _load_entries_slow(self, node, page_data, offset, num_keys):
+        for i in range(num_keys):
+            node.keys.append(self._deserialize_key(page_data[offset:offset+self.key_size]))
+            offset += self.key_size
+            node.children.append(struct.unpack_from('!q', page_data, offset)[0])
+            offset += 8
+        
+        if not node.is_leaf and num_keys > 0:
+            node.children.append(struct.unpack_from('!q', page_data, offset)[0])
+        
+        return node
+    
+    def _store_node(self, page_id, node):
         """Escribe un nodo al disco en su page_id"""
         page_data = bytearray(self.page_size)
         
@@ -180,32 +247,46 @@ class BPlusTree(IndexBase):
         
         # Siguientes 4 bytes para número de claves
         num_keys = len(node.keys)
-        page_data[1:5] = struct.pack('!i', num_keys)
+        struct.pack_into('!i', page_data, 1, num_keys)
         
         # Si es hoja, almacenar puntero next_leaf
         if node.is_leaf:
             next_leaf = node.next_leaf if node.next_leaf is not None else -1
-            page_data[5:9] = struct.pack('!i', next_leaf)
+            struct.pack_into('!i', page_data, 5, next_leaf)
             offset = 9
         else:
             offset = 5
         
-        # Escribir claves y punteros
-        for i in range(num_keys):
-            key_bytes = self._serialize_key(node.keys[i])
-            page_data[offset:offset+self.key_size] = key_bytes
-            offset += self.key_size
-            
-            page_data[offset:offset+8] = struct.pack('!q', node.children[i])
-            offset += 8
-        
-        # Para nodos internos, escribir un puntero adicional
-        if not node.is_leaf and num_keys > 0:
-            page_data[offset:offset+8] = struct.pack('!q', node.children[num_keys])
+        if self._packed_keys and self._key_fields == 1:
+            keys = node.keys
+            if self._key_is_text:
+                keys = [k.encode("utf-8") for k in keys]
+            values = [None] * (2 * num_keys)
+            values[0::2] = keys
+            values[1::2] = node.children[:num_keys]
+            if not node.is_leaf and num_keys > 0:
+                values.append(node.children[num_keys])
+            self._node_struct(num_keys, node.is_leaf).pack_into(page_data, offset, *values)
+        elif self._packed_keys:
+            values = []
+            for key, child in zip(node.keys, node.children):
+                if self._key_is_text:
+                    key = (key[0].encode("utf-8"),) + tuple(key[1:])
+                values.extend(key)
+                values.append(child)
+            if not node.is_leaf and num_keys > 0:
+                values.append(node.children[num_keys])
+            self._node_struct(num_keys, node.is_leaf).pack_into(page_data, offset, *values)
+        else:
+            for i in range(num_keys):
+                page_data[offset:offset+self.key_size] = self._serialize_key(node.keys[i])
+                offset += self.key_size
+                struct.pack_into('!q', page_data, offset, node.children[i])
+                offset += 8
+            if not node.is_leaf and num_keys > 0:
+                struct.pack_into('!q', page_data, offset, node.children[num_keys])
         
-        with open(self.index_file, 'r+b' if os.path.exists(self.index_file) else 'wb') as f:
-            f.seek(node.page_id * self.page_size)
-            f.write(page_data)
+        self.table_ref.get_file(self.index_file).write_at(page_id * self.page_size, page_data)
     
     def _serialize_key(self, key):
         """Serializa la clave usando la lógica centralizada en Table"""
@@ -222,31 +303,30 @@ class BPlusTree(IndexBase):
             
         current_node = self._read_node(self.root_page_id)
         while not current_node.is_leaf:
-            i = 0
-            while i < len(current_node.keys) and key >= current_node.keys[i]:
-                i += 1
-            
+            i = bisect_right(current_node.keys, key)
             current_node = self._read_node(current_node.children[i])
         
         return current_node
     
-    def search(self, key):
-        """Busca un registro con la clave especificada"""
+    def locate(self, key):
+        """Posición (offset en el .dat) del registro con la clave, o None"""
         leaf = self._find_leaf(key)
         if leaf is None:
             return None
             
-        for i, k in enumerate(leaf.keys):
-            if k == key:
-                record_pos = leaf.children[i]
-                
-                with open(self.data_path, 'rb') as f:
-                    f.seek(record_pos)
-                    record_data = f.read(self.table_ref._get_record_size())
-                    return self.table_ref._deserialize_record(record_data)
+        i = bisect_left(leaf.keys, key)
+        if i < len(leaf.keys) and leaf.keys[i] == key:
+            return leaf.children[i]
         
         return None
     
+    def search(self, key):
+        """Busca un registro con la clave especificada"""
+        record_pos = self.locate(key)
+        if record_pos is None:
+            return None
+        return self.table_ref.read_record(record_pos)
+    
     def range_search(self, begin_key, end_key=None):
         """Busca registros con claves en el rango dado"""
         result = []
@@ -255,9 +335,7 @@ class BPlusTree(IndexBase):
         if leaf is None:
             return result
         
-        i = 0
-        while i < len(leaf.keys) and leaf.keys[i] < begin_key:
-            i += 1
+        i = bisect_left(leaf.keys, begin_key)
         
         current_leaf = leaf
         while current_leaf is not None:
@@ -267,11 +345,7 @@ class BPlusTree(IndexBase):
                 if end_key is not None and current_key > end_key:
                     return result
                 
-                record_pos = current_leaf.children[i]
-                with open(self.data_path, 'rb') as f:
-                    f.seek(record_pos)
-                    record_data = f.read(self.table_ref._get_record_size())
-                    result.append(self.table_ref._deserialize_record(record_data))
+                result.append(self.table_ref.read_record(current_leaf.children[i]))
                 
                 i += 1
             
@@ -288,14 +362,12 @@ class BPlusTree(IndexBase):
         record_data = self.table_ref._serialize_record(record)
         record_pos = self._append_record_to_data_file(record_data)
         self._add_key_with_position(key, record_pos)
-        self._save_metadata()
+        self._persist_metadata()
+        return record_pos
     
     def _append_record_to_data_file(self, record_data):
         """Añade un registro al archivo de datos y retorna su posición"""
-        with open(self.data_path, 'ab') as f:
-            record_pos = f.tell()
-            f.write(record_data)
-            return record_pos
+        return self.table_ref.get_file(self.data_path).append(record_data)
     
     def _add_key_with_position(self, key, record_pos):
         """Añade una clave con su posición al árbol B+"""
@@ -337,9 +409,7 @@ class BPlusTree(IndexBase):
         
         # Si es un nodo hoja
         if node.is_leaf:
-            i = 0
-            while i < len(node.keys) and key > node.keys[i]:
-                i += 1
+            i = bisect_left(node.keys, key)
             
             if i < len(node.keys) and key == node.keys[i]:
                 node.children[i] = record_pos
@@ -359,9 +429,7 @@ class BPlusTree(IndexBase):
         # Si es un nodo interno
         else:
             # Encontrar el hijo
-            i = 0
-            while i < len(node.keys) and key >= node.keys[i]:
-                i += 1
+            i = bisect_right(node.keys, key)
             
             child_id = node.children[i]
             new_key, new_node = self._insert_recursive(child_id, key, record_pos)
@@ -369,9 +437,7 @@ class BPlusTree(IndexBase):
             if new_key is None:
                 return None, None
             
-            i = 0
-            while i < len(node.keys) and new_key > node.keys[i]:
-                i += 1
+            i = bisect_left(node.keys, new_key)
             
             node.keys.insert(i, new_key)
             node.children.insert(i + 1, new_node.page_id)
@@ -460,7 +526,7 @@ class BPlusTree(IndexBase):
                 self.height -= 1
                 # Liberar la página de la antigua raíz (opcional)
         
-        self._save_metadata()
+        self._persist_metadata()
         return result
         
     def _remove_recursive(self, node_id, key):
@@ -481,45 +547,11 @@ class BPlusTree(IndexBase):
         # Si es un nodo hoja
         if node.is_leaf:
             # Buscar la clave
-            i = 0
-            while i < len(node.keys) and key != node.keys[i]:
-                i += 1
-                
-            if i == len(node.keys):
+            i = bisect_left(node.keys, key)
+            if i == len(node.keys) or node.keys[i] != key:
                 return False, False
             
-            record_pos_to_delete = node.children[i]
-            
-            # last pos
-            file_size = os.path.getsize(self.data_path)
-            record_size = self.table_ref._get_record_size()
-            last_record_pos = file_size - record_size
-            
-            # Reemplazar el registro a eliminar
-            if record_pos_to_delete != last_record_pos:
-                with open(self.data_path, 'rb') as f:
-                    f.seek(last_record_pos)
-                    last_record_data = f.read(record_size)
-                    last_record = self.table_ref._deserialize_record(last_record_data)
-                    last_key = last_record[self.column_name]
-                
-                with open(self.data_path, 'r+b') as f:
-                    f.seek(record_pos_to_delete)
-                    f.write(last_record_data)
-                
-                # Encontrar el nodo hoja
-                last_leaf = self._find_leaf(last_key)
-                if last_leaf is not None and last_leaf.page_id != node.page_id:
-                    j = 0
-                    while j < len(last_leaf.keys):
-                        if last_leaf.keys[j] == last_key and last_leaf.children[j] == last_record_pos:
-                            last_leaf.children[j] = record_pos_to_delete
-                            self._write_node(last_leaf)
-                            break
-                        j += 1
-                    # truncar 
-                    with open(self.data_path, 'ab') as f:
-                        f.truncate(last_record_pos)
+            self._release_record(node, node.children[i])
             
             node.keys.pop(i)
             node.children.pop(i)
@@ -532,9 +564,7 @@ class BPlusTree(IndexBase):
             
         # Si es un nodo interno
         else:
-            i = 0
-            while i < len(node.keys) and key >= node.keys[i]:
-                i += 1
+            i = bisect_right(node.keys, key)
             child_id = node.children[i]
             success, child_underflow = self._remove_recursive(child_id, key)
             
@@ -546,6 +576,52 @@ class BPlusTree(IndexBase):
             child = self._read_node(child_id)
             return self._handle_underflow(node, child, i)
     
+    def _release_record(self, node, record_pos):
+        """
+        Libera el espacio del registro borrado: el último registro del .dat
+        se mueve al hueco y el archivo se trunca.
+        
+        Args:
+            node: Hoja que contiene la clave que se está borrando
+            record_pos: Posición del registro borrado
+        """
+        data_file = self.table_ref.get_file(self.data_path)
+        record_size = self.table_ref._get_record_size()
+        last_record_pos = data_file.size() - record_size
+        
+        if record_pos != last_record_pos:
+            last_record_data = data_file.read_at(last_record_pos, record_size)
+            last_record = self.table_ref._deserialize_record(last_record_data)
+            last_key = last_record[self.column_name]
+            
+            # La hoja del último registro puede ser la misma que se está modificando
+            last_leaf = self._find_leaf(last_key)
+            if last_leaf is None:
+                return
+            if last_leaf.page_id == node.page_id:
+                last_leaf = node
+            
+            j = bisect_left(last_leaf.keys, last_key)
+            while j < len(last_leaf.keys) and last_leaf.keys[j] == last_key:
+                if last_leaf.children[j] == last_record_pos:
+                    break
+                j += 1
+            else:
+                # El último registro no está en el índice: no se toca el archivo
+                return
+            
+            data_file.write_at(record_pos, last_record_data)
+            last_leaf.children[j] = record_pos
+            self._write_node(last_leaf)
+            
+            # Los índices secundarios guardan posiciones: avisar del movimiento
+            on_moved = getattr(self.table_ref, "_on_record_moved", None)
+            if on_moved is not None:
+                on_moved(last_record, last_record_pos, record_pos)
+        
+        # truncar
+        data_file.truncate(last_record_pos)
+    
     def _handle_underflow(self, parent, child, child_index):
         """
         Maneja el underflow de un nodo hijo.
@@ -695,35 +771,110 @@ class BPlusTree(IndexBase):
         
         return True, parent_underflow
     
+    def bulk_load(self, items, fill_factor=0.9):
+        """
+        Construye el árbol de abajo hacia arriba a partir de pares (clave, posición)
+        ya ordenados por clave y sin duplicados. Reemplaza el contenido del índice.
+        
+        Las hojas se llenan hasta fill_factor de su capacidad, se encadenan en
+        orden y luego se arma cada nivel interno en una sola pasada.
+        
+        Returns:
+            int: Número de claves cargadas
+        """
+        max_keys = self.order - 1
+        min_keys = (self.order - 1) // 2
+        leaf_fill = min(max_keys, max(min_keys, 1, int(max_keys * fill_factor)))
+        fanout = min(self.order, max(min_keys + 1, 2, int(self.order * fill_factor)))
+        
+        # Empezar con el archivo del índice vacío
+        self.buffer_pool.invalidate(self.index_file)
+        self.table_ref.get_file(self.index_file).truncate(0)
+        self.num_pages = 0
+        self.free_pages = []
+        
+        # Nivel de hojas: las páginas se asignan en orden, así next_leaf es page_id + 1.
+        # La última hoja llena se retiene para poder balancearla con el resto final.
+        level = []
+        pending = None
+        chunk = []
+        total = 0
+        for entry in items:
+            chunk.append(entry)
+            total += 1
+            if len(chunk) == leaf_fill:
+                if pending is not None:
+                    level.append(self._bulk_write_leaf(pending, has_next=True))
+                pending = chunk
+                chunk = []
+        
+        tail = [group for group in (pending, chunk) if group]
+        tail = self._balance_tail(tail, min_keys, max_keys)
+        for i, group in enumerate(tail):
+            level.append(self._bulk_write_leaf(group, has_next=i < len(tail) - 1))
+        
+        if not level:
+            level.append(self._bulk_write_leaf([], has_next=False))
+        self.height = 1
+        
+        # Niveles internos: cada nodo toma hasta fanout hijos del nivel inferior
+        while len(level) > 1:
+            groups = [level[i:i + fanout] for i in range(0, len(level), fanout)]
+            groups = self._balance_tail(groups, min_keys + 1, self.order)
+            
+            next_level = []
+            for group in groups:
+                node = Node(is_leaf=False, page_id=self._allocate_page())
+                node.keys = [min_key for min_key, _ in group[1:]]
+                node.children = [page_id for _, page_id in group]
+                self._store_node(node.page_id, node)
+                next_level.append((group[0][0], node.page_id))
+            level = next_level
+            self.height += 1
+        
+        self.root_page_id = level[0][1]
+        self._save_metadata()
+        return total
+    
+    def _bulk_write_leaf(self, entries, has_next):
+        leaf = Node(is_leaf=True, page_id=self._allocate_page())
+        leaf.keys = [key for key, _ in entries]
+        leaf.children = [record_pos for _, record_pos in entries]
+        leaf.next_leaf = leaf.page_id + 1 if has_next else None
+        self._store_node(leaf.page_id, leaf)
+        return (leaf.keys[0] if leaf.keys else None, leaf.page_id)
+    
+    def _balance_tail(self, groups, min_size, max_size):
+        """Reparte los dos últimos grupos para que ninguno quede por debajo del mínimo"""
+        if len(groups) < 2 or len(groups[-1]) >= min_size:
+            return groups
+        
+        merged = groups[-2] + groups[-1]
+        if len(merged) <= max_size:
+            return groups[:-2] + [merged]
+        
+        half = len(merged) // 2
+        return groups[:-2] + [merged[:half], merged[half:]]
+    
     def rebuild(self):
         pass
     
     def get_all(self):
         """Obtiene todos los registros en el índice"""
-        result = []
-        
+        return list(self.iter_all())
+    
+    def iter_positions(self):
+        """Posiciones de los registros en orden de clave, recorriendo las hojas"""
         if self.root_page_id is None:
-            return result
+            return
         
-        # Encontrar la hoja más a la izquierda
         node = self._read_node(self.root_page_id)
         while not node.is_leaf:
             node = self._read_node(node.children[0])
         
         while node is not None:
-            for i, key in enumerate(node.keys):
-                record_pos = node.children[i]
-                with open(self.data_path, 'rb') as f:
-                    f.seek(record_pos)
-                    record_data = f.read(self.table_ref._get_record_size())
-                    result.append(self.table_ref._deserialize_record(record_data))
-            
-            if node.next_leaf is not None:
-                node = self._read_node(node.next_leaf)
-            else:
-                node = None
-        
-        return result
+            yield from list(node.children)
+            node = self._read_node(node.next_leaf) if node.next_leaf is not None else None
     
     def count(self):
         """Cuenta el número de registros en el índice"""
@@ -768,4 +919,4 @@ class BPlusTree(IndexBase):
         """
         if page_id is not None and page_id < self.num_pages:
             self.free_pages.append(page_id)
-            self._save_metadata()
\ No newline at end of file
+            self._persist_metadata()
\ No newline at end of file
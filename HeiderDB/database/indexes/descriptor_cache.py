@@ -0,0 +1,144 @@
+import os
+import hashlib
+import json
+import tempfile
+import threading
+from collections import OrderedDict
+import numpy as np
+
+
+def extractor_signature(feature_extractor):
+    """
+    Texto que identifica al extractor y sus parámetros: si cambia el método,
+    la dimensión o cualquier parámetro simple, cambian las claves del cache.
+    """
+    params = {
+        name: value
+        for name, value in sorted(vars(feature_extractor).items())
+        if isinstance(value, (bool, int, float, str))
+    }
+    params["class"] = type(feature_extractor).__name__
+    return hashlib.md5(json.dumps(params, sort_keys=True).encode()).hexdigest()[:16]
+
+
+class DescriptorCache:
+    """
+    Cache persistente de descriptores locales por contenido de archivo.
+
+    La clave es el hash del contenido más la firma del extractor, así el
+    mismo archivo guardado dos veces o consultado de nuevo no vuelve a pasar
+    por SIFT/MFCC. Cada entrada es un .npy float32 en cache_dir.
+
+    Cuando el total pasa max_bytes se borran las entradas usadas hace más
+    tiempo. La fecha de uso es el mtime del archivo (se actualiza en cada
+    lectura), así el orden LRU sobrevive a reinicios sin archivo de índice.
+
+    Varios SELECT pueden usarlo a la vez: entries y los contadores van con
+    un lock, y cada put escribe su propio temporal antes de renombrarlo.
+    """
+
+    def __init__(self, cache_dir, max_bytes=1 << 30):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()  # clave -> bytes, de la menos a la más usada
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        self._scan()
+
+    def _scan(self):
+        found = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".npy"):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.cache_dir, name))
+            except OSError:
+                continue
+            found.append((stat.st_mtime, name[:-4], stat.st_size))
+        for _, key, size in sorted(found):
+            self.entries[key] = size
+            self.total_bytes += size
+
+    def key(self, content_hash, feature_extractor):
+        return f"{extractor_signature(feature_extractor)}_{content_hash}"
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.npy")
+
+    def __contains__(self, key):
+        with self.lock:
+            return key in self.entries
+
+    def get(self, key):
+        """Descriptores guardados para key (matriz float32) o None"""
+        with self.lock:
+            if key not in self.entries:
+                self.misses += 1
+                return None
+        path = self._path(key)
+        try:
+            descriptors = np.load(path)
+            os.utime(path)
+        except (OSError, ValueError):
+            # Otro proceso (o hilo) la borró o quedó a medio escribir
+            with self.lock:
+                self._drop(key)
+                self.misses += 1
+            return None
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+            self.hits += 1
+        return descriptors
+
+    def put(self, key, descriptors):
+        descriptors = np.asarray(descriptors, dtype=np.float32)
+        path = self._path(key)
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.save(f, descriptors)
+            size = os.path.getsize(tmp_path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+        with self.lock:
+            os.replace(tmp_path, path)
+            self.total_bytes -= self.entries.pop(key, 0)
+            self.entries[key] = size
+            self.total_bytes += size
+            self._evict(keep=key)
+
+    def _drop(self, key):
+        """Borra una entrada; se llama con el lock tomado"""
+        self.total_bytes -= self.entries.pop(key, 0)
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def _evict(self, keep=None):
+        while self.total_bytes > self.max_bytes and len(self.entries) > 1:
+            oldest = next(iter(self.entries))
+            if oldest == keep:
+                break
+            self._drop(oldest)
+
+    def clear(self):
+        with self.lock:
+            for key in list(self.entries):
+                self._drop(key)
+
+    def get_stats(self):
+        with self.lock:
+            return {
+                "entries": len(self.entries),
+                "total_bytes": self.total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
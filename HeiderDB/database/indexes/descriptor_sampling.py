@@ -0,0 +1,51 @@
+import numpy as np
+
+
+class DescriptorReservoir:
+    """
+    Muestra uniforme de a lo más capacity descriptores de un flujo de largo
+    desconocido (algoritmo R de reservoir sampling, por bloques).
+
+    La memoria queda fija en capacity x dim float32 sin importar cuántos
+    descriptores pasen, así el vocabulario se entrena sobre carpetas que no
+    caben enteras en RAM.
+    """
+
+    def __init__(self, capacity, seed=42):
+        self.capacity = max(1, int(capacity))
+        self.rng = np.random.default_rng(seed)
+        self.samples = None  # se reserva con la dimensión del primer bloque
+        self.seen = 0
+
+    def __len__(self):
+        return min(self.seen, self.capacity)
+
+    def sample_rows(self, descriptors, limit):
+        """A lo más limit filas de descriptors elegidas al azar sin repetición"""
+        descriptors = np.asarray(descriptors, dtype=np.float32)
+        if len(descriptors) <= limit:
+            return descriptors
+        return descriptors[np.sort(self.rng.choice(len(descriptors), limit, replace=False))]
+
+    def add(self, descriptors):
+        descriptors = np.atleast_2d(np.asarray(descriptors, dtype=np.float32))
+        if len(descriptors) == 0:
+            return
+        if self.samples is None:
+            self.samples = np.empty((self.capacity, descriptors.shape[1]), dtype=np.float32)
+
+        positions = self.seen + np.arange(len(descriptors))
+        # Mientras haya espacio se agrega al final
+        free = positions < self.capacity
+        self.samples[positions[free]] = descriptors[free]
+        # Después la fila t reemplaza a una al azar con probabilidad capacity / (t + 1)
+        if not free.all():
+            targets = self.rng.integers(0, positions[~free] + 1)
+            keep = targets < self.capacity
+            self.samples[targets[keep]] = descriptors[~free][keep]
+        self.seen += len(descriptors)
+
+    def get(self):
+        if self.samples is None:
+            return np.empty((0, 0), dtype=np.float32)
+        return self.samples[:len(self)]
@@ -0,0 +1,99 @@
+import os
+import struct
+from collections.abc import MutableMapping
+from HeiderDB.database.file_manager import PagedFile
+from HeiderDB.database.indexes.tfidf_page_file import _encode_doc_id, _decode_doc_id
+
+RECORD = struct.Struct("<cII")  # operación, página, posición
+PUT = b"p"
+DELETE = b"d"
+
+
+class DocDirectory(MutableMapping):
+    """
+    Directorio doc_id -> (página, posición) de los vectores TF-IDF.
+
+    Se usa como un dict, pero cada asignación o borrado agrega un registro
+    ([op][página][posición][doc_id]) al final de <path>, así insertar un
+    documento no reescribe el directorio entero. Al abrir se repiten los
+    registros; una cola cortada por un corte de luz se descarta. Cuando los
+    registros viejos superan a los vigentes el archivo se reescribe.
+    """
+
+    COMPACT_MIN_RECORDS = 1024
+
+    def __init__(self, path):
+        self.path = path
+        self.existed = os.path.exists(path)
+        self.entries = {}
+        self.records = 0
+        self.file = PagedFile(path)
+        if self.existed:
+            self._replay()
+
+    def _replay(self):
+        data = self.file.read_at(0, self.file.size())
+        view = memoryview(data)
+        offset = 0
+        while offset < len(data):
+            try:
+                op, page_id, position = RECORD.unpack_from(view, offset)
+                doc_id, end = _decode_doc_id(view, offset + RECORD.size)
+                if end > len(data):
+                    raise ValueError("registro incompleto")
+            except (struct.error, ValueError, UnicodeDecodeError):
+                print(f"Directorio TF-IDF cortado en {offset}, se descarta el resto")
+                self.file.truncate(offset)
+                break
+            if op == PUT:
+                self.entries[doc_id] = (page_id, position)
+            else:
+                self.entries.pop(doc_id, None)
+            self.records += 1
+            offset = end
+
+    def _append(self, op, doc_id, page_id=0, position=0):
+        self.file.append(RECORD.pack(op, page_id, position) + _encode_doc_id(doc_id))
+        self.records += 1
+        if self.records > max(self.COMPACT_MIN_RECORDS, 2 * len(self.entries)):
+            self.reset(self.entries)
+
+    def __getitem__(self, doc_id):
+        return self.entries[doc_id]
+
+    def __setitem__(self, doc_id, location):
+        page_id, position = location
+        self.entries[doc_id] = (page_id, position)
+        self._append(PUT, doc_id, page_id, position)
+
+    def __delitem__(self, doc_id):
+        del self.entries[doc_id]
+        self._append(DELETE, doc_id)
+
+    def __iter__(self):
+        return iter(self.entries)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def reset(self, entries):
+        """Reemplaza el contenido y reescribe el archivo solo con las entradas vigentes"""
+        entries = dict(entries)
+        data = b"".join(
+            RECORD.pack(PUT, page_id, position) + _encode_doc_id(doc_id)
+            for doc_id, (page_id, position) in entries.items()
+        )
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        self.file.close()
+        os.replace(tmp_path, self.path)
+        self.file = PagedFile(self.path)
+        self.entries = entries
+        self.records = len(entries)
+
+    def clear(self):
+        self.reset({})
+
+    def close(self):
+        self.file.close()
@@ -52,13 +52,14 @@ class ExtendibleHash(IndexBase):
         self.global_depth = 2  
         self.next_bucket_id = 0 
         
-        self.key_size = table_ref.get_column_size(column_name)
         self.ptr_size = 8  
         self.col_type = table_ref.columns.get(column_name)
+        self.key_size = self._get_key_size()
         
         # Cálculo del factor de bloque (cuántas entradas caben en un bucket)
         # Cada bucket tiene: local_depth(4) + num_entries(4) + entries(key_size+ size cada una) + next_pointer(4)
         self.block_factor = math.floor((page_size - 12) / (self.key_size + self.ptr_size))
+        self.bucket_size = 8 + (self.block_factor * (self.key_size + self.ptr_size)) + 4
         
         self.directory = {}
         self._init_index()
@@ -84,9 +85,9 @@ class ExtendibleHash(IndexBase):
             # Guardar directorio y buckets
             self._save_directory()
             
-            with open(self.bucket_file, "wb") as f:
-                self._write_bucket(f, bucket0)
-                self._write_bucket(f, bucket1)
+            self.table_ref.get_file(self.bucket_file).truncate(0)
+            self._write_bucket(bucket0)
+            self._write_bucket(bucket1)
     
     def _load_directory(self):
         with open(self.dir_file, "r") as f:
@@ -104,45 +105,37 @@ class ExtendibleHash(IndexBase):
             }, f, indent=4)
     
     def _read_bucket(self, bucket_id):
-        with open(self.bucket_file, "rb") as f:
-            entry_size = self.key_size + self.ptr_size
-            bucket_size = 8 + (self.block_factor * entry_size) + 4  # local_depth + num_entries + entradas + next
-            f.seek(bucket_id * bucket_size)
-            
-            local_depth = struct.unpack('i', f.read(4))[0]
-            num_entries = struct.unpack('i', f.read(4))[0]
-            
-            bucket = Bucket(bucket_id=bucket_id, local_depth=local_depth)
-            
-            for _ in range(num_entries):
-                key = self._deserialize_key(f.read(self.key_size))
-                pointer = struct.unpack('q', f.read(self.ptr_size))[0]
-                bucket.add_entry(key, pointer)
-            
-            f.seek((self.block_factor - num_entries) * entry_size, 1)
-            
-            bucket.next = struct.unpack('i', f.read(4))[0]
-            
-            return bucket
-    
-    def _write_bucket(self, file_obj, bucket):
-        entry_size = self.key_size + self.ptr_size
-        bucket_size = 8 + (self.block_factor * entry_size) + 4
-        file_obj.seek(bucket.bucket_id * bucket_size)
+        data = self.table_ref.get_file(self.bucket_file).read_at(bucket_id * self.bucket_size, self.bucket_size)
         
-        file_obj.write(struct.pack('i', bucket.local_depth))
-        file_obj.write(struct.pack('i', len(bucket.keys)))
+        local_depth, num_entries = struct.unpack_from('ii', data, 0)
+        bucket = Bucket(bucket_id=bucket_id, local_depth=local_depth)
         
-        for i in range(len(bucket.keys)):
-            key_bytes = self._serialize_key(bucket.keys[i])
-            file_obj.write(key_bytes)
-            file_obj.write(struct.pack('q', bucket.pointers[i]))
+        offset = 8
+        for _ in range(num_entries):
+            key = self._deserialize_key(data[offset:offset + self.key_size])
+            pointer = struct.unpack_from('q', data, offset + self.key_size)[0]
+            bucket.add_entry(key, pointer)
+            offset += self.key_size + self.ptr_size
         
-        for _ in range(self.block_factor - len(bucket.keys)):
-            file_obj.write(b'\x00' * self.key_size)
-            file_obj.write(struct.pack('q', 0))
+        bucket.next = struct.unpack_from('i', data, self.bucket_size - 4)[0]
         
-        file_obj.write(struct.pack('i', bucket.next))
+        return bucket
+    
+    def _write_bucket(self, bucket):
+        data = bytearray(self.bucket_size)
+        struct.pack_into('ii', data, 0, bucket.local_depth, len(bucket.keys))
+        
+        offset = 8
+        for i in range(len(bucket.keys)):
+            data[offset:offset + self.key_size] = self._serialize_key(bucket.keys[i])
+            struct.pack_into('q', data, offset + self.key_size, bucket.pointers[i])
+            offset += self.key_size + self.ptr_size
+        
+        struct.pack_into('i', data, self.bucket_size - 4, bucket.next)
+        self.table_ref.get_file(self.bucket_file).write_at(bucket.bucket_id * self.bucket_size, bytes(data))
+    
+    def _get_key_size(self):
+        return self.table_ref.get_column_size(self.column_name)
     
     def _serialize_key(self, key):
         return self.table_ref.serialize_column(self.col_type, key)
@@ -150,56 +143,52 @@ class ExtendibleHash(IndexBase):
     def _deserialize_key(self, key_bytes):
         return self.table_ref.deserialize_column(self.col_type, key_bytes)
     
-    def hashindex(self, key):
+    def _hash_value(self, key):
         if isinstance(key, str):
-            hash_value = sum(ord(c) for c in key)
+            return sum(ord(c) for c in key)
         elif isinstance(key, float):
-            hash_value = int(key * 1000)
+            return int(key * 1000)
         else:
-            hash_value = int(key)
-        
-        hashid = hash_value % (2 ** self.global_depth)
+            return int(key)
+    
+    def hashindex(self, key):
+        hashid = self._hash_value(key) % (2 ** self.global_depth)
         return format(hashid, f'0{self.global_depth}b')
     
-    def search(self, key):
+    def locate(self, key):
+        """Posición del registro con la clave en el .dat, o None"""
         bin_index = self.hashindex(key)
         bucket_id = self.directory[bin_index]
         bucket = self._read_bucket(bucket_id)
         
         if key in bucket.keys:
             idx = bucket.keys.index(key)
-            record_pos = bucket.pointers[idx]
-            
-            with open(self.data_path, 'rb') as f:
-                f.seek(record_pos)
-                record_data = f.read(self.table_ref._get_record_size())
-                return self.table_ref._deserialize_record(record_data)
+            return bucket.pointers[idx]
         
         current = bucket
         while current.next != -1:
             current = self._read_bucket(current.next)
             if key in current.keys:
                 idx = current.keys.index(key)
-                record_pos = current.pointers[idx]
-                
-                with open(self.data_path, 'rb') as f:
-                    f.seek(record_pos)
-                    record_data = f.read(self.table_ref._get_record_size())
-                    return self.table_ref._deserialize_record(record_data)
+                return current.pointers[idx]
         
         return None
     
+    def search(self, key):
+        record_pos = self.locate(key)
+        if record_pos is None:
+            return None
+        return self.table_ref.read_record(record_pos)
+    
     def add(self, record, key):
         record_data = self.table_ref._serialize_record(record)
         record_pos = self._append_record_to_data_file(record_data)
         
         self._add_key_with_position(key, record_pos)
+        return record_pos
     
     def _append_record_to_data_file(self, record_data):
-        with open(self.data_path, 'ab') as f:
-            record_pos = f.tell()
-            f.write(record_data)
-            return record_pos
+        return self.table_ref.get_file(self.data_path).append(record_data)
     
     def _add_key_with_position(self, key, record_pos):
         bin_index = self.hashindex(key)
@@ -209,8 +198,7 @@ class ExtendibleHash(IndexBase):
         if key in bucket.keys:
             idx = bucket.keys.index(key)
             bucket.pointers[idx] = record_pos
-            with open(self.bucket_file, "r+b") as f:
-                self._write_bucket(f, bucket)
+            self._write_bucket(bucket)
             return
         
         current = bucket
@@ -219,14 +207,12 @@ class ExtendibleHash(IndexBase):
             if key in current.keys:
                 idx = current.keys.index(key)
                 current.pointers[idx] = record_pos
-                with open(self.bucket_file, "r+b") as f:
-                    self._write_bucket(f, current)
+                self._write_bucket(current)
                 return
         
         if not bucket.is_full(self.block_factor):
             bucket.add_entry(key, record_pos)
-            with open(self.bucket_file, "r+b") as f:
-                self._write_bucket(f, bucket)
+            self._write_bucket(bucket)
             return
         
         if bucket.next == -1:
@@ -244,8 +230,7 @@ class ExtendibleHash(IndexBase):
                 current = self._read_bucket(current.next)
                 if not current.is_full(self.block_factor):
                     current.add_entry(key, record_pos)
-                    with open(self.bucket_file, "r+b") as f:
-                        self._write_bucket(f, current)
+                    self._write_bucket(current)
                     return
             
             overflow = Bucket(bucket_id=self.next_bucket_id, local_depth=current.local_depth)
@@ -254,9 +239,8 @@ class ExtendibleHash(IndexBase):
             overflow.add_entry(key, record_pos)
             current.next = overflow.bucket_id
             
-            with open(self.bucket_file, "r+b") as f:
-                self._write_bucket(f, current)
-                self._write_bucket(f, overflow)
+            self._write_bucket(current)
+            self._write_bucket(overflow)
             
             self._save_directory()
     
@@ -296,9 +280,8 @@ class ExtendibleHash(IndexBase):
         
         self._save_directory()
         
-        with open(self.bucket_file, "r+b") as f:
-            self._write_bucket(f, bucket)
-            self._write_bucket(f, new_bucket)
+        self._write_bucket(bucket)
+        self._write_bucket(new_bucket)
         
         for i in range(len(old_keys)):
             self._add_key_with_position(old_keys[i], old_pointers[i])
@@ -310,8 +293,7 @@ class ExtendibleHash(IndexBase):
         
         if key in bucket.keys:
             bucket.remove_entry(key)
-            with open(self.bucket_file, "r+b") as f:
-                self._write_bucket(f, bucket)
+            self._write_bucket(bucket)
             
             if len(bucket.keys) == 0 and bucket.local_depth > 1:
                 self._merge_buckets()
@@ -329,11 +311,9 @@ class ExtendibleHash(IndexBase):
                 
                 if len(current.keys) == 0:
                     prev.next = current.next
-                    with open(self.bucket_file, "r+b") as f:
-                        self._write_bucket(f, prev)
+                    self._write_bucket(prev)
                 else:
-                    with open(self.bucket_file, "r+b") as f:
-                        self._write_bucket(f, current)
+                    self._write_bucket(current)
                 
                 return True
         
@@ -375,9 +355,8 @@ class ExtendibleHash(IndexBase):
                     bucket2.pointers = []
                     bucket2.local_depth = 0
                     
-                    with open(self.bucket_file, "r+b") as f:
-                        self._write_bucket(f, bucket1)
-                        self._write_bucket(f, bucket2)
+                    self._write_bucket(bucket1)
+                    self._write_bucket(bucket2)
                     
                     self._save_directory()
                     
@@ -430,32 +409,17 @@ class ExtendibleHash(IndexBase):
         
         return count
     
-    def get_all(self):
-        result = []
-        
-        unique_buckets = set(self.directory.values())
-        
-        for bucket_id in unique_buckets:
-            bucket = self._read_bucket(bucket_id)
-            
-            for i in range(len(bucket.keys)):
-                record_pos = bucket.pointers[i]
-                with open(self.data_path, 'rb') as f:
-                    f.seek(record_pos)
-                    record_data = f.read(self.table_ref._get_record_size())
-                    result.append(self.table_ref._deserialize_record(record_data))
-            
-            current = bucket
+    def iter_positions(self):
+        """Posiciones de todos los registros, bucket por bucket"""
+        for bucket_id in set(self.directory.values()):
+            current = self._read_bucket(bucket_id)
+            yield from current.pointers
             while current.next != -1:
                 current = self._read_bucket(current.next)
-                for i in range(len(current.keys)):
-                    record_pos = current.pointers[i]
-                    with open(self.data_path, 'rb') as f:
-                        f.seek(record_pos)
-                        record_data = f.read(self.table_ref._get_record_size())
-                        result.append(self.table_ref._deserialize_record(record_data))
-        
-        return result
+                yield from current.pointers
+    
+    def get_all(self):
+        return [self.table_ref.read_record(pos) for pos in self.iter_positions()]
     
     def range_search(self, begin_key, end_key=None):
         """
@@ -482,6 +446,7 @@ class ExtendibleHash(IndexBase):
         if os.path.exists(self.dir_file):
             os.remove(self.dir_file)
         if os.path.exists(self.bucket_file):
+            self.table_ref.files.close(self.bucket_file)
             os.remove(self.bucket_file)
         
         self.global_depth = 2
@@ -492,6 +457,8 @@ class ExtendibleHash(IndexBase):
             key = record[self.column_name]
             self.add(record, key)
         
+        # Los registros se volvieron a escribir en otras posiciones
+        self._notify_relocated()
         return True
     
     def _get_record_size(self):
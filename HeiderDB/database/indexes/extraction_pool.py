@@ -0,0 +1,73 @@
+import os
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+# Extractor de cada proceso del pool, se arma una vez en _init_worker
+_worker_extractor = None
+
+
+def _init_worker(feature_extractor):
+    global _worker_extractor
+    _worker_extractor = feature_extractor
+
+
+def _extract_file(feature_extractor, path):
+    """(path, descriptores como matriz float32 o None, error o None)"""
+    try:
+        descriptors = feature_extractor.extract(path)
+        if descriptors is None or len(descriptors) == 0:
+            return path, None, None
+        return path, np.asarray(descriptors, dtype=np.float32), None
+    except Exception as e:
+        return path, None, str(e)
+
+
+def _extract_chunk(paths):
+    return [_extract_file(_worker_extractor, path) for path in paths]
+
+
+class ExtractionPool:
+    """
+    Extracción de características en varios procesos.
+
+    Los archivos se mandan al pool en bloques de chunk_size y nunca hay más de
+    max_pending bloques en vuelo, así un reindexado grande no acumula todos
+    los descriptores en memoria. Los resultados salen en el mismo orden que
+    los archivos de entrada.
+
+    Cada proceso recibe una copia del extractor (ImageExtractor recrea su
+    detector al deserializarse). Con workers <= 1, o si no alcanza para dos
+    bloques, se extrae en el mismo proceso.
+    """
+
+    def __init__(self, feature_extractor, workers=None, chunk_size=8, max_pending=None):
+        self.feature_extractor = feature_extractor
+        self.workers = max(1, os.cpu_count() or 1) if workers is None else max(1, int(workers))
+        self.chunk_size = max(1, chunk_size)
+        self.max_pending = max_pending or 2 * self.workers
+
+    def map(self, paths):
+        """Genera (path, descriptores, error) por archivo, en el orden de paths"""
+        paths = list(paths)
+        if self.workers <= 1 or len(paths) < 2 * self.chunk_size:
+            for path in paths:
+                yield _extract_file(self.feature_extractor, path)
+            return
+
+        chunks = [paths[i:i + self.chunk_size] for i in range(0, len(paths), self.chunk_size)]
+        # spawn: el servidor tiene hilos y hacer fork con hilos vivos no es seguro
+        with ProcessPoolExecutor(
+            max_workers=min(self.workers, len(chunks)),
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(self.feature_extractor,),
+        ) as executor:
+            pending = deque()
+            for chunk in chunks:
+                pending.append(executor.submit(_extract_chunk, chunk))
+                if len(pending) >= self.max_pending:
+                    yield from pending.popleft().result()
+            while pending:
+                yield from pending.popleft().result()
@@ -48,6 +48,9 @@ class ImageExtractor(FeatureExtractor):
 
         self.method = method
         self.media_type = "image"
+        self._load_backend()
+
+    def _load_backend(self):
         self.cnn_model = None
         self.sift_detector = None
 
@@ -74,6 +77,18 @@ class ImageExtractor(FeatureExtractor):
                 self.cnn_model = None
             self._dimension = 128  # Dimensión reducida para vectores locales CNN
 
+    def __getstate__(self):
+        # El detector SIFT y el modelo CNN no se pueden serializar: cada
+        # proceso del pool de extracción los vuelve a crear
+        state = self.__dict__.copy()
+        state["cnn_model"] = None
+        state["sift_detector"] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._load_backend()
+
     def extract(self, file_path):
         if self.method == "sift":
             return self._extract_sift_local(file_path)
@@ -0,0 +1,143 @@
+import os
+import struct
+import numpy as np
+from HeiderDB.database.file_manager import PagedFile
+
+COUNT = struct.Struct("<I")
+
+
+class ForwardIndex:
+    """
+    Índice directo del índice invertido: ordinal de documento -> ids de sus
+    términos.
+
+    Los registros ([cantidad][term ids uint32...]) solo se agregan al final
+    de <path>; el offset del registro de cada ordinal vive en memoria y se
+    guarda en <path>.idx (un .npy int64, -1 si el ordinal no tiene registro)
+    con flush(). Así borrar un documento solo toca sus propios términos.
+    Entre un flush y otro, el índice invertido anota en su journal los
+    offsets que cambian y los repone con set_offset() al abrir.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.offsets_path = f"{path}.idx"
+        self.offsets = np.full(0, -1, dtype=np.int64)
+        self.count = 0  # ordinales con lugar en offsets
+        self.dirty = False
+        if os.path.exists(self.offsets_path):
+            try:
+                with open(self.offsets_path, "rb") as f:
+                    self.offsets = np.load(f)
+                self.count = len(self.offsets)
+            except (OSError, ValueError) as e:
+                print(f"Índice directo inválido, se descarta: {e}")
+                self.offsets = np.full(0, -1, dtype=np.int64)
+        self.file = PagedFile(path)
+
+    def __contains__(self, ordinal):
+        return 0 <= ordinal < self.count and self.offsets[ordinal] >= 0
+
+    def _grow(self, last):
+        """Asegura lugar en offsets hasta el ordinal last"""
+        if last >= len(self.offsets):
+            grown = np.full(max(last + 1, 2 * len(self.offsets), 1024), -1, dtype=np.int64)
+            grown[:len(self.offsets)] = self.offsets
+            self.offsets = grown
+        self.count = max(self.count, last + 1)
+
+    def offset(self, ordinal):
+        """Offset del registro del ordinal (-1 si no tiene)"""
+        return int(self.offsets[ordinal]) if 0 <= ordinal < self.count else -1
+
+    def set_offset(self, ordinal, offset):
+        """Apunta el ordinal a un registro ya escrito (al repetir el journal del índice)"""
+        self._grow(ordinal)
+        self.offsets[ordinal] = offset
+        self.dirty = True
+
+    def append(self, ordinal, term_ids):
+        term_ids = np.asarray(term_ids, dtype="<u4")
+        offset = self.file.append(COUNT.pack(len(term_ids)) + term_ids.tobytes())
+        self._grow(ordinal)
+        self.offsets[ordinal] = offset
+        self.dirty = True
+
+    def append_many(self, entries):
+        """Agrega varios (ordinal, term_ids) con una sola escritura"""
+        entries = list(entries)
+        if not entries:
+            return
+        start = self.file.size()
+        parts, offsets, position = [], [], start
+        for _, term_ids in entries:
+            record = COUNT.pack(len(term_ids)) + np.asarray(term_ids, dtype="<u4").tobytes()
+            parts.append(record)
+            offsets.append(position)
+            position += len(record)
+        self.file.write_at(start, b"".join(parts))
+        self._grow(max(ordinal for ordinal, _ in entries))
+        for (ordinal, _), offset in zip(entries, offsets):
+            self.offsets[ordinal] = offset
+        self.dirty = True
+
+    def get(self, ordinal):
+        """Ids de los términos del documento (arreglo vacío si no tiene registro)"""
+        if ordinal not in self:
+            return np.empty(0, dtype=np.uint32)
+        offset = int(self.offsets[ordinal])
+        (count,) = COUNT.unpack(self.file.read_at(offset, COUNT.size))
+        data = self.file.read_at(offset + COUNT.size, 4 * count)
+        return np.frombuffer(data, dtype="<u4").astype(np.uint32)
+
+    def discard(self, ordinal):
+        """Olvida el registro del ordinal (sus bytes quedan como basura)"""
+        if ordinal in self:
+            self.offsets[ordinal] = -1
+            self.dirty = True
+
+    def compact(self, path):
+        """
+        Copia solo los registros vigentes, en orden de ordinal, a un archivo
+        nuevo en path (con su .idx) y pasa a usarlo. Los archivos anteriores
+        quedan intactos: los borra el que llama cuando ya no los necesita.
+        """
+        live = np.flatnonzero(self.offsets[:self.count] >= 0)
+        parts, offsets, position = [], [], 0
+        for ordinal in live.tolist():
+            term_ids = self.get(ordinal)
+            parts.append(COUNT.pack(len(term_ids)) + term_ids.astype("<u4").tobytes())
+            offsets.append(position)
+            position += len(parts[-1])
+        with open(path, "wb") as f:
+            f.write(b"".join(parts))
+            f.flush()
+            os.fsync(f.fileno())
+        self.file.close()
+        self.path = path
+        self.offsets_path = f"{path}.idx"
+        self.file = PagedFile(path)
+        self.offsets = self.offsets.copy()
+        self.offsets[live] = offsets
+        self.dirty = True
+        self.flush()
+
+    def flush(self):
+        if not self.dirty:
+            return
+        tmp_path = f"{self.offsets_path}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.save(f, self.offsets[:self.count])
+        os.replace(tmp_path, self.offsets_path)
+        self.dirty = False
+
+    def clear(self):
+        self.file.truncate(0)
+        self.offsets = np.full(0, -1, dtype=np.int64)
+        self.count = 0
+        self.dirty = True
+        self.flush()
+
+    def close(self):
+        self.flush()
+        self.file.close()
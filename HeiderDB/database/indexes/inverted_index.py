@@ -3,33 +3,114 @@ import json
 import math
 import pickle
 import struct
+import heapq
+import itertools
+import tempfile
+import numpy as np
 from HeiderDB.database.index_base import IndexBase
+from HeiderDB.database.file_manager import atomic_write, atomic_write_json
 from HeiderDB.database.indexes.text_processor import TextProcessor
+from HeiderDB.database.indexes.forward_index import ForwardIndex
+from HeiderDB.database.indexes.postings_codec import (
+    encode_postings, decode_postings, decode_doc_ordinals, decode_df,
+    decode_skips, decode_blocks,
+)
 
 class InvertedIndex(IndexBase):
     """
     Implementación de índice invertido para búsqueda textual.
     Implementa algoritmo SPIMI para indexación eficiente.
+    
+    Cada documento recibe un ordinal (entero creciente) y las posting lists
+    se guardan en binario con postings_codec: ordinales y tf en varint con
+    diferencias, y las posiciones en un bloque aparte que se puede saltar.
+    doc_ids[ordinal] es el doc_id (None si se borró).
+    
+    Cada término tiene además un id y el índice directo (forward_index)
+    guarda los ids de los términos de cada documento. Los borrados son
+    perezosos: remove solo baja el df de esos términos y marca el ordinal en
+    deleted; las consultas filtran los ordinales borrados y se purgan de una
+    posting list cuando se vuelve a escribir.
+    
+    search_ranked usa MaxScore: el diccionario guarda la tf máxima de cada
+    término (tf_max * idf acota lo que aporta a un documento) y las listas
+    largas traen una tabla de saltos con la tf máxima por bloque, así los
+    términos que no pueden cambiar el top-k solo se consultan en los
+    bloques de los candidatos.
+    
+    Diccionario, metadatos (con doc_ids) e índice directo se guardan
+    completos solo en _save_index (build, vacuum, o cuando el journal pasa
+    JOURNAL_MAX_BYTES). Cada add/remove fuera de un batch, y cada fin de
+    batch, agrega al journal una línea JSON con lo que cambió: entradas del
+    diccionario, doc_id y offset directo de los ordinales tocados y los
+    contadores. Al abrir se repiten sobre el último guardado completo.
     """
     
+    # Versión del formato del archivo de postings (1 = dicts con pickle,
+    # 2 = binario sin ids de término ni índice directo, 3 = sin tf máxima ni
+    # tablas de saltos)
+    POSTINGS_FORMAT = 4
+    
+    # SPIMI: memoria por bloque antes de volcarlo a disco, y lo que se estima
+    # que ocupa en Python cada término nuevo, posting y posición
+    SPIMI_BLOCK_BYTES = 64 * 1024 * 1024
+    SPIMI_TERM_BYTES = 300
+    SPIMI_POSTING_BYTES = 72
+    SPIMI_POSITION_BYTES = 36
+    
+    # Compactación automática: el archivo de postings se reescribe cuando los
+    # bytes muertos (copias viejas de posting lists) pasan esta fracción del
+    # total, si el archivo tiene al menos COMPACTION_MIN_BYTES
+    COMPACTION_DEAD_RATIO = 0.5
+    COMPACTION_MIN_BYTES = 1024 * 1024
+    
+    # Tamaño del journal a partir del cual se guarda todo y se vacía
+    JOURNAL_MAX_BYTES = 4 * 1024 * 1024
+    
     def __init__(self, table_name, column_name, data_path, table_ref, page_size):
         super().__init__(table_name, column_name, data_path, table_ref, page_size)
         
-        # Definir rutas de archivos
+        # Definir rutas de archivos. Diccionario, postings, índice directo y
+        # journal van con la generación que dicen los metadatos (ver vacuum)
         self.index_dir = os.path.dirname(data_path)
-        self.dictionary_file = os.path.join(self.index_dir, f"{table_name}_{column_name}_inverted_dictionary.dat")
-        self.postings_file = os.path.join(self.index_dir, f"{table_name}_{column_name}_inverted_postings.dat")
         self.metadata_file = os.path.join(self.index_dir, f"{table_name}_{column_name}_inverted_metadata.json")
+        self._set_generation(self._stored_generation())
         
         # Inicializar procesador de texto
         self.text_processor = TextProcessor()
         
-        # Diccionario en memoria: término -> {offset, size, df}
+        # Diccionario en memoria: término -> {offset, size, df, term_id, max_tf}.
+        # df cuenta solo documentos vivos; max_tf puede incluir borrados (es
+        # solo una cota)
         self.dictionary = {}
         
+        # term_id -> término (None si el término ya no está)
+        self.terms = []
+        
         # Contador de documentos indexados
         self.doc_count = 0
         
+        # Bytes del archivo de postings que usa el diccionario y bytes que
+        # quedaron abandonados
+        self.live_bytes = 0
+        self.dead_bytes = 0
+        
+        # Ordinal -> doc_id y doc_id -> ordinal
+        self.doc_ids = []
+        self.doc_ordinals = {}
+        
+        # Ordinales borrados (todavía pueden estar en las posting lists)
+        self.deleted = np.zeros(0, dtype=bool)
+        
+        # Términos y ordinales cambiados desde la última línea del journal
+        self.dirty_terms = set()
+        self.dirty_ordinals = set()
+        self.journal_bytes = 0
+        
+        # Ordinal -> ids de los términos del documento
+        os.makedirs(self.index_dir, exist_ok=True)
+        self.forward_index = ForwardIndex(self.forward_file)
+        
         # Cargar o crear índice
         self._load_or_create_index()
         
@@ -38,6 +119,18 @@ class InvertedIndex(IndexBase):
         if os.path.exists(self.metadata_file) and os.path.exists(self.dictionary_file):
             self._load_metadata()
             self._load_dictionary()
+            if self.postings_format == self.POSTINGS_FORMAT:
+                self._replay_journal()
+            if self.live_bytes is None:
+                self._recount_bytes()
+            if self.postings_format < 2:
+                self._migrate_legacy_postings()
+            if self.postings_format < 3:
+                self._build_forward_index()
+            if self.postings_format < self.POSTINGS_FORMAT:
+                # Se recodifican todas las listas para agregar lo que falta
+                self.postings_format = self.POSTINGS_FORMAT
+                self.vacuum(reencode=True)
             print(f"Índice invertido cargado para {self.table_name}.{self.column_name}")
         else:
             self._create_new_index()
@@ -46,7 +139,16 @@ class InvertedIndex(IndexBase):
     def _create_new_index(self):
         """Crea un nuevo índice vacío"""
         self.dictionary = {}
+        self.terms = []
         self.doc_count = 0
+        self.live_bytes = 0
+        self.dead_bytes = 0
+        self.doc_ids = []
+        self.doc_ordinals = {}
+        self.deleted = np.zeros(0, dtype=bool)
+        self.postings_format = self.POSTINGS_FORMAT
+        self.forward_index.clear()
+        self._reset_journal()
         
         # Asegurar que el directorio existe
         os.makedirs(self.index_dir, exist_ok=True)
@@ -60,29 +162,72 @@ class InvertedIndex(IndexBase):
             
         self._save_metadata()
     
+    def _generation_files(self, generation):
+        """Diccionario, postings, índice directo y journal de una generación (la 0 usa los nombres de siempre)"""
+        prefix = os.path.join(self.index_dir, f"{self.table_name}_{self.column_name}_inverted")
+        suffix = f"_{generation}" if generation else ""
+        return (
+            f"{prefix}_dictionary{suffix}.dat",
+            f"{prefix}_postings{suffix}.dat",
+            f"{prefix}_forward{suffix}.dat",
+            f"{prefix}_journal{suffix}.jsonl",
+        )
+    
+    def _set_generation(self, generation):
+        self.generation = generation
+        self.dictionary_file, self.postings_file, self.forward_file, self.journal_file = (
+            self._generation_files(generation)
+        )
+    
+    def _stored_generation(self):
+        try:
+            with open(self.metadata_file, 'r') as f:
+                return int(json.load(f).get("generation", 0))
+        except (OSError, ValueError):
+            return 0
+    
     def _save_metadata(self):
         """Guarda metadatos del índice"""
         metadata = {
             "table_name": self.table_name,
             "column_name": self.column_name,
+            "generation": self.generation,
             "doc_count": self.doc_count,
             "vocabulary_size": len(self.dictionary),
+            "postings_format": self.postings_format,
+            "term_id_count": len(self.terms),
+            "live_bytes": self.live_bytes,
+            "dead_bytes": self.dead_bytes,
+            "doc_ids": self.doc_ids,
             "created_at": os.path.getmtime(self.data_path) if os.path.exists(self.data_path) else 0,
             "updated_at": os.path.getmtime(self.postings_file) if os.path.exists(self.postings_file) else 0
         }
         
-        with open(self.metadata_file, 'w') as f:
-            json.dump(metadata, f, indent=2)
+        atomic_write_json(self.metadata_file, metadata, indent=None)
     
     def _load_metadata(self):
         """Carga metadatos del índice"""
         with open(self.metadata_file, 'r') as f:
             metadata = json.load(f)
             self.doc_count = metadata.get("doc_count", 0)
+            self.postings_format = metadata.get("postings_format", 1)
+            self.doc_ids = metadata.get("doc_ids", [])
+            self.doc_ordinals = {
+                doc_id: ordinal for ordinal, doc_id in enumerate(self.doc_ids) if doc_id is not None
+            }
+            self.deleted = np.array([doc_id is None for doc_id in self.doc_ids], dtype=bool)
+            self.terms = [None] * metadata.get("term_id_count", 0)
+            # Índices anteriores no llevaban la cuenta (se calcula al cargar)
+            self.live_bytes = metadata.get("live_bytes")
+            self.dead_bytes = metadata.get("dead_bytes", 0)
     
     def _load_dictionary(self):
         """Carga el diccionario completo en memoria"""
         self.dictionary = {}
+        # Antes del formato 3 las entradas no traían term_id, y antes del 4
+        # tampoco max_tf
+        with_ids = self.postings_format >= 3
+        with_max_tf = self.postings_format >= 4
         
         try:
             with open(self.dictionary_file, 'rb') as f:
@@ -95,56 +240,98 @@ class InvertedIndex(IndexBase):
                     # Leer término
                     term = f.read(term_len).decode('utf-8')
                     
-                    # Leer offset, size y df
-                    offset, size, df = struct.unpack('!QII', f.read(16))
+                    # Leer offset, size, df, term_id y max_tf
+                    term_id = max_tf = None
+                    if with_max_tf:
+                        offset, size, df, term_id, max_tf = struct.unpack('!QIIII', f.read(24))
+                    elif with_ids:
+                        offset, size, df, term_id = struct.unpack('!QIII', f.read(20))
+                    else:
+                        offset, size, df = struct.unpack('!QII', f.read(16))
                     
                     # Almacenar en el diccionario
                     self.dictionary[term] = {
                         'offset': offset,
                         'size': size,
-                        'df': df
+                        'df': df,
+                        'term_id': term_id,
+                        'max_tf': max_tf
                     }
+                    if term_id is not None:
+                        if term_id >= len(self.terms):
+                            self.terms.extend([None] * (term_id + 1 - len(self.terms)))
+                        self.terms[term_id] = term
         except (EOFError, struct.error) as e:
             print(f"Error al cargar el diccionario: {e}")
             self.dictionary = {}
     
     def _save_dictionary(self):
         """Guarda el diccionario completo a disco"""
-        with open(self.dictionary_file, 'wb') as f:
-            # Escribir número de términos
-            f.write(struct.pack('!I', len(self.dictionary)))
-            
-            # Escribir cada término con su offset, size y df
-            for term, data in self.dictionary.items():
-                term_bytes = term.encode('utf-8')
-                
-                # Escribir longitud del término
-                f.write(struct.pack('!I', len(term_bytes)))
-                
-                # Escribir término
-                f.write(term_bytes)
-                
-                # Escribir offset, size y df
-                f.write(struct.pack('!QII', data['offset'], data['size'], data['df']))
+        # Se arma en memoria y se reemplaza el archivo de una sola vez
+        parts = [struct.pack('!I', len(self.dictionary))]
+
+        # Cada término con su longitud, offset, size, df, term_id y max_tf
+        for term, data in self.dictionary.items():
+            term_bytes = term.encode('utf-8')
+            parts.append(struct.pack('!I', len(term_bytes)))
+            parts.append(term_bytes)
+            parts.append(struct.pack(
+                '!QIIII', data['offset'], data['size'], data['df'], data['term_id'], data['max_tf']
+            ))
+
+        atomic_write(self.dictionary_file, b''.join(parts))
+    
+    def _recount_bytes(self):
+        """Calcula bytes vivos y muertos a partir del diccionario y el archivo"""
+        self.live_bytes = sum(data['size'] for data in self.dictionary.values())
+        file_size = os.path.getsize(self.postings_file) if os.path.exists(self.postings_file) else 0
+        self.dead_bytes = max(0, file_size - self.live_bytes)
     
-    def _read_posting_list(self, term):
-        """Lee la posting list para un término específico desde el archivo"""
+    def _replace_entry(self, term, entry):
+        """Pone entry en el diccionario; la copia anterior pasa a bytes muertos"""
+        old = self.dictionary.get(term)
+        if old is not None:
+            self.live_bytes -= old['size']
+            self.dead_bytes += old['size']
+        self.live_bytes += entry['size']
+        self.dictionary[term] = entry
+        self.dirty_terms.add(term)
+    
+    def _read_posting_bytes(self, term):
+        """Bytes de la posting list de term tal como están en el archivo"""
+        data = self.dictionary[term]
+        with open(self.postings_file, 'rb') as f:
+            f.seek(data['offset'])
+            return f.read(data['size'])
+    
+    def _read_posting_list(self, term, with_positions=True):
+        """
+        Lee la posting list de term. Retorna (ordinales, tfs, posiciones) como
+        arreglos, o None si el término no existe. Sin with_positions el bloque
+        de posiciones no se decodifica y viene None.
+        """
         if term not in self.dictionary:
             return None
             
         try:
-            with open(self.postings_file, 'rb') as f:
-                f.seek(self.dictionary[term]['offset'])
-                serialized = f.read(self.dictionary[term]['size'])
-                return pickle.loads(serialized)
-        except (EOFError, pickle.UnpicklingError) as e:
+            return decode_postings(self._read_posting_bytes(term), with_positions)
+        except (IndexError, ValueError) as e:
             print(f"Error al leer posting list para '{term}': {e}")
             return None
     
-    def _write_posting_list(self, posting_list):
+    def _read_doc_ordinals(self, term):
+        """Solo los ordinales de los documentos de term (para consultas booleanas)"""
+        if term not in self.dictionary:
+            return np.empty(0, dtype=np.int64)
+        try:
+            return decode_doc_ordinals(self._read_posting_bytes(term))
+        except (IndexError, ValueError) as e:
+            print(f"Error al leer posting list para '{term}': {e}")
+            return np.empty(0, dtype=np.int64)
+    
+    def _write_posting_list(self, doc_ordinals, tfs, positions):
         """Escribe una posting list al archivo y retorna su offset y tamaño"""
-        term = posting_list['term']
-        serialized = pickle.dumps(posting_list)
+        serialized = encode_postings(doc_ordinals, tfs, positions)
         
         with open(self.postings_file, 'ab') as f:
             offset = f.tell()
@@ -153,6 +340,148 @@ class InvertedIndex(IndexBase):
         
         return offset, size
     
+    def _get_ordinal(self, doc_id):
+        """Ordinal de doc_id, asignando uno nuevo si no tiene"""
+        ordinal = self.doc_ordinals.get(doc_id)
+        if ordinal is None:
+            ordinal = len(self.doc_ids)
+            self.doc_ids.append(doc_id)
+            self.doc_ordinals[doc_id] = ordinal
+            self._grow_deleted(ordinal)
+            self.dirty_ordinals.add(ordinal)
+        return ordinal
+    
+    def _grow_deleted(self, ordinal):
+        if ordinal >= len(self.deleted):
+            grown = np.zeros(max(ordinal + 1, 2 * len(self.deleted), 1024), dtype=bool)
+            grown[:len(self.deleted)] = self.deleted
+            self.deleted = grown
+    
+    def _term_id(self, term):
+        """Id de term, asignando uno nuevo si todavía no está en el diccionario"""
+        data = self.dictionary.get(term)
+        if data is not None and data.get('term_id') is not None:
+            return data['term_id']
+        self.terms.append(term)
+        return len(self.terms) - 1
+    
+    def _mark_deleted(self, ordinal):
+        """
+        Borrado perezoso: baja el df de los términos del documento (según el
+        índice directo) y marca el ordinal. Las posting lists no se tocan.
+        """
+        for term_id in self.forward_index.get(ordinal).tolist():
+            term = self.terms[term_id] if term_id < len(self.terms) else None
+            data = self.dictionary.get(term)
+            if data is None:
+                continue
+            self.dirty_terms.add(term)
+            data['df'] -= 1
+            if data['df'] <= 0:
+                # Si no quedan documentos, eliminar el término
+                del self.dictionary[term]
+                self.terms[term_id] = None
+                self.live_bytes -= data['size']
+                self.dead_bytes += data['size']
+        self.forward_index.discard(ordinal)
+        del self.doc_ordinals[self.doc_ids[ordinal]]
+        self.doc_ids[ordinal] = None
+        self.deleted[ordinal] = True
+        self.dirty_ordinals.add(ordinal)
+    
+    def _purge_deleted(self, postings):
+        """Posting list decodificada sin los ordinales borrados"""
+        doc_ordinals, tfs, positions = postings
+        live = ~self.deleted[doc_ordinals]
+        if live.all():
+            return postings
+        return doc_ordinals[live], tfs[live], positions[np.repeat(live, tfs)]
+    
+    def _live(self, doc_ordinals):
+        """Máscara de los ordinales que no están borrados"""
+        return ~self.deleted[doc_ordinals]
+    
+    @staticmethod
+    def _upsert_posting(postings, ordinal, doc_positions):
+        """Agrega o reemplaza las posiciones de ordinal en una posting list decodificada"""
+        doc_ordinals, tfs, positions = postings
+        i = int(np.searchsorted(doc_ordinals, ordinal))
+        start = int(tfs[:i].sum())
+        doc_positions = np.asarray(doc_positions, dtype=np.int64)
+        if i < len(doc_ordinals) and doc_ordinals[i] == ordinal:
+            end = start + int(tfs[i])
+            tfs = tfs.copy()
+            tfs[i] = len(doc_positions)
+        else:
+            end = start
+            doc_ordinals = np.insert(doc_ordinals, i, ordinal)
+            tfs = np.insert(tfs, i, len(doc_positions))
+        positions = np.concatenate([positions[:start], doc_positions, positions[end:]])
+        return doc_ordinals, tfs, positions
+    
+    def _migrate_legacy_postings(self):
+        """Convierte un archivo de postings con dicts pickle al formato binario"""
+        print(f"Migrando postings de {self.table_name}.{self.column_name} al formato binario...")
+        legacy = {}
+        for term in list(self.dictionary):
+            try:
+                legacy[term] = pickle.loads(self._read_posting_bytes(term))['postings']
+            except (EOFError, pickle.UnpicklingError, KeyError) as e:
+                print(f"Error al leer posting list para '{term}': {e}")
+        
+        self.doc_ids = []
+        self.doc_ordinals = {}
+        self.deleted = np.zeros(0, dtype=bool)
+        for postings in legacy.values():
+            for posting in postings:
+                self._get_ordinal(posting['doc_id'])
+        
+        # El archivo nuevo se arma completo y reemplaza al viejo de una vez
+        old_dictionary = self.dictionary
+        self.dictionary = {}
+        parts, offset = [], 0
+        for term, postings in legacy.items():
+            entries = sorted(
+                (self.doc_ordinals[p['doc_id']], sorted(p['positions'])) for p in postings
+            )
+            doc_ordinals = [ordinal for ordinal, _ in entries]
+            tfs = [len(positions) for _, positions in entries]
+            flat = np.array([pos for _, positions in entries for pos in positions], dtype=np.int64)
+            serialized = encode_postings(doc_ordinals, tfs, flat)
+            parts.append(serialized)
+            self.dictionary[term] = {
+                'offset': offset, 'size': len(serialized), 'df': len(entries), 'term_id': None, 'max_tf': max(tfs),
+            }
+            offset += len(serialized)
+        atomic_write(self.postings_file, b''.join(parts))
+        self.live_bytes, self.dead_bytes = offset, 0
+        
+        dropped = len(old_dictionary) - len(self.dictionary)
+        if dropped:
+            print(f"Se descartaron {dropped} posting lists ilegibles")
+        # Faltan el índice directo y las tablas de saltos; se guarda al final
+        # de la migración
+        self.postings_format = 2
+    
+    def _build_forward_index(self):
+        """
+        Asigna ids a los términos y arma el índice directo recorriendo las
+        posting lists (índices guardados antes del formato 3).
+        """
+        print(f"Armando índice directo de {self.table_name}.{self.column_name}...")
+        self.terms = []
+        doc_terms = {}
+        for term, data in self.dictionary.items():
+            data['term_id'] = len(self.terms)
+            self.terms.append(term)
+            doc_ordinals = self._read_doc_ordinals(term)
+            for ordinal in doc_ordinals[self._live(doc_ordinals)].tolist():
+                doc_terms.setdefault(ordinal, []).append(data['term_id'])
+        
+        self.forward_index.clear()
+        self.forward_index.append_many(sorted(doc_terms.items()))
+        self.postings_format = 3
+    
     def search(self, key):
         """
         Busca un registro usando la clave proporcionada.
@@ -208,140 +537,279 @@ class InvertedIndex(IndexBase):
         # Procesar texto
         terms = self.text_processor.process_text(text)
         
-        # Calcular frecuencias de términos
-        term_freqs = {}
+        # Posiciones de cada término (la tf es cuántas tiene)
         term_positions = {}
-        
         for pos, term in enumerate(terms):
-            if term in term_freqs:
-                term_freqs[term] += 1
-                term_positions[term].append(pos)
-            else:
-                term_freqs[term] = 1
-                term_positions[term] = [pos]
+            term_positions.setdefault(term, []).append(pos)
+        
+        # Si ya estaba indexado, la versión anterior queda como borrada y el
+        # documento recibe un ordinal nuevo
+        is_new = key not in self.doc_ordinals
+        if not is_new:
+            self._mark_deleted(self.doc_ordinals[key])
+        ordinal = self._get_ordinal(key)
         
         # Para cada término, actualizar su posting list
-        for term, tf in term_freqs.items():
-            # Leer posting list actual
-            posting_list = self._read_posting_list(term)
+        term_ids = []
+        for term, positions in term_positions.items():
+            postings = self._read_posting_list(term)
+            term_id = self._term_id(term)
+            term_ids.append(term_id)
             
-            if posting_list is None:
+            if postings is None:
                 # Crear nueva posting list
-                posting_list = {
-                    'term': term,
-                    'df': 1,
-                    'postings': [
-                        {
-                            'doc_id': key,
-                            'tf': tf,
-                            'positions': term_positions[term]
-                        }
-                    ]
-                }
+                postings = (
+                    np.array([ordinal], dtype=np.int64),
+                    np.array([len(positions)], dtype=np.int64),
+                    np.asarray(positions, dtype=np.int64),
+                )
             else:
-                # Actualizar posting list existente
-                # Verificar si el documento ya está en la lista
-                found = False
-                for i, posting in enumerate(posting_list['postings']):
-                    if posting['doc_id'] == key:
-                        # Actualizar entrada existente
-                        posting_list['postings'][i] = {
-                            'doc_id': key,
-                            'tf': tf,
-                            'positions': term_positions[term]
-                        }
-                        found = True
-                        break
-                        
-                if not found:
-                    # Añadir nueva entrada
-                    posting_list['postings'].append({
-                        'doc_id': key,
-                        'tf': tf,
-                        'positions': term_positions[term]
-                    })
-                    posting_list['df'] += 1
+                # Agregar el documento; al reescribir la lista se purgan
+                # los ordinales borrados
+                postings = self._upsert_posting(self._purge_deleted(postings), ordinal, positions)
             
             # Escribir posting list actualizada
-            offset, size = self._write_posting_list(posting_list)
+            offset, size = self._write_posting_list(*postings)
             
             # Actualizar diccionario
-            self.dictionary[term] = {
+            self._replace_entry(term, {
                 'offset': offset,
                 'size': size,
-                'df': posting_list['df']
-            }
+                'df': len(postings[0]),
+                'term_id': term_id,
+                'max_tf': int(postings[1].max())
+            })
+        
+        self.forward_index.append(ordinal, term_ids)
         
         # Actualizar contador de documentos
-        self.doc_count += 1
+        if is_new:
+            self.doc_count += 1
         
-        # Guardar cambios
-        self._save_dictionary()
-        self._save_metadata()
+        # Guardar cambios (o dejarlos pendientes si hay un batch abierto)
+        self._persist_metadata()
         
     def remove(self, key):
         """
         Elimina un documento del índice invertido.
         key: ID primario del documento a eliminar
         """
-        removed = False
-        terms_to_update = []
+        ordinal = self.doc_ordinals.get(key)
+        if ordinal is None:
+            return False
         
-        # Identificar términos que contienen el documento
-        for term, data in self.dictionary.items():
-            posting_list = self._read_posting_list(term)
-            if not posting_list:
-                continue
-                
-            # Buscar y eliminar el documento de la posting list
-            new_postings = [p for p in posting_list['postings'] if p['doc_id'] != key]
-            
-            # Si cambió la posting list
-            if len(new_postings) < len(posting_list['postings']):
-                removed = True
-                
-                if len(new_postings) == 0:
-                    # Si no quedan documentos, eliminar el término
-                    del self.dictionary[term]
-                else:
-                    # Actualizar posting list
-                    posting_list['postings'] = new_postings
-                    posting_list['df'] = len(new_postings)
-                    
-                    # Reescribir posting list
-                    offset, size = self._write_posting_list(posting_list)
-                    
-                    # Actualizar diccionario
-                    self.dictionary[term] = {
-                        'offset': offset,
-                        'size': size,
-                        'df': posting_list['df']
-                    }
-        
-        if removed:
-            self.doc_count -= 1
-            self._save_dictionary()
-            self._save_metadata()
+        # Solo se tocan los términos del documento (índice directo); sus
+        # postings quedan en las listas hasta que se reescriban
+        self._mark_deleted(ordinal)
+        self.doc_count -= 1
+        self._persist_metadata()
             
-        return removed
+        return True
         
     def rebuild(self):
         """
         Reconstruye el índice desde cero usando todos los registros de la tabla.
         """
+        self.build(self.table_ref.scan())
+        print(f"Índice invertido reconstruido con {self.doc_count} documentos")
+    
+    def build(self, records):
+        """
+        Indexa records desde cero con SPIMI: los postings se juntan en memoria
+        por bloques de hasta SPIMI_BLOCK_BYTES (estimado), cada bloque lleno
+        se vuelca a disco ordenado por término y al final todos los bloques
+        se mezclan (k-way merge) escribiendo postings y diccionario en una
+        sola pasada secuencial.
+        """
         # Limpiar archivos existentes
         self._create_new_index()
         
-        # Obtener todos los registros
-        all_records = self.table_ref.get_all()
+        with tempfile.TemporaryDirectory(dir=self.index_dir) as tmp_dir:
+            runs = []
+            block, block_bytes = {}, 0
+            term_ids, forward = {}, []
+            for record in records:
+                key = record.get(self.table_ref.primary_key)
+                text = record.get(self.column_name)
+                if key is None or not isinstance(text, str) or not text.strip():
+                    continue
+                if key in self.doc_ordinals:
+                    continue  # clave repetida: vale la primera
+                ordinal = self._get_ordinal(key)
+                self.doc_count += 1
+                
+                term_positions = {}
+                for pos, term in enumerate(self.text_processor.process_text(text)):
+                    term_positions.setdefault(term, []).append(pos)
+                
+                for term, positions in term_positions.items():
+                    entry = block.get(term)
+                    if entry is None:
+                        entry = block[term] = ([], [], [])
+                        block_bytes += self.SPIMI_TERM_BYTES + len(term)
+                    entry[0].append(ordinal)
+                    entry[1].append(len(positions))
+                    entry[2].extend(positions)
+                    block_bytes += self.SPIMI_POSTING_BYTES + self.SPIMI_POSITION_BYTES * len(positions)
+                forward.append((ordinal, [term_ids.setdefault(term, len(term_ids)) for term in term_positions]))
+                
+                if block_bytes >= self.SPIMI_BLOCK_BYTES:
+                    runs.append(self._spill_block(block, os.path.join(tmp_dir, f"block_{len(runs)}.dat")))
+                    self.forward_index.append_many(forward)
+                    block, block_bytes, forward = {}, 0, []
+            
+            # El último bloque se mezcla directo desde memoria
+            if block:
+                runs.append(self._block_items(block))
+            self.forward_index.append_many(forward)
+            self._merge_blocks(runs, term_ids)
         
-        # Reindexar cada registro
-        for record in all_records:
-            primary_key = record.get(self.table_ref.primary_key)
-            if primary_key is not None:
-                self.add(record, primary_key)
+        self._save_index()
+    
+    @staticmethod
+    def _block_items(block):
+        """(término, posting list codificada) de un bloque, en orden de término"""
+        for term in sorted(block):
+            doc_ordinals, tfs, positions = block[term]
+            yield term, encode_postings(doc_ordinals, tfs, positions)
+    
+    def _spill_block(self, block, path):
+        """Escribe un bloque ordenado a disco y retorna un lector de sus entradas"""
+        with open(path, 'wb') as f:
+            for term, serialized in self._block_items(block):
+                term_bytes = term.encode('utf-8')
+                f.write(struct.pack('!II', len(term_bytes), len(serialized)))
+                f.write(term_bytes)
+                f.write(serialized)
+        return self._read_block(path)
+    
+    @staticmethod
+    def _read_block(path):
+        with open(path, 'rb') as f:
+            while True:
+                header = f.read(8)
+                if len(header) < 8:
+                    return
+                term_len, size = struct.unpack('!II', header)
+                term = f.read(term_len).decode('utf-8')
+                yield term, f.read(size)
+    
+    def _merge_blocks(self, runs, term_ids):
+        """
+        Mezcla los bloques ordenados por término. Los ordinales de un bloque
+        son todos menores que los del siguiente, así que la posting list de
+        un término es la concatenación de sus partes en orden de bloque.
+        term_ids trae el id que build le asignó a cada término.
+        """
+        self.dictionary = {}
+        self.terms = list(term_ids)
+        with open(self.postings_file, 'wb') as f:
+            # heapq.merge mantiene el orden de los bloques entre términos iguales
+            merged = heapq.merge(*runs, key=lambda item: item[0])
+            for term, group in itertools.groupby(merged, key=lambda item: item[0]):
+                parts = [serialized for _, serialized in group]
+                if len(parts) == 1:
+                    serialized = parts[0]
+                    max_tf = int(decode_postings(serialized, with_positions=False)[1].max())
+                else:
+                    decoded = [decode_postings(part) for part in parts]
+                    serialized = encode_postings(*(np.concatenate(arrays) for arrays in zip(*decoded)))
+                    max_tf = max(int(tfs.max()) for _, tfs, _ in decoded)
+                self.dictionary[term] = {
+                    'offset': f.tell(),
+                    'size': len(serialized),
+                    'df': decode_df(serialized),
+                    'term_id': term_ids[term],
+                    'max_tf': max_tf,
+                }
+                f.write(serialized)
+            self.live_bytes, self.dead_bytes = f.tell(), 0
+    
+    def vacuum(self, reencode=False):
+        """
+        Reescribe el archivo de postings con solo las posting lists vivas,
+        seguidas y en orden de término, purgando los ordinales borrados.
+        También compacta el índice directo. Retorna los bytes liberados.
         
-        print(f"Índice invertido reconstruido con {self.doc_count} documentos")
+        reencode: vuelve a codificar todas las listas (al migrar de formato)
+        
+        Todo se escribe en archivos de la generación siguiente, y los
+        metadatos (que dicen qué generación vale) se guardan al final: si se
+        corta antes, al abrir se sigue usando la generación anterior entera.
+        Los archivos viejos se borran recién después.
+        """
+        before = os.path.getsize(self.postings_file) if os.path.exists(self.postings_file) else 0
+        generation = self.generation + 1
+        new_files = self._generation_files(generation)
+        # Restos de un vacuum anterior que se cortó antes de publicarse
+        for path in (*new_files, f"{new_files[2]}.idx"):
+            if os.path.exists(path):
+                os.remove(path)
+        old_files = (
+            self.dictionary_file, self.postings_file, self.forward_file,
+            self.forward_index.offsets_path, self.journal_file,
+        )
+        
+        dictionary = {}
+        with open(self.postings_file, 'rb') as src, open(new_files[1], 'wb') as dst:
+            for term in sorted(self.dictionary):
+                data = self.dictionary[term]
+                src.seek(data['offset'])
+                serialized = src.read(data['size'])
+                max_tf = data['max_tf']
+                if reencode or not self._live(decode_doc_ordinals(serialized)).all():
+                    postings = self._purge_deleted(decode_postings(serialized))
+                    serialized = encode_postings(*postings)
+                    max_tf = int(postings[1].max())
+                dictionary[term] = {
+                    'offset': dst.tell(),
+                    'size': len(serialized),
+                    'df': data['df'],
+                    'term_id': data['term_id'],
+                    'max_tf': max_tf,
+                }
+                dst.write(serialized)
+            dst.flush()
+            os.fsync(dst.fileno())
+        self.forward_index.compact(new_files[2])
+        
+        self._set_generation(generation)
+        self.dictionary = dictionary
+        self.live_bytes = sum(data['size'] for data in dictionary.values())
+        self.dead_bytes = 0
+        self._save_index()
+        for path in old_files:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        freed = before - self.live_bytes
+        print(f"Índice invertido {self.table_name}.{self.column_name} compactado: {freed} bytes liberados")
+        return freed
+    
+    def _needs_compaction(self):
+        total = self.live_bytes + self.dead_bytes
+        return total >= self.COMPACTION_MIN_BYTES and self.dead_bytes > self.COMPACTION_DEAD_RATIO * total
+    
+    def get_stats(self):
+        """
+        Obtiene estadísticas del índice.
+
+        Returns:
+            dict: Estadísticas del índice
+        """
+        total = self.live_bytes + self.dead_bytes
+        return {
+            "table_name": self.table_name,
+            "column_name": self.column_name,
+            "doc_count": self.doc_count,
+            "vocabulary_size": len(self.dictionary),
+            "deleted_docs": int(self.deleted[:len(self.doc_ids)].sum()),
+            "postings_bytes": total,
+            "live_bytes": self.live_bytes,
+            "dead_bytes": self.dead_bytes,
+            "dead_ratio": self.dead_bytes / total if total else 0.0,
+        }
         
     def get_all(self):
         """
@@ -376,28 +844,25 @@ class InvertedIndex(IndexBase):
             doc_id = document.get(self.table_ref.primary_key)
         
         # Leer posting list
-        posting_list = self._read_posting_list(term)
-        if not posting_list:
+        ordinal = self.doc_ordinals.get(doc_id)
+        postings = self._read_posting_list(term, with_positions=False)
+        if ordinal is None or postings is None:
             return 0.0
         
         # Buscar el documento en la posting list
-        doc_posting = None
-        for posting in posting_list['postings']:
-            if posting['doc_id'] == doc_id:
-                doc_posting = posting
-                break
-                
-        if not doc_posting:
+        doc_ordinals, tfs, _ = postings
+        i = int(np.searchsorted(doc_ordinals, ordinal))
+        if i == len(doc_ordinals) or doc_ordinals[i] != ordinal:
             return 0.0
             
         # Calcular TF (term frequency)
-        tf = doc_posting['tf']
+        tf = int(tfs[i])
         
         # Normalizar TF (opcional)
         # En esta implementación usamos frecuencia bruta
         
-        # Calcular IDF (inverse document frequency)
-        idf = math.log(self.doc_count / posting_list['df'])
+        # Calcular IDF (inverse document frequency) con el df de documentos vivos
+        idf = math.log(self.doc_count / self.dictionary[term]['df'])
         
         return tf * idf
         
@@ -422,17 +887,16 @@ class InvertedIndex(IndexBase):
         # Usar solo el primer término procesado
         processed_term = processed_terms[0]
         
-        if processed_term not in self.dictionary:
-            return []
-            
-        posting_list = self._read_posting_list(processed_term)
-        if not posting_list:
-            return []
-            
-        # Obtener IDs de documentos
-        doc_ids = [posting['doc_id'] for posting in posting_list['postings']]
+        # Obtener IDs de documentos (sin decodificar tf ni posiciones)
+        doc_ids = self._doc_ids_for(self._read_doc_ordinals(processed_term))
         
         # Recuperar documentos completos
+        return self._fetch_documents(doc_ids)
+    
+    def _doc_ids_for(self, doc_ordinals):
+        return [self.doc_ids[ordinal] for ordinal in doc_ordinals[self._live(doc_ordinals)].tolist()]
+    
+    def _fetch_documents(self, doc_ids):
         results = []
         for doc_id in doc_ids:
             # Corregir la llamada para pasar el nombre de la columna primaria
@@ -441,6 +905,13 @@ class InvertedIndex(IndexBase):
                 results.append(doc)
                 
         return results
+    
+    def _part_doc_ordinals(self, part):
+        """Ordinales de los documentos que contienen el primer término de part"""
+        processed_terms = self.text_processor.process_text(part)
+        if not processed_terms:
+            return np.empty(0, dtype=np.int64)
+        return self._read_doc_ordinals(processed_terms[0])
         
     def search_boolean(self, query):
         """
@@ -463,49 +934,29 @@ class InvertedIndex(IndexBase):
             # Sin operador, tratar como búsqueda simple
             return self.search_term(query)
             
-        # Procesar cada parte
+        # Procesar cada parte: solo hacen falta los ordinales de cada término
         results_sets = []
         for part in parts:
             part = part.strip()
             if not part:
                 continue
-                
-            # Buscar documentos para esta parte
-            part_results = self.search_term(part)
-            
-            # Extraer IDs
-            doc_ids = set()
-            for doc in part_results:
-                doc_id = doc.get(self.table_ref.primary_key)
-                if doc_id is not None:
-                    doc_ids.add(doc_id)
-                    
-            results_sets.append(doc_ids)
+            results_sets.append(self._part_doc_ordinals(part))
             
         if not results_sets:
             return []
             
-        # Aplicar operador
-        if operator == "AND":
-            # Intersección
-            final_ids = results_sets[0]
-            for s in results_sets[1:]:
-                final_ids = final_ids.intersection(s)
-        else:
-            # Unión
-            final_ids = results_sets[0]
-            for s in results_sets[1:]:
-                final_ids = final_ids.union(s)
+        # Aplicar operador sobre arreglos ordenados
+        final_ordinals = results_sets[0]
+        for ordinals in results_sets[1:]:
+            if operator == "AND":
+                # Intersección
+                final_ordinals = np.intersect1d(final_ordinals, ordinals, assume_unique=True)
+            else:
+                # Unión
+                final_ordinals = np.union1d(final_ordinals, ordinals)
                 
         # Recuperar documentos completos
-        results = []
-        for doc_id in final_ids:
-            # Corregir para incluir el nombre de la columna primaria
-            doc = self.table_ref.search(self.table_ref.primary_key, doc_id)
-            if doc:
-                results.append(doc)
-                
-        return results
+        return self._fetch_documents(self._doc_ids_for(final_ordinals))
         
     def search_top_k(self, query, k=10):
         """
@@ -528,51 +979,16 @@ class InvertedIndex(IndexBase):
         # Procesar consulta
         query_terms = self.text_processor.process_text(query)
         
-        if not query_terms:
+        if not query_terms or k <= 0:
             return []
-            
-        # Mapear término -> documentos
-        term_docs = {}
-        
-        # Para cada término, obtener documentos
-        for term in set(query_terms):
-            if term in self.dictionary:
-                posting_list = self._read_posting_list(term)
-                if posting_list:
-                    term_docs[term] = posting_list['postings']
-        
-        if not term_docs:
-            return []
-            
-        # Calcular puntuaciones TF-IDF para cada documento
-        doc_scores = {}
-        
-        for term, postings in term_docs.items():
-            for posting in postings:
-                doc_id = posting['doc_id']
-                
-                # Calcular TF-IDF
-                tf = posting['tf']
-                df = self.dictionary[term]['df']
-                idf = math.log(self.doc_count / df) if df > 0 else 0
-                
-                score = tf * idf
-                
-                # Acumular puntuación
-                if doc_id in doc_scores:
-                    doc_scores[doc_id] += score
-                else:
-                    doc_scores[doc_id] = score
-        
-        # Ordenar documentos por puntuación
-        sorted_docs = sorted(doc_scores.items(), key=lambda x: x[1], reverse=True)
         
-        # Limitar a k resultados
-        top_k_docs = sorted_docs[:k]
+        # Los k ordinales con mejor puntuación, ya ordenados
+        ordinals, scores = self._top_k_ranked(set(query_terms), k)
         
         # Recuperar documentos completos
         results = []
-        for doc_id, score in top_k_docs:
+        for ordinal, score in zip(ordinals.tolist(), scores.tolist()):
+            doc_id = self.doc_ids[ordinal]
             # Corregir para incluir el nombre de la columna primaria
             doc = self.table_ref.search(self.table_ref.primary_key, doc_id)
             if doc:
@@ -581,6 +997,103 @@ class InvertedIndex(IndexBase):
                 results.append(doc)
                 
         return results
+    
+    def _top_k_ranked(self, terms, k):
+        """
+        MaxScore: cada término aporta a lo más max_tf * idf a un documento.
+        Los términos se recorren de mayor a menor cota; mientras la suma de
+        las cotas que faltan pueda alcanzar al k-ésimo puntaje se decodifican
+        completos y agregan candidatos. Después ningún documento nuevo puede
+        entrar al top-k, así que el resto de los términos solo suma a los
+        candidatos que todavía pueden entrar (ver _candidate_tfs).
+        Retorna (ordinales, puntajes) de los k mejores.
+        """
+        weighted = []
+        for term in terms:
+            data = self.dictionary.get(term)
+            if data is None or data['df'] <= 0:
+                continue
+            idf = math.log(self.doc_count / data['df'])
+            weighted.append((data['max_tf'] * idf, idf, term))
+        weighted.sort(reverse=True)
+        bounds = [bound for bound, _, _ in weighted]
+        
+        # Términos esenciales: se acumula la puntuación de todos sus documentos
+        ordinals = np.empty(0, dtype=np.int64)
+        scores = np.empty(0, dtype=np.float64)
+        essential = len(weighted)
+        for i, (_, idf, term) in enumerate(weighted):
+            threshold = self._kth_score(scores, k)
+            if threshold is not None and sum(bounds[i:]) < threshold:
+                essential = i
+                break
+            postings = self._read_posting_list(term, with_positions=False)
+            if postings is None:
+                continue
+            term_ordinals, tfs, _ = postings
+            live = self._live(term_ordinals)
+            ordinals, inverse = np.unique(np.concatenate([ordinals, term_ordinals[live]]), return_inverse=True)
+            scores = np.bincount(inverse, weights=np.concatenate([scores, tfs[live] * idf]), minlength=len(ordinals))
+        
+        # Términos no esenciales: solo se buscan los candidatos que todavía
+        # pueden llegar al k-ésimo puntaje
+        for j in range(essential, len(weighted)):
+            _, idf, term = weighted[j]
+            threshold = self._kth_score(scores, k)
+            remaining = sum(bounds[j + 1:])
+            keep = scores + bounds[j] + remaining >= threshold
+            ordinals, scores = ordinals[keep], scores[keep]
+            tfs = self._candidate_tfs(term, ordinals, idf, scores + remaining, threshold)
+            scores = scores + tfs * idf
+        
+        return self._top_k(ordinals, scores, k)
+    
+    def _candidate_tfs(self, term, candidates, idf, reach, threshold):
+        """
+        tf de term en cada candidato (0 si no lo contiene). reach es lo que
+        puede llegar a sumar cada candidato sin este término. Si la lista
+        tiene tabla de saltos solo se decodifican los bloques de candidatos
+        que con la tf máxima del bloque todavía alcanzan threshold; los demás
+        quedan fuera del top-k de todas formas.
+        """
+        tfs = np.zeros(len(candidates), dtype=np.int64)
+        if len(candidates) == 0 or term not in self.dictionary:
+            return tfs
+        data = self._read_posting_bytes(term)
+        skips = decode_skips(data)
+        if skips is None:
+            term_ordinals, term_tfs, _ = decode_postings(data, with_positions=False)
+        else:
+            blocks = np.searchsorted(skips['last'].astype(np.int64), candidates)
+            useful = blocks < len(skips)
+            useful[useful] = reach[useful] + skips['max_tf'][blocks[useful]] * idf >= threshold
+            term_ordinals, term_tfs = decode_blocks(data, skips, np.unique(blocks[useful]))
+        if len(term_ordinals) == 0:
+            return tfs
+        i = np.minimum(np.searchsorted(term_ordinals, candidates), len(term_ordinals) - 1)
+        found = term_ordinals[i] == candidates
+        tfs[found] = term_tfs[i[found]]
+        return tfs
+    
+    @staticmethod
+    def _kth_score(scores, k):
+        """k-ésimo mejor puntaje, o None si hay menos de k"""
+        if len(scores) < k:
+            return None
+        return np.partition(scores, len(scores) - k)[len(scores) - k]
+    
+    @classmethod
+    def _top_k(cls, ordinals, scores, k):
+        """
+        Los k mejores por puntaje (a igual puntaje, el ordinal menor). Se
+        seleccionan con np.partition y solo esos se ordenan.
+        """
+        threshold = cls._kth_score(scores, k)
+        if threshold is not None:
+            keep = scores >= threshold
+            ordinals, scores = ordinals[keep], scores[keep]
+        top = np.lexsort((ordinals, -scores))[:k]
+        return ordinals[top], scores[top]
         
     def cosine_similarity(self, query_vector, document_vector):
         """
@@ -609,10 +1122,119 @@ class InvertedIndex(IndexBase):
         
     def _save_index(self):
         """
-        Guarda el índice completo (diccionario y metadatos).
+        Guarda el índice completo (diccionario y metadatos) y vacía el journal.
         """
         self._save_dictionary()
+        self.forward_index.flush()
         self._save_metadata()
+        self._reset_journal()
+
+    def _flush_metadata(self):
+        # Al persistir (fuera de un batch) se compacta si hay mucha basura
+        if self._needs_compaction():
+            self.vacuum()
+        elif self.journal_bytes >= self.JOURNAL_MAX_BYTES:
+            self._save_index()
+        else:
+            self._append_journal()
+    
+    def close(self):
+        """Anota lo pendiente en el journal y cierra el índice directo"""
+        self._append_journal()
+        self.forward_index.close()
+    
+    # ========== JOURNAL ==========
+    
+    def _reset_journal(self):
+        with open(self.journal_file, 'w'):
+            pass
+        self.journal_bytes = 0
+        self.dirty_terms = set()
+        self.dirty_ordinals = set()
+    
+    def _append_journal(self):
+        """Agrega una línea con lo que cambió desde la anterior (valores absolutos)"""
+        if not self.dirty_terms and not self.dirty_ordinals:
+            return
+        terms = []
+        for term in sorted(self.dirty_terms):
+            data = self.dictionary.get(term)
+            if data is None:
+                terms.append([term])
+            else:
+                terms.append([term, data['offset'], data['size'], data['df'], data['term_id'], data['max_tf']])
+        record = {
+            "docs": [
+                [ordinal, self.doc_ids[ordinal], self.forward_index.offset(ordinal)]
+                for ordinal in sorted(self.dirty_ordinals)
+            ],
+            "terms": terms,
+            "doc_count": self.doc_count,
+            "term_id_count": len(self.terms),
+            "live_bytes": self.live_bytes,
+            "dead_bytes": self.dead_bytes,
+        }
+        line = json.dumps(record) + "\n"
+        with open(self.journal_file, 'a') as f:
+            f.write(line)
+        self.journal_bytes += len(line.encode('utf-8'))
+        self.dirty_terms = set()
+        self.dirty_ordinals = set()
+    
+    def _replay_journal(self):
+        """
+        Aplica el journal sobre lo cargado. Como guarda valores absolutos se
+        puede repetir sin problema (p. ej. si se cortó a mitad de _save_index);
+        una última línea cortada se descarta.
+        """
+        if not os.path.exists(self.journal_file):
+            return
+        with open(self.journal_file, 'rb') as f:
+            lines = f.read().split(b"\n")
+        applied = 0
+        for line in lines[:-1]:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                break
+            for ordinal, doc_id, forward_offset in record["docs"]:
+                if ordinal >= len(self.doc_ids):
+                    self.doc_ids.extend([None] * (ordinal + 1 - len(self.doc_ids)))
+                old = self.doc_ids[ordinal]
+                if old is not None and self.doc_ordinals.get(old) == ordinal:
+                    del self.doc_ordinals[old]
+                self.doc_ids[ordinal] = doc_id
+                if doc_id is not None:
+                    self.doc_ordinals[doc_id] = ordinal
+                self._grow_deleted(ordinal)
+                self.deleted[ordinal] = doc_id is None
+                self.forward_index.set_offset(ordinal, forward_offset)
+            for entry in record["terms"]:
+                term = entry[0]
+                if len(entry) == 1:
+                    data = self.dictionary.pop(term, None)
+                    if data is not None and data['term_id'] is not None and self.terms[data['term_id']] == term:
+                        self.terms[data['term_id']] = None
+                    continue
+                _, offset, size, df, term_id, max_tf = entry
+                self.dictionary[term] = {
+                    'offset': offset, 'size': size, 'df': df, 'term_id': term_id, 'max_tf': max_tf,
+                }
+                if term_id >= len(self.terms):
+                    self.terms.extend([None] * (term_id + 1 - len(self.terms)))
+                self.terms[term_id] = term
+            self.doc_count = record["doc_count"]
+            if record["term_id_count"] > len(self.terms):
+                self.terms.extend([None] * (record["term_id_count"] - len(self.terms)))
+            self.live_bytes = record["live_bytes"]
+            self.dead_bytes = record["dead_bytes"]
+            applied += len(line) + 1
+        
+        if applied < sum(len(line) + 1 for line in lines) - 1:
+            print(f"Journal de {self.table_name}.{self.column_name} cortado, se descarta el final")
+            with open(self.journal_file, 'r+b') as f:
+                f.truncate(applied)
+        self.journal_bytes = applied
         
     def _load_index(self):
         """
@@ -2,6 +2,7 @@ import os
 import json
 import struct
 from HeiderDB.database.index_base import IndexBase
+from HeiderDB.database.file_manager import atomic_write_json
 
 class ISAMSparseIndex(IndexBase):
     """
@@ -44,12 +45,14 @@ class ISAMSparseIndex(IndexBase):
             self.rebuild()
 
     def _save_index(self):
-        with open(self.index_file, "w") as f:
-            json.dump({
-                "pages":  self.pages,
-                "root":   self.index["root"],
-                "levels": self.index["levels"]
-            }, f, indent=4)
+        atomic_write_json(self.index_file, {
+            "pages":  self.pages,
+            "root":   self.index["root"],
+            "levels": self.index["levels"]
+        })
+
+    def _flush_metadata(self):
+        self._save_index()
 
     def rebuild(self):
         """
@@ -118,12 +121,12 @@ class ISAMSparseIndex(IndexBase):
 
         self._save_index()
 
+        # El .dat se reescribió: las posiciones anteriores ya no valen
+        self._notify_relocated()
+
     def _read_record(self, pos):
         rs = self.table_ref._get_record_size()
-        with open(self.data_path, 'rb') as f:
-            f.seek(pos * rs)
-            buf = f.read(rs)
-        return self.table_ref._deserialize_record(buf)
+        return self.table_ref.read_record(pos * rs)
 
     def _find_level1_block(self, key):
         arr = self.index["root"]
@@ -149,30 +152,38 @@ class ISAMSparseIndex(IndexBase):
         idx = hi if hi >= 0 else 0
         return arr[idx]["page"]
 
-    def search(self, key):
+    def locate(self, key):
+        """Offset en bytes del registro con la clave, o None"""
         # Si no hay páginas todavía, devolver None
         if not self.pages:
             return None
 
         lvl1 = self._find_level1_block(key)
         dp   = self._find_data_page(lvl1, key)
+        rs = self.table_ref._get_record_size()
 
         # revisar data page principal
         page = self.pages[dp]
         for e in page["entries"]:
             if e["key"] == key:
-                return self._read_record(e["pos"])
+                return e["pos"] * rs
 
         # revisar overflows encadenados
         ov = page["next_overflow"]
         while ov != -1:
             for e in self.pages[ov]["entries"]:
                 if e["key"] == key:
-                    return self._read_record(e["pos"])
+                    return e["pos"] * rs
             ov = self.pages[ov]["next_overflow"]
 
         return None
 
+    def search(self, key):
+        record_pos = self.locate(key)
+        if record_pos is None:
+            return None
+        return self.table_ref.read_record(record_pos)
+
     def range_search(self, lo_key, hi_key=None):
         if hi_key is None:
             hi_key = lo_key
@@ -208,14 +219,12 @@ class ISAMSparseIndex(IndexBase):
     def add(self, record, key):
         rs = self.table_ref._get_record_size()
         # 1) Append al datafile
-        with open(self.data_path, 'ab') as f:
-            f.write(self.table_ref._serialize_record(record))
-            pos = (f.tell() // rs) - 1
+        pos = self.table_ref.append_record(record) // rs
 
         # 2) Si no hay páginas, reconstruir índice completo
         if not self.pages:
             self.rebuild()
-            return
+            return self.locate(key)
 
         # 3) Ubicar data page destino
         lvl1 = self._find_level1_block(key)
@@ -226,16 +235,16 @@ class ISAMSparseIndex(IndexBase):
             entries = self.pages[dp]["entries"]
             entries.append({"key": key, "pos": pos})
             entries.sort(key=lambda e: e["key"])
-            self._save_index()
-            return
+            self._persist_metadata()
+            return pos * rs
 
         # 5) Buscar overflow con espacio
         prev, ov = dp, self.pages[dp]["next_overflow"]
         while ov != -1:
             if len(self.pages[ov]["entries"]) < self.block_factor:
                 self.pages[ov]["entries"].append({"key": key, "pos": pos})
-                self._save_index()
-                return
+                self._persist_metadata()
+                return pos * rs
             prev, ov = ov, self.pages[ov]["next_overflow"]
 
         # 6) Crear nuevo overflow si todos llenos
@@ -246,7 +255,8 @@ class ISAMSparseIndex(IndexBase):
             "next_data": self.pages[dp]["next_data"]
         })
         self.pages[prev]["next_overflow"] = new_idx
-        self._save_index()
+        self._persist_metadata()
+        return pos * rs
 
     def remove(self, key):
         rs = self.table_ref._get_record_size()
@@ -257,35 +267,41 @@ class ISAMSparseIndex(IndexBase):
         lvl1 = self._find_level1_block(key)
         dp   = self._find_data_page(lvl1, key)
 
-        with open(self.data_path, 'r+b') as f:
-            queue = [dp]
-            while queue:
-                idx = queue.pop(0)
-                blk = self.pages[idx]
-                for i, e in enumerate(blk["entries"]):
-                    if e["key"] == key:
-                        pos = e["pos"]
-                        f.seek(pos * rs)
-                        rec = self.table_ref._deserialize_record(f.read(rs))
-                        rec[self.column_name] = self.deleted_marker
-                        f.seek(pos * rs)
-                        f.write(self.table_ref._serialize_record(rec))
-                        blk["entries"].pop(i)
-                        self._save_index()
-                        return True
-                if blk["next_overflow"] != -1:
-                    queue.append(blk["next_overflow"])
+        data_file = self.table_ref.get_file(self.data_path)
+        queue = [dp]
+        while queue:
+            idx = queue.pop(0)
+            blk = self.pages[idx]
+            for i, e in enumerate(blk["entries"]):
+                if e["key"] == key:
+                    pos = e["pos"]
+                    rec = self.table_ref._deserialize_record(data_file.read_at(pos * rs, rs))
+                    rec[self.column_name] = self.deleted_marker
+                    data_file.write_at(pos * rs, self.table_ref._serialize_record(rec))
+                    blk["entries"].pop(i)
+                    self._persist_metadata()
+                    return True
+            if blk["next_overflow"] != -1:
+                queue.append(blk["next_overflow"])
         return False
 
     def count(self):
         rs = self.table_ref._get_record_size()
         return os.path.getsize(self.data_path) // rs
 
-    def get_all(self):
-        total = self.count()
-        results = []
-        for pos in range(total):
+    def iter_positions(self):
+        """Offsets de los registros no eliminados, en el orden del .dat"""
+        rs = self.table_ref._get_record_size()
+        for pos in range(self.count()):
             rec = self._read_record(pos)
             if rec[self.column_name] != self.deleted_marker:
-                results.append(rec)
-        return results
+                yield pos * rs
+
+    def iter_all(self):
+        for pos in range(self.count()):
+            rec = self._read_record(pos)
+            if rec[self.column_name] != self.deleted_marker:
+                yield rec
+
+    def get_all(self):
+        return list(self.iter_all())
@@ -4,22 +4,33 @@ from HeiderDB.database.index_base import IndexBase
 from HeiderDB.database.indexes.feature_extractor import create_feature_extractor
 from HeiderDB.database.indexes.vector_index import VectorIndex
 from HeiderDB.database.indexes.multimedia_storage import MultimediaStorage
+from HeiderDB.database.indexes.extraction_pool import ExtractionPool
+from HeiderDB.database.indexes.descriptor_cache import DescriptorCache
 
 
 class MultimediaIndex(IndexBase):
+    # Tamaño máximo del cache de descriptores (compartido por los índices del directorio)
+    DESCRIPTOR_CACHE_BYTES = 1 << 30
+
     def __init__(self, table_name, column_name, data_path, table_ref, page_size):
         super().__init__(table_name, column_name, data_path, table_ref, page_size)
         self.vector_index = None
         self.feature_extractor = None
         self.storage = None
+        self.descriptor_cache = None
         self.metadata_file = os.path.join(
             os.path.dirname(data_path), f"{table_name}_{column_name}_metadata.json"
         )
         self.metadata = {}
+        self.extraction_workers = None  # procesos de extracción en add_many/rebuild (None = uno por CPU)
 
-    def initialize(self, media_type="image", method="sift"):
+    def initialize(self, media_type="image", method="sift", ann=None):
         self.storage = MultimediaStorage(self.data_path)
         self.feature_extractor = create_feature_extractor(media_type, method)
+        self.descriptor_cache = DescriptorCache(
+            os.path.join(os.path.dirname(self.data_path), "descriptor_cache"),
+            max_bytes=self.DESCRIPTOR_CACHE_BYTES,
+        )
         vector_index_file = os.path.join(
             os.path.dirname(self.data_path),
             f"{self.table_name}_{self.column_name}_vector.idx",
@@ -33,23 +44,80 @@ class MultimediaIndex(IndexBase):
             metadata_file=vector_metadata_file,
             page_size=self.page_size,
             table_name=f"{self.table_name}_{self.column_name}",  # Añadir table_name único
+            ann=ann,  # None mantiene lo que ya tenía el índice
         )
         if os.path.exists(self.metadata_file):
             self._load_metadata()
         else:
             self._save_metadata()
 
-    def add(self, record, key):
-        if self.vector_index is None:
-            raise RuntimeError("Index not initialized. Call initialize() first.")
+    def _source_path(self, record):
         src = record[self.column_name]
 
         # Limpiar bytes padding si es necesario
         if isinstance(src, bytes):
             src = src.decode("utf-8").rstrip("\x00")
+        return src
+
+    def _content_hash(self, path):
+        # Los archivos guardados por MultimediaStorage ya se llaman <md5><ext>
+        if os.path.dirname(os.path.abspath(path)) == os.path.abspath(self.storage.storage_dir):
+            return os.path.splitext(os.path.basename(path))[0]
+        return self.storage._calculate_file_hash(path)
+
+    def _cache_key(self, path):
+        return self.descriptor_cache.key(self._content_hash(path), self.feature_extractor)
+
+    def _extract(self, path):
+        """Descriptores de path; si ese contenido ya se extrajo salen del cache"""
+        key = self._cache_key(path)
+        local_descriptors = self.descriptor_cache.get(key)
+        if local_descriptors is None:
+            local_descriptors = self.feature_extractor.extract(path)
+            if local_descriptors is not None and len(local_descriptors) > 0:
+                self.descriptor_cache.put(key, local_descriptors)
+        return local_descriptors
+
+    def _extract_many(self, paths):
+        """
+        Como ExtractionPool.map: (path, descriptores, error) en orden, pero
+        solo los archivos que no están en el cache pasan por el pool.
+        """
+        keys = [self._cache_key(path) for path in paths]
+        # Un contenido repetido se extrae una vez; las copias siguientes ya lo
+        # encuentran en el cache
+        cached, pending = [], set()
+        for key in keys:
+            cached.append(key in self.descriptor_cache or key in pending)
+            pending.add(key)
+        misses = [path for path, hit in zip(paths, cached) if not hit]
+        extracted = ExtractionPool(self.feature_extractor, self.extraction_workers).map(misses)
+
+        for path, key, hit in zip(paths, keys, cached):
+            if hit:
+                local_descriptors = self.descriptor_cache.get(key)
+                if local_descriptors is not None:
+                    yield path, local_descriptors, None
+                    continue
+                # Se desalojó mientras tanto: se extrae aquí mismo
+                try:
+                    yield path, self._extract(path), None
+                except Exception as e:
+                    yield path, None, str(e)
+                continue
+
+            result = next(extracted)
+            if result[1] is not None:
+                self.descriptor_cache.put(key, result[1])
+            yield result
+
+    def add(self, record, key):
+        if self.vector_index is None:
+            raise RuntimeError("Index not initialized. Call initialize() first.")
+        src = self._source_path(record)
 
         dst = self.storage.store(src)
-        local_descriptors = self.feature_extractor.extract(dst)
+        local_descriptors = self._extract(dst)
 
         if local_descriptors is not None and len(local_descriptors) > 0:
             # Use add_vectors (not add_vector) and pass the list of local descriptors
@@ -60,6 +128,37 @@ class MultimediaIndex(IndexBase):
         else:
             raise RuntimeError(f"No se pudo extraer vector para {src}")
 
+    def add_many(self, records):
+        """
+        Indexa pares (record, key) extrayendo en paralelo con un ExtractionPool
+        (los archivos que ya están en el cache de descriptores no se extraen).
+        Guarda el índice una sola vez al final. Retorna la lista de (key, error)
+        de los registros que no se pudieron indexar.
+        """
+        if self.vector_index is None:
+            raise RuntimeError("Index not initialized. Call initialize() first.")
+
+        stored = []  # (key, src, dst) en el orden de entrada
+        errors = []
+        for record, key in records:
+            src = self._source_path(record)
+            try:
+                stored.append((key, src, self.storage.store(src)))
+            except Exception as e:
+                errors.append((key, str(e)))
+
+        results = self._extract_many([dst for _, _, dst in stored])
+        for (key, src, dst), (_, local_descriptors, error) in zip(stored, results):
+            if error is not None or local_descriptors is None or len(local_descriptors) == 0:
+                errors.append((key, error or f"No se pudo extraer vector para {src}"))
+                continue
+            self.vector_index.add_vectors(key, local_descriptors, save_metadata=False)
+            self.metadata[key] = dst
+
+        self.vector_index.save()
+        self._save_metadata()
+        return errors
+
     def remove(self, key):
         if self.vector_index is None:
             return False
@@ -77,10 +176,14 @@ class MultimediaIndex(IndexBase):
     def rebuild(self):
         if self.vector_index is None or self.feature_extractor is None:
             return
-        for key, path in self.metadata.items():
-            if os.path.exists(path):
-                local_descriptors = self.feature_extractor.extract(path)
-                self.vector_index.add_vectors(key, local_descriptors)
+        items = [(key, path) for key, path in self.metadata.items() if os.path.exists(path)]
+        results = self._extract_many([path for _, path in items])
+        for (key, path), (_, local_descriptors, error) in zip(items, results):
+            if error is not None:
+                print(f"Error extrayendo {path}: {error}")
+                continue
+            self.vector_index.add_vectors(key, local_descriptors, save_metadata=False)
+        self.vector_index.save()
 
     def search(self, key):
         return self.metadata.get(key)
@@ -100,9 +203,12 @@ class MultimediaIndex(IndexBase):
             ]
         return [(k, self.metadata[k]) for k in selected]
 
-    def knn_search(self, query_file, k=5):
+    def knn_search(self, query_file, k=5, nprobe=None, ef_search=None):
         """
         Busca los k vectores más similares al archivo de consulta.
+        Si el índice se creó con ANN usa la búsqueda aproximada, donde nprobe
+        y ef_search regulan recall vs latencia; si no, la búsqueda exacta.
+        Los errores de extracción o búsqueda se propagan al que consulta.
         """
         if self.vector_index is None or self.feature_extractor is None:
             return []
@@ -111,26 +217,33 @@ class MultimediaIndex(IndexBase):
         if not os.path.exists(query_file):
             return []
 
-        try:
-            # Extraer características del archivo de consulta directamente
-            qvec = self.feature_extractor.extract(query_file)
-
-            if qvec is None:
-                return []
-
-            # Ejecutar búsqueda KNN
-            results = self.vector_index.search_knn(qvec, k)
-            return results
+        # Extraer características del archivo de consulta (o sacarlas del cache)
+        qvec = self._extract(query_file)
 
-        except Exception as e:
+        if qvec is None:
             return []
 
+        # Ejecutar búsqueda KNN
+        if self.vector_index.ann_enabled:
+            return self.vector_index.search_ann(qvec, k, nprobe=nprobe, ef_search=ef_search)
+        return self.vector_index.search_knn(qvec, k)
+
     def get_all(self):
         return list(self.metadata.items())
 
     def count(self):
         return len(self.metadata)
 
+    def close(self):
+        if self.vector_index is not None:
+            self.vector_index.close()
+
+    def files(self):
+        paths = [self.metadata_file]
+        if self.vector_index is not None:
+            paths.extend(self.vector_index.files())
+        return paths
+
     def _save_metadata(self):
         try:
             os.makedirs(os.path.dirname(self.metadata_file), exist_ok=True)
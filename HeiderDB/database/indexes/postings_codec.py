@@ -0,0 +1,200 @@
+import numpy as np
+
+# Formato binario de una posting list del índice invertido:
+#
+#   [df][gaps de doc ordinals x df][tf x df][largo del bloque][bloque de posiciones]
+#
+# Todo va en varint (7 bits por byte, el bit alto indica que sigue otro
+# byte). Los documentos se guardan por su ordinal (entero que el índice
+# asigna a cada doc_id) en orden creciente y como diferencias con el
+# anterior. Las posiciones de cada documento también van como diferencias y
+# todo el bloque lleva su largo adelante, así una consulta que no las usa
+# lo salta sin decodificarlo.
+#
+# Las listas con más de SKIP_BLOCK documentos llevan al final una tabla de
+# saltos de ancho fijo: por cada bloque de SKIP_BLOCK documentos, su último
+# ordinal, dónde empiezan sus gaps y sus tf dentro de la lista y su tf
+# máxima. Con eso se decodifica solo el bloque que tiene un documento dado y
+# se sabe cuánto puede aportar el bloque sin leerlo. Como la tabla va al
+# final, los lectores que no la usan leen la lista igual que antes.
+
+MAX_VARINT_BYTES = 10
+
+SKIP_BLOCK = 128
+SKIP_DTYPE = np.dtype([("last", "<u8"), ("gaps", "<u4"), ("tfs", "<u4"), ("max_tf", "<u4")])
+
+
+def _varint_sizes(values):
+    """Bytes que ocupa cada valor como varint"""
+    nbytes = np.ones(len(values), dtype=np.int64)
+    for k in range(1, MAX_VARINT_BYTES):
+        nbytes += values >= np.uint64(1 << (7 * k))
+    return nbytes
+
+
+def encode_varints(values):
+    """Codifica enteros no negativos como varints concatenados"""
+    values = np.asarray(values, dtype=np.uint64).ravel()
+    if len(values) == 0:
+        return b""
+    nbytes = _varint_sizes(values)
+    starts = np.cumsum(nbytes) - nbytes
+    out = np.zeros(int(nbytes.sum()), dtype=np.uint8)
+    for k in range(int(nbytes.max())):
+        mask = nbytes > k
+        chunk = (values[mask] >> np.uint64(7 * k)) & np.uint64(0x7F)
+        more = np.where(nbytes[mask] > k + 1, 0x80, 0).astype(np.uint64)
+        out[starts[mask] + k] = (chunk | more).astype(np.uint8)
+    return out.tobytes()
+
+
+def decode_varints(data, count, offset=0):
+    """Lee count varints desde offset. Retorna (arreglo uint64, offset final)"""
+    if count == 0:
+        return np.empty(0, dtype=np.uint64), offset
+    window = np.frombuffer(data, dtype=np.uint8, count=min(len(data) - offset, count * MAX_VARINT_BYTES), offset=offset)
+    ends = np.flatnonzero(window < 0x80)
+    if len(ends) < count:
+        raise ValueError("Posting list truncada")
+    ends = ends[:count]
+    window = window[:ends[-1] + 1]
+    starts = np.empty(count, dtype=np.int64)
+    starts[0] = 0
+    starts[1:] = ends[:-1] + 1
+    # Posición de cada byte dentro de su varint
+    shift = np.arange(len(window), dtype=np.int64) - np.repeat(starts, ends - starts + 1)
+    parts = (window & 0x7F).astype(np.uint64) << (7 * shift).astype(np.uint64)
+    return np.add.reduceat(parts, starts), offset + len(window)
+
+
+def _decode_varint(data, offset):
+    """Un solo varint (para los encabezados)"""
+    value, shift = 0, 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, offset
+        shift += 7
+
+
+def _doc_starts(tfs):
+    """Índice en el arreglo plano de posiciones donde empieza cada documento"""
+    tfs = np.asarray(tfs, dtype=np.int64)
+    return np.cumsum(tfs) - tfs
+
+
+def encode_postings(doc_ordinals, tfs, positions):
+    """
+    doc_ordinals: ordinales en orden creciente; tfs: frecuencia por documento;
+    positions: todas las posiciones en un arreglo plano, las tf[i] del
+    documento i seguidas y en orden creciente.
+    """
+    doc_ordinals = np.asarray(doc_ordinals, dtype=np.int64)
+    gaps = np.diff(doc_ordinals, prepend=0)
+    if len(gaps) > 1 and gaps[1:].min() <= 0:
+        raise ValueError("Los ordinales deben ser estrictamente crecientes")
+
+    positions = np.asarray(positions, dtype=np.int64)
+    position_gaps = np.diff(positions, prepend=0)
+    # Las diferencias se reinician en cada documento
+    starts = _doc_starts(tfs)
+    starts = starts[starts < len(positions)]
+    position_gaps[starts] = positions[starts]
+    position_block = encode_varints(position_gaps)
+    header = encode_varints([len(doc_ordinals)])
+    encoded_gaps = encode_varints(gaps)
+    encoded_tfs = encode_varints(tfs)
+    return b"".join([
+        header,
+        encoded_gaps,
+        encoded_tfs,
+        encode_varints([len(position_block)]),
+        position_block,
+        _encode_skips(doc_ordinals, gaps, tfs, len(header), len(header) + len(encoded_gaps)),
+    ])
+
+
+def _encode_skips(doc_ordinals, gaps, tfs, gaps_start, tfs_start):
+    """Tabla de saltos de la lista (vacía si cabe en un bloque)"""
+    if len(doc_ordinals) <= SKIP_BLOCK:
+        return b""
+    tfs = np.asarray(tfs, dtype=np.uint64)
+    firsts = np.arange(0, len(doc_ordinals), SKIP_BLOCK)
+    skips = np.empty(len(firsts), dtype=SKIP_DTYPE)
+    skips["last"] = doc_ordinals[np.minimum(firsts + SKIP_BLOCK, len(doc_ordinals)) - 1]
+    gap_sizes = _varint_sizes(gaps.astype(np.uint64))
+    tf_sizes = _varint_sizes(tfs)
+    gap_offsets = np.cumsum(gap_sizes) - gap_sizes
+    tf_offsets = np.cumsum(tf_sizes) - tf_sizes
+    skips["gaps"] = gaps_start + gap_offsets[firsts]
+    skips["tfs"] = tfs_start + tf_offsets[firsts]
+    skips["max_tf"] = np.maximum.reduceat(tfs, firsts)
+    return skips.tobytes()
+
+
+def decode_df(data):
+    """Cantidad de documentos de la posting list (solo lee el encabezado)"""
+    return _decode_varint(data, 0)[0]
+
+
+def decode_doc_ordinals(data):
+    """Solo los ordinales de los documentos, sin tocar tf ni posiciones"""
+    df, offset = _decode_varint(data, 0)
+    gaps, _ = decode_varints(data, df, offset)
+    return np.cumsum(gaps).astype(np.int64)
+
+
+def decode_postings(data, with_positions=True):
+    """
+    Retorna (ordinales, tfs, posiciones) como arreglos int64. Las posiciones
+    vienen en el mismo arreglo plano que recibe encode_postings, o None si
+    with_positions es False (el bloque se salta sin leerlo).
+    """
+    df, offset = _decode_varint(data, 0)
+    gaps, offset = decode_varints(data, df, offset)
+    tfs, offset = decode_varints(data, df, offset)
+    doc_ordinals = np.cumsum(gaps).astype(np.int64)
+    tfs = tfs.astype(np.int64)
+    if not with_positions:
+        return doc_ordinals, tfs, None
+
+    block_size, offset = _decode_varint(data, offset)
+    position_gaps, _ = decode_varints(data[:offset + block_size], int(tfs.sum()), offset)
+    running = np.cumsum(position_gaps.astype(np.int64))
+    # Restar lo acumulado antes de que empiece cada documento
+    before = np.concatenate(([0], running))[_doc_starts(tfs)]
+    return doc_ordinals, tfs, running - np.repeat(before, tfs)
+
+
+def decode_skips(data):
+    """Tabla de saltos de la lista, o None si no tiene (df <= SKIP_BLOCK)"""
+    df = decode_df(data)
+    if df <= SKIP_BLOCK:
+        return None
+    count = -(-df // SKIP_BLOCK)
+    return np.frombuffer(data, dtype=SKIP_DTYPE, count=count, offset=len(data) - count * SKIP_DTYPE.itemsize)
+
+
+def decode_blocks(data, skips, blocks):
+    """
+    (ordinales, tfs) de solo los bloques indicados (índices crecientes en la
+    tabla de saltos), sin decodificar el resto de la lista.
+    """
+    df = decode_df(data)
+    ordinals, tfs = [], []
+    for block in blocks:
+        count = min(SKIP_BLOCK, df - block * SKIP_BLOCK)
+        base = int(skips["last"][block - 1]) if block > 0 else 0
+        gaps, _ = decode_varints(data, count, int(skips["gaps"][block]))
+        ordinals.append(base + np.cumsum(gaps).astype(np.int64))
+        tfs.append(decode_varints(data, count, int(skips["tfs"][block]))[0].astype(np.int64))
+    if not ordinals:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    return np.concatenate(ordinals), np.concatenate(tfs)
+
+
+def split_positions(tfs, positions):
+    """Posiciones de cada documento como lista de arreglos"""
+    return np.split(positions, np.cumsum(tfs)[:-1]) if len(tfs) else []
@@ -0,0 +1,212 @@
+import os
+import struct
+from bisect import bisect_left
+from HeiderDB.database.indexes.b_plus import BPlusTree
+from HeiderDB.database.indexes.extendible_hash import ExtendibleHash, Bucket
+
+
+class SecondaryBPlusTree(BPlusTree):
+    """
+    Índice secundario B+ Tree sobre una columna que no es la clave primaria.
+
+    Las claves del árbol son pares (valor, posición) para admitir valores
+    repetidos, y las hojas apuntan directo a la posición del registro en el
+    .dat. El índice nunca escribe en el archivo de datos: la tabla le avisa
+    con insert/delete cuando un registro aparece, se borra o se mueve.
+    """
+
+    index_type = "bplus_tree"
+
+    def __init__(self, table_name, column_name, data_path, table_ref, page_size, index_name=None, buffer_pool=None):
+        self.index_name = index_name or f"idx_{column_name}"
+        super().__init__(table_name, column_name, data_path, table_ref, page_size, buffer_pool=buffer_pool)
+
+    def _get_key_size(self):
+        return super()._get_key_size() + 8
+
+    def _get_key_format(self):
+        return super()._get_key_format() + "q"
+
+    def _release_record(self, node, record_pos):
+        # El registro lo maneja el índice primario
+        pass
+
+    def insert(self, value, position):
+        self._add_key_with_position((value, position), position)
+        self._persist_metadata()
+
+    def delete(self, value, position):
+        return super().remove((value, position))
+
+    def add(self, record, key):
+        """key es la posición del registro en el .dat"""
+        self.insert(record[self.column_name], key)
+        return key
+
+    def remove(self, key):
+        """key es el par (valor, posición)"""
+        return self.delete(*key)
+
+    def positions(self, value):
+        """Posiciones de los registros cuyo valor es igual a value"""
+        return list(self.range_positions(value, value))
+
+    def range_positions(self, begin_key=None, end_key=None):
+        """
+        Posiciones de los registros con begin_key <= valor <= end_key,
+        en orden de valor. None deja el extremo abierto.
+        """
+        if self.root_page_id is None:
+            return
+
+        if begin_key is None:
+            leaf = self._read_node(self.root_page_id)
+            while not leaf.is_leaf:
+                leaf = self._read_node(leaf.children[0])
+            i = 0
+        else:
+            start = (begin_key, -1)
+            leaf = self._find_leaf(start)
+            i = bisect_left(leaf.keys, start)
+
+        while leaf is not None:
+            keys = leaf.keys
+            while i < len(keys):
+                if end_key is not None and keys[i][0] > end_key:
+                    return
+                yield leaf.children[i]
+                i += 1
+            leaf = self._read_node(leaf.next_leaf) if leaf.next_leaf is not None else None
+            i = 0
+
+    def search(self, key):
+        return [self.table_ref.read_record(pos) for pos in self.positions(key)]
+
+    def range_search(self, begin_key, end_key=None):
+        return [self.table_ref.read_record(pos) for pos in self.range_positions(begin_key, end_key)]
+
+    def build(self, entries):
+        """Reconstruye el índice desde pares (valor, posición)"""
+        ordered = sorted(entries)
+        self.bulk_load(((entry, entry[1]) for entry in ordered), fill_factor=0.9)
+
+    def rebuild(self):
+        self.build(
+            (record[self.column_name], pos)
+            for pos, record in self.table_ref.iter_located_records()
+        )
+
+    def get_all(self):
+        return [self.table_ref.read_record(pos) for pos in self.iter_positions()]
+
+    def files(self):
+        return [self.index_file, self.metadata_file]
+
+
+class SecondaryHash(ExtendibleHash):
+    """
+    Índice secundario hash extensible: solo sirve para igualdad.
+
+    Igual que el B+ Tree secundario, las claves son (valor, posición) pero el
+    hash se calcula solo con el valor, así todos los registros con el mismo
+    valor caen en el mismo bucket o en su cadena de overflow.
+    """
+
+    index_type = "extendible_hash"
+
+    def __init__(self, table_name, column_name, data_path, table_ref, page_size, index_name=None):
+        self.index_name = index_name or f"idx_{column_name}"
+        super().__init__(table_name, column_name, data_path, table_ref, page_size)
+
+    def _get_key_size(self):
+        return super()._get_key_size() + 8
+
+    def _serialize_key(self, key):
+        value, position = key
+        return super()._serialize_key(value) + struct.pack("!q", position)
+
+    def _deserialize_key(self, key_bytes):
+        value = super()._deserialize_key(key_bytes[:-8])
+        return value, struct.unpack("!q", key_bytes[-8:])[0]
+
+    def _hash_value(self, key):
+        if isinstance(key, tuple):
+            key = key[0]
+        return super()._hash_value(key)
+
+    def _add_key_with_position(self, key, record_pos):
+        bucket = self._read_bucket(self.directory[self.hashindex(key)])
+        hash_value = self._hash_value(key)
+
+        # Si todo el bucket tiene el mismo hash, dividirlo no separa nada:
+        # se encadena un bucket de overflow
+        if (bucket.is_full(self.block_factor) and bucket.next == -1
+                and all(self._hash_value(k) == hash_value for k in bucket.keys)):
+            overflow = Bucket(bucket_id=self.next_bucket_id, local_depth=bucket.local_depth)
+            self.next_bucket_id += 1
+            overflow.add_entry(key, record_pos)
+            bucket.next = overflow.bucket_id
+            self._write_bucket(bucket)
+            self._write_bucket(overflow)
+            self._save_directory()
+            return
+
+        super()._add_key_with_position(key, record_pos)
+
+    def insert(self, value, position):
+        self._add_key_with_position((value, position), position)
+
+    def delete(self, value, position):
+        return super().remove((value, position))
+
+    def add(self, record, key):
+        """key es la posición del registro en el .dat"""
+        self.insert(record[self.column_name], key)
+        return key
+
+    def remove(self, key):
+        """key es el par (valor, posición)"""
+        return self.delete(*key)
+
+    def positions(self, value):
+        """Posiciones de los registros cuyo valor es igual a value"""
+        result = []
+        current = self._read_bucket(self.directory[self.hashindex(value)])
+        while True:
+            result.extend(pos for (v, pos) in current.keys if v == value)
+            if current.next == -1:
+                return result
+            current = self._read_bucket(current.next)
+
+    def search(self, key):
+        return [self.table_ref.read_record(pos) for pos in self.positions(key)]
+
+    def range_search(self, begin_key, end_key=None):
+        if end_key is None:
+            end_key = begin_key
+        return [
+            record for record in self.get_all()
+            if begin_key <= record[self.column_name] <= end_key
+        ]
+
+    def build(self, entries):
+        """Reconstruye el índice desde pares (valor, posición)"""
+        if os.path.exists(self.dir_file):
+            os.remove(self.dir_file)
+        self.global_depth = 2
+        self.next_bucket_id = 0
+        self.directory = {}
+        self._init_index()
+
+        for value, position in entries:
+            self.insert(value, position)
+
+    def rebuild(self):
+        self.build(
+            [(record[self.column_name], pos)
+             for pos, record in self.table_ref.iter_located_records()]
+        )
+        return True
+
+    def files(self):
+        return [self.dir_file, self.bucket_file]
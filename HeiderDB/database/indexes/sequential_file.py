@@ -1,8 +1,10 @@
 import os
 import struct
 import json
+import io
 import math
 from HeiderDB.database.index_base import IndexBase
+from HeiderDB.database.file_manager import atomic_write_json
 
 class SequentialFile(IndexBase):
     
@@ -63,8 +65,10 @@ class SequentialFile(IndexBase):
             'active_entries': self.active_entries,
         }
         
-        with open(self.metadata_file, 'w') as f:
-            json.dump(metadata, f, indent=4)
+        atomic_write_json(self.metadata_file, metadata)
+
+    def _flush_metadata(self):
+        self._save_metadata()
     
     def _serialize_key(self, key):
         return self.table_ref.serialize_column(self.col_type, key)
@@ -114,6 +118,10 @@ class SequentialFile(IndexBase):
             return None, None, None
 
     def search(self, key):
+        return self._get_record_at_position(self.locate(key))
+    
+    def locate(self, key):
+        """Posición del registro con la clave en el .dat, o None"""
         if self.active_entries == 0:
             return None
         
@@ -125,7 +133,7 @@ class SequentialFile(IndexBase):
                 found_key, record_pos, _ = self._read_index_entry(f)
                 
                 if found_key == key:
-                    return self._get_record_at_position(record_pos)
+                    return record_pos
             else:
                 insert_pos = -position - 1
                 
@@ -134,19 +142,17 @@ class SequentialFile(IndexBase):
                     _, _, overflow_ptr = self._read_index_entry(f)
                     
                     while overflow_ptr != -1:
-                        with open(self.overflow_file, 'rb') as of:
-                            of.seek(overflow_ptr)
-                            entry = self._read_index_entry(of)
+                        entry = self._read_overflow_entry(overflow_ptr)
 
-                            if entry is None:
-                                break
+                        if entry is None:
+                            break
 
-                            of_key, of_pos, next_overflow = entry
+                        of_key, of_pos, next_overflow = entry
 
-                            if of_key == key:
-                                return self._get_record_at_position(of_pos)
+                        if of_key == key:
+                            return of_pos
 
-                            overflow_ptr = next_overflow
+                        overflow_ptr = next_overflow
         
         return None
     
@@ -159,6 +165,8 @@ class SequentialFile(IndexBase):
             file_obj.seek(mid * self.entry_size)
             
             mid_key, _, _ = self._read_index_entry(file_obj)
+            # entre first_mid y mid solo hay entradas vacías
+            first_mid = mid
             
             if mid_key is None:
                 valid_pos = self._find_next_valid_entry(file_obj, mid)
@@ -175,7 +183,7 @@ class SequentialFile(IndexBase):
             elif mid_key < key:
                 left = mid + 1
             else:
-                right = mid - 1
+                right = first_mid - 1
         
         return -(left + 1) 
     
@@ -202,26 +210,21 @@ class SequentialFile(IndexBase):
             return None
             
         try:
-            with open(self.data_path, 'rb') as f:
-                file_size = os.path.getsize(self.data_path)
-                if position >= file_size:
-                    return None
-                    
-                f.seek(position)
-                record_size = self.table_ref._get_record_size()
-
-                if position + record_size > file_size:
-                    return None
-                    
-                record_data = f.read(record_size)
-                if len(record_data) < record_size:
-                    return None
-                    
-                return self.table_ref._deserialize_record(record_data)
+            record_size = self.table_ref._get_record_size()
+            record_data = self.table_ref.get_file(self.data_path).read_at(position, record_size)
+            if len(record_data) < record_size:
+                return None
+                
+            return self.table_ref._deserialize_record(record_data)
                 
         except (OSError, IOError, struct.error, ValueError):
             return None
 
+    def _read_overflow_entry(self, position):
+        """Lee una entrada del archivo de overflow con una lectura posicional"""
+        data = self.table_ref.get_file(self.overflow_file).read_at(position, self.entry_size)
+        return self._read_index_entry(io.BytesIO(data))
+
     def range_search(self, begin_key, end_key=None):
         result = []
         
@@ -262,14 +265,12 @@ class SequentialFile(IndexBase):
                         result.append(record)
                 
                 while next_ptr != -1:
-                    with open(self.overflow_file, 'rb') as of:
-                        of.seek(next_ptr)
-                        of_key, of_pos, next_ptr = self._read_index_entry(of)
-                        
-                        if of_key is not None and begin_key <= of_key <= end_key:
-                            overflow_record = self._get_record_at_position(of_pos)
-                            if overflow_record is not None:
-                                result.append(overflow_record)
+                    of_key, of_pos, next_ptr = self._read_overflow_entry(next_ptr)
+                    
+                    if of_key is not None and begin_key <= of_key <= end_key:
+                        overflow_record = self._get_record_at_position(of_pos)
+                        if overflow_record is not None:
+                            result.append(overflow_record)
         
         return result
     
@@ -282,8 +283,8 @@ class SequentialFile(IndexBase):
                 self._write_index_entry(f, key, record_pos, -1)
             self.record_count += 1
             self.active_entries += 1
-            self._save_metadata()
-            return
+            self._persist_metadata()
+            return record_pos
         
         with open(self.index_file, 'rb') as f:
             position = self._binary_search(f, key)
@@ -294,7 +295,7 @@ class SequentialFile(IndexBase):
                     _, _, next_ptr = self._read_index_entry(f)
                     f.seek(position)
                     self._write_index_entry(f, key, record_pos, next_ptr)
-                return
+                return record_pos
         
         insert_pos = -position - 1
         null_pos = self._find_null_position()
@@ -331,12 +332,14 @@ class SequentialFile(IndexBase):
             self.active_entries += 1
         
         self.record_count += 1
-        self._save_metadata()
+        self._persist_metadata()
         
         
         if (self.overflow_count > self.active_entries // 2 or 
             (self.record_count - self.active_entries) > self.active_entries // 3):
             self.rebuild()
+        
+        return record_pos
     
     def _find_null_position(self):
         try:
@@ -354,10 +357,7 @@ class SequentialFile(IndexBase):
             return -1
     
     def _append_record_to_data_file(self, record_data):
-        with open(self.data_path, 'ab') as f:
-            record_pos = f.tell()
-            f.write(record_data)
-            return record_pos
+        return self.table_ref.get_file(self.data_path).append(record_data)
     
     def remove(self, key):
         if self.active_entries == 0:
@@ -397,7 +397,7 @@ class SequentialFile(IndexBase):
                     
                     self.record_count -= 1
                     self.active_entries -= 1
-                    self._save_metadata()
+                    self._persist_metadata()
                     
                     # Reconstruir si hay muchas entradas vacías
                     if ((self.record_count - self.active_entries) > self.active_entries // 2 or
@@ -437,7 +437,7 @@ class SequentialFile(IndexBase):
                                         self.record_count -= 1
                                         self.overflow_count -= 1
                                         self.active_entries -= 1
-                                        self._save_metadata()
+                                        self._persist_metadata()
                                         return True
                                     
                                     prev_of_ptr = curr_of_ptr
@@ -473,12 +473,10 @@ class SequentialFile(IndexBase):
                     current_overflow_ptr = next_ptr
                     while current_overflow_ptr != -1:
                         try:
-                            with open(self.overflow_file, 'rb') as of:
-                                of.seek(current_overflow_ptr)
-                                of_key, of_pos, next_overflow_ptr = self._read_index_entry(of)
-                                if of_key is not None:
-                                    entries.append((of_key, of_pos))
-                                current_overflow_ptr = next_overflow_ptr
+                            of_key, of_pos, next_overflow_ptr = self._read_overflow_entry(current_overflow_ptr)
+                            if of_key is not None:
+                                entries.append((of_key, of_pos))
+                            current_overflow_ptr = next_overflow_ptr
                         except (OSError, IOError):
                             break
         except (OSError, IOError):
@@ -509,53 +507,30 @@ class SequentialFile(IndexBase):
     def count(self):
         return self.active_entries
     
-    def get_all(self):
-        result = []
-        
-        if self.active_entries == 0:
-            return result
+    def iter_positions(self):
+        """Posiciones de los registros en orden de clave (con sus overflows)"""
+        max_entries = self._get_max_valid_entries()
+        index_file = self.table_ref.get_file(self.index_file)
+        for i in range(max_entries):
+            data = index_file.read_at(i * self.entry_size, self.entry_size)
+            key, record_pos, next_ptr = self._read_index_entry(io.BytesIO(data))
+            if key is None or record_pos is None:
+                continue
+            if record_pos >= 0:
+                yield record_pos
             
-        try:
-            with open(self.index_file, 'rb') as f:
-                max_entries = self._get_max_valid_entries()
-                
-                for i in range(max_entries):
-                    f.seek(i * self.entry_size)
-                    key, record_pos, next_ptr = self._read_index_entry(f)
-                    
-                    if key is None or record_pos is None:
-                        continue 
-                    
-                   
-                    if record_pos >= 0:
-                        try:
-                            record = self._get_record_at_position(record_pos)
-                            if record is not None:
-                                result.append(record)
-                        except (OSError, IOError, struct.error):
-                            continue
-                    
-                    current_overflow_ptr = next_ptr
-                    while current_overflow_ptr != -1 and current_overflow_ptr >= 0:
-                        try:
-                            with open(self.overflow_file, 'rb') as of:
-                                of.seek(current_overflow_ptr)
-                                of_key, of_pos, next_overflow = self._read_index_entry(of)
-                                
-                                if of_key is not None and of_pos is not None and of_pos >= 0:
-                                    try:
-                                        overflow_record = self._get_record_at_position(of_pos)
-                                        if overflow_record is not None:
-                                            result.append(overflow_record)
-                                    except (OSError, IOError, struct.error):
-                                        pass
-                                
-                                current_overflow_ptr = next_overflow
-                                
-                        except (OSError, IOError):
-                            break
-                            
-        except (OSError, IOError):
-            return result
-                
-        return result
+            while next_ptr is not None and next_ptr >= 0:
+                of_key, of_pos, next_ptr = self._read_overflow_entry(next_ptr)
+                if of_key is not None and of_pos is not None and of_pos >= 0:
+                    yield of_pos
+    
+    def iter_all(self):
+        if self.active_entries == 0:
+            return
+        for record_pos in self.iter_positions():
+            record = self._get_record_at_position(record_pos)
+            if record is not None:
+                yield record
+    
+    def get_all(self):
+        return list(self.iter_all())
@@ -0,0 +1,173 @@
+import os
+import struct
+import numpy as np
+from HeiderDB.database.file_manager import PagedFile
+
+# Archivo de páginas TF-IDF en binario.
+#
+#   [FILE_HEADER: "HTFP" + versión]
+#   [RECORD_HEADER: page_id, bytes usados, capacidad][payload + espacio libre]...
+#
+# Cada página se reescribe en su lugar mientras quepa en su capacidad; si
+# crece más se agrega al final con espacio de sobra y la copia vieja queda
+# como basura hasta compact(). Como las páginas solo se mueven hacia el
+# final, al abrir el archivo la copia válida de cada página es la de mayor
+# offset: la tabla de offsets se arma leyendo solo los encabezados.
+
+MAGIC = b"HTFP"
+VERSION = 1
+FILE_HEADER = struct.Struct("<4sI")
+RECORD_HEADER = struct.Struct("<III")  # page_id, bytes usados, capacidad
+ENTRY_HEADER = struct.Struct("<II")  # posición, cantidad de clusters
+COUNT = struct.Struct("<I")
+INT_ID = struct.Struct("<q")
+FLOAT_ID = struct.Struct("<d")
+
+ALIGNMENT = 512
+
+
+def _capacity_for(size):
+    # 25% extra para que la página pueda crecer sin moverse
+    needed = size + size // 4
+    return max(ALIGNMENT, (needed + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT)
+
+
+def _encode_doc_id(doc_id):
+    if isinstance(doc_id, (bool, np.bool_)):
+        raise TypeError(f"doc_id no soportado: {doc_id!r}")
+    if isinstance(doc_id, (int, np.integer)):
+        return b"i" + INT_ID.pack(int(doc_id))
+    if isinstance(doc_id, (float, np.floating)):
+        return b"f" + FLOAT_ID.pack(float(doc_id))
+    if isinstance(doc_id, str):
+        data = doc_id.encode("utf-8")
+        return b"s" + COUNT.pack(len(data)) + data
+    raise TypeError(f"doc_id no soportado: {doc_id!r}")
+
+
+def _decode_doc_id(view, offset):
+    tag = bytes(view[offset:offset + 1])
+    offset += 1
+    if tag == b"i":
+        return INT_ID.unpack_from(view, offset)[0], offset + INT_ID.size
+    if tag == b"f":
+        return FLOAT_ID.unpack_from(view, offset)[0], offset + FLOAT_ID.size
+    if tag == b"s":
+        (length,) = COUNT.unpack_from(view, offset)
+        offset += COUNT.size
+        return bytes(view[offset:offset + length]).decode("utf-8"), offset + length
+    raise ValueError(f"Tipo de doc_id desconocido: {tag!r}")
+
+
+def encode_page(vectors):
+    """Serializa {posición: {'id', 'indices', 'values'}} a bytes"""
+    parts = [COUNT.pack(len(vectors))]
+    for position, entry in vectors.items():
+        indices = np.asarray(entry["indices"], dtype="<i4")
+        values = np.asarray(entry["values"], dtype="<f4")
+        parts.append(ENTRY_HEADER.pack(position, len(indices)))
+        parts.append(_encode_doc_id(entry["id"]))
+        parts.append(indices.tobytes())
+        parts.append(values.tobytes())
+    return b"".join(parts)
+
+
+def decode_page(payload):
+    view = memoryview(payload)
+    (count,) = COUNT.unpack_from(view, 0)
+    offset = COUNT.size
+    vectors = {}
+    for _ in range(count):
+        position, nnz = ENTRY_HEADER.unpack_from(view, offset)
+        offset += ENTRY_HEADER.size
+        doc_id, offset = _decode_doc_id(view, offset)
+        indices = np.frombuffer(payload, dtype="<i4", count=nnz, offset=offset)
+        offset += nnz * 4
+        values = np.frombuffer(payload, dtype="<f4", count=nnz, offset=offset)
+        offset += nnz * 4
+        vectors[position] = {"id": doc_id, "indices": indices, "values": values}
+    return vectors
+
+
+class TfidfPageFile:
+    """
+    Páginas TF-IDF en un archivo binario con tabla de offsets en memoria.
+    Leer o escribir una página es un solo pread/pwrite en su offset.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._open()
+
+    def _open(self):
+        self.offsets = {}  # page_id -> (offset, capacidad)
+        self.file = PagedFile(self.path)
+        if self.file.size() == 0:
+            self.file.write_at(0, FILE_HEADER.pack(MAGIC, VERSION))
+        else:
+            self._scan()
+
+    @staticmethod
+    def is_legacy(path):
+        """True si path existe y tiene el formato anterior (páginas pickle)"""
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            return False
+        with open(path, "rb") as f:
+            return f.read(len(MAGIC)) != MAGIC
+
+    def _scan(self):
+        magic, version = FILE_HEADER.unpack(self.file.read_at(0, FILE_HEADER.size))
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{self.path} no es un archivo de páginas TF-IDF")
+
+        offset = FILE_HEADER.size
+        end = self.file.size()
+        while offset + RECORD_HEADER.size <= end:
+            page_id, _, capacity = RECORD_HEADER.unpack(self.file.read_at(offset, RECORD_HEADER.size))
+            if offset + RECORD_HEADER.size + capacity > end:
+                break  # página a medio escribir al final del archivo
+            self.offsets[page_id] = (offset, capacity)
+            offset += RECORD_HEADER.size + capacity
+
+    def read_page(self, page_id):
+        """Vectores de la página, o None si nunca se escribió"""
+        location = self.offsets.get(page_id)
+        if location is None:
+            return None
+        offset, capacity = location
+        data = self.file.read_at(offset, RECORD_HEADER.size + capacity)
+        _, used, _ = RECORD_HEADER.unpack_from(data, 0)
+        return decode_page(data[RECORD_HEADER.size:RECORD_HEADER.size + used])
+
+    def write_page(self, page_id, vectors):
+        payload = encode_page(vectors)
+        location = self.offsets.get(page_id)
+        if location is not None and len(payload) <= location[1]:
+            offset, capacity = location
+        else:
+            capacity = _capacity_for(len(payload))
+            offset = self.file.size()
+            self.offsets[page_id] = (offset, capacity)
+        record = RECORD_HEADER.pack(page_id, len(payload), capacity) + payload
+        self.file.write_at(offset, record.ljust(RECORD_HEADER.size + capacity, b"\0"))
+
+    def compact(self, page_ids):
+        """Reescribe el archivo solo con las páginas page_ids, sin copias viejas"""
+        tmp_path = f"{self.path}.tmp"
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        compacted = TfidfPageFile(tmp_path)
+        for page_id in sorted(page_ids):
+            vectors = self.read_page(page_id)
+            if vectors is not None:
+                compacted.write_page(page_id, vectors)
+        compacted.close()
+        self.close()
+        os.replace(tmp_path, self.path)
+        self._open()
+
+    def size(self):
+        return self.file.size()
+
+    def close(self):
+        self.file.close()
@@ -1,13 +1,22 @@
 import os
 import json
 import numpy as np
-from sklearn.cluster import KMeans
+from sklearn.cluster import KMeans, MiniBatchKMeans
 import pickle
 import math
 import warnings
 from collections import OrderedDict
 import heapq
 import glob
+import threading
+from HeiderDB.database.indexes.vector_matrix import VectorMatrix
+from HeiderDB.database.indexes.tfidf_page_file import TfidfPageFile
+from HeiderDB.database.indexes.doc_directory import DocDirectory
+from HeiderDB.database.file_manager import atomic_write_json
+from HeiderDB.database.indexes.ann_index import IVFPQIndex, nearest_centroids
+from HeiderDB.database.indexes.extraction_pool import ExtractionPool
+from HeiderDB.database.indexes.descriptor_sampling import DescriptorReservoir
+from sklearn.neighbors import KDTree
 
 warnings.filterwarnings("ignore", category=UserWarning, module="sklearn.cluster")
 
@@ -16,17 +25,47 @@ class VectorIndex:
     Estructura de datos para vectores TF-IDF con visual words y paginación.
     
     ARQUITECTURA DE ALMACENAMIENTO:
-    1. _tfidf_vectors.dat: ID → vector TF-IDF (paginado tradicional)
-    2. cluster_X.dat: Un archivo por cluster conteniendo lista de doc_ids (paginado vertical)
+    1. _tfidf_vectors.dat: ID → vector TF-IDF disperso (paginado tradicional)
+    2. cluster_X.dat: Un archivo por cluster con sus postings (doc_id, peso TF-IDF) (paginado vertical)
     3. metadata.json: IDF por cluster en RAM + configuración
+    4. _tfidf_matrix.f32: los mismos vectores TF-IDF como matriz float32 contigua
+       (memmap) con sus normas, para responder search_knn con un solo producto
+       matriz-vector. Se deriva de las páginas y se reconstruye si falta.
+    5. _ann*: índice aproximado IVF-PQ opcional (ann=True) sobre las filas de
+       la matriz, para search_ann en colecciones grandes.
     
     PAGINACIÓN:
-    - TF-IDF vectors: Paginación horizontal tradicional (como actual)
+    - TF-IDF vectors: Paginación horizontal tradicional. Cada vector se guarda
+      disperso: solo los clusters que aparecen en el documento ('indices') y
+      su peso TF-IDF ('values'). Las páginas van en binario en TfidfPageFile,
+      que las lee y escribe directo en su offset.
     - Clusters: Paginación vertical simple - cada cluster crece en su propio archivo
-      Formato: [HEADER: 8 bytes size][PAGE_0: doc_ids][HEADER: 8 bytes][PAGE_1: doc_ids]...
+      Formato: [HEADER: 8 bytes size][PAGE_0: postings][HEADER: 8 bytes][PAGE_1: postings]...
     """
     
-    def __init__(self, index_file, metadata_file, page_size=100, cache_size=10, num_clusters=500, table_name=None):
+    # Índice ANN: por debajo de ANN_MIN_VECTORS la búsqueda exacta ya es rápida
+    ANN_MIN_VECTORS = 1000
+    ANN_TRAIN_SAMPLE = 50000
+    ANN_DEFAULT_NPROBE = 8
+    ANN_DEFAULT_EF_SEARCH = 64
+    
+    # Asignación de descriptores a visual words: bloques de a lo más
+    # ASSIGN_CHUNK_BYTES de distancias, y KD-tree sobre los centros desde
+    # KD_TREE_MIN_CLUSTERS clusters
+    ASSIGN_CHUNK_BYTES = 32 * 1024 * 1024
+    KD_TREE_MIN_CLUSTERS = 4096
+    
+    # Entrenamiento del vocabulario: descriptores muestreados como máximo,
+    # mínimo por archivo, y hasta cuántos se usa KMeans completo en vez de
+    # MiniBatchKMeans (lotes, pasadas y cada cuántos lotes se guardan los centros)
+    VOCAB_DESCRIPTOR_BUDGET = 1000000
+    VOCAB_MIN_PER_FILE = 16
+    VOCAB_FULL_KMEANS_MAX = 50000
+    VOCAB_BATCH_SIZE = 4096
+    VOCAB_EPOCHS = 3
+    VOCAB_CHECKPOINT_EVERY = 50
+    
+    def __init__(self, index_file, metadata_file, page_size=100, cache_size=10, num_clusters=500, table_name=None, ann=None):
         self.index_file = index_file
         self.metadata_file = metadata_file
         self.page_size = page_size  
@@ -43,17 +82,23 @@ class VectorIndex:
         
         # Archivos de datos con nombres únicos por tabla
         self.tfidf_vectors_file = self.index_file.replace('.pkl', '_tfidf_vectors.dat')
+        self.matrix_file = os.path.splitext(self.index_file)[0] + '_tfidf_matrix.f32'
+        self.doc_directory_file = os.path.splitext(self.index_file)[0] + '_tfidf_directory.log'
+        self.ann_prefix = os.path.splitext(self.index_file)[0] + '_ann'
+        self.vocab_checkpoint_file = os.path.splitext(self.index_file)[0] + '_vocab_checkpoint.npz'
         self.clusters_dir = os.path.join(os.path.dirname(self.index_file), f'clusters_{self.table_name}')
         os.makedirs(self.clusters_dir, exist_ok=True)
         
         # Estructura 1: ID → vector TF-IDF (paginado horizontal tradicional)
         self.tfidf_page_directory = {}  # {page_id: {'vector_count': int, 'free_positions': list}}
         self.tfidf_page_cache = OrderedDict()  # {page_id: {'vectors': dict, 'dirty': bool}}
+        self.tfidf_doc_directory = DocDirectory(self.doc_directory_file)  # {doc_id: (page_id, position)}
         self.next_tfidf_page_id = 0
+        self.tfidf_file = self._open_tfidf_file()
         
         # Estructura 2: Cluster files (un archivo por cluster, paginado vertical)
         self.cluster_files = {}  # {cluster_id: 'path/cluster_X.dat'}
-        self.cluster_cache = OrderedDict()  # {cluster_id: {'doc_ids': list, 'dirty': bool}}
+        self.cluster_cache = OrderedDict()  # {cluster_id: {'postings': [(doc_id, peso)], 'dirty': bool}}
         
         # Estructura 3: Cluster ID → IDF (en RAM)
         self.cluster_idf = {}  # {cluster_id: idf_value}
@@ -62,6 +107,7 @@ class VectorIndex:
         # Vocabulario visual (centroides de clusters)
         self.cluster_centers = None
         self.is_trained = False
+        self._centers_cache = None  # (cluster_centers, centros float32, ||c||², KD-tree)
         
         # Metadatos generales
         self.total_vectors = 0  # Total de documentos
@@ -72,13 +118,35 @@ class VectorIndex:
         self.vector_to_cluster = {}  # {doc_id: cluster_id}
         self.next_page_id = 0  # Alias para next_tfidf_page_id
         
+        # Estructura 4: matriz densa de vectores TF-IDF (solo con vocabulario entrenado)
+        self.matrix = None
+        
+        # Estructura 5: índice ANN opcional sobre la matriz
+        self.ann_enabled = False
+        self.ann = None
+        self._ann_lock = threading.Lock()
+        
         self.load()
+        if ann is not None and bool(ann) != self.ann_enabled:
+            self.ann_enabled = bool(ann)
+            self.save_metadata()
+        if self.is_trained:
+            self._open_matrix()
     
     # ========== ENTRENAMIENTO DEL VOCABULARIO VISUAL ==========
     
-    def train_visual_vocabulary(self, folder_path, feature_extractor):
+    def train_visual_vocabulary(self, folder_path, feature_extractor, workers=None, streaming=None,
+                                descriptor_budget=None):
         """
         Entrena el vocabulario visual a partir de todos los archivos en una carpeta y sus subcarpetas.
+        La extracción corre en un ExtractionPool de workers procesos (None = uno por CPU).
+        
+        Los descriptores no se acumulan todos: de cada archivo se toma una
+        muestra y el total pasa por un reservoir de descriptor_budget filas
+        (VOCAB_DESCRIPTOR_BUDGET por defecto). Si la muestra es chica se usa
+        KMeans completo como antes; si no (o con streaming=True) se ajusta
+        MiniBatchKMeans por lotes, guardando los centros cada cierto número
+        de lotes para retomar un entrenamiento cortado.
         """
         print(f"Iniciando entrenamiento de vocabulario visual desde: {folder_path}")
         
@@ -95,41 +163,42 @@ class VectorIndex:
         
         print(f"Encontrados {len(all_files)} archivos para entrenamiento")
         
-        # Extraer descriptores de todos los archivos
-        all_descriptors = []
+        # Muestrear descriptores de todos los archivos con memoria acotada
+        budget = descriptor_budget or self.VOCAB_DESCRIPTOR_BUDGET
+        per_file = max(self.VOCAB_MIN_PER_FILE, budget // len(all_files))
+        reservoir = DescriptorReservoir(budget)
         processed_files = 0
         
-        for file_path in all_files:
-            try:
-                descriptors = feature_extractor.extract(file_path)
-                if descriptors and len(descriptors) > 0:
-                    all_descriptors.extend(descriptors)
-                    processed_files += 1
-                    if processed_files % 100 == 0:
-                        print(f"Procesados {processed_files}/{len(all_files)} archivos...")
-            except Exception as e:
-                print(f"Error procesando {file_path}: {e}")
+        for file_path, descriptors, error in ExtractionPool(feature_extractor, workers).map(all_files):
+            if error is not None:
+                print(f"Error procesando {file_path}: {error}")
                 continue
+            if descriptors is not None:
+                reservoir.add(reservoir.sample_rows(descriptors, per_file))
+                processed_files += 1
+                if processed_files % 100 == 0:
+                    print(f"Procesados {processed_files}/{len(all_files)} archivos...")
         
-        if not all_descriptors:
+        if len(reservoir) == 0:
             raise ValueError("No se pudieron extraer descriptores de ningún archivo")
         
-        print(f"Total descriptores extraídos: {len(all_descriptors)}")
-
-        
-        # Convertir a matriz numpy para K-means
-        descriptors_matrix = np.vstack(all_descriptors)
+        descriptors_matrix = reservoir.get()
+        print(f"Total descriptores muestreados: {len(descriptors_matrix)} (de {reservoir.seen})")
         
         # Ajustar número de clusters si hay pocos descriptores
-        effective_clusters = min(self.num_clusters, len(all_descriptors))
+        effective_clusters = min(self.num_clusters, len(descriptors_matrix))
         
-        print(f"Entrenando K-means con {effective_clusters} clusters...")
+        if streaming is None:
+            streaming = len(descriptors_matrix) > self.VOCAB_FULL_KMEANS_MAX
         
-        # Entrenar K-means
-        kmeans = KMeans(n_clusters=effective_clusters, random_state=42, n_init=10)
-        kmeans.fit(descriptors_matrix)
+        if streaming:
+            self.cluster_centers = self._fit_minibatch_kmeans(descriptors_matrix, effective_clusters)
+        else:
+            print(f"Entrenando K-means con {effective_clusters} clusters...")
+            kmeans = KMeans(n_clusters=effective_clusters, random_state=42, n_init=10)
+            kmeans.fit(descriptors_matrix)
+            self.cluster_centers = kmeans.cluster_centers_
         
-        self.cluster_centers = kmeans.cluster_centers_
         self.num_clusters = effective_clusters
         self.is_trained = True
         
@@ -148,6 +217,74 @@ class VectorIndex:
         
         print(f"Vocabulario visual entrenado exitosamente con {self.num_clusters} clusters")
         self.save_metadata()
+        self._open_matrix()
+    
+    def _fit_minibatch_kmeans(self, descriptors, n_clusters):
+        """
+        MiniBatchKMeans con partial_fit sobre lotes barajados de descriptors.
+        Cada VOCAB_CHECKPOINT_EVERY lotes guarda los centros en
+        vocab_checkpoint_file; si al empezar hay un checkpoint compatible
+        se parte de esos centros y se saltan los lotes ya hechos.
+        """
+        batch_size = min(len(descriptors), max(self.VOCAB_BATCH_SIZE, 3 * n_clusters))
+        batches_per_epoch = math.ceil(len(descriptors) / batch_size)
+        total_batches = self.VOCAB_EPOCHS * batches_per_epoch
+        
+        init, done = 'k-means++', 0
+        checkpoint = self._load_vocab_checkpoint(n_clusters, descriptors.shape[1])
+        if checkpoint is not None:
+            init, done = checkpoint
+            print(f"Retomando entrenamiento desde el lote {done}/{total_batches}")
+        
+        print(f"Entrenando MiniBatchKMeans con {n_clusters} clusters ({total_batches} lotes de {batch_size})...")
+        kmeans = MiniBatchKMeans(n_clusters=n_clusters, batch_size=batch_size, init=init, n_init=1, random_state=42)
+        rng = np.random.default_rng(42)
+        
+        for batch in range(total_batches):
+            if batch % batches_per_epoch == 0:
+                order = rng.permutation(len(descriptors))
+            if batch < done:
+                continue
+            
+            start = (batch % batches_per_epoch) * batch_size
+            chunk = descriptors[order[start:start + batch_size]]
+            # El primer partial_fit necesita al menos n_clusters filas
+            if not hasattr(kmeans, 'cluster_centers_') and len(chunk) < n_clusters:
+                chunk = descriptors[order[:batch_size]]
+            kmeans.partial_fit(chunk)
+            
+            if (batch + 1) % self.VOCAB_CHECKPOINT_EVERY == 0 and batch + 1 < total_batches:
+                self._save_vocab_checkpoint(kmeans.cluster_centers_, batch + 1)
+                print(f"Lote {batch + 1}/{total_batches}, centros guardados")
+        
+        if not hasattr(kmeans, 'cluster_centers_'):
+            # Todos los lotes estaban hechos en el checkpoint
+            centers = init
+        else:
+            centers = kmeans.cluster_centers_
+        if os.path.exists(self.vocab_checkpoint_file):
+            os.remove(self.vocab_checkpoint_file)
+        return np.asarray(centers, dtype=np.float64)
+    
+    def _save_vocab_checkpoint(self, centers, batches_done):
+        tmp_path = self.vocab_checkpoint_file + '.tmp.npz'
+        np.savez(tmp_path, centers=centers, batches_done=np.int64(batches_done))
+        os.replace(tmp_path, self.vocab_checkpoint_file)
+    
+    def _load_vocab_checkpoint(self, n_clusters, dim):
+        """(centros, lotes hechos) del checkpoint, o None si no hay o no calza"""
+        if not os.path.exists(self.vocab_checkpoint_file):
+            return None
+        try:
+            with np.load(self.vocab_checkpoint_file) as data:
+                centers = data['centers']
+                batches_done = int(data['batches_done'])
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Checkpoint de vocabulario inválido, se ignora: {e}")
+            return None
+        if centers.shape != (n_clusters, dim):
+            return None
+        return centers, batches_done
     
     # ========== MÉTODOS PRINCIPALES ==========
     
@@ -158,28 +295,35 @@ class VectorIndex:
         if not self.is_trained:
             raise RuntimeError("Debe entrenar el vocabulario visual primero con train_visual_vocabulary()")
         
-        if not local_descriptors or len(local_descriptors) == 0:
+        if local_descriptors is None or len(local_descriptors) == 0:
             print(f"Warning: No hay descriptores para documento {doc_id}")
             return
         
+        # Si el documento ya estaba, se reemplaza (si no, su entrada vieja
+        # queda huérfana y total_vectors deja de coincidir con la matriz)
+        if doc_id in self.tfidf_doc_directory:
+            self.remove_vector(doc_id, save_metadata=False)
+        
         # 1. Crear histograma TF
         tf_histogram = self._create_tf_histogram(local_descriptors)
         
         # 2. Actualizar conteos de documentos por cluster
         self._update_document_counts_and_idf(tf_histogram)
         
-        # 3. Calcular vector TF-IDF
+        # 3. Calcular vector TF-IDF, disperso sobre los clusters que aparecen
         tfidf_vector = self._calculate_tfidf_vector(tf_histogram)
+        indices = np.flatnonzero(tf_histogram).astype(np.int32)
+        values = tfidf_vector[indices]
         
         # 4. Guardar vector TF-IDF
-        self._store_tfidf_vector(doc_id, tfidf_vector)
+        self._store_tfidf_vector(doc_id, indices, values)
         
-        # 5. Actualizar archivos de clusters
-        for cluster_id, count in enumerate(tf_histogram):
-            if count > 0:  # Documento contiene este cluster
-                self._add_document_to_cluster(cluster_id, doc_id)
+        # 5. Actualizar archivos de clusters con el peso del documento
+        for cluster_id, weight in zip(indices.tolist(), values.tolist()):
+            self._add_document_to_cluster(cluster_id, doc_id, weight)
         
         self.total_vectors += 1
+        self._maybe_build_ann()
         
         if save_metadata:
             self.save_metadata()
@@ -193,8 +337,8 @@ class VectorIndex:
         Remueve un documento del índice TF-IDF.
         """
         # Obtener vector TF-IDF actual para saber qué clusters actualizar
-        tfidf_vector = self._get_tfidf_vector(doc_id)
-        if tfidf_vector is None:
+        sparse_vector = self._get_sparse_vector(doc_id)
+        if sparse_vector is None:
             return False
         
         # Remover de estructuras TF-IDF
@@ -202,13 +346,13 @@ class VectorIndex:
         if not success:
             return False
         
-        # Remover de archivos de clusters (donde TF-IDF > 0)
-        for cluster_id, tfidf_value in enumerate(tfidf_vector):
-            if tfidf_value > 0:
-                self._remove_document_from_cluster(cluster_id, doc_id)
-                # Actualizar conteos
-                if cluster_id in self.cluster_document_count:
-                    self.cluster_document_count[cluster_id] = max(0, self.cluster_document_count[cluster_id] - 1)
+        # Remover solo de los clusters que aparecen en el documento
+        indices, _ = sparse_vector
+        for cluster_id in indices.tolist():
+            self._remove_document_from_cluster(cluster_id, doc_id)
+            # Actualizar conteos
+            if cluster_id in self.cluster_document_count:
+                self.cluster_document_count[cluster_id] = max(0, self.cluster_document_count[cluster_id] - 1)
         
         # Recalcular IDF
         self._recalculate_all_idf()
@@ -231,6 +375,9 @@ class VectorIndex:
     def search_knn(self, query_descriptors, k=5):
         """
         Búsqueda KNN usando TF-IDF (búsqueda lineal completa).
+        
+        Compara contra todos los documentos de una vez con la matriz TF-IDF:
+        un producto matriz-vector y argpartition para quedarse con los k mejores.
         """
         if not self.is_trained:
             raise RuntimeError("Vocabulario visual no entrenado")
@@ -239,29 +386,88 @@ class VectorIndex:
         query_tf = self._create_tf_histogram(query_descriptors)
         query_tfidf = self._calculate_tfidf_vector(query_tf)
         
-        best_k = []
+        return self.matrix.search(query_tfidf, k)
+    
+    def search_ann(self, query_descriptors, k=5, nprobe=None, ef_search=None):
+        """
+        Búsqueda KNN aproximada con el índice IVF-PQ.
         
-        # Recorrer todas las páginas TF-IDF
-        for page_id in self.tfidf_page_directory:
-            page_data = self._load_tfidf_page(page_id)
-            
-            for entry in page_data['vectors'].values():
-                if isinstance(entry, dict) and 'id' in entry and 'tfidf_vector' in entry:
-                    doc_id = entry['id']
-                    doc_tfidf = entry['tfidf_vector']
-                    
-                    distance = self._compute_cosine_distance(query_tfidf, doc_tfidf)
-                    
-                    if len(best_k) < k:
-                        heapq.heappush(best_k, (-distance, doc_id))
-                    elif distance < -best_k[0][0]:
-                        heapq.heapreplace(best_k, (-distance, doc_id))
+        nprobe: cuántas celdas del IVF se visitan. ef_search: cuántos
+        candidatos se reordenan con la distancia exacta. Subirlos mejora el
+        recall y cuesta latencia. Sin ANN, o mientras no esté entrenado, la
+        búsqueda es exacta (search_knn). Una búsqueda nunca entrena el ANN.
+        """
+        if not self.is_trained:
+            raise RuntimeError("Vocabulario visual no entrenado")
+        
+        query_tf = self._create_tf_histogram(query_descriptors)
+        query_tfidf = self._calculate_tfidf_vector(query_tf)
+        
+        # build_ann reemplaza self.ann entero: se usa la misma referencia toda la búsqueda
+        ann = self.ann
+        if ann is None or not ann.trained:
+            return self.matrix.search(query_tfidf, k)
         
-        return [(doc_id, -dist) for dist, doc_id in sorted(best_k, key=lambda x: -x[0])]
+        nprobe = nprobe or self.ANN_DEFAULT_NPROBE
+        ef_search = max(k, ef_search or self.ANN_DEFAULT_EF_SEARCH)
+        candidates = ann.search(query_tfidf, nprobe=nprobe, candidates=ef_search)
+        return self.matrix.search(query_tfidf, k, rows=candidates)
+    
+    def build_ann(self, nlist=None, m=None):
+        """
+        Entrena el índice ANN con (una muestra de) los vectores actuales y
+        codifica todos. Retorna False si todavía no hay vectores.
+        
+        Se arma en un IVFPQIndex aparte y se publica reemplazando self.ann al
+        final, así las búsquedas en curso siguen con el anterior (o con la
+        búsqueda exacta). Escribe en la matriz: va con la tabla bloqueada
+        para escritura (CREATE, INSERT), nunca dentro de un SELECT.
+        """
+        if self.matrix is None:
+            raise RuntimeError("Vocabulario visual no entrenado")
+        
+        with self._ann_lock:
+            rows = np.array(sorted(self.matrix.rows.values()), dtype=np.int64)
+            if len(rows) == 0:
+                return False
+            if len(rows) > self.ANN_TRAIN_SAMPLE:
+                rng = np.random.default_rng(0)
+                sample = np.sort(rng.choice(rows, self.ANN_TRAIN_SAMPLE, replace=False))
+            else:
+                sample = rows
+            
+            # El número de celdas depende del total de vectores, no de la muestra
+            if nlist is None:
+                nlist = int(4 * np.sqrt(len(rows)))
+            ann = IVFPQIndex(f"{self.ann_prefix}_build", self.num_clusters)
+            ann.clear()
+            ann.train(self.matrix.matrix[sample], nlist=nlist, m=m)
+            for start in range(0, len(rows), 10000):
+                chunk = rows[start:start + 10000]
+                ann.add(chunk, self.matrix.matrix[chunk])
+            ann.move_to(self.ann_prefix)
+            self.ann = ann
+        return True
     
-    def search_knn_with_index(self, query_descriptors, k=5, clusters_to_check=10):
+    def _maybe_build_ann(self):
+        """Con USING ANN, entrena el ANN cuando se junta ANN_MIN_VECTORS vectores."""
+        if not self.ann_enabled or self.matrix is None:
+            return
+        if (self.ann is None or not self.ann.trained) and len(self.matrix) >= self.ANN_MIN_VECTORS:
+            self.build_ann()
+    
+    def search_knn_with_index(self, query_descriptors, k=5, clusters_to_check=None):
         """
-        Búsqueda KNN optimizada usando archivos de clusters como índice invertido.
+        Búsqueda KNN usando archivos de clusters como índice invertido.
+        
+        Acumula el producto punto query·doc recorriendo solo los postings de
+        los clusters presentes en la consulta (cada posting trae el peso del
+        documento), y lo divide por las normas al final. El costo depende de
+        los clusters de la consulta, no del tamaño de la colección.
+        
+        clusters_to_check limita la búsqueda a los clusters de mayor peso de la
+        consulta (se siguen agregando clusters mientras haya menos de k
+        candidatos): más rápido, pero las distancias pasan a ser aproximadas.
         """
         if not self.is_trained:
             raise RuntimeError("Vocabulario visual no entrenado")
@@ -269,70 +475,31 @@ class VectorIndex:
         # Crear TF-IDF de consulta
         query_tf = self._create_tf_histogram(query_descriptors)
         query_tfidf = self._calculate_tfidf_vector(query_tf)
+        query_norm = float(np.linalg.norm(query_tfidf))
+        if query_norm == 0 or k <= 0:
+            return []
         
-        # Identificar clusters relevantes ordenados por importancia
-        relevant_clusters = []
-        for cluster_id, tf_value in enumerate(query_tf):
-            if tf_value > 0:
-                tfidf_value = query_tfidf[cluster_id]
-                relevant_clusters.append((cluster_id, tfidf_value))
-        
-        # Ordenar por importancia TF-IDF descendente
-        relevant_clusters.sort(key=lambda x: x[1], reverse=True)
-        
-        # Buscar candidatos usando heap
-        best_k = []
-        visited_docs = set()
+        # Clusters de la consulta ordenados por peso TF-IDF descendente
+        query_clusters = np.flatnonzero(query_tfidf)
+        query_clusters = query_clusters[np.argsort(-query_tfidf[query_clusters], kind='stable')]
         
-        # Procesar clusters más relevantes primero
-        clusters_processed = 0
-        for cluster_id, _ in relevant_clusters:
-            if clusters_processed >= clusters_to_check and len(best_k) >= k:
+        scores = {}  # doc_id -> producto punto acumulado
+        for processed, cluster_id in enumerate(query_clusters.tolist()):
+            if clusters_to_check is not None and processed >= clusters_to_check and len(scores) >= k:
                 break
             
-            doc_ids = self._load_cluster_documents(cluster_id)
-            
-            for doc_id in doc_ids:
-                if doc_id in visited_docs:
-                    continue
-                
-                doc_tfidf = self._get_tfidf_vector(doc_id)
-                if doc_tfidf is not None:
-                    distance = self._compute_cosine_distance(query_tfidf, doc_tfidf)
-                    
-                    if len(best_k) < k:
-                        heapq.heappush(best_k, (-distance, doc_id))
-                    elif distance < -best_k[0][0]:
-                        heapq.heapreplace(best_k, (-distance, doc_id))
-                    
-                    visited_docs.add(doc_id)
-            
-            clusters_processed += 1
-        
-        # Si no hay suficientes, buscar en clusters restantes
-        if len(best_k) < k and clusters_processed < len(relevant_clusters):
-            for cluster_id, _ in relevant_clusters[clusters_processed:]:
-                doc_ids = self._load_cluster_documents(cluster_id)
-                
-                for doc_id in doc_ids:
-                    if doc_id in visited_docs:
-                        continue
-                    
-                    doc_tfidf = self._get_tfidf_vector(doc_id)
-                    if doc_tfidf is not None:
-                        distance = self._compute_cosine_distance(query_tfidf, doc_tfidf)
-                        
-                        if len(best_k) < k:
-                            heapq.heappush(best_k, (-distance, doc_id))
-                        elif distance < -best_k[0][0]:
-                            heapq.heapreplace(best_k, (-distance, doc_id))
-                        
-                        visited_docs.add(doc_id)
-                
-                if len(best_k) >= k:
-                    break
+            query_weight = float(query_tfidf[cluster_id])
+            for doc_id, weight in self._load_cluster_postings(cluster_id):
+                scores[doc_id] = scores.get(doc_id, 0.0) + query_weight * weight
+        
+        results = []
+        for doc_id, dot_product in scores.items():
+            doc_norm = self.matrix.norm(doc_id)
+            if not doc_norm:
+                continue
+            results.append((1.0 - dot_product / (doc_norm * query_norm), doc_id))
         
-        return [(doc_id, -dist) for dist, doc_id in sorted(best_k, key=lambda x: -x[0])]
+        return [(doc_id, distance) for distance, doc_id in heapq.nsmallest(k, results, key=lambda x: x[0])]
     
     # ========== GESTIÓN DE ARCHIVOS DE CLUSTERS ==========
     
@@ -340,20 +507,21 @@ class VectorIndex:
         """Retorna la ruta del archivo para un cluster específico."""
         return os.path.join(self.clusters_dir, f'cluster_{cluster_id}.dat')
     
-    def _load_cluster_documents(self, cluster_id):
+    def _load_cluster_postings(self, cluster_id):
         """
-        Carga la lista de documentos de un cluster desde su archivo.
+        Carga los postings (doc_id, peso TF-IDF) de un cluster desde su archivo.
         """
         if cluster_id in self.cluster_cache:
             self.cluster_cache.move_to_end(cluster_id)
-            return self.cluster_cache[cluster_id]['doc_ids']
+            return self.cluster_cache[cluster_id]['postings']
         
         # Limpiar cache si está lleno
         if len(self.cluster_cache) >= self.cache_size:
             self._evict_oldest_cluster()
         
         cluster_file = self._get_cluster_file_path(cluster_id)
-        doc_ids = []
+        postings = []
+        legacy = False
         
         try:
             if os.path.exists(cluster_file) and os.path.getsize(cluster_file) > 0:
@@ -366,45 +534,72 @@ class VectorIndex:
                         if page_size == 0:
                             break
                         page_data = pickle.loads(f.read(page_size))
-                        doc_ids.extend(page_data)
+                        for item in page_data:
+                            if isinstance(item, tuple):
+                                postings.append(item)
+                            else:
+                                # Formato anterior: solo doc_id, el peso se toma del vector
+                                postings.append((item, self._get_cluster_weight(item, cluster_id)))
+                                legacy = True
         except Exception as e:
             print(f"Error cargando cluster {cluster_id}: {e}")
         
-        self.cluster_cache[cluster_id] = {'doc_ids': doc_ids, 'dirty': False}
-        return doc_ids
+        self.cluster_cache[cluster_id] = {'postings': postings, 'dirty': legacy}
+        return postings
+    
+    def _get_cluster_weight(self, doc_id, cluster_id):
+        """Peso TF-IDF de un documento en un cluster (0.0 si no aparece)."""
+        sparse_vector = self._get_sparse_vector(doc_id)
+        if sparse_vector is None:
+            return 0.0
+        indices, values = sparse_vector
+        position = np.searchsorted(indices, cluster_id)
+        if position < len(indices) and indices[position] == cluster_id:
+            return float(values[position])
+        return 0.0
     
-    def _save_cluster_documents(self, cluster_id, doc_ids_list):
+    def _load_cluster_documents(self, cluster_id):
+        """Lista de doc_ids de un cluster."""
+        return [doc_id for doc_id, _ in self._load_cluster_postings(cluster_id)]
+    
+    def _save_cluster_documents(self, cluster_id, postings):
         """
-        Guarda la lista de documentos de un cluster a su archivo.
+        Guarda los postings de un cluster a su archivo.
         """
         cluster_file = self._get_cluster_file_path(cluster_id)
         
         try:
             with open(cluster_file, 'wb') as f:
                 # Dividir en páginas
-                for i in range(0, len(doc_ids_list), self.page_size):
-                    page_data = doc_ids_list[i:i + self.page_size]
+                for i in range(0, len(postings), self.page_size):
+                    page_data = postings[i:i + self.page_size]
                     page_bytes = pickle.dumps(page_data)
                     header = len(page_bytes).to_bytes(8, 'big')
                     f.write(header + page_bytes)
         except Exception as e:
             print(f"Error guardando cluster {cluster_id}: {e}")
     
-    def _add_document_to_cluster(self, cluster_id, doc_id):
-        """Añade un documento a un cluster específico."""
-        doc_ids = self._load_cluster_documents(cluster_id)
+    def _add_document_to_cluster(self, cluster_id, doc_id, weight=0.0):
+        """Añade (o actualiza) el posting de un documento en un cluster."""
+        postings = self._load_cluster_postings(cluster_id)
         
-        if doc_id not in doc_ids:
-            doc_ids.append(doc_id)
-            self.cluster_cache[cluster_id]['dirty'] = True
+        for i, (posting_id, _) in enumerate(postings):
+            if posting_id == doc_id:
+                postings[i] = (doc_id, weight)
+                break
+        else:
+            postings.append((doc_id, weight))
+        self.cluster_cache[cluster_id]['dirty'] = True
     
     def _remove_document_from_cluster(self, cluster_id, doc_id):
         """Remueve un documento de un cluster específico."""
-        doc_ids = self._load_cluster_documents(cluster_id)
+        postings = self._load_cluster_postings(cluster_id)
         
-        if doc_id in doc_ids:
-            doc_ids.remove(doc_id)
-            self.cluster_cache[cluster_id]['dirty'] = True
+        for i, (posting_id, _) in enumerate(postings):
+            if posting_id == doc_id:
+                del postings[i]
+                self.cluster_cache[cluster_id]['dirty'] = True
+                break
     
     def _evict_oldest_cluster(self):
         """Remueve el cluster más antiguo del cache."""
@@ -413,57 +608,160 @@ class VectorIndex:
         
         oldest_cluster_id, cluster_data = self.cluster_cache.popitem(last=False)
         if cluster_data['dirty']:
-            self._save_cluster_documents(oldest_cluster_id, cluster_data['doc_ids'])
+            self._save_cluster_documents(oldest_cluster_id, cluster_data['postings'])
     
     # ========== GESTIÓN DE VECTORES TF-IDF ==========
     
-    def _store_tfidf_vector(self, doc_id, tfidf_vector):
-        """Almacena un vector TF-IDF usando paginación horizontal."""
+    def _store_tfidf_vector(self, doc_id, indices, values, index_vector=True):
+        """
+        Almacena un vector TF-IDF disperso usando paginación horizontal.
+        Con index_vector=False no se toca la matriz ni el ANN (compactación).
+        """
         page_id = self._find_available_tfidf_page()
         page_data = self._load_tfidf_page(page_id)
         page_info = self.tfidf_page_directory[page_id]
         
         position = page_info['free_positions'].pop(0)
-        page_data['vectors'][position] = {'id': doc_id, 'tfidf_vector': tfidf_vector}
+        page_data['vectors'][position] = {'id': doc_id, 'indices': indices, 'values': values}
         page_data['dirty'] = True
         page_info['vector_count'] += 1
+        self.tfidf_doc_directory[doc_id] = (page_id, position)
+        
+        if index_vector and self.matrix is not None:
+            dense = self._to_dense(indices, values)
+            self.matrix.add(doc_id, dense)
+            if self.ann is not None and self.ann.trained:
+                self.ann.add(self.matrix.rows[doc_id], dense)
+    
+    def _to_dense(self, indices, values):
+        vector = np.zeros(self.num_clusters, dtype=np.float32)
+        vector[indices] = values
+        return vector
+    
+    def _entry_sparse(self, entry):
+        """(indices, values) de una entrada de página; las viejas guardaban el vector denso."""
+        if 'indices' in entry:
+            return entry['indices'], entry['values']
+        dense = np.asarray(entry['tfidf_vector'], dtype=np.float32)
+        indices = np.flatnonzero(dense).astype(np.int32)
+        return indices, dense[indices]
+    
+    def _locate_tfidf_entry(self, doc_id):
+        """Página, posición y entrada de un doc_id usando el directorio (o None)."""
+        location = self.tfidf_doc_directory.get(doc_id)
+        if location is None:
+            return None
+        page_id, position = location
+        entry = self._load_tfidf_page(page_id)['vectors'].get(position)
+        if not isinstance(entry, dict) or entry.get('id') != doc_id:
+            return None
+        return page_id, position, entry
+    
+    def _get_sparse_vector(self, doc_id):
+        """Obtiene un vector TF-IDF disperso (indices, values) por doc_id."""
+        located = self._locate_tfidf_entry(doc_id)
+        if located is None:
+            return None
+        return self._entry_sparse(located[2])
     
     def _get_tfidf_vector(self, doc_id):
-        """Obtiene un vector TF-IDF por doc_id."""
-        for page_id in self.tfidf_page_directory:
-            page_data = self._load_tfidf_page(page_id)
-            for entry in page_data['vectors'].values():
-                if isinstance(entry, dict) and entry.get('id') == doc_id:
-                    return entry['tfidf_vector']
-        return None
+        """Obtiene un vector TF-IDF (denso) por doc_id."""
+        sparse_vector = self._get_sparse_vector(doc_id)
+        if sparse_vector is None:
+            return None
+        return self._to_dense(*sparse_vector)
     
     def _remove_tfidf_vector(self, doc_id):
         """Remueve un vector TF-IDF por doc_id."""
-        for page_id, page_info in self.tfidf_page_directory.items():
+        located = self._locate_tfidf_entry(doc_id)
+        if located is None:
+            return False
+        page_id, pos, _ = located
+        page_data = self._load_tfidf_page(page_id)
+        page_info = self.tfidf_page_directory[page_id]
+        
+        del page_data['vectors'][pos]
+        page_data['dirty'] = True
+        page_info['free_positions'].append(pos)
+        page_info['free_positions'].sort()
+        page_info['vector_count'] -= 1
+        del self.tfidf_doc_directory[doc_id]
+        if self.matrix is not None:
+            self.matrix.remove(doc_id)
+        return True
+    
+    def _rebuild_doc_directory(self):
+        """Arma el directorio doc_id → (página, posición) recorriendo las páginas."""
+        entries = {}
+        for page_id in list(self.tfidf_page_directory):
             page_data = self._load_tfidf_page(page_id)
-            for pos, entry in list(page_data['vectors'].items()):
-                if isinstance(entry, dict) and entry.get('id') == doc_id:
-                    del page_data['vectors'][pos]
-                    page_data['dirty'] = True
-                    page_info['free_positions'].append(pos)
-                    page_info['free_positions'].sort()
-                    page_info['vector_count'] -= 1
-                    return True
-        return False
+            for position, entry in page_data['vectors'].items():
+                if isinstance(entry, dict) and 'id' in entry:
+                    entries[entry['id']] = (page_id, position)
+        self.tfidf_doc_directory.reset(entries)
+    
+    def _iter_sparse_entries(self):
+        """Recorre las páginas TF-IDF retornando (doc_id, indices, values)."""
+        for page_id in list(self.tfidf_page_directory):
+            page_data = self._load_tfidf_page(page_id)
+            for entry in list(page_data['vectors'].values()):
+                if isinstance(entry, dict) and 'id' in entry:
+                    yield (entry['id'], *self._entry_sparse(entry))
+    
+    def _iter_tfidf_entries(self):
+        """Recorre las páginas TF-IDF retornando pares (doc_id, vector denso)."""
+        for doc_id, indices, values in self._iter_sparse_entries():
+            yield doc_id, self._to_dense(indices, values)
+    
+    def _open_matrix(self):
+        """Abre la matriz TF-IDF; si no existe o no coincide con las páginas la reconstruye."""
+        if self.matrix is not None:
+            self.matrix.close()
+        self.matrix = VectorMatrix(self.matrix_file, self.num_clusters)
+        self.ann = IVFPQIndex(self.ann_prefix, self.num_clusters) if self.ann_enabled else None
+        if len(self.matrix) != self.total_vectors:
+            self.matrix.rebuild(self._iter_tfidf_entries())
+            # Las filas cambiaron: los códigos ANN ya no sirven
+            if self.ann is not None:
+                self.ann.clear()
+                self._maybe_build_ann()
     
     # ========== CÁLCULOS TF-IDF ==========
     
     def _create_tf_histogram(self, local_descriptors):
         """Crea histograma TF asignando descriptores a clusters más cercanos."""
-        tf_histogram = np.zeros(self.num_clusters, dtype=np.int32)
-        
-        for descriptor in local_descriptors:
-            # Encontrar cluster más cercano
-            distances = np.linalg.norm(self.cluster_centers - descriptor, axis=1)
-            nearest_cluster = np.argmin(distances)
-            tf_histogram[nearest_cluster] += 1
-        
-        return tf_histogram
+        words = self._assign_visual_words(local_descriptors)
+        return np.bincount(words, minlength=self.num_clusters).astype(np.int32)
+    
+    def _get_centers_cache(self):
+        """
+        Centros en float32 con sus normas al cuadrado (y el KD-tree si el
+        vocabulario es grande). Se recalcula solo si cambian los centros.
+        """
+        if self._centers_cache is None or self._centers_cache[0] is not self.cluster_centers:
+            centers = np.asarray(self.cluster_centers, dtype=np.float32)
+            centers_sq = np.einsum('ij,ij->i', centers, centers)
+            tree = KDTree(centers) if len(centers) >= self.KD_TREE_MIN_CLUSTERS else None
+            self._centers_cache = (self.cluster_centers, centers, centers_sq, tree)
+        return self._centers_cache[1:]
+    
+    def _assign_visual_words(self, local_descriptors):
+        """
+        Cluster más cercano de cada descriptor, todos de una vez: los
+        descriptores se apilan en una matriz y la distancia al cuadrado sale
+        de ||a||² + ||c||² - 2·a·c por bloques de tamaño acotado.
+        """
+        descriptors = np.asarray(local_descriptors, dtype=np.float32)
+        if descriptors.size == 0:
+            return np.empty(0, dtype=np.int64)
+        if descriptors.ndim == 1:
+            descriptors = descriptors[None, :]
+        
+        centers, centers_sq, tree = self._get_centers_cache()
+        if tree is not None:
+            return tree.query(descriptors, k=1, return_distance=False)[:, 0]
+        chunk_size = max(1, self.ASSIGN_CHUNK_BYTES // (4 * len(centers)))
+        return nearest_centroids(descriptors, centers, chunk_size=chunk_size, centroid_sq=centers_sq)
     
     def _calculate_tfidf_vector(self, tf_histogram):
         """Calcula vector TF-IDF multiplicando TF * IDF."""
@@ -542,21 +840,9 @@ class VectorIndex:
         
         page_data = {'vectors': {}, 'dirty': False}
         try:
-            if os.path.exists(self.tfidf_vectors_file):
-                with open(self.tfidf_vectors_file, 'rb') as f:
-                    current_page = 0
-                    while True:
-                        header = f.read(8)
-                        if not header or len(header) < 8:
-                            break
-                        page_size = int.from_bytes(header, 'big')
-                        page_bytes = f.read(page_size)
-                        if current_page == page_id:
-                            if page_size > 0:
-                                vectors_data = pickle.loads(page_bytes)
-                                page_data = {'vectors': vectors_data, 'dirty': False}
-                            break
-                        current_page += 1
+            vectors_data = self.tfidf_file.read_page(page_id)
+            if vectors_data is not None:
+                page_data = {'vectors': vectors_data, 'dirty': False}
         except Exception as e:
             print(f"Error cargando página TF-IDF {page_id}: {e}")
         
@@ -564,7 +850,7 @@ class VectorIndex:
         return page_data
     
     def _save_tfidf_page(self, page_id):
-        """Guarda página TF-IDF a disco."""
+        """Guarda página TF-IDF a disco (solo esa página, en su offset)."""
         if page_id not in self.tfidf_page_cache:
             return
         
@@ -572,47 +858,52 @@ class VectorIndex:
         if not page_data['dirty']:
             return
         
-        max_page = max(self.tfidf_page_directory.keys()) if self.tfidf_page_directory else -1
-        pages = []
-        
-        if os.path.exists(self.tfidf_vectors_file):
-            with open(self.tfidf_vectors_file, 'rb') as f:
-                for i in range(max_page + 1):
-                    header = f.read(8)
-                    if not header or len(header) < 8:
-                        break
-                    page_size = int.from_bytes(header, 'big')
-                    page_bytes = f.read(page_size)
-                    pages.append((header, page_bytes))
-        
-        new_pages = []
-        for i in range(max_page + 1):
-            if i == page_id:
-                pdata = self.tfidf_page_cache[i]['vectors']
-                vbytes = pickle.dumps(pdata) if pdata else pickle.dumps({})
-                pheader = len(vbytes).to_bytes(8, 'big')
-                new_pages.append(pheader + vbytes)
-            elif i < len(pages):
-                new_pages.append(pages[i][0] + pages[i][1])
-            else:
-                empty_bytes = pickle.dumps({})
-                empty_header = len(empty_bytes).to_bytes(8, 'big')
-                new_pages.append(empty_header + empty_bytes)
-        
-        with open(self.tfidf_vectors_file, 'wb') as f:
-            for p in new_pages:
-                f.write(p)
-        
+        self.tfidf_file.write_page(page_id, page_data['vectors'])
         page_data['dirty'] = False
     
+    def _open_tfidf_file(self):
+        """Abre el archivo de páginas TF-IDF, convirtiendo el formato pickle anterior."""
+        if TfidfPageFile.is_legacy(self.tfidf_vectors_file):
+            self._migrate_legacy_tfidf_file()
+        return TfidfPageFile(self.tfidf_vectors_file)
+    
+    def _migrate_legacy_tfidf_file(self):
+        """
+        Formato anterior: [8 bytes tamaño][pickle de la página] por cada página,
+        en orden de page_id. Se reescribe completo una sola vez.
+        """
+        tmp_path = f"{self.tfidf_vectors_file}.migrating"
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        migrated = TfidfPageFile(tmp_path)
+        with open(self.tfidf_vectors_file, 'rb') as f:
+            page_id = 0
+            while True:
+                header = f.read(8)
+                if not header or len(header) < 8:
+                    break
+                page_size = int.from_bytes(header, 'big')
+                vectors = pickle.loads(f.read(page_size)) if page_size > 0 else {}
+                page = {}
+                for position, entry in vectors.items():
+                    if isinstance(entry, dict) and 'id' in entry:
+                        indices, values = self._entry_sparse(entry)
+                        page[position] = {'id': entry['id'], 'indices': indices, 'values': values}
+                if page:
+                    migrated.write_page(page_id, page)
+                page_id += 1
+        migrated.close()
+        os.replace(tmp_path, self.tfidf_vectors_file)
+    
     def _evict_oldest_tfidf_page(self):
         """Remueve página TF-IDF más antigua del cache."""
         if not self.tfidf_page_cache:
             return
         
-        oldest_page_id, page_data = self.tfidf_page_cache.popitem(last=False)
-        if page_data['dirty']:
-            self._save_tfidf_page(oldest_page_id)
+        # Se guarda antes de sacarla: _save_tfidf_page solo ve páginas en cache
+        oldest_page_id = next(iter(self.tfidf_page_cache))
+        self._save_tfidf_page(oldest_page_id)
+        del self.tfidf_page_cache[oldest_page_id]
     
     # ========== COMPATIBILIDAD ==========
     
@@ -663,6 +954,7 @@ class VectorIndex:
                 'cluster_centers': self.cluster_centers.tolist() if self.cluster_centers is not None else None,
                 'num_clusters': self.num_clusters,
                 'is_trained': self.is_trained,
+                'ann_enabled': self.ann_enabled,
                 
                 # Metadatos de paginación TF-IDF
                 'tfidf_page_directory': {str(k): v for k, v in self.tfidf_page_directory.items()},
@@ -678,8 +970,7 @@ class VectorIndex:
                 'cache_size': self.cache_size
             }
             
-            with open(self.metadata_file, 'w') as f:
-                json.dump(metadata, f, indent=2)
+            atomic_write_json(self.metadata_file, metadata, indent=None)
                 
         except Exception as e:
             print(f"Error guardando metadatos TF-IDF: {e}")
@@ -709,11 +1000,23 @@ class VectorIndex:
                     self.cluster_centers = np.array(cluster_centers_data)
                 self.num_clusters = metadata.get('num_clusters', self.num_clusters)
                 self.is_trained = metadata.get('is_trained', False)
+                self.ann_enabled = metadata.get('ann_enabled', False)
                 
                 # Cargar metadatos de paginación TF-IDF
                 self.tfidf_page_directory = {int(k): v for k, v in metadata.get('tfidf_page_directory', {}).items()}
                 self.next_tfidf_page_id = metadata.get('next_tfidf_page_id', 0)
                 
+                # Directorio doc_id → (página, posición): vive en su propio archivo.
+                # Antes se guardaba en los metadatos, y los índices más viejos no lo tienen
+                if not self.tfidf_doc_directory.existed:
+                    if 'tfidf_doc_directory' in metadata:
+                        self.tfidf_doc_directory.reset({
+                            doc_id: (page_id, position)
+                            for doc_id, page_id, position in metadata['tfidf_doc_directory']
+                        })
+                    else:
+                        self._rebuild_doc_directory()
+                
                 # Cargar archivos de clusters
                 self.cluster_files = {int(k): v for k, v in metadata.get('cluster_files', {}).items()}
                 
@@ -741,6 +1044,7 @@ class VectorIndex:
         self.cluster_centers = None
         self.is_trained = False
         self.tfidf_page_directory = {}
+        self.tfidf_doc_directory.clear()
         self.cluster_files = {}
         self.next_tfidf_page_id = 0
         self.total_vectors = 0
@@ -757,12 +1061,23 @@ class VectorIndex:
         # Flush clusters dirty
         for cluster_id, cluster_data in list(self.cluster_cache.items()):
             if cluster_data['dirty']:
-                self._save_cluster_documents(cluster_id, cluster_data['doc_ids'])
+                self._save_cluster_documents(cluster_id, cluster_data['postings'])
                 cluster_data['dirty'] = False
         
+        if self.matrix is not None:
+            self.matrix.flush()
+        
         # Guardar metadatos
         self.save_metadata()
     
+    def close(self):
+        """Guarda lo pendiente y libera la matriz mapeada y los archivos abiertos."""
+        self.save()
+        if self.matrix is not None:
+            self.matrix.close()
+        self.tfidf_file.close()
+        self.tfidf_doc_directory.close()
+    
     # ========== MÉTODOS DE UTILIDAD (COMPATIBILIDAD) ==========
     
     def get_vector_count(self):
@@ -793,12 +1108,21 @@ class VectorIndex:
         self.tfidf_page_cache.clear()
         self.cluster_cache.clear()
         
+        if self.matrix is not None:
+            self.matrix.clear()
+            self.matrix = None
+        if self.ann is not None:
+            self.ann.clear()
+            self.ann = None
+        
         # Eliminar archivos
+        self.tfidf_file.close()
         if os.path.exists(self.tfidf_vectors_file):
             try:
                 os.remove(self.tfidf_vectors_file)
             except Exception as e:
                 print(f"Error eliminando archivo TF-IDF: {e}")
+        self.tfidf_file = TfidfPageFile(self.tfidf_vectors_file)
         
         # Eliminar archivos de clusters
         for cluster_id in range(self.num_clusters):
@@ -813,6 +1137,18 @@ class VectorIndex:
         self._initialize_empty()
         self.save_metadata()
     
+    def files(self):
+        """Archivos del índice en disco (para borrarlos con la tabla)"""
+        paths = [
+            self.index_file, self.metadata_file, self.tfidf_vectors_file, self.doc_directory_file,
+            self.matrix_file, f"{self.matrix_file}.norms", f"{self.matrix_file}.json",
+        ]
+        paths.extend(glob.glob(os.path.join(self.clusters_dir, 'cluster_*.dat')))
+        # ANN (también restos de un build_ann cortado) y checkpoint del vocabulario
+        paths.extend(glob.glob(glob.escape(self.ann_prefix) + '*'))
+        paths.append(self.vocab_checkpoint_file)
+        return list(dict.fromkeys(paths))
+    
     def get_storage_stats(self):
         """Obtiene estadísticas de almacenamiento."""
         stats = {
@@ -823,6 +1159,7 @@ class VectorIndex:
             'cluster_files': len(self.cluster_files),
             'tfidf_disk_usage_bytes': 0,
             'clusters_disk_usage_bytes': 0,
+            'matrix_disk_usage_bytes': 0,
             'total_disk_usage_bytes': 0
         }
         
@@ -836,7 +1173,15 @@ class VectorIndex:
             if os.path.exists(cluster_file):
                 stats['clusters_disk_usage_bytes'] += os.path.getsize(cluster_file)
         
-        stats['total_disk_usage_bytes'] = stats['tfidf_disk_usage_bytes'] + stats['clusters_disk_usage_bytes']
+        # Calcular uso de disco de la matriz TF-IDF
+        if self.matrix is not None:
+            for path in (self.matrix.path, self.matrix.norms_path, self.matrix.ids_path):
+                if os.path.exists(path):
+                    stats['matrix_disk_usage_bytes'] += os.path.getsize(path)
+        
+        stats['total_disk_usage_bytes'] = (
+            stats['tfidf_disk_usage_bytes'] + stats['clusters_disk_usage_bytes'] + stats['matrix_disk_usage_bytes']
+        )
         
         return stats
     
@@ -857,21 +1202,16 @@ class VectorIndex:
         if self.cluster_centers is None:
             return 0
         
-        distances = np.linalg.norm(self.cluster_centers - vector, axis=1)
-        return np.argmin(distances)
+        return self._assign_visual_words(vector)[0]
     
     def _get_ordered_clusters(self, query_vector):
         """COMPATIBILIDAD: Obtiene clusters ordenados por distancia"""
         if self.cluster_centers is None:
             return []
         
-        cluster_distances = []
-        for i, center in enumerate(self.cluster_centers):
-            distance = np.linalg.norm(query_vector - center)
-            cluster_distances.append((i, distance))
-        
-        cluster_distances.sort(key=lambda x: x[1])
-        return cluster_distances
+        distances = np.linalg.norm(self.cluster_centers - query_vector, axis=1)
+        order = np.argsort(distances, kind='stable')
+        return list(zip(order.tolist(), distances[order].tolist()))
     
     def compact_pages(self):
         """
@@ -880,24 +1220,22 @@ class VectorIndex:
         print("Iniciando compactación de páginas TF-IDF...")
         
         # Extraer todos los vectores TF-IDF activos
-        active_vectors = []
-        for page_id in self.tfidf_page_directory:
-            page_data = self._load_tfidf_page(page_id)
-            for entry in page_data['vectors'].values():
-                if isinstance(entry, dict) and 'id' in entry and 'tfidf_vector' in entry:
-                    active_vectors.append((entry['id'], entry['tfidf_vector']))
+        active_vectors = list(self._iter_sparse_entries())
         
         # Limpiar estructuras
         self.tfidf_page_cache.clear()
         self.tfidf_page_directory = {}
+        self.tfidf_doc_directory.clear()
         self.next_tfidf_page_id = 0
         
         # Recrear páginas compactadas
-        for doc_id, tfidf_vector in active_vectors:
-            self._store_tfidf_vector(doc_id, tfidf_vector)
+        # Los vectores no cambian: la matriz y el ANN siguen valiendo
+        for doc_id, indices, values in active_vectors:
+            self._store_tfidf_vector(doc_id, indices, values, index_vector=False)
         
-        # Guardar cambios
+        # Guardar cambios y descartar las copias viejas de las páginas
         self.save()
+        self.tfidf_file.compact(self.tfidf_page_directory.keys())
         print(f"Compactación completada. Páginas TF-IDF activas: {len(self.tfidf_page_directory)}")
     
     def _flush_all_pages(self):
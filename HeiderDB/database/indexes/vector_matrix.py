@@ -0,0 +1,228 @@
+import os
+import json
+import numpy as np
+from HeiderDB.database.file_manager import atomic_write_json
+
+
+class VectorMatrix:
+    """
+    Vectores TF-IDF guardados como una matriz float32 contigua mapeada a disco.
+
+    Cada documento ocupa una fila. Junto a la matriz se guardan la norma L2 de
+    cada fila y el doc_id de cada fila, así una búsqueda KNN es un solo
+    producto matriz-vector más un argpartition en vez de recorrer las páginas
+    documento por documento. Las filas borradas quedan en cero con doc_id None
+    y se reutilizan en la siguiente inserción.
+
+    Archivos: <path> (matriz), <path>.norms (normas) y <path>.json (doc_ids).
+    """
+
+    def __init__(self, path, dim, initial_capacity=1024):
+        self.path = path
+        self.norms_path = f"{path}.norms"
+        self.ids_path = f"{path}.json"
+        self.dim = dim
+        self.initial_capacity = max(1, initial_capacity)
+
+        self.ids = []  # doc_id por fila, None si la fila está libre
+        self.rows = {}  # doc_id -> fila
+        self.free_rows = []
+        self.capacity = 0
+        self.matrix = None
+        self.norms = None
+        self.dirty = False
+
+        if not self._load():
+            self._reset()
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __contains__(self, doc_id):
+        return doc_id in self.rows
+
+    # ========== ARCHIVOS ==========
+
+    def _load(self):
+        """Abre una matriz ya guardada. Retorna False si no existe o no calza."""
+        if not os.path.exists(self.ids_path):
+            return False
+        try:
+            with open(self.ids_path, "r") as f:
+                meta = json.load(f)
+            capacity = meta["capacity"]
+            if meta["dim"] != self.dim or len(meta["ids"]) > capacity:
+                return False
+            if os.path.getsize(self.path) != capacity * self.dim * 4:
+                return False
+            if os.path.getsize(self.norms_path) != capacity * 4:
+                return False
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Matriz TF-IDF inválida, se reconstruye: {e}")
+            return False
+
+        self.ids = meta["ids"]
+        self.rows = {doc_id: row for row, doc_id in enumerate(self.ids) if doc_id is not None}
+        self.free_rows = [row for row, doc_id in enumerate(self.ids) if doc_id is None]
+        self._map(capacity)
+        return True
+
+    def _map(self, capacity):
+        """(Re)mapea los archivos con capacity filas, agrandándolos si hace falta"""
+        self._unmap()
+        for path, size in ((self.path, capacity * self.dim * 4), (self.norms_path, capacity * 4)):
+            with open(path, "ab") as f:
+                if f.tell() < size:
+                    f.truncate(size)
+        self.matrix = np.memmap(self.path, dtype=np.float32, mode="r+", shape=(capacity, self.dim))
+        self.norms = np.memmap(self.norms_path, dtype=np.float32, mode="r+", shape=(capacity,))
+        self.capacity = capacity
+
+    def _unmap(self):
+        if self.matrix is not None:
+            self.matrix.flush()
+            self.norms.flush()
+        self.matrix = None
+        self.norms = None
+
+    def _remove_files(self):
+        for path in (self.path, self.norms_path, self.ids_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def _reset(self):
+        self._unmap()
+        self._remove_files()
+        self.ids = []
+        self.rows = {}
+        self.free_rows = []
+        self._map(self.initial_capacity)
+        self.dirty = True
+
+    def flush(self):
+        """Baja la matriz a disco y guarda los doc_ids si cambiaron"""
+        if self.matrix is None:
+            return
+        self.matrix.flush()
+        self.norms.flush()
+        if self.dirty:
+            atomic_write_json(
+                self.ids_path,
+                {"dim": self.dim, "capacity": self.capacity, "ids": self.ids},
+                indent=None,
+            )
+            self.dirty = False
+
+    def close(self):
+        self.flush()
+        self._unmap()
+
+    def clear(self):
+        """Borra la matriz y sus archivos"""
+        self._unmap()
+        self._remove_files()
+        self.ids = []
+        self.rows = {}
+        self.free_rows = []
+        self.capacity = 0
+        self.dirty = False
+
+    # ========== OPERACIONES ==========
+
+    def add(self, doc_id, vector):
+        """Guarda (o reemplaza) el vector de doc_id"""
+        if self.matrix is None:
+            self._reset()
+
+        row = self.rows.get(doc_id)
+        if row is None:
+            if self.free_rows:
+                row = self.free_rows.pop()
+            else:
+                row = len(self.ids)
+                if row >= self.capacity:
+                    self._map(self.capacity * 2)
+                self.ids.append(None)
+
+        vector = np.asarray(vector, dtype=np.float32)
+        self.matrix[row] = vector
+        self.norms[row] = np.linalg.norm(vector)
+        self.ids[row] = doc_id
+        self.rows[doc_id] = row
+        self.dirty = True
+
+    def remove(self, doc_id):
+        row = self.rows.pop(doc_id, None)
+        if row is None:
+            return False
+        self.matrix[row] = 0.0
+        self.norms[row] = 0.0
+        self.ids[row] = None
+        self.free_rows.append(row)
+        self.dirty = True
+        return True
+
+    def get(self, doc_id):
+        row = self.rows.get(doc_id)
+        if row is None:
+            return None
+        return np.array(self.matrix[row])
+
+    def norm(self, doc_id):
+        """Norma L2 precalculada del vector de doc_id (None si no está)"""
+        row = self.rows.get(doc_id)
+        if row is None:
+            return None
+        return float(self.norms[row])
+
+    def rebuild(self, entries):
+        """Reconstruye la matriz desde pares (doc_id, vector)"""
+        self._reset()
+        for doc_id, vector in entries:
+            self.add(doc_id, vector)
+        self.flush()
+
+    def search(self, query_vector, k=5, rows=None):
+        """
+        Los k documentos con menor distancia coseno a query_vector, como
+        lista de (doc_id, distancia) ordenada de menor a mayor distancia.
+        Con rows solo se comparan esas filas (candidatos de un índice ANN).
+        """
+        if k <= 0 or not self.rows:
+            return []
+
+        if rows is None:
+            rows = np.arange(len(self.ids))
+            vectors = self.matrix[:len(rows)]
+            norms = self.norms[:len(rows)]
+            free = self.free_rows
+        else:
+            rows = np.unique(np.asarray(rows, dtype=np.int64))
+            rows = rows[rows < len(self.ids)]
+            vectors = self.matrix[rows]
+            norms = self.norms[rows]
+            free = [i for i, row in enumerate(rows.tolist()) if self.ids[row] is None]
+
+        query = np.asarray(query_vector, dtype=np.float32)
+        query_norm = float(np.linalg.norm(query))
+
+        # Igual que _compute_cosine_distance: contra un vector nulo la distancia es 1
+        distances = np.ones(len(rows), dtype=np.float32)
+        if query_norm > 0:
+            valid = norms > 0
+            similarities = vectors @ query
+            distances[valid] = 1.0 - similarities[valid] / (norms[valid] * query_norm)
+
+        # Las filas libres no cuentan
+        if free:
+            distances[free] = np.inf
+
+        k = min(k, len(rows) - len(free))
+        if k == 0:
+            return []
+        if k < len(rows):
+            top = np.argpartition(distances, k - 1)[:k]
+        else:
+            top = np.arange(len(rows))
+        top = top[np.argsort(distances[top], kind="stable")]
+        return [(self.ids[row], float(distances[i])) for i, row in zip(top.tolist(), rows[top].tolist())]
@@ -17,8 +17,12 @@ def parse_query(query):
 
     CREATE_SPATIAL_INDEX ::= "CREATE SPATIAL INDEX" index_name "ON" table_name "(" column_name ")"
 
+    CREATE_INDEX ::= "CREATE INDEX" index_name "ON" table_name "(" column_name ")" ["USING" ("btree" | "hash")]
+
     DROP_TABLE ::= "DROP TABLE" table_name
 
+    VACUUM_INDEX ::= "VACUUM INDEX" ["ON"] table_name ["(" column_name ")"]
+
     SELECT ::= "select" ("*" | column_list) "from" table_name [where_clause] [spatial_clause]
     column_list ::= column_name ("," column_name)*
     where_clause ::= "where" condition
@@ -95,6 +99,21 @@ def parse_query(query):
                 "error_message": None,
             }
 
+        # VACUUM INDEX (compacta los índices invertidos de la tabla)
+        vacuum_index_pattern = r"""
+            VACUUM\s+INDEX\s+(?:ON\s+)?(\w+)(?:\s*\(\s*(\w+)\s*\))?
+            \s*;?$
+        """
+
+        match = re.match(vacuum_index_pattern, query, re.IGNORECASE | re.VERBOSE)
+        if match:
+            return {
+                "type": "VACUUM_INDEX",
+                "table_name": match.group(1),
+                "column_name": match.group(2),
+                "error_message": None,
+            }
+
         # CREATE INVERTED INDEX
         create_inverted_index_pattern = r"""
             CREATE\s+INVERTED\s+INDEX\s+(\w+)\s+ON\s+(\w+)\s*\(\s*(\w+)\s*\)
@@ -134,6 +153,32 @@ def parse_query(query):
         if multimedia_index_query:
             return multimedia_index_query
 
+        # CREATE INDEX (índice secundario B+ Tree o hash)
+        create_index_pattern = r"""
+            CREATE\s+INDEX\s+(\w+)\s+ON\s+(\w+)\s*\(\s*(\w+)\s*\)
+            (?:\s+USING\s+(\w+))?
+            \s*;?$
+        """
+
+        match = re.match(create_index_pattern, query, re.IGNORECASE | re.VERBOSE)
+        if match:
+            using = (match.group(4) or "btree").lower()
+            index_type = index_map.get(using)
+            if index_type not in ("bplus_tree", "extendible_hash"):
+                return {
+                    "type": "CREATE_INDEX",
+                    "error_message": f"Tipo de índice secundario no soportado: {using} (use btree o hash)",
+                    "error_location": "USING clause",
+                }
+            return {
+                "type": "CREATE_INDEX",
+                "index_name": match.group(1),
+                "table_name": match.group(2),
+                "column_name": match.group(3),
+                "index_type": index_type,
+                "error_message": None,
+            }
+
         # CREATE TABLE con definición completa de columnas (incluyendo tipos espaciales)
         create_table_pattern = r"""
             CREATE\s+TABLE\s+(\w+)\s*\(
@@ -157,6 +202,7 @@ def parse_query(query):
             primary_key_found = None
             table_index_type = index_type
             spatial_columns = []
+            secondary_indexes = {}
 
             # Dividir por comas, pero respetando paréntesis en VARCHAR y geometrías
             column_defs = []
@@ -214,6 +260,11 @@ def parse_query(query):
                             table_index_type = index_map.get(
                                 table_index_type, "sequential"
                             )
+                    elif col_index_type:
+                        # INDEX en una columna que no es KEY: índice secundario
+                        secondary_type = index_map.get(col_index_type.lower())
+                        if secondary_type in ("bplus_tree", "extendible_hash"):
+                            secondary_indexes[col_name] = secondary_type
 
                     # Si tiene SPATIAL INDEX o es un tipo espacial, agregarlo a spatial_columns
                     if is_spatial_index or data_type in [
@@ -252,6 +303,11 @@ def parse_query(query):
                 "primary_key": primary_key,
                 "index_type": table_index_type,
                 "spatial_columns": spatial_columns,
+                "secondary_indexes": {
+                    col: idx_type
+                    for col, idx_type in secondary_indexes.items()
+                    if col != primary_key
+                },
                 "error_message": None,
             }
 
@@ -364,12 +420,13 @@ def parse_query(query):
     
 def parse_create_multimedia_index(query):
     """
-    Parsea CREATE MULTIMEDIA INDEX idx_name ON table (column) WITH TYPE media_type [METHOD method] [TRAIN FROM 'folder_path']
+    Parsea CREATE MULTIMEDIA INDEX idx_name ON table (column) WITH TYPE media_type [METHOD method] [USING ANN|EXACT] [TRAIN FROM 'folder_path']
     """
     # Patrón extendido para incluir TRAIN FROM
     multimedia_index_pattern = r"""
         CREATE\s+MULTIMEDIA\s+INDEX\s+(\w+)\s+ON\s+(\w+)\s*\(\s*(\w+)\s*\)\s+
-        WITH\s+TYPE\s+(\w+)(?:\s+METHOD\s+(\w+))?(?:\s+TRAIN\s+FROM\s+['"](.*?)['"])?
+        WITH\s+TYPE\s+(\w+)(?:\s+METHOD\s+(\w+))?(?:\s+USING\s+(ANN|EXACT))?
+        (?:\s+TRAIN\s+FROM\s+['"](.*?)['"])?
         \s*;?$
     """
 
@@ -384,7 +441,8 @@ def parse_create_multimedia_index(query):
             "method": (
                 match.group(5).lower() if match.group(5) else "sift"
             ),  # Default method
-            "train_folder": match.group(6) if match.group(6) else None,  # Folder de entrenamiento
+            "ann": bool(match.group(6)) and match.group(6).upper() == "ANN",
+            "train_folder": match.group(7) if match.group(7) else None,  # Folder de entrenamiento
             "error_message": None,
         }
     return None
@@ -393,23 +451,31 @@ def parse_create_multimedia_index(query):
 def parse_similarity_search(where_clause):
     """
     Parsea condiciones de similitud multimedia:
-    - column SIMILAR TO "path" [LIMIT n]
+    - column SIMILAR TO "path" [LIMIT n] [NPROBE n] [EF_SEARCH n]
+
+    NPROBE y EF_SEARCH solo afectan a índices creados con USING ANN.
     """
     # Búsqueda por similitud multimedia
     similarity_pattern = (
-        r'(\w+)\s+SIMILAR\s+TO\s+[\'"]([^\'"]+)[\'"](?:\s+LIMIT\s+(\d+))?$'
+        r'(\w+)\s+SIMILAR\s+TO\s+[\'"]([^\'"]+)[\'"]'
+        r'((?:\s+(?:LIMIT|NPROBE|EF_SEARCH)\s+\d+)*)$'
     )
     match = re.match(similarity_pattern, where_clause, re.IGNORECASE)
     if match:
         column = match.group(1)
         query_file = match.group(2)
-        limit = int(match.group(3)) if match.group(3) else 5
+        options = {
+            name.upper(): int(value)
+            for name, value in re.findall(r'(LIMIT|NPROBE|EF_SEARCH)\s+(\d+)', match.group(3), re.IGNORECASE)
+        }
 
         return {
             "condition_type": "MULTIMEDIA_SIMILARITY",
             "column": column,
             "query_file": query_file,
-            "limit": limit,
+            "limit": options.get("LIMIT", 5),
+            "nprobe": options.get("NPROBE"),
+            "ef_search": options.get("EF_SEARCH"),
             "error_message": None,
         }
     return None
@@ -764,6 +830,8 @@ if __name__ == "__main__":
         );""",
         # CREATE SPATIAL INDEX
         "CREATE SPATIAL INDEX idx_ubicacion ON Restaurantes (ubicacion);",
+        # CREATE INDEX secundario
+        "CREATE INDEX idx_nombre ON Restaurantes (nombre) USING hash;",
         # CREATE TABLE desde archivo
         "create table Restaurantes from file 'C:\\restaurantes.csv' using index isam('id')",
         # SELECT con búsqueda espacial - WITHIN
@@ -2,6 +2,12 @@ import os
 import json
 import struct
 import pickle
+import heapq
+import tempfile
+import time
+import operator
+from HeiderDB.database.file_manager import FileManager, atomic_write_json
+from HeiderDB.database.locks import RWLock
 from HeiderDB.database.indexes.b_plus import BPlusTree
 from HeiderDB.database.indexes.isam_sparse import ISAMSparseIndex
 from HeiderDB.database.indexes.extendible_hash import ExtendibleHash
@@ -9,9 +15,24 @@ from HeiderDB.database.indexes.sequential_file import SequentialFile
 from HeiderDB.database.indexes.r_tree import RTreeIndex
 from HeiderDB.database.indexes.inverted_index import InvertedIndex
 from HeiderDB.database.indexes.multimedia_index import MultimediaIndex
+from HeiderDB.database.indexes.secondary_index import SecondaryBPlusTree, SecondaryHash
 
 
 class Table:
+    COMPARISON_OPERATORS = {
+        "=": operator.eq,
+        "!=": operator.ne,
+        "<": operator.lt,
+        ">": operator.gt,
+        "<=": operator.le,
+        ">=": operator.ge,
+    }
+
+    SECONDARY_INDEX_TYPES = {
+        "bplus_tree": SecondaryBPlusTree,
+        "extendible_hash": SecondaryHash,
+    }
+
     DATA_TYPES = {
         "INT": {"size": 4, "format": "i"},
         "FLOAT": {"size": 8, "format": "d"},
@@ -26,6 +47,10 @@ class Table:
         "AUDIO": {"variable": True, "multimedia": True},
     }
 
+    # Auto-batch para escrituras sueltas (ver set_auto_batch); apagado por defecto
+    AUTO_BATCH_MAX_OPERATIONS = None
+    AUTO_BATCH_MAX_INTERVAL = None
+
     def _get_single_data_pack_string(self, col_type):
         """Returns the pack string for a single data type."""
         if col_type in self.DATA_TYPES:
@@ -76,6 +101,21 @@ class Table:
         self.text_indexes = {}
         self.spatial_indexes = {}
         self.indexes = {}
+        # índices secundarios B+ Tree / hash: columna -> índice
+        self.secondary_indexes = {}
+        # descriptores abiertos de los archivos de datos e índices
+        self.files = FileManager()
+        # estado del modo batch (ver begin_batch)
+        self._batch_depth = 0
+        self._batch_ops = 0
+        self._batch_started = 0.0
+        self._batch_limits = (None, None)
+        self.auto_batch = (self.AUTO_BATCH_MAX_OPERATIONS, self.AUTO_BATCH_MAX_INTERVAL)
+        self._auto_batch_open = False
+        # se pone en True cuando el índice primario reescribe el .dat
+        self._relocated = False
+        # lectores (SELECT) en paralelo, escrituras en exclusiva
+        self.lock = RWLock()
 
         # el pack string es el que se usa para serializar los datos:
         self.pack_string = "".join(
@@ -147,6 +187,7 @@ class Table:
         table._create_spatial_indexes()
         table._create_text_indexes()
         table._create_multimedia_indexes()
+        table._create_secondary_indexes()
 
         return table
 
@@ -227,11 +268,12 @@ class Table:
             "spatial_columns": self.spatial_columns,
             "text_columns": self.text_columns,
             "multimedia_indexes": multimedia_indexes,
+            "secondary_indexes": {
+                column: {"name": index.index_name, "type": index.index_type}
+                for column, index in self.secondary_indexes.items()
+            },
         }
-        with open(self.metadata_path, "w") as f:
-            json.dump(metadata, f, indent=4)
-
-        pass
+        atomic_write_json(self.metadata_path, metadata)
 
     def _load_from_file(self, file_path):
         """
@@ -247,9 +289,260 @@ class Table:
         for record in data:
             self.add(record)
 
+    def bulk_load(self, records, fill_factor=0.9, run_size=100000):
+        """
+        Carga masiva en una tabla vacía con índice B+ Tree.
+
+        Los registros se ordenan por clave primaria con un ordenamiento externo
+        (corridas de run_size registros en archivos temporales + merge), se
+        escriben al .dat en ese orden y el índice se arma de abajo hacia arriba.
+        Para otros índices, o si la tabla ya tiene datos, se usa add() normal.
+
+        Returns:
+            int: Número de registros cargados
+        """
+        if self.record_count > 0 or not hasattr(self.index, "bulk_load"):
+            loaded = 0
+            self.begin_batch(max_operations=run_size)
+            try:
+                for record in records:
+                    try:
+                        self.add(record)
+                        loaded += 1
+                    except Exception as e:
+                        print(f"Error cargando registro: {e}")
+            finally:
+                self.commit_batch()
+            return loaded
+
+        with tempfile.TemporaryDirectory(dir=os.path.dirname(self.data_path)) as tmp_dir:
+            runs = self._sorted_runs(records, run_size, tmp_dir)
+            merged = heapq.merge(*runs, key=lambda entry: entry[0])
+            loaded = self.index.bulk_load(
+                self._write_sorted_records(merged), fill_factor=fill_factor
+            )
+
+        self.record_count = loaded
+
+        for secondary_index in self.secondary_indexes.values():
+            secondary_index.rebuild()
+
+        # Los índices invertidos se arman con SPIMI en una pasada sobre la tabla
+        for text_index in self.text_indexes.values():
+            text_index.rebuild()
+
+        # El resto no soporta carga masiva: se llenan registro a registro
+        if self.spatial_indexes or self.indexes:
+            self.begin_batch()
+            for record in self.index.iter_all():
+                key = record[self.primary_key]
+                for index_group in (self.spatial_indexes, self.indexes):
+                    for column, index in index_group.items():
+                        try:
+                            index.add(record, key)
+                        except Exception as e:
+                            print(f"Error indexando {column} en carga masiva: {e}")
+            self.commit_batch()
+
+        self._save_metadata()
+        return loaded
+
+    def _sorted_runs(self, records, run_size, tmp_dir):
+        """
+        Parte los registros en corridas ordenadas de (clave, bytes del registro).
+        Si todo cabe en una corrida se devuelve en memoria; si no, cada corrida
+        se vuelca a un archivo temporal y se lee en streaming.
+        """
+        runs = []
+        run = []
+        for record in records:
+            try:
+                for col_name in self.columns:
+                    if col_name not in record:
+                        raise ValueError(f"Missing column {col_name} in record")
+                run.append((record[self.primary_key], self._serialize_record(record)))
+            except Exception as e:
+                print(f"Error cargando registro: {e}")
+                continue
+
+            if len(run) >= run_size:
+                run.sort(key=lambda entry: entry[0])
+                runs.append(self._spill_run(run, tmp_dir, len(runs)))
+                run = []
+
+        run.sort(key=lambda entry: entry[0])
+        if not runs:
+            return [iter(run)]
+        if run:
+            runs.append(self._spill_run(run, tmp_dir, len(runs)))
+        return [self._read_run(path) for path in runs]
+
+    def _spill_run(self, run, tmp_dir, run_id):
+        path = os.path.join(tmp_dir, f"run_{run_id}.tmp")
+        with open(path, "wb") as f:
+            for entry in run:
+                pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+        return path
+
+    def _read_run(self, path):
+        with open(path, "rb") as f:
+            while True:
+                try:
+                    yield pickle.load(f)
+                except EOFError:
+                    return
+
+    def _write_sorted_records(self, entries, buffer_size=1 << 20):
+        """
+        Escribe los registros ordenados al .dat en bloques grandes y produce
+        (clave, posición) para el índice. Si una clave se repite se conserva
+        la primera, como haría add().
+        """
+        data_file = self.get_file(self.data_path)
+        data_file.truncate(0)
+        record_size = self._get_record_size()
+
+        buffer = bytearray()
+        written = 0
+        last_key = None
+        duplicates = 0
+        for key, record_data in entries:
+            if written and key == last_key:
+                duplicates += 1
+                continue
+            position = written * record_size
+            buffer += record_data
+            written += 1
+            last_key = key
+            if len(buffer) >= buffer_size:
+                data_file.append(bytes(buffer))
+                buffer.clear()
+            yield key, position
+
+        if buffer:
+            data_file.append(bytes(buffer))
+        if duplicates:
+            print(f"Carga masiva: {duplicates} registros con clave duplicada omitidos")
+
     def _get_record_size(self):
         return struct.calcsize(self.pack_string)
 
+    def get_file(self, path):
+        """Devuelve el descriptor persistente de un archivo de la tabla"""
+        return self.files.get(path)
+
+    def read_record(self, position):
+        """Lee y deserializa el registro que empieza en position (bytes)"""
+        record_data = self.get_file(self.data_path).read_at(
+            position, self._get_record_size()
+        )
+        return self._deserialize_record(record_data)
+
+    def append_record(self, record):
+        """Agrega el registro al archivo de datos y retorna su posición"""
+        return self.get_file(self.data_path).append(self._serialize_record(record))
+
+    def _all_indexes(self):
+        indexes = [self.index] if self.index is not None else []
+        for index_group in (self.spatial_indexes, self.text_indexes, self.indexes, self.secondary_indexes):
+            indexes.extend(index_group.values())
+        return indexes
+
+    def begin_batch(self, max_operations=None, max_interval=None):
+        """
+        Abre un batch de escrituras: los metadatos de la tabla y de sus índices
+        (JSON, diccionario del índice invertido, páginas del B+ Tree) se
+        escriben una sola vez en commit_batch() en lugar de en cada add/remove.
+
+        Con max_operations y/o max_interval (segundos) se hace un checkpoint
+        automático al superar alguno de los dos, así un batch largo que nunca
+        se cierra (por ejemplo, una carga desde el servidor) no pierde todo
+        ante una caída. Los batches se pueden anidar.
+        """
+        self._batch_depth += 1
+        if self._batch_depth > 1:
+            return
+        self._batch_ops = 0
+        self._batch_started = time.time()
+        self._batch_limits = (max_operations, max_interval)
+        for index in self._all_indexes():
+            if hasattr(index, "begin_batch"):
+                index.begin_batch()
+
+    def commit_batch(self):
+        """Cierra el batch y persiste todos los metadatos pendientes"""
+        if self._batch_depth == 0:
+            return
+        self._batch_depth -= 1
+        if self._batch_depth == 1 and self._auto_batch_open:
+            # Un batch explícito dentro del automático se guarda al cerrarse
+            if any(self.auto_batch):
+                self.checkpoint()
+            else:
+                self.commit_batch()
+            return
+        if self._batch_depth > 0:
+            return
+        self._auto_batch_open = False
+        for index in self._all_indexes():
+            if hasattr(index, "end_batch"):
+                index.end_batch()
+        self._save_metadata()
+
+    def in_batch(self):
+        return self._batch_depth > 0
+
+    def checkpoint(self):
+        """Persiste lo pendiente sin cerrar el batch"""
+        for index in self._all_indexes():
+            if hasattr(index, "checkpoint"):
+                index.checkpoint()
+        self._save_metadata()
+        self._batch_ops = 0
+        self._batch_started = time.time()
+
+    def _metadata_changed(self):
+        """Se llama después de cada escritura: guarda ya o lo deja para el batch"""
+        if not self._batch_depth:
+            if not any(self.auto_batch):
+                self._save_metadata()
+                return
+            # La primera escritura suelta abre el batch automático
+            self.begin_batch(*self.auto_batch)
+            self._auto_batch_open = True
+
+        self._batch_ops += 1
+        max_operations, max_interval = self._batch_limits
+        if (max_operations and self._batch_ops >= max_operations) or (
+            max_interval and time.time() - self._batch_started >= max_interval
+        ):
+            self.checkpoint()
+
+    def set_auto_batch(self, max_operations=None, max_interval=None):
+        """
+        Agrupa también las escrituras sueltas (INSERT/DELETE fuera de un
+        begin_batch): la primera abre un batch que se guarda cada
+        max_operations escrituras o cuando pasaron max_interval segundos desde
+        el último guardado (se revisa al escribir), y al cerrar la tabla. Ante
+        una caída se pierden a lo sumo los metadatos de ese tramo. Sin
+        argumentos lo apaga y guarda lo pendiente. Los valores por defecto
+        salen de AUTO_BATCH_MAX_OPERATIONS y AUTO_BATCH_MAX_INTERVAL.
+        """
+        self.auto_batch = (max_operations, max_interval)
+        if self._auto_batch_open:
+            self._batch_limits = self.auto_batch
+            if not any(self.auto_batch) and self._batch_depth == 1:
+                self.commit_batch()
+
+    def close(self):
+        """Escribe lo pendiente de los índices y cierra los archivos abiertos"""
+        while self._batch_depth:
+            self.commit_batch()
+        for index in self._all_indexes():
+            if hasattr(index, "close"):
+                index.close()
+        self.files.close_all()
+
     def search(self, column, value):
         """
         Busca registros por columna y valor.
@@ -263,26 +556,83 @@ class Table:
         """
         if column == self.primary_key:
             return self.index.search(value)
+        elif column in self.secondary_indexes:
+            return self.secondary_indexes[column].search(value)
         else:
             # Full scan para columnas no indexadas
-            results = []
-            all_records = self.get_all()
-            for record in all_records:
-                if record.get(column) == value:
-                    results.append(record)
-            return results
+            return list(self.scan(predicate=(column, "=", value)))
 
     def range_search(self, column, begin_key, end_key):
         if column == self.primary_key:
             return self.index.range_search(begin_key, end_key)
+        elif column in self.secondary_indexes:
+            return self.secondary_indexes[column].range_search(begin_key, end_key)
         else:
             # Full scan for non-indexed columns
-            results = []
-            all_records = self.get_all()
-            for record in all_records:
-                if begin_key <= record[column] <= end_key:
-                    results.append(record)
-            return results
+            return list(self.scan(predicate=lambda record: begin_key <= record[column] <= end_key))
+
+    def filter(self, column, op, value):
+        """
+        Registros que cumplen `column op value` (op: =, !=, <, >, <=, >=).
+
+        Usa el índice primario o secundario de la columna cuando lo hay y
+        recorre toda la tabla si no.
+
+        Returns:
+            list: Registros que cumplen la condición
+        """
+        return list(self.iter_filter(column, op, value))
+
+    def iter_filter(self, column, op, value):
+        """Como filter() pero entrega los registros de a uno"""
+        compare = self.COMPARISON_OPERATORS.get(op)
+        if compare is None:
+            raise ValueError(f"Operador no soportado: {op}")
+
+        if op == "=" and (column == self.primary_key or column in self.secondary_indexes):
+            results = self.search(column, value)
+            if not isinstance(results, list):
+                results = [results] if results else []
+            yield from results
+            return
+
+        index = self.secondary_indexes.get(column)
+        if op != "!=" and hasattr(index, "range_positions"):
+            begin_key = value if op in (">", ">=") else None
+            end_key = value if op in ("<", "<=") else None
+            for pos in index.range_positions(begin_key, end_key):
+                record = self.read_record(pos)
+                if compare(record[column], value):
+                    yield record
+            return
+
+        yield from self.scan(predicate=(column, op, value))
+
+    def scan(self, columns=None, predicate=None):
+        """
+        Recorre la tabla registro por registro, sin cargarla entera en memoria.
+
+        Args:
+            columns (list): Columnas a devolver, None para todas
+            predicate: Función record -> bool o tupla (columna, operador, valor);
+                se evalúa antes de proyectar las columnas
+
+        Yields:
+            dict: Registros que cumplen el predicado
+        """
+        if isinstance(predicate, tuple):
+            column, op, value = predicate
+            compare = self.COMPARISON_OPERATORS.get(op)
+            if compare is None:
+                raise ValueError(f"Operador no soportado: {op}")
+            predicate = lambda record: compare(record.get(column), value)
+
+        for record in self.index.iter_all():
+            if predicate is not None and not predicate(record):
+                continue
+            if columns is not None:
+                record = {col: record[col] for col in columns if col in record}
+            yield record
 
     def spatial_search(self, column, point, radius):
         # Specialized search for spatial data - could be enhanced for spatial indices
@@ -340,12 +690,19 @@ class Table:
             except Exception as e:
                 print(f"Warning: Error removing from multimedia index: {e}")
 
+        # Los secundarios guardan la posición: quitarlos antes de que el
+        # primario mueva o marque el registro
+        if self.secondary_indexes:
+            record_pos = self.index.locate(value)
+            for column, secondary_index in self.secondary_indexes.items():
+                secondary_index.delete(existing_record[column], record_pos)
+
         # Remove the record from the primary index
         try:
             result = self.index.remove(value)
             if result:
                 self.record_count -= 1
-                self._save_metadata()
+                self._metadata_changed()
                 return True
             else:
                 return False
@@ -704,7 +1061,15 @@ class Table:
             )
 
         # Add the record to the index
-        self.index.add(record, primary_key_value)
+        self._relocated = False
+        record_pos = self.index.add(record, primary_key_value)
+
+        # Si el índice primario reescribió el .dat ya se reconstruyeron los secundarios
+        if self.secondary_indexes and not self._relocated:
+            if record_pos is None:
+                record_pos = self.index.locate(primary_key_value)
+            for column, secondary_index in self.secondary_indexes.items():
+                secondary_index.insert(record[column], record_pos)
 
         # Serialize the record
         for column, spatial_index in self.spatial_indexes.items():
@@ -731,8 +1096,8 @@ class Table:
         # Update record count
         self.record_count += 1
 
-        # Save metadata
-        self._save_metadata()
+        # Save metadata (diferido si hay un batch abierto)
+        self._metadata_changed()
 
         return True
 
@@ -777,12 +1142,19 @@ class Table:
             except Exception as e:
                 print(f"Warning: Error removing from multimedia index: {e}")
 
+        # Los secundarios guardan la posición: quitarlos antes de que el
+        # primario mueva o marque el registro
+        if self.secondary_indexes:
+            record_pos = self.index.locate(value)
+            for column, secondary_index in self.secondary_indexes.items():
+                secondary_index.delete(existing_record[column], record_pos)
+
         # Remove the record from the primary index
         try:
             result = self.index.remove(value)
             if result:
                 self.record_count -= 1
-                self._save_metadata()
+                self._metadata_changed()
                 return True
             else:
                 return False
@@ -820,6 +1192,44 @@ class Table:
             stats[column] = text_index.get_stats()
         return stats
 
+    def iter_located_records(self):
+        """Pares (posición, registro) de todos los registros según el índice primario"""
+        for position in self.index.iter_positions():
+            yield position, self.read_record(position)
+
+    def _on_record_moved(self, record, old_position, new_position):
+        """El índice primario movió un registro dentro del .dat"""
+        for column, secondary_index in self.secondary_indexes.items():
+            secondary_index.delete(record[column], old_position)
+            secondary_index.insert(record[column], new_position)
+
+    def _on_records_relocated(self):
+        """El índice primario reescribió el .dat: reconstruir los secundarios"""
+        self._relocated = True
+        for secondary_index in self.secondary_indexes.values():
+            secondary_index.rebuild()
+
+    def _new_secondary_index(self, column_name, index_type, index_name=None):
+        return self.SECONDARY_INDEX_TYPES[index_type](
+            table_name=self.name,
+            column_name=column_name,
+            data_path=self.data_path,
+            table_ref=self,
+            page_size=self.page_size,
+            index_name=index_name,
+        )
+
+    def _create_secondary_indexes(self):
+        """Reabre los índices secundarios guardados en la metadata"""
+        secondary_metadata = getattr(self, "metadata", {}).get("secondary_indexes", {})
+        for column_name, index_info in secondary_metadata.items():
+            try:
+                self.secondary_indexes[column_name] = self._new_secondary_index(
+                    column_name, index_info.get("type", "bplus_tree"), index_info.get("name")
+                )
+            except Exception as e:
+                print(f"Error recreating secondary index for {column_name}: {e}")
+
     def create_index(self, column_name, index_type, **opts):
         ALLOWED_TYPES = ["bplus_tree", "extendible_hash", "sequential", "multimedia"]
 
@@ -840,8 +1250,21 @@ class Table:
             # Pasar tanto media_type como method al inicializar
             media_type = opts.get("media_type", "image")
             method = opts.get("method", "sift")
-            idx.initialize(media_type, method)
+            idx.initialize(media_type, method, ann=opts.get("ann"))
             self.indexes[column_name] = idx
             return idx
+        elif index_type in self.SECONDARY_INDEX_TYPES:
+            if column_name == self.primary_key:
+                raise ValueError(f"Column {column_name} is the primary key and is already indexed")
+            if column_name in self.secondary_indexes:
+                raise ValueError(f"Column {column_name} already has a secondary index")
+
+            idx = self._new_secondary_index(column_name, index_type, opts.get("name"))
+            idx.rebuild()
+            if self.in_batch():
+                idx.begin_batch()
+            self.secondary_indexes[column_name] = idx
+            self._save_metadata()
+            return idx
         else:
             raise NotImplementedError(f"Index type {index_type} not implemented yet")
@@ -0,0 +1,168 @@
+import sys
+import json
+import struct
+from array import array
+
+try:
+    import msgpack
+except ImportError:  # sin msgpack solo se ofrece JSON
+    msgpack = None
+
+# Cada mensaje va precedido por su largo en 4 bytes (big endian). Con un
+# máximo de 64 MB el primer byte de un frame es siempre < 4, mientras que una
+# consulta en texto plano empieza con una letra: así el servidor distingue a
+# los clientes viejos que mandan la consulta sin frame.
+HEADER = struct.Struct("!I")
+MAX_FRAME_SIZE = 64 * 1024 * 1024
+
+
+class ProtocolError(Exception):
+    pass
+
+
+def is_framed(first_bytes):
+    """True si los primeros bytes recibidos son el encabezado de un frame"""
+    return bool(first_bytes) and first_bytes[0] < (MAX_FRAME_SIZE >> 24)
+
+
+def send_frame(sock, payload):
+    """Envía payload (bytes o str) como un frame"""
+    if isinstance(payload, str):
+        payload = payload.encode("utf-8")
+    if len(payload) > MAX_FRAME_SIZE:
+        raise ProtocolError(f"Mensaje demasiado grande: {len(payload)} bytes")
+    sock.sendall(HEADER.pack(len(payload)) + payload)
+
+
+def recv_exact(sock, size):
+    """
+    Lee exactamente size bytes. Retorna None si la conexión se cerró antes
+    de recibir el primer byte; si se corta a mitad lanza ProtocolError.
+    """
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+    received = 0
+    while received < size:
+        n = sock.recv_into(view[received:], size - received)
+        if n == 0:
+            if received == 0:
+                return None
+            raise ProtocolError("Conexión cerrada a mitad de un mensaje")
+        received += n
+    return bytes(buffer)
+
+
+def recv_frame(sock):
+    """Recibe un frame completo, o None si el otro lado cerró la conexión"""
+    header = recv_exact(sock, HEADER.size)
+    if header is None:
+        return None
+    (size,) = HEADER.unpack(header)
+    if size > MAX_FRAME_SIZE:
+        raise ProtocolError(f"Mensaje demasiado grande: {size} bytes")
+    if size == 0:
+        return b""
+    payload = recv_exact(sock, size)
+    if payload is None:
+        raise ProtocolError("Conexión cerrada a mitad de un mensaje")
+    return payload
+
+
+# Formatos de respuesta, en orden de preferencia del servidor. "msgpack"
+# manda lo mismo que JSON pero en binario; "columnar" además manda las
+# filas como columnas, con los INT/FLOAT empaquetados en arreglos tipados.
+FORMATS = ("columnar", "msgpack", "json")
+
+# Códigos de array para las columnas numéricas (siempre little endian)
+COLUMN_TYPES = {"i8": "q", "f8": "d"}
+
+
+def available_formats():
+    if msgpack is None:
+        return ["json"]
+    return list(FORMATS)
+
+
+def choose_format(requested):
+    """Primer formato pedido por el cliente que este lado soporta"""
+    supported = available_formats()
+    for fmt in requested or ():
+        if fmt in supported:
+            return fmt
+    return "json"
+
+
+def encode_payload(obj, fmt="json", default=str):
+    """Serializa un mensaje ya limpio (sin bytes de relleno) según el formato"""
+    if fmt == "json":
+        return json.dumps(obj, default=default).encode("utf-8")
+    return msgpack.packb(obj, default=default, use_bin_type=True)
+
+
+def decode_payload(payload, fmt="json"):
+    if fmt == "json":
+        return json.loads(payload.decode("utf-8"))
+    return msgpack.unpackb(payload, raw=False, strict_map_key=False)
+
+
+def _pack_column(values):
+    # array() valida los tipos en C: "q" rechaza floats y "d" rechaza texto
+    # o None, así que se prueba en ese orden sin recorrer la columna antes.
+    # Las columnas BOOLEAN van como lista para no volver como 0/1
+    if values and type(values[0]) is bool:
+        return {"type": "list", "values": values}
+    try:
+        code, packed = "i8", array("q", values)
+    except OverflowError:
+        return {"type": "list", "values": values}
+    except TypeError:
+        try:
+            code, packed = "f8", array("d", values)
+        except TypeError:
+            return {"type": "list", "values": values}
+    if sys.byteorder == "big":
+        packed.byteswap()
+    return {"type": code, "values": packed.tobytes()}
+
+
+def _unpack_column(column):
+    code = COLUMN_TYPES.get(column["type"])
+    if code is None:
+        return column["values"]
+    values = array(code)
+    values.frombytes(column["values"])
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values.tolist()
+
+
+def encode_columns(rows):
+    """Pasa una lista de filas (dicts) a un bloque columnar"""
+    columns = list(rows[0]) if rows else []
+    return {
+        "layout": "columnar",
+        "columns": columns,
+        "count": len(rows),
+        "data": [_pack_column([row.get(col) for row in rows]) for col in columns],
+    }
+
+
+def is_row_list(value):
+    return isinstance(value, list) and bool(value) and all(isinstance(row, dict) for row in value)
+
+
+def decode_columns(block):
+    """Columnas de un bloque columnar como {columna: lista de valores}"""
+    return {
+        col: _unpack_column(column)
+        for col, column in zip(block["columns"], block["data"])
+    }
+
+
+def decode_rows(block):
+    """Filas como lista de dicts, vengan como lista o como bloque columnar"""
+    if not (isinstance(block, dict) and block.get("layout") == "columnar"):
+        return block
+    columns = block["columns"]
+    values = [_unpack_column(column) for column in block["data"]]
+    return [dict(zip(columns, row)) for row in zip(*values)]
@@ -4,7 +4,18 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 import socket
 import json
 import argparse
+import inspect
+import queue
+import selectors
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
 from HeiderDB.database.database import Database
+from HeiderDB.protocol import (
+    is_framed, send_frame, recv_frame, ProtocolError,
+    choose_format, encode_payload, encode_columns, is_row_list,
+)
 import nltk
 
 
@@ -34,38 +45,327 @@ def json_serializer(obj):
     return str(obj)
 
 
-def run_server(host='0.0.0.0', port=54321):
-    db = Database()
-    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-        s.bind((host, port))
-        s.listen()
-        print(f"Servidor escuchando en {host}:{port}")
-        while True:
-            conn, addr = s.accept()
-            with conn:
-                data = conn.recv(4096).decode(errors='ignore')
-                if not data:
-                    continue
-                try:
-                    # Detectar si es una solicitud get_len
-                    if data.strip().startswith('get_len(') and data.strip().endswith(')'):
-                        # Extraer el nombre de la tabla de get_len(table_name)
-                        table_name = data.strip()[8:-1].strip().strip('"').strip("'")
-                        count = db.get_record_count(table_name)
-                        if count is not None:
-                            result = (count, None)
-                        else:
-                            result = (None, f"Tabla '{table_name}' no encontrada")
+BUSY_MESSAGE = {"status": "error", "message": "Servidor ocupado, intente de nuevo"}
+
+
+# Filas por frame cuando el cliente no pide otro tamaño
+DEFAULT_FETCH_SIZE = 500
+
+
+def get_len(db, data):
+    """Resultado de una solicitud get_len(tabla), o None si data no lo es"""
+    data = data.strip()
+    if not (data.startswith('get_len(') and data.endswith(')')):
+        return None
+    # Extraer el nombre de la tabla de get_len(table_name)
+    table_name = data[8:-1].strip().strip('"').strip("'")
+    with db.table_locked(table_name):
+        count = db.get_record_count(table_name)
+    if count is not None:
+        return (count, None)
+    return (None, f"Tabla '{table_name}' no encontrada")
+
+
+def clean_rows(rows):
+    """
+    convert_bytes_to_string para una lista de filas planas: solo toca las
+    columnas que vienen como bytes (se miran en la primera fila), así las
+    filas numéricas pasan sin copiarse
+    """
+    if not rows:
+        return rows
+    byte_columns = [key for key, value in rows[0].items() if type(value) is bytes]
+    if not byte_columns:
+        return rows
+    cleaned = []
+    for row in rows:
+        row = dict(row)
+        for key in byte_columns:
+            value = row[key]
+            if type(value) is bytes:
+                row[key] = value.decode('utf-8', errors='ignore').rstrip('\x00')
+        cleaned.append(row)
+    return cleaned
+
+
+def encode_rows(rows, fmt="json"):
+    rows = clean_rows(rows)
+    return encode_columns(rows) if fmt == "columnar" else rows
+
+
+def encode_response(message, fmt="json"):
+    """
+    Serializa una respuesta en el formato de la conexión. Si el resultado
+    es una lista de filas se limpia fila por fila (y en formato columnar
+    se manda por columnas); lo demás pasa por convert_bytes_to_string.
+    """
+    result = message.get("result")
+    if isinstance(result, (list, tuple)) and len(result) == 2 and is_row_list(result[0]):
+        message = dict(message, result=[encode_rows(result[0], fmt), convert_bytes_to_string(result[1])])
+    else:
+        message = convert_bytes_to_string(message)
+    return encode_payload(message, fmt, default=json_serializer)
+
+
+def handle_request(db, data, fmt="json"):
+    """
+    Ejecuta una solicitud (consulta SQL o get_len(tabla)) y arma la
+    respuesta en el formato pedido (JSON por defecto)
+    """
+    try:
+        result = get_len(db, data)
+        if result is None:
+            # Ejecutar consulta SQL normal
+            result = db.execute_query(data)
+        return encode_response({"status": "ok", "result": result}, fmt)
+    except Exception as e:
+        return encode_payload({"status": "error", "message": str(e)}, fmt)
+
+
+def stream_request(db, conn, query, fetch_size=DEFAULT_FETCH_SIZE, fmt="json"):
+    """
+    Ejecuta la consulta como cursor: las filas de un SELECT salen en frames
+    {"rows": [...]} de a fetch_size, y al final va un frame con "done": true
+    (y "result" si la consulta no devuelve filas). El primer frame sale
+    apenas el scan produce fetch_size filas y el resto se copia con los
+    locks tomados (ver Database.execute_query_iter), así que un cliente que
+    lee lento no bloquea la tabla; sendall se bloquea si el cliente no lee,
+    y la memoria queda acotada en ambos lados.
+    """
+    try:
+        result = get_len(db, query)
+        if result is None:
+            result = db.execute_query_iter(query, first_rows=fetch_size)
+    except Exception as e:
+        send_frame(conn, encode_payload({"status": "error", "message": str(e), "done": True}, fmt))
+        return
+
+    rows, error = result
+    if error is not None or not inspect.isgenerator(rows):
+        send_frame(conn, encode_response({"status": "ok", "result": result, "done": True}, fmt))
+        return
+
+    final = {"status": "ok", "done": True}
+    try:
+        for chunk in iter(lambda: list(islice(rows, fetch_size)), []):
+            send_frame(conn, encode_payload({"rows": encode_rows(chunk, fmt)}, fmt, default=json_serializer))
+    except (OSError, ProtocolError):
+        raise
+    except Exception as e:
+        final = {"status": "error", "message": str(e), "done": True}
+    finally:
+        # Libera la copia del resultado aunque el cliente se haya ido
+        rows.close()
+    send_frame(conn, encode_payload(final, fmt))
+
+
+def handle_framed(db, conn, payload, fmt="json"):
+    """
+    Atiende un frame y retorna el formato de respuesta de la conexión.
+
+    El frame puede ser texto SQL (respuesta en un solo frame) o un pedido
+    JSON: {"hello": true, "formats": [...]} para negociar el formato, o
+    {"query": ..., "cursor": true, "fetch_size": n} para un cursor.
+    """
+    data = payload.decode(errors='ignore')
+    if data.lstrip().startswith('{'):
+        try:
+            request = json.loads(data)
+        except ValueError as e:
+            send_frame(conn, encode_payload({"status": "error", "message": f"Pedido inválido: {e}", "done": True}, fmt))
+            return fmt
+        if request.get("hello"):
+            # La respuesta al saludo siempre va en JSON
+            fmt = choose_format(request.get("formats"))
+            send_frame(conn, json.dumps({"status": "ok", "format": fmt}))
+            return fmt
+        if request.get("cursor"):
+            fetch_size = max(1, int(request.get("fetch_size") or DEFAULT_FETCH_SIZE))
+            stream_request(db, conn, request.get("query", ""), fetch_size, fmt)
+            return fmt
+        data = request.get("query", "")
+    send_frame(conn, handle_request(db, data, fmt))
+    return fmt
+
+
+class HeiderServer:
+    """
+    Servidor con conexiones persistentes y un pool de hilos.
+
+    Cada mensaje es un frame (ver HeiderDB/protocol.py) y una conexión puede
+    mandar muchas consultas. El hilo principal espera con un selector a que
+    alguna conexión tenga una consulta lista y recién ahí la pasa al pool,
+    así las conexiones ociosas no ocupan hilos. max_workers consultas corren
+    en paralelo y hasta queue_depth esperan turno; pasado ese límite se
+    responde que el servidor está ocupado y se cierra la conexión.
+
+    Un frame con texto SQL recibe la respuesta completa en un frame; un
+    pedido de cursor recibe las filas por partes (ver stream_request).
+    Los clientes viejos que mandan la consulta en texto plano (sin frame)
+    siguen funcionando: se les responde y se cierra la conexión.
+    """
+
+    def __init__(self, db, host='0.0.0.0', port=54321, max_workers=8, queue_depth=32, idle_timeout=300):
+        self.db = db
+        self.max_workers = max_workers
+        self.queue_depth = queue_depth
+        self.idle_timeout = idle_timeout
+        # cupos = consultas en ejecución + en cola
+        self.slots = threading.BoundedSemaphore(max_workers + queue_depth)
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="heiderdb")
+        self.selector = selectors.DefaultSelector()
+        # conexiones que terminaron su consulta y vuelven al selector
+        self.returned = queue.Queue()
+        self.last_active = {}
+        # formato de respuesta negociado por cada conexión
+        self.formats = {}
+        self.running = False
+
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind((host, port))
+        self.sock.listen(max_workers + queue_depth)
+        self.address = self.sock.getsockname()
+
+        # socketpair para despertar al selector desde los hilos del pool
+        self._wake_r, self._wake_w = socket.socketpair()
+        self._wake_r.setblocking(False)
+
+    def serve_forever(self):
+        self.running = True
+        self.selector.register(self.sock, selectors.EVENT_READ, "accept")
+        self.selector.register(self._wake_r, selectors.EVENT_READ, "wake")
+        try:
+            while self.running:
+                for key, _ in self.selector.select(timeout=1.0):
+                    if key.data == "accept":
+                        self._accept()
+                    elif key.data == "wake":
+                        self._drain_wakeups()
                     else:
-                        # Ejecutar consulta SQL normal
-                        result = db.execute_query(data)
-                    
-                    # Convertir bytes a string antes de serializar
-                    clean_result = convert_bytes_to_string(result)
-                    response = json.dumps({"status": "ok", "result": clean_result}, default=json_serializer)
-                except Exception as e:
-                    response = json.dumps({"status": "error", "message": str(e)})
-                conn.sendall(response.encode())
+                        self._dispatch(key.fileobj)
+                self._register_returned()
+                self._close_idle()
+        finally:
+            self._cleanup()
+
+    def shutdown(self):
+        self.running = False
+        self._wake()
+
+    def _accept(self):
+        conn, addr = self.sock.accept()
+        self._watch(conn)
+
+    def _watch(self, conn):
+        self.last_active[conn] = time.monotonic()
+        self.selector.register(conn, selectors.EVENT_READ, "conn")
+
+    def _dispatch(self, conn):
+        """La conexión tiene una consulta: pasarla al pool si hay cupo"""
+        self.selector.unregister(conn)
+        self.last_active.pop(conn, None)
+        try:
+            framed = is_framed(conn.recv(1, socket.MSG_PEEK))
+        except OSError:
+            framed = False
+        if not self.slots.acquire(blocking=False):
+            self._reply_busy(conn, framed)
+            return
+        self.pool.submit(self._serve_request, conn, framed)
+
+    def _serve_request(self, conn, framed):
+        """Atiende una consulta en un hilo del pool"""
+        keep = False
+        try:
+            if framed:
+                conn.settimeout(self.idle_timeout)
+                payload = recv_frame(conn)
+                if payload is not None:
+                    fmt = self.formats.get(conn, "json")
+                    self.formats[conn] = handle_framed(self.db, conn, payload, fmt)
+                    keep = True
+            else:
+                data = conn.recv(4096).decode(errors='ignore')
+                if data:
+                    conn.sendall(handle_request(self.db, data))
+        except (OSError, ProtocolError) as e:
+            print(f"Error atendiendo conexión: {e}")
+        finally:
+            self.slots.release()
+            if keep and self.running:
+                self.returned.put(conn)
+                self._wake()
+            else:
+                self._close(conn)
+
+    def _reply_busy(self, conn, framed):
+        try:
+            if framed:
+                send_frame(conn, encode_payload(BUSY_MESSAGE, self.formats.get(conn, "json")))
+            else:
+                conn.sendall(encode_payload(BUSY_MESSAGE))
+        except OSError:
+            pass
+        self._close(conn)
+
+    def _close(self, conn):
+        self.formats.pop(conn, None)
+        conn.close()
+
+    def _wake(self):
+        try:
+            self._wake_w.send(b"\0")
+        except OSError:
+            pass
+
+    def _drain_wakeups(self):
+        try:
+            while self._wake_r.recv(1024):
+                pass
+        except (BlockingIOError, OSError):
+            pass
+
+    def _register_returned(self):
+        while True:
+            try:
+                conn = self.returned.get_nowait()
+            except queue.Empty:
+                return
+            conn.settimeout(None)
+            self._watch(conn)
+
+    def _close_idle(self):
+        now = time.monotonic()
+        for conn, last in list(self.last_active.items()):
+            if now - last > self.idle_timeout:
+                self.selector.unregister(conn)
+                del self.last_active[conn]
+                self._close(conn)
+
+    def _cleanup(self):
+        # Esperar las consultas en curso antes de cerrar las conexiones
+        self.pool.shutdown(wait=True)
+        self._register_returned()
+        for conn in list(self.last_active):
+            self._close(conn)
+        self.last_active.clear()
+        self.selector.close()
+        self.sock.close()
+        self._wake_r.close()
+        self._wake_w.close()
+
+
+def run_server(host='0.0.0.0', port=54321, max_workers=8, queue_depth=32, idle_timeout=300, data_dir="./data",
+               extraction_workers=None):
+    db = Database(data_dir=data_dir, extraction_workers=extraction_workers)
+    server = HeiderServer(db, host, port, max_workers, queue_depth, idle_timeout)
+    print(f"Servidor escuchando en {host}:{port} ({max_workers} hilos, cola de {queue_depth})")
+    try:
+        server.serve_forever()
+    finally:
+        # Bajar páginas sucias y cerrar archivos de todas las tablas
+        db.close()
 
 if __name__ == "__main__":
     nltk.download('punkt_tab')
@@ -73,6 +373,18 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Servidor HeiderDB")
     parser.add_argument("--host", default="0.0.0.0", help="Host para escuchar")
     parser.add_argument("--port", type=int, default=54321, help="Puerto para escuchar")
+    parser.add_argument("--workers", type=int, default=8, help="Consultas atendidas en paralelo")
+    parser.add_argument("--queue-depth", type=int, default=32, help="Consultas que pueden esperar turno")
+    parser.add_argument("--idle-timeout", type=int, default=300, help="Segundos antes de cerrar una conexión ociosa")
+    parser.add_argument("--extraction-workers", type=int, default=None,
+                        help="Procesos para extraer características multimedia (por defecto uno por CPU)")
     args = parser.parse_args()
 
-    run_server(host=args.host, port=args.port)
+    run_server(
+        host=args.host,
+        port=args.port,
+        max_workers=args.workers,
+        queue_depth=args.queue_depth,
+        idle_timeout=args.idle_timeout,
+        extraction_workers=args.extraction_workers,
+    )
@@ -0,0 +1,137 @@
+import os
+import sys
+import tempfile
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from HeiderDB.database.indexes.ann_index import IVFPQIndex
+from HeiderDB.database.indexes.vector_index import VectorIndex
+from HeiderDB.database.parser import parse_query
+from HeiderDB.test.test_vector_matrix import make_index, index_files_on_disk
+
+
+def clustered(rng, n, dim, groups=20):
+    centers = rng.random((groups, dim)).astype(np.float32) * 4
+    return centers[rng.integers(0, groups, n)] + rng.random((n, dim)).astype(np.float32)
+
+
+def exact_top(data, query, k):
+    normalized = data / np.linalg.norm(data, axis=1, keepdims=True)
+    return set(np.argsort(-(normalized @ (query / np.linalg.norm(query))))[:k].tolist())
+
+
+def test_ivfpq_recall_and_persistence():
+    rng = np.random.default_rng(10)
+    data = clustered(rng, 3000, 32)
+    with tempfile.TemporaryDirectory() as tmp:
+        ann = IVFPQIndex(os.path.join(tmp, "vec_ann"), 32)
+        ann.train(data, nlist=32, m=8)
+        ann.add(np.arange(len(data)), data)
+
+        # Recall de los candidatos que después se reordenan con la distancia exacta
+        queries = clustered(rng, 20, 32)
+
+        def recall(nprobe, candidates):
+            return np.mean([
+                len(set(ann.search(q, nprobe, candidates).tolist()) & exact_top(data, q, 10)) / 10
+                for q in queries
+            ])
+
+        assert recall(8, 100) >= 0.9
+        assert recall(32, 3000) == 1.0
+
+        # Reescribir una fila deja solo su código nuevo
+        ann.add([5], data[6:7])
+        assert (ann.search(data[6], nprobe=32, candidates=3000) == 5).sum() == 1
+
+        reopened = IVFPQIndex(os.path.join(tmp, "vec_ann"), 32)
+        assert reopened.nlist == 32 and reopened.m == 8 and len(reopened) == 3001
+        assert np.array_equal(reopened.search(queries[0], 8, 50), ann.search(queries[0], 8, 50))
+
+
+def test_vector_index_search_ann():
+    rng = np.random.default_rng(11)
+    with tempfile.TemporaryDirectory() as tmp:
+        vi = make_index(tmp, num_clusters=32)
+        vi = VectorIndex(vi.index_file, vi.metadata_file, page_size=16, cache_size=4, ann=True)
+        vi.ANN_MIN_VECTORS = 200
+        for i in range(400):
+            vi.add_vectors(i + 1, list(rng.random((20, 8)).astype(np.float32)), save_metadata=False)
+
+        query = list(rng.random((20, 8)).astype(np.float32))
+        exact = vi.search_knn(query, 10)
+        approx = vi.search_ann(query, 10, nprobe=64, ef_search=400)
+        assert vi.ann.trained
+        # Con todas las celdas y todos los candidatos el reordenamiento es exacto
+        assert np.allclose([d for _, d in approx], [d for _, d in exact], atol=1e-5)
+
+        # Los vectores nuevos se codifican al insertarlos y los borrados no aparecen
+        vi.add_vectors("nuevo", query)
+        assert vi.search_ann(query, 1, nprobe=64)[0][0] == "nuevo"
+        best = vi.search_ann(query, 1, nprobe=64)[0][0]
+        assert vi.remove_vector(best)
+        assert best not in [doc_id for doc_id, _ in vi.search_ann(query, 10, nprobe=64)]
+        vi.save()
+
+        reopened = VectorIndex(vi.index_file, vi.metadata_file, page_size=16, cache_size=4)
+        assert reopened.ann_enabled and reopened.ann.trained
+        assert reopened.search_ann(query, 5, nprobe=64, ef_search=400) == vi.search_ann(query, 5, nprobe=64, ef_search=400)
+
+
+def test_ann_is_built_on_insert_and_swapped_in():
+    rng = np.random.default_rng(12)
+    with tempfile.TemporaryDirectory() as tmp:
+        vi = make_index(tmp, num_clusters=32)
+        vi = VectorIndex(vi.index_file, vi.metadata_file, page_size=16, cache_size=4, ann=True)
+        for i in range(150):
+            vi.add_vectors(i + 1, list(rng.random((20, 8)).astype(np.float32)), save_metadata=False)
+        query = list(rng.random((20, 8)).astype(np.float32))
+
+        # Una búsqueda no entrena: responde exacto hasta la próxima inserción
+        vi.ANN_MIN_VECTORS = 100
+        assert vi.search_ann(query, 5) == vi.search_knn(query, 5)
+        assert not vi.ann.trained
+        vi.add_vectors(151, list(rng.random((20, 8)).astype(np.float32)))
+        assert vi.ann.trained
+
+        # Las búsquedas durante un build_ann siguen con el índice anterior
+        old = vi.ann
+        expected = vi.search_ann(query, 5, nprobe=64, ef_search=400)
+        seen = []
+        original_add = IVFPQIndex.add
+
+        def add_and_search(ann, rows, vectors):
+            original_add(ann, rows, vectors)
+            seen.append((vi.ann is old, vi.search_ann(query, 5, nprobe=64, ef_search=400)))
+
+        IVFPQIndex.add = add_and_search
+        try:
+            assert vi.build_ann(nlist=8)
+        finally:
+            IVFPQIndex.add = original_add
+        assert seen and all(same and found == expected for same, found in seen)
+        assert vi.ann is not old and vi.ann.nlist == 8 and len(vi.ann) == 151
+        vi.save()
+
+        reopened = VectorIndex(vi.index_file, vi.metadata_file, page_size=16, cache_size=4)
+        assert reopened.ann.nlist == 8 and len(reopened.ann) == 151
+        assert not os.path.exists(f"{vi.ann_prefix}_build.npz")
+
+        # DROP TABLE borra también los cuantizadores y códigos
+        with open(f"{vi.ann_prefix}_build_codes.u8", "wb") as f:
+            f.write(b"resto")
+        assert os.path.exists(f"{vi.ann_prefix}.npz")
+        assert index_files_on_disk(tmp) <= set(reopened.files())
+
+
+def test_parser_ann_options():
+    parsed = parse_query("CREATE MULTIMEDIA INDEX idx ON fotos (img) WITH TYPE image METHOD sift USING ANN")
+    assert parsed["type"] == "CREATE_MULTIMEDIA_INDEX" and parsed["ann"] is True
+    parsed = parse_query("CREATE MULTIMEDIA INDEX idx ON fotos (img) WITH TYPE image TRAIN FROM 'datos/'")
+    assert parsed["ann"] is False and parsed["train_folder"] == "datos/"
+
+    parsed = parse_query("SELECT * FROM fotos WHERE img SIMILAR TO 'q.jpg' LIMIT 3 NPROBE 16 EF_SEARCH 128")
+    assert (parsed["limit"], parsed["nprobe"], parsed["ef_search"]) == (3, 16, 128)
+    parsed = parse_query("SELECT * FROM fotos WHERE img SIMILAR TO 'q.jpg'")
+    assert (parsed["limit"], parsed["nprobe"], parsed["ef_search"]) == (5, None, None)
@@ -0,0 +1,106 @@
+import os
+import sys
+import json
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from HeiderDB.database.table import Table
+
+
+def _read_json(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def test_batch_defers_metadata_until_commit():
+    with tempfile.TemporaryDirectory() as data_dir:
+        for index_type in ["bplus_tree", "sequential", "isam_sparse"]:
+            table = Table(
+                name=f"lote_{index_type}",
+                columns={"id": "INT", "name": "VARCHAR(10)"},
+                primary_key="id",
+                page_size=128,
+                index_type=index_type,
+                data_dir=data_dir,
+            )
+            table.begin_batch()
+            for i in range(1, 51):
+                table.add({"id": i, "name": f"n{i}"})
+
+            # Dentro del batch el JSON de la tabla sigue como al crearla
+            assert _read_json(table.metadata_path)["record_count"] == 0
+            assert table.search("id", 42)["name"] == "n42"
+
+            table.commit_batch()
+            assert _read_json(table.metadata_path)["record_count"] == 50
+
+            reopened = Table.from_table_name(f"lote_{index_type}", 128, data_dir=data_dir)
+            assert sorted(r["id"] for r in reopened.get_all()) == list(range(1, 51))
+            table.close()
+            reopened.close()
+
+
+def test_batch_checkpoints_after_max_operations():
+    with tempfile.TemporaryDirectory() as data_dir:
+        table = Table(
+            name="auto",
+            columns={"id": "INT", "name": "VARCHAR(10)"},
+            primary_key="id",
+            page_size=128,
+            index_type="bplus_tree",
+            data_dir=data_dir,
+        )
+        table.begin_batch(max_operations=20)
+        for i in range(45):
+            table.add({"id": i, "name": f"n{i}"})
+        assert _read_json(table.metadata_path)["record_count"] == 40
+
+        # close() confirma el batch abierto
+        table.close()
+        assert _read_json(table.metadata_path)["record_count"] == 45
+        assert not os.path.exists(table.metadata_path + ".tmp")
+
+
+def test_auto_batch_groups_plain_writes():
+    with tempfile.TemporaryDirectory() as data_dir:
+        table = Table(
+            name="suelta",
+            columns={"id": "INT", "name": "VARCHAR(10)"},
+            primary_key="id",
+            page_size=128,
+            index_type="bplus_tree",
+            data_dir=data_dir,
+        )
+        # Apagado por defecto: cada escritura guarda el JSON
+        table.add({"id": 0, "name": "n0"})
+        assert _read_json(table.metadata_path)["record_count"] == 1
+
+        table.set_auto_batch(max_operations=20)
+        for i in range(1, 46):
+            table.add({"id": i, "name": f"n{i}"})
+        assert table.in_batch()
+        assert _read_json(table.metadata_path)["record_count"] == 41
+
+        # Un batch explícito adentro se guarda al confirmarse
+        table.begin_batch()
+        table.add({"id": 46, "name": "n46"})
+        table.commit_batch()
+        assert table.in_batch()
+        assert _read_json(table.metadata_path)["record_count"] == 47
+
+        table.add({"id": 47, "name": "n47"})
+        table.close()
+        assert _read_json(table.metadata_path)["record_count"] == 48
+
+        reopened = Table.from_table_name("suelta", 128, data_dir=data_dir)
+        assert sorted(r["id"] for r in reopened.get_all()) == list(range(48))
+
+        # Apagarlo guarda lo pendiente
+        reopened.set_auto_batch(max_interval=3600)
+        reopened.add({"id": 48, "name": "n48"})
+        assert _read_json(reopened.metadata_path)["record_count"] == 48
+        reopened.set_auto_batch()
+        assert not reopened.in_batch()
+        assert _read_json(reopened.metadata_path)["record_count"] == 49
+        reopened.close()
@@ -0,0 +1,61 @@
+import os
+import sys
+import random
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from HeiderDB.database.buffer_pool import BufferPool
+from HeiderDB.database.table import Table
+
+
+def _make_table(data_dir, key_type):
+    table = Table(
+        name=f"nodos_{key_type[:4].lower()}",
+        columns={"k": key_type, "v": "INT"},
+        primary_key="k",
+        page_size=160,
+        index_type="bplus_tree",
+        data_dir=data_dir,
+    )
+    # pool chico para que los nodos se lean y escriban desde disco seguido
+    table.index.buffer_pool = BufferPool(capacity=4)
+    return table
+
+
+def test_node_roundtrip_keeps_keys_and_children():
+    with tempfile.TemporaryDirectory() as data_dir:
+        for key_type, make_key in [("INT", lambda i: i), ("VARCHAR(12)", lambda i: f"clave{i:05d}")]:
+            index = _make_table(data_dir, key_type).index
+            for is_leaf in (True, False):
+                node = index._load_node(index.root_page_id)
+                node.is_leaf = is_leaf
+                node.keys = [make_key(i) for i in range(3)]
+                node.children = [10, 20, 30] if is_leaf else [10, 20, 30, 40]
+                node.next_leaf = 7 if is_leaf else None
+                index._store_node(node.page_id, node)
+
+                loaded = index._load_node(node.page_id)
+                assert loaded.keys == node.keys
+                assert loaded.children == node.children
+                assert loaded.next_leaf == node.next_leaf
+
+
+def test_search_with_numeric_and_varchar_keys():
+    with tempfile.TemporaryDirectory() as data_dir:
+        for key_type, make_key in [("FLOAT", lambda i: i * 0.5), ("VARCHAR(12)", lambda i: f"clave{i:05d}")]:
+            table = _make_table(data_dir, key_type)
+            ids = list(range(1, 400))
+            random.shuffle(ids)
+            for i in ids:
+                table.add({"k": make_key(i), "v": i})
+
+            assert table.index.height > 2
+            for i in ids[:50]:
+                assert table.search("k", make_key(i))["v"] == i
+            assert table.search("k", make_key(1000)) is None
+            assert [r["v"] for r in table.range_search("k", make_key(100), make_key(110))] == list(range(100, 111))
+
+            for i in ids[:100]:
+                assert table.remove("k", make_key(i))
+            assert [r["v"] for r in table.get_all()] == sorted(ids[100:])
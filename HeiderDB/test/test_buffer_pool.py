@@ -0,0 +1,68 @@
+import os
+import sys
+import random
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from HeiderDB.database.buffer_pool import BufferPool
+from HeiderDB.database.table import Table
+
+
+def test_lru_evicts_least_recently_used_and_writes_back():
+    written = {}
+    pool = BufferPool(capacity=2, policy="lru")
+
+    def writer(page_id, page):
+        written[page_id] = page
+
+    pool.put("f", 1, "a", writer)
+    pool.put("f", 2, "b", writer)
+    pool.get("f", 1, loader=lambda pid: None)  # 1 pasa a ser el más reciente
+    pool.put("f", 3, "c", writer)
+
+    assert written == {2: "b"}
+    assert pool.stats()["pages"] == 2
+    assert pool.get("f", 2, loader=lambda pid: "disk") == "disk"
+
+
+def test_clock_gives_second_chance():
+    pool = BufferPool(capacity=3, policy="clock")
+    for page_id in range(3):
+        pool.get("f", page_id, loader=lambda pid: pid)
+
+    pool.get("f", 4, loader=lambda pid: pid)
+    assert len(pool.frames) == 3
+
+    pool.flush()
+    assert pool.stats()["dirty_pages"] == 0
+
+
+def test_bplus_tree_with_small_pool():
+    with tempfile.TemporaryDirectory() as data_dir:
+        table = Table(
+            name="bp_pool",
+            columns={"id": "INT", "name": "VARCHAR(20)"},
+            primary_key="id",
+            page_size=128,
+            index_type="bplus_tree",
+            data_dir=data_dir,
+        )
+        table.index.buffer_pool = BufferPool(capacity=4, policy="clock")
+
+        ids = list(range(300))
+        random.shuffle(ids)
+        for i in ids:
+            table.add({"id": i, "name": f"n{i}"})
+
+        for i in ids[:100]:
+            table.remove("id", i)
+
+        # Releer desde disco con un pool vacío
+        reopened = Table.from_table_name("bp_pool", 128, data_dir=data_dir)
+        reopened.index.buffer_pool = BufferPool(capacity=8)
+
+        remaining = sorted(ids[100:])
+        assert [r["id"] for r in reopened.get_all()] == remaining
+        assert reopened.search("id", remaining[0])["name"] == f"n{remaining[0]}"
+        assert reopened.search("id", ids[0]) is None
@@ -0,0 +1,64 @@
+import os
+import sys
+import csv
+import random
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from HeiderDB.database.database import Database
+from HeiderDB.database.table import Table
+
+
+def test_bulk_load_with_external_sort():
+    with tempfile.TemporaryDirectory() as data_dir:
+        table = Table(
+            name="bulk",
+            columns={"id": "INT", "name": "VARCHAR(12)"},
+            primary_key="id",
+            page_size=128,
+            index_type="bplus_tree",
+            data_dir=data_dir,
+        )
+        ids = list(range(2000))
+        random.shuffle(ids)
+        records = [{"id": i, "name": f"n{i}"} for i in ids]
+        records.append({"id": 7, "name": "repetido"})
+
+        # run_size pequeño para forzar corridas en disco
+        loaded = table.bulk_load(iter(records), fill_factor=0.7, run_size=300)
+
+        assert loaded == 2000
+        assert table.get_record_count() == 2000
+        assert [r["id"] for r in table.get_all()] == list(range(2000))
+        assert table.search("id", 7)["name"] == "n7"
+        assert [r["id"] for r in table.range_search("id", 995, 1004)] == list(range(995, 1005))
+
+        # El árbol cargado sigue aceptando inserciones y borrados normales
+        table.add({"id": 5000, "name": "nuevo"})
+        for i in range(0, 2000, 3):
+            assert table.remove("id", i)
+        expected = [i for i in range(2000) if i % 3] + [5000]
+        assert [r["id"] for r in table.get_all()] == expected
+
+
+def test_create_table_from_csv_uses_bulk_load():
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, "datos.csv")
+        ids = list(range(1, 501))
+        random.shuffle(ids)
+        with open(csv_path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["id", "ciudad", "valor"])
+            for i in ids:
+                writer.writerow([i, f"ciudad{i}", i * 1.5])
+
+        db = Database(data_dir=os.path.join(tmp, "data"))
+        ok, msg = db.create_table_from_file("ciudades", csv_path, index_type="bplus_tree", primary_key="id")
+        assert ok, msg
+
+        table = db.get_table("ciudades")
+        assert table.get_record_count() == 500
+        assert table.search("id", 250)["ciudad"] == "ciudad250"
+        assert [r["id"] for r in table.get_all()] == list(range(1, 501))
+        db.close()
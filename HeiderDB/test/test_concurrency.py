@@ -0,0 +1,85 @@
+import os
+import sys
+import json
+import time
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from HeiderDB.database.database import Database
+from HeiderDB.database.locks import RWLock
+
+
+def test_rwlock_readers_share_writer_excludes():
+    lock = RWLock()
+    inside = []
+    max_readers = [0]
+    guard = threading.Lock()
+
+    def reader():
+        with lock.read_locked():
+            with guard:
+                inside.append("r")
+                max_readers[0] = max(max_readers[0], inside.count("r"))
+            time.sleep(0.05)
+            with guard:
+                inside.remove("r")
+
+    def writer():
+        with lock.write_locked():
+            with guard:
+                assert inside == []
+                inside.append("w")
+            time.sleep(0.02)
+            with guard:
+                inside.remove("w")
+
+    threads = [threading.Thread(target=reader) for _ in range(4)]
+    threads += [threading.Thread(target=writer) for _ in range(2)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert max_readers[0] > 1
+    assert inside == []
+
+
+def test_concurrent_queries():
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(data_dir=tmp)
+        _, err = db.execute_query(
+            "CREATE TABLE t (id INT KEY INDEX bplus_tree, name VARCHAR(10))"
+        )
+        assert not err
+
+        def insert(i):
+            return db.execute_query(f"INSERT INTO t VALUES ({i}, 'n{i}')")
+
+        def select(i):
+            return db.execute_query(f"SELECT * FROM t WHERE id = {i}")
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(insert, range(1, 201)))
+            assert all(err is None for _, err in results)
+            found = list(pool.map(select, range(1, 201)))
+
+        assert all(rows == [{"id": i, "name": f"n{i}"}] for i, (rows, _) in zip(range(1, 201), found))
+        assert db.get_record_count("t") == 200
+        db.close()
+
+
+def test_handle_request():
+    from HeiderDB.server import handle_request
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(data_dir=tmp)
+        db.create_table("t", {"id": "INT", "name": "VARCHAR(10)"}, "id", index_type="bplus_tree")
+        db.execute_query("INSERT INTO t VALUES (1, 'uno')")
+
+        assert json.loads(handle_request(db, "get_len(t)"))["result"] == [1, None]
+        response = json.loads(handle_request(db, "SELECT * FROM t"))
+        assert response["result"][0] == [{"id": 1, "name": "uno"}]
+        db.close()
@@ -0,0 +1,123 @@
+import os
+import sys
+import tempfile
+import threading
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from HeiderDB.database.indexes.descriptor_cache import DescriptorCache
+from HeiderDB.database.indexes.multimedia_index import MultimediaIndex
+from HeiderDB.test.test_extraction_pool import ContentExtractor
+
+
+class CountingExtractor(ContentExtractor):
+    def __init__(self):
+        self.method = "prueba"
+        self.extracted = []  # no es un parámetro simple, no entra en la firma
+
+    @property
+    def calls(self):
+        return len(self.extracted)
+
+    def extract(self, path):
+        self.extracted.append(path)
+        return super().extract(path)
+
+
+def test_cache_evicts_least_recently_used():
+    with tempfile.TemporaryDirectory() as tmp:
+        entry = np.ones((10, 4), dtype=np.float32)
+        cache = DescriptorCache(tmp, max_bytes=10 ** 6)
+        for name in "abc":
+            cache.put(name, entry)
+        size = cache.entries["a"]
+        assert np.array_equal(cache.get("a"), entry)
+
+        # Con espacio para dos entradas se va la menos usada ("b")
+        cache.max_bytes = 2 * size
+        cache.put("d", entry)
+        assert "b" not in cache and "c" not in cache
+        assert "a" in cache and "d" in cache
+        assert cache.get("b") is None
+
+        reopened = DescriptorCache(tmp, max_bytes=2 * size)
+        assert set(reopened.entries) == {"a", "d"} and reopened.total_bytes == 2 * size
+
+        extractor = CountingExtractor()
+        key = cache.key("hash", extractor)
+        extractor.method = "otro"
+        assert cache.key("hash", extractor) != key
+
+
+def test_multimedia_index_skips_cached_extraction():
+    with tempfile.TemporaryDirectory() as tmp:
+        files = []
+        for i in range(6):
+            path = os.path.join(tmp, f"img_{i}.jpg")
+            with open(path, "wb") as f:
+                f.write(f"imagen {i % 4}".encode())  # img_4 y img_5 repiten contenido
+            files.append(path)
+
+        index = MultimediaIndex("fotos", "img", os.path.join(tmp, "data", "fotos.dat"), None, 16)
+        index.initialize(media_type="image", method="sift")
+        extractor = CountingExtractor()
+        index.feature_extractor = extractor
+        index.extraction_workers = 1
+        index.vector_index.num_clusters = 4
+        index.vector_index.train_visual_vocabulary(tmp, extractor, workers=1)
+        extractor.extracted.clear()
+
+        assert index.add_many([({"img": path}, i) for i, path in enumerate(files)]) == []
+        assert extractor.calls == 4
+
+        # Volver a indexar, insertar el mismo archivo o repetir la consulta no extrae de nuevo
+        index.rebuild()
+        index.add({"img": files[1]}, 10)
+        first = index.knn_search(files[2], k=3)
+        assert index.knn_search(files[2], k=3) == first
+        assert extractor.calls == 4
+        assert len(first) == 3
+
+        # Un error en la búsqueda llega al que consulta en vez de parecer "sin resultados"
+        def failing(*args, **kwargs):
+            raise RuntimeError("matriz rota")
+
+        index.vector_index.search_knn = failing
+        try:
+            index.knn_search(files[2], k=3)
+            assert False, "se esperaba el error"
+        except RuntimeError as e:
+            assert "matriz rota" in str(e)
+
+
+def test_cache_is_safe_under_concurrent_queries():
+    with tempfile.TemporaryDirectory() as tmp:
+        entry = np.ones((10, 4), dtype=np.float32)
+        cache = DescriptorCache(tmp, max_bytes=10 ** 6)
+        cache.put("x", entry)
+        cache.max_bytes = 5 * cache.entries["x"]
+        errors = []
+
+        def worker(n):
+            try:
+                for i in range(200):
+                    key = f"k{(n + i) % 12}"
+                    found = cache.get(key)
+                    if found is None:
+                        cache.put(key, entry)
+                    else:
+                        assert np.array_equal(found, entry)
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert errors == []
+        on_disk = {name[:-4]: os.path.getsize(os.path.join(tmp, name)) for name in os.listdir(tmp)}
+        assert on_disk == dict(cache.entries)
+        assert cache.total_bytes == sum(on_disk.values()) <= cache.max_bytes
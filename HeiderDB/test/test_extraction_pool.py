@@ -0,0 +1,57 @@
+import os
+import sys
+import pickle
+import tempfile
+import zlib
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from HeiderDB.database.indexes.extraction_pool import ExtractionPool
+from HeiderDB.database.indexes.feature_extractor import ImageExtractor
+
+
+class ContentExtractor:
+    """Descriptores derivados del contenido del archivo (iguales en cualquier proceso)"""
+
+    def extract(self, path):
+        with open(path, "rb") as f:
+            data = f.read()
+        if data == b"roto":
+            raise ValueError("archivo corrupto")
+        if data == b"vacio":
+            return []
+        rng = np.random.default_rng(zlib.crc32(data))
+        return list(rng.random((5, 4)).astype(np.float32))
+
+
+def make_files(tmp, count):
+    paths = []
+    for i in range(count):
+        path = os.path.join(tmp, f"f{i}.jpg")
+        with open(path, "wb") as f:
+            f.write(b"roto" if i == 7 else b"vacio" if i == 11 else f"contenido {i}".encode())
+        paths.append(path)
+    return paths
+
+
+def test_pool_returns_results_in_order():
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = make_files(tmp, 30)
+        serial = list(ExtractionPool(ContentExtractor(), workers=1).map(paths))
+        parallel = list(ExtractionPool(ContentExtractor(), workers=3, chunk_size=2, max_pending=2).map(paths))
+
+        assert [path for path, _, _ in parallel] == paths
+        for (_, expected, expected_error), (_, descriptors, error) in zip(serial, parallel):
+            assert error == expected_error
+            if expected is None:
+                assert descriptors is None
+            else:
+                assert np.array_equal(descriptors, expected)
+        assert "corrupto" in parallel[7][2]
+        assert parallel[11][1] is None and parallel[11][2] is None
+
+
+def test_image_extractor_is_picklable():
+    extractor = pickle.loads(pickle.dumps(ImageExtractor("sift")))
+    assert extractor.method == "sift" and extractor.get_vector_dimension() == 128
@@ -0,0 +1,58 @@
+import os
+import sys
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from HeiderDB.database.file_manager import PagedFile, FileManager
+from HeiderDB.database.database import Database
+
+
+def test_paged_file_positional_io():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "f.dat")
+        f = PagedFile(path)
+        assert f.append(b"abcd") == 0
+        assert f.append(b"efgh") == 4
+        f.write_at(2, b"XY")
+        assert f.read_at(0, 8) == b"abXYefgh"
+        assert f.read_at(6, 10) == b"gh"
+        f.truncate(4)
+        assert f.size() == 4
+        f.close()
+        assert f.closed
+
+
+def test_file_manager_reuses_handles():
+    with tempfile.TemporaryDirectory() as tmp:
+        manager = FileManager()
+        path = os.path.join(tmp, "a.dat")
+        assert manager.get(path) is manager.get(path)
+        manager.close_all()
+        assert manager.files == {}
+
+
+def test_primary_indexes_use_table_handles():
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(data_dir=tmp)
+        for index_type in ["bplus_tree", "extendible_hash", "isam_sparse", "sequential"]:
+            name = f"t_{index_type}"
+            ok, msg = db.create_table(
+                name, {"id": "INT", "name": "VARCHAR(10)"}, "id", index_type=index_type
+            )
+            assert ok, msg
+            table = db.get_table(name)
+            for i in [5, 1, 9, 3, 7]:
+                table.add({"id": i, "name": f"n{i}"})
+
+            assert table.search("id", 9)["name"] == "n9"
+            assert sorted(r["id"] for r in table.range_search("id", 3, 7)) == [3, 5, 7]
+            assert table.remove("id", 3)
+            assert sorted(r["id"] for r in table.get_all()) == [1, 5, 7, 9]
+            assert table.data_path in table.files.files
+
+            ok, msg = db.drop_table(name)
+            assert ok, msg
+            assert table.files.files == {}
+            assert not os.path.exists(table.data_path)
+        db.close()
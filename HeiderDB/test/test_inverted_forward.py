@@ -0,0 +1,98 @@
+import os
+import sys
+import json
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from HeiderDB.database.indexes.inverted_index import InvertedIndex
+from HeiderDB.database.indexes.forward_index import ForwardIndex
+from HeiderDB.test.test_inverted_postings import make_index, reopen, DOCS
+
+
+def test_forward_index_round_trip():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "forward.dat")
+        forward = ForwardIndex(path)
+        forward.append(3, [7, 1, 2])
+        forward.append_many([(0, [5]), (1, [])])
+        forward.discard(0)
+        forward.close()
+
+        reopened = ForwardIndex(path)
+        assert reopened.get(3).tolist() == [7, 1, 2]
+        assert 0 not in reopened and 1 in reopened and 2 not in reopened
+        assert reopened.get(1).tolist() == [] and reopened.get(99).tolist() == []
+
+
+def test_remove_only_reads_the_documents_terms():
+    with tempfile.TemporaryDirectory() as tmp:
+        index, table = make_index(tmp, DOCS)
+        read = []
+        original = index._read_posting_bytes
+        index._read_posting_bytes = lambda term: (read.append(term), original(term))[1]
+
+        assert index.remove(2)  # "green apple"
+        assert read == []
+        assert "green" not in index.dictionary
+        assert index.dictionary["apple"]["df"] == 2
+        # La posting list conserva el ordinal borrado hasta que se reescriba
+        assert len(index._read_posting_list("apple")[0]) == 3
+        assert {d["id"] for d in index.search_term("apple")} == {1, 4}
+        assert {d["id"] for d in index.search_boolean("apple OR car")} == {1, 4, "tres"}
+        assert 2 not in {d["id"] for d in index.search_ranked("green apple", k=10)}
+
+        # Al reescribir la lista se purgan los borrados
+        table.records[5] = {"id": 5, "content": "apple pie"}
+        index.add(table.records[5], 5)
+        ordinals = index._read_posting_list("apple")[0]
+        assert [index.doc_ids[o] for o in ordinals] == [1, 4, 5]
+
+        reopened = reopen(index, table)
+        assert not reopened.deleted[index.doc_ordinals[1]]
+        assert reopened.remove(1)
+        assert {d["id"] for d in reopened.search_term("red")} == {"tres"}
+        assert reopened.dictionary["fruit"]["df"] == 1
+
+
+def test_reindexing_drops_terms_the_document_no_longer_has():
+    with tempfile.TemporaryDirectory() as tmp:
+        index, table = make_index(tmp, DOCS)
+        table.records["tres"]["content"] = "blue bike"
+        index.add(table.records["tres"], "tres")
+        assert index.count() == 4
+        assert index.search_term("car") == []
+        assert "car" not in index.dictionary
+        assert {d["id"] for d in index.search_term("red")} == {1}
+        assert {d["id"] for d in index.search_term("bike")} == {"tres"}
+
+
+def test_format_2_index_gets_a_forward_index():
+    with tempfile.TemporaryDirectory() as tmp:
+        index, table = make_index(tmp, DOCS)
+        # Diccionario y metadatos como los guardaba el formato 2 (sin journal)
+        index._save_index()
+        index.postings_format = 2
+        parts = [len(index.dictionary).to_bytes(4, "big")]
+        for term, data in index.dictionary.items():
+            term_bytes = term.encode()
+            parts += [len(term_bytes).to_bytes(4, "big"), term_bytes,
+                      data["offset"].to_bytes(8, "big"), data["size"].to_bytes(4, "big"), data["df"].to_bytes(4, "big")]
+        with open(index.dictionary_file, "wb") as f:
+            f.write(b"".join(parts))
+        with open(index.metadata_file) as f:
+            metadata = json.load(f)
+        metadata["postings_format"] = 2
+        with open(index.metadata_file, "w") as f:
+            json.dump(metadata, f)
+        index.forward_index.close()
+        os.remove(index.forward_file)
+        os.remove(index.forward_index.offsets_path)
+
+        migrated = reopen(index, table)
+        assert migrated.postings_format == InvertedIndex.POSTINGS_FORMAT
+        terms = {migrated.terms[t] for t in migrated.forward_index.get(migrated.doc_ordinals[4]).tolist()}
+        assert terms == {"fruit", "salad", "with", "apple"}
+        assert migrated.remove(4)
+        assert "salad" not in migrated.dictionary
+        assert {d["id"] for d in reopen(migrated, table).search_term("fruit")} == {1}
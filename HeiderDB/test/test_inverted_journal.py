@@ -0,0 +1,95 @@
+import os
+import sys
+import tempfile
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from HeiderDB.test.test_inverted_postings import make_index, reopen, DOCS
+
+
+def snapshot(index):
+    return (
+        index.doc_ids, index.doc_ordinals, index.dictionary, index.doc_count,
+        index.live_bytes, index.dead_bytes, [t for t in index.terms if t is not None],
+        index.deleted[:len(index.doc_ids)].tolist(),
+        index.forward_index.offsets[:index.forward_index.count].tolist(),
+    )
+
+
+def read_files(index):
+    paths = (index.metadata_file, index.dictionary_file, index.forward_index.offsets_path)
+    contents = []
+    for path in paths:
+        with open(path, "rb") as f:
+            contents.append(f.read())
+    return contents
+
+
+def journal_lines(index):
+    with open(index.journal_file) as f:
+        return f.read().splitlines()
+
+
+def test_writes_only_append_to_the_journal():
+    with tempfile.TemporaryDirectory() as tmp:
+        index, table = make_index(tmp, DOCS)
+        assert len(journal_lines(index)) == len(DOCS)
+        saved = read_files(index)
+
+        table.records[5] = {"id": 5, "content": "blue car"}
+        index.add(table.records[5], 5)
+        table.records[1]["content"] = "yellow apple"
+        index.add(table.records[1], 1)
+        assert index.remove(2)
+        # Metadatos, diccionario e índice directo no se reescriben
+        assert read_files(index) == saved
+        assert len(journal_lines(index)) == len(DOCS) + 3
+
+        reopened = reopen(index, table)
+        assert snapshot(reopened) == snapshot(index)
+        assert {d["id"] for d in reopened.search_term("car")} == {5, "tres"}
+        assert reopened.remove(5) and "blue" not in reopened.dictionary
+
+        # Un batch deja una sola línea
+        index = reopen(reopened, table)
+        index.begin_batch()
+        for doc_id in (6, 7, 8):
+            table.records[doc_id] = {"id": doc_id, "content": f"word{doc_id} apple"}
+            index.add(table.records[doc_id], doc_id)
+        index.end_batch()
+        assert len(journal_lines(index)) == len(DOCS) + 5
+        assert snapshot(reopen(index, table)) == snapshot(index)
+
+
+def test_torn_journal_line_and_checkpoint():
+    with tempfile.TemporaryDirectory() as tmp:
+        index, table = make_index(tmp, DOCS)
+        expected = snapshot(index)
+        with open(index.journal_file, "a") as f:
+            f.write('{"docs": [[9, "x", ')
+        reopened = reopen(index, table)
+        assert snapshot(reopened) == expected
+        assert len(journal_lines(reopened)) == len(DOCS)
+
+        # Con el journal lleno se guarda todo y se vacía
+        reopened.JOURNAL_MAX_BYTES = 1
+        table.records[5] = {"id": 5, "content": "blue car"}
+        reopened.add(table.records[5], 5)
+        assert journal_lines(reopened) == []
+        again = reopen(reopened, table)
+        assert snapshot(again) == snapshot(reopened)
+        assert np.array_equal(again.forward_index.get(again.doc_ordinals[5]), reopened.forward_index.get(reopened.doc_ordinals[5]))
+
+
+def test_close_keeps_pending_batch_changes():
+    with tempfile.TemporaryDirectory() as tmp:
+        index, table = make_index(tmp, DOCS)
+        index.begin_batch()
+        table.records[5] = {"id": 5, "content": "blue car"}
+        index.add(table.records[5], 5)
+        index.close()
+        assert index.forward_index.file.closed
+        reopened = reopen(index, table)
+        assert snapshot(reopened) == snapshot(index)
+        assert {d["id"] for d in reopened.search_term("blue")} == {5}
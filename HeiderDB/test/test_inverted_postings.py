@@ -0,0 +1,134 @@
+import os
+import sys
+import json
+import pickle
+import struct
+import tempfile
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from HeiderDB.database.indexes.inverted_index import InvertedIndex
+from HeiderDB.database.indexes.postings_codec import (
+    encode_varints, decode_varints, encode_postings, decode_postings, decode_doc_ordinals,
+)
+
+
+class WhitespaceProcessor:
+    """Tokenizador simple para no depender de los datos de nltk"""
+
+    def process_text(self, text):
+        return text.lower().split()
+
+
+class FakeTable:
+    primary_key = "id"
+
+    def __init__(self):
+        self.records = {}
+
+    def search(self, column, value):
+        record = self.records.get(value)
+        return dict(record) if record else None
+
+    def scan(self):
+        return iter(list(self.records.values()))
+
+
+def make_index(tmp, docs):
+    table = FakeTable()
+    index = InvertedIndex("docs", "content", os.path.join(tmp, "docs.dat"), table, 4096)
+    index.text_processor = WhitespaceProcessor()
+    for doc_id, text in docs.items():
+        table.records[doc_id] = {"id": doc_id, "content": text}
+        index.add(table.records[doc_id], doc_id)
+    return index, table
+
+
+def reopen(index, table):
+    reopened = InvertedIndex("docs", "content", index.data_path, table, 4096)
+    reopened.text_processor = WhitespaceProcessor()
+    return reopened
+
+
+DOCS = {
+    1: "red apple red fruit",
+    2: "green apple",
+    "tres": "red car fast car",
+    4: "fruit salad with apple",
+}
+
+
+def test_codec_round_trip():
+    values = np.array([0, 1, 127, 128, 16383, 16384, 2 ** 40], dtype=np.uint64)
+    decoded, end = decode_varints(encode_varints(values), len(values))
+    assert np.array_equal(decoded, values) and end == len(encode_varints(values))
+
+    rng = np.random.default_rng(0)
+    ordinals = np.sort(rng.choice(100000, 300, replace=False))
+    tfs = rng.integers(1, 5, 300)
+    positions = np.concatenate([np.sort(rng.choice(500, t, replace=False)) for t in tfs])
+    data = encode_postings(ordinals, tfs, positions)
+    got_ordinals, got_tfs, got_positions = decode_postings(data)
+    assert np.array_equal(got_ordinals, ordinals) and np.array_equal(got_tfs, tfs)
+    assert np.array_equal(got_positions, positions)
+    assert decode_postings(data, with_positions=False)[2] is None
+    assert np.array_equal(decode_doc_ordinals(data), ordinals)
+
+
+def test_binary_postings_add_remove_and_queries():
+    with tempfile.TemporaryDirectory() as tmp:
+        index, table = make_index(tmp, DOCS)
+        ordinals, tfs, positions = index._read_posting_list("red")
+        assert [index.doc_ids[o] for o in ordinals] == [1, "tres"]
+        assert tfs.tolist() == [2, 1] and positions.tolist() == [0, 2, 0]
+
+        assert {d["id"] for d in index.search_term("apple")} == {1, 2, 4}
+        assert {d["id"] for d in index.search_boolean("apple AND fruit")} == {1, 4}
+        assert {d["id"] for d in index.search_boolean("car OR green")} == {2, "tres"}
+        ranked = index.search_ranked("red car", k=2)
+        assert ranked[0]["id"] == "tres"
+
+        # Reindexar un documento reemplaza su entrada sin contarlo de nuevo
+        table.records[2]["content"] = "green green apple"
+        index.add(table.records[2], 2)
+        assert index.count() == 4
+        assert index._read_posting_list("green")[1].tolist() == [2]
+
+        assert index.remove(1)
+        assert not index.remove(1)
+        assert {d["id"] for d in index.search_term("red")} == {"tres"}
+        assert index.count() == 3
+
+        reopened = reopen(index, table)
+        assert {d["id"] for d in reopened.search_boolean("apple AND fruit")} == {4}
+        assert reopened.compute_tf_idf("car", "tres") == 2 * np.log(3 / 1)
+
+
+def test_legacy_pickle_postings_are_migrated():
+    with tempfile.TemporaryDirectory() as tmp:
+        index, table = make_index(tmp, {})
+        # Archivos con el formato anterior: un dict pickle por término
+        postings = {
+            "apple": [{"doc_id": 1, "tf": 1, "positions": [1]}, {"doc_id": 2, "tf": 1, "positions": [1]}],
+            "red": [{"doc_id": 1, "tf": 2, "positions": [0, 2]}],
+        }
+        data, dictionary = b"", [struct.pack("!I", len(postings))]
+        for term, entries in postings.items():
+            serialized = pickle.dumps({"term": term, "df": len(entries), "postings": entries})
+            dictionary += [struct.pack("!I", len(term)), term.encode(), struct.pack("!QII", len(data), len(serialized), len(entries))]
+            data += serialized
+        with open(index.postings_file, "wb") as f:
+            f.write(data)
+        with open(index.dictionary_file, "wb") as f:
+            f.write(b"".join(dictionary))
+        with open(index.metadata_file, "w") as f:
+            json.dump({"doc_count": 2}, f)
+        for doc_id, text in {1: "red apple red", 2: "green apple"}.items():
+            table.records[doc_id] = {"id": doc_id, "content": text}
+
+        migrated = reopen(index, table)
+        assert migrated.postings_format == InvertedIndex.POSTINGS_FORMAT
+        assert {d["id"] for d in migrated.search_term("apple")} == {1, 2}
+        assert migrated._read_posting_list("red")[2].tolist() == [0, 2]
+        assert os.path.getsize(migrated.postings_file) < len(data)
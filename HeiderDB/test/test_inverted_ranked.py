@@ -0,0 +1,76 @@
+import os
+import sys
+import math
+import tempfile
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from HeiderDB.database.indexes import inverted_index
+from HeiderDB.test.test_inverted_postings import make_index
+
+
+def zipf_docs(count, seed=0):
+    """Pocos términos muy comunes y muchos raros"""
+    rng = np.random.default_rng(seed)
+    words = np.array([f"w{i}" for i in range(2000)])
+    weights = 1 / np.arange(1, len(words) + 1)
+    weights /= weights.sum()
+    return {
+        doc_id: " ".join(rng.choice(words, rng.integers(5, 40), p=weights))
+        for doc_id in range(1, count + 1)
+    }
+
+
+def brute_force(index, table, query, k):
+    """Puntaje TF-IDF de cada documento vivo, ordenado como search_ranked"""
+    terms = set(query.split())
+    scores = {}
+    for doc_id, ordinal in index.doc_ordinals.items():
+        words = table.records[doc_id]["content"].split()
+        matched = [t for t in terms if t in words]
+        if matched:
+            scores[ordinal] = sum(
+                words.count(t) * math.log(index.doc_count / index.dictionary[t]["df"]) for t in matched
+            )
+    top = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:k]
+    return [(index.doc_ids[ordinal], score) for ordinal, score in top]
+
+
+def test_maxscore_matches_exhaustive_ranking():
+    docs = zipf_docs(6000)
+    with tempfile.TemporaryDirectory() as tmp:
+        index, table = make_index(tmp, {})
+        for doc_id, text in docs.items():
+            table.records[doc_id] = {"id": doc_id, "content": text}
+        index.rebuild()
+        for doc_id in range(1, 6000, 7):
+            index.remove(doc_id)
+            del table.records[doc_id]
+
+        assert index.dictionary["w0"]["max_tf"] >= 1
+        decoded = []
+        original = inverted_index.decode_blocks
+        inverted_index.decode_blocks = lambda data, skips, blocks: (
+            decoded.append((len(blocks), len(skips))), original(data, skips, blocks)
+        )[1]
+        try:
+            for query, k in [("w0 w1 w1500", 5), ("w3 w900 w0 w2", 10), ("w7 w8", 1), ("w1999 w0", 50), ("nada", 3)]:
+                got = [(d["id"], d["_score"]) for d in index.search_ranked(query, k=k)]
+                expected = brute_force(index, table, query, k)
+                assert [doc_id for doc_id, _ in got] == [doc_id for doc_id, _ in expected]
+                assert np.allclose([s for _, s in got], [s for _, s in expected])
+        finally:
+            inverted_index.decode_blocks = original
+
+        # Los términos comunes solo se leen en los bloques de los candidatos
+        assert decoded and sum(used for used, _ in decoded) < sum(total for _, total in decoded)
+
+
+def test_top_k_breaks_ties_by_ordinal():
+    index_cls = inverted_index.InvertedIndex
+    ordinals = np.array([9, 2, 5, 7, 1])
+    scores = np.array([1.0, 3.0, 1.0, 3.0, 0.5])
+    top_ordinals, top_scores = index_cls._top_k(ordinals, scores, 3)
+    assert top_ordinals.tolist() == [2, 7, 5] and top_scores.tolist() == [3.0, 3.0, 1.0]
+    assert index_cls._kth_score(scores, 6) is None
@@ -0,0 +1,55 @@
+import os
+import sys
+import tempfile
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from HeiderDB.test.test_inverted_postings import make_index, reopen
+
+
+def random_docs(count, seed=0):
+    rng = np.random.default_rng(seed)
+    words = [f"w{i}" for i in range(300)]
+    return {
+        doc_id: " ".join(rng.choice(words, rng.integers(5, 60)))
+        for doc_id in range(1, count + 1)
+    }
+
+
+def test_spimi_build_matches_incremental_adds():
+    docs = random_docs(150)
+    with tempfile.TemporaryDirectory() as tmp:
+        os.makedirs(os.path.join(tmp, "a"))
+        os.makedirs(os.path.join(tmp, "b"))
+        incremental, _ = make_index(os.path.join(tmp, "a"), docs)
+
+        built, table = make_index(os.path.join(tmp, "b"), {})
+        for doc_id, text in docs.items():
+            table.records[doc_id] = {"id": doc_id, "content": text}
+        # Bloques chicos para forzar varios volcados y el merge
+        built.SPIMI_BLOCK_BYTES = 20000
+        spilled = []
+        original = built._spill_block
+        built._spill_block = lambda block, path: (spilled.append(path), original(block, path))[1]
+        built.rebuild()
+        assert len(spilled) > 3
+
+        assert built.count() == incremental.count() == 150
+        assert built.dictionary.keys() == incremental.dictionary.keys()
+        for term in incremental.dictionary:
+            assert built.dictionary[term]["df"] == incremental.dictionary[term]["df"]
+            expected = [
+                (incremental.doc_ids[o], tf)
+                for o, tf in zip(*incremental._read_posting_list(term, with_positions=False)[:2])
+            ]
+            got_ordinals, got_tfs, got_positions = built._read_posting_list(term)
+            assert [(built.doc_ids[o], tf) for o, tf in zip(got_ordinals, got_tfs)] == expected
+            assert len(got_positions) == got_tfs.sum()
+
+        # El archivo de postings queda sin copias viejas
+        assert os.path.getsize(built.postings_file) == sum(d["size"] for d in built.dictionary.values())
+        reopened = reopen(built, table)
+        assert {d["id"] for d in reopened.search_boolean("w1 AND w2")} == {
+            d["id"] for d in incremental.search_boolean("w1 AND w2")
+        }
@@ -0,0 +1,124 @@
+import os
+import sys
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from HeiderDB.database.database import Database
+from HeiderDB.database.parser import parse_query
+from HeiderDB.test.test_inverted_postings import WhitespaceProcessor, make_index, reopen, DOCS
+
+
+def live_size(index):
+    return sum(d["size"] for d in index.dictionary.values())
+
+
+def test_byte_accounting_and_vacuum():
+    with tempfile.TemporaryDirectory() as tmp:
+        index, table = make_index(tmp, DOCS)
+        # Cada add reescribe las listas de sus términos al final del archivo
+        assert index.live_bytes == live_size(index)
+        assert index.live_bytes + index.dead_bytes == os.path.getsize(index.postings_file)
+        assert index.dead_bytes > 0
+
+        index.remove(2)
+        table.records[1]["content"] = "yellow apple"
+        index.add(table.records[1], 1)
+        stats = index.get_stats()
+        assert stats["deleted_docs"] == 2 and stats["doc_count"] == 3
+        assert stats["postings_bytes"] == os.path.getsize(index.postings_file)
+
+        freed = index.vacuum()
+        assert freed > 0 and index.dead_bytes == 0
+        assert os.path.getsize(index.postings_file) == index.live_bytes == live_size(index)
+        # Las listas quedan seguidas en orden de término y sin ordinales borrados
+        terms = sorted(index.dictionary)
+        assert [index.dictionary[t]["offset"] for t in terms] == sorted(d["offset"] for d in index.dictionary.values())
+        assert all(len(index._read_posting_list(t)[0]) == index.dictionary[t]["df"] for t in terms)
+
+        reopened = reopen(index, table)
+        assert reopened.dead_bytes == 0
+        assert {d["id"] for d in reopened.search_term("apple")} == {1, 4}
+        assert reopened.remove(4)
+        assert {d["id"] for d in reopened.search_term("fruit")} == set()
+
+
+def test_interrupted_vacuum_keeps_the_previous_generation():
+    with tempfile.TemporaryDirectory() as tmp:
+        index, table = make_index(tmp, DOCS)
+        index.remove(2)
+        expected = {term: {d["id"] for d in index.search_term(term)} for term in ("apple", "red", "fruit", "car")}
+        old_files = [index.dictionary_file, index.postings_file, index.forward_file]
+
+        # Se corta justo antes de guardar diccionario y metadatos
+        def crash():
+            raise OSError("corte")
+
+        index._save_index = crash
+        try:
+            index.vacuum()
+            assert False, "se esperaba el corte"
+        except OSError:
+            pass
+        crashed = reopen(index, table)
+        assert crashed.generation == 0 and all(os.path.exists(path) for path in old_files)
+        assert {term: {d["id"] for d in crashed.search_term(term)} for term in expected} == expected
+
+        assert crashed.vacuum() > 0
+        assert crashed.generation == 1 and not any(os.path.exists(path) for path in old_files)
+        vacuumed = reopen(crashed, table)
+        assert vacuumed.generation == 1 and vacuumed.dead_bytes == 0
+        assert {term: {d["id"] for d in vacuumed.search_term(term)} for term in expected} == expected
+        assert vacuumed.remove(4) and "salad" not in vacuumed.dictionary
+
+
+def test_compaction_runs_when_dead_ratio_is_high():
+    with tempfile.TemporaryDirectory() as tmp:
+        index, table = make_index(tmp, {})
+        index.COMPACTION_MIN_BYTES = 0
+        vacuums = []
+        original = index.vacuum
+        index.vacuum = lambda: (vacuums.append(index.dead_bytes), original())[1]
+
+        for doc_id in range(1, 30):
+            table.records[doc_id] = {"id": doc_id, "content": f"common word{doc_id % 3}"}
+            index.add(table.records[doc_id], doc_id)
+        assert vacuums
+        assert index.dead_bytes <= index.COMPACTION_DEAD_RATIO * (index.live_bytes + index.dead_bytes)
+        assert {d["id"] for d in index.search_term("word1")} == {i for i in range(1, 30) if i % 3 == 1}
+
+        # Dentro de un batch se espera al final para compactar
+        vacuums.clear()
+        index.begin_batch()
+        for doc_id in range(1, 10):
+            index.remove(doc_id)
+        assert vacuums == []
+        index.end_batch()
+        assert len(vacuums) <= 1
+        assert index.count() == 20
+
+
+def test_vacuum_index_command():
+    assert parse_query("VACUUM INDEX ON docs (content);")["column_name"] == "content"
+    parsed = parse_query("vacuum index docs")
+    assert parsed["type"] == "VACUUM_INDEX" and parsed["table_name"] == "docs" and parsed["column_name"] is None
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(data_dir=tmp)
+        _, err = db.execute_query("CREATE TABLE docs (id INT KEY INDEX bplus_tree, content VARCHAR(50))")
+        assert not err
+        _, err = db.execute_query("CREATE INVERTED INDEX idx ON docs (content)")
+        assert not err
+        index = db.tables["docs"].text_indexes["content"]
+        index.text_processor = WhitespaceProcessor()
+        for doc_id, text in [(1, "red apple"), (2, "green apple"), (3, "red car")]:
+            assert db.execute_query(f"INSERT INTO docs VALUES ({doc_id}, '{text}')")[1] is None
+        assert index.dead_bytes > 0
+
+        message, err = db.execute_query("VACUUM INDEX docs")
+        assert err is None and "content" in message
+        assert index.dead_bytes == 0
+        assert db.execute_query("VACUUM INDEX docs (id)")[1]
+        assert db.execute_query("VACUUM INDEX nada")[1]
+        db.close()
+        assert index.forward_index.file.closed
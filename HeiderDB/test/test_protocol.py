@@ -0,0 +1,267 @@
+import os
+import sys
+import json
+import socket
+import tempfile
+import threading
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from HeiderDB.database.database import Database
+from HeiderDB.client import HeiderClient
+from HeiderDB.protocol import send_frame, recv_frame
+from HeiderDB.server import HeiderServer
+
+
+def test_frames_roundtrip():
+    a, b = socket.socketpair()
+    with a, b:
+        payload = "x" * 100000
+        threading.Thread(target=send_frame, args=(a, payload)).start()
+        assert recv_frame(b).decode() == payload
+        a.close()
+        assert recv_frame(b) is None
+
+
+def test_persistent_connections_and_large_results():
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(data_dir=tmp)
+        db.create_table("t", {"id": "INT", "name": "VARCHAR(40)"}, "id", index_type="bplus_tree")
+        server = HeiderServer(db, "127.0.0.1", 0, max_workers=2, queue_depth=2)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+        host, port = server.address
+        client = HeiderClient(host, port, pool_size=1)
+        try:
+            for i in range(1, 301):
+                response = client.send_query(f"INSERT INTO t VALUES ({i}, 'registro numero {i}')")
+                assert response["status"] == "ok"
+
+            # Más de 4 KB de respuesta, por la misma conexión
+            response = client.send_query("SELECT * FROM t")
+            rows, error = response["result"]
+            assert error is None
+            assert len(rows) == 300
+            assert len(client.pool.idle) == 1
+
+            # Los clientes viejos sin frame siguen funcionando
+            with socket.create_connection((host, port)) as s:
+                s.sendall(b"get_len(t)")
+                assert json.loads(s.recv(4096).decode())["result"] == [300, None]
+        finally:
+            client.close()
+            server.shutdown()
+            thread.join()
+            db.close()
+
+
+def test_cursor_streams_rows():
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(data_dir=tmp)
+        db.create_table("t", {"id": "INT", "name": "VARCHAR(20)"}, "id", index_type="bplus_tree")
+        table = db.get_table("t")
+        for i in range(1, 1001):
+            table.add({"id": i, "name": f"n{i}"})
+
+        server = HeiderServer(db, "127.0.0.1", 0, max_workers=2, queue_depth=2)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+        client = HeiderClient(*server.address, pool_size=2)
+        try:
+            cursor = client.execute("SELECT * FROM t", fetch_size=100)
+            first = cursor.fetchmany(10)
+            assert [r["id"] for r in first] == list(range(1, 11))
+            # Solo se leyó el primer frame
+            assert len(cursor.buffer) == 90
+            rest = list(cursor)
+            assert [r["id"] for r in rest] == list(range(11, 1001))
+            assert cursor.done and cursor.error is None
+
+            # Cerrar un cursor a medias suelta el lock de la tabla
+            cursor = client.execute("SELECT * FROM t", fetch_size=10)
+            assert cursor.fetchone()["id"] == 1
+            cursor.close()
+            with client.execute("INSERT INTO t VALUES (5000, 'ultimo')") as cursor:
+                assert cursor.fetchall() == []
+                assert cursor.result == "Registro insertado en 't'"
+
+            with client.execute("SELECT * FROM no_existe") as cursor:
+                assert cursor.fetchall() == []
+                assert "no encontrada" in cursor.error
+        finally:
+            client.close()
+            server.shutdown()
+            thread.join()
+            db.close()
+
+
+def test_execute_query_iter_releases_lock():
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(data_dir=tmp)
+        db.create_table("t", {"id": "INT", "name": "VARCHAR(20)"}, "id", index_type="bplus_tree")
+        for i in range(1, 6):
+            db.execute_query(f"INSERT INTO t VALUES ({i}, 'n{i}')")
+
+        rows, err = db.execute_query_iter("SELECT TOP 3 FROM t")
+        assert err is None
+        assert next(rows)["id"] == 1
+        rows.close()
+        assert db.execute_query("INSERT INTO t VALUES (9, 'n9')")[1] is None
+        rows, _ = db.execute_query_iter("SELECT * FROM t WHERE id > 3")
+        assert [r["id"] for r in rows] == [4, 5, 9]
+
+        # El iterador no retiene locks: ni sin empezar ni a medio leer
+        unstarted, _ = db.execute_query_iter("SELECT * FROM t")
+        started, _ = db.execute_query_iter("SELECT * FROM t")
+        assert next(started)["id"] == 1
+        done = threading.Event()
+        threading.Thread(target=lambda: (db.execute_query("DELETE FROM t WHERE id = 9"), done.set())).start()
+        assert done.wait(5)
+        # Cada cursor ve la tabla como estaba al ejecutarse
+        assert [r["id"] for r in started] == [2, 3, 4, 5, 9]
+        assert len(list(unstarted)) == 6
+        db.close()
+
+
+def test_execute_query_iter_returns_first_rows_before_the_scan_ends():
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(data_dir=tmp)
+        db.create_table("t", {"id": "INT", "name": "VARCHAR(20)"}, "id", index_type="bplus_tree")
+        for i in range(1, 6):
+            db.execute_query(f"INSERT INTO t VALUES ({i}, 'n{i}')")
+
+        # El resto del scan se queda esperando hasta que lo soltemos
+        resume = threading.Event()
+        spool_rows = db._spool_rows
+
+        def slow_spool(rows):
+            assert resume.wait(5)
+            return spool_rows(rows)
+
+        db._spool_rows = slow_spool
+        try:
+            rows, err = db.execute_query_iter("SELECT * FROM t", first_rows=2)
+            assert err is None
+            assert [next(rows)["id"], next(rows)["id"]] == [1, 2]
+
+            # El scan sigue con el lock tomado: el DELETE espera
+            done = threading.Event()
+            threading.Thread(target=lambda: (db.execute_query("DELETE FROM t WHERE id = 5"), done.set())).start()
+            assert not done.wait(0.2)
+            resume.set()
+            assert [r["id"] for r in rows] == [3, 4, 5]
+            assert done.wait(5)
+        finally:
+            resume.set()
+            db._spool_rows = spool_rows
+
+        rows, err = db.execute_query_iter("SELECT * FROM nada")
+        assert rows is None and err is not None
+        db.close()
+
+
+def test_columnar_encoding_roundtrip():
+    from HeiderDB.protocol import encode_columns, decode_rows, decode_columns, encode_payload, decode_payload
+
+    # Los enteros que no entran en 64 bits van como lista
+    block = encode_columns([{"grande": 2 ** 70, "activo": True}])
+    assert [c["type"] for c in block["data"]] == ["list", "list"]
+
+    rows = [{"id": i, "valor": i * 0.5, "nombre": f"n{i}"} for i in range(1000)]
+    block = encode_columns(rows)
+    assert [c["type"] for c in block["data"]] == ["i8", "f8", "list"]
+    assert decode_rows(decode_payload(encode_payload(block, "msgpack"), "msgpack")) == rows
+    assert decode_columns(block)["valor"][:3] == [0.0, 0.5, 1.0]
+
+    numeric = [{"id": i, "x": i * 1.25, "y": i * 2.5} for i in range(10000)]
+    as_json = encode_payload(numeric, "json")
+    as_columns = encode_payload(encode_columns(numeric), "columnar")
+    assert len(as_columns) < len(as_json)
+
+
+def test_clients_negotiate_formats():
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(data_dir=tmp)
+        db.create_table("t", {"id": "INT", "valor": "FLOAT", "name": "VARCHAR(20)"}, "id", index_type="bplus_tree")
+        table = db.get_table("t")
+        for i in range(1, 301):
+            table.add({"id": i, "valor": i / 4, "name": f"n{i}"})
+
+        server = HeiderServer(db, "127.0.0.1", 0, max_workers=2, queue_depth=2)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+        clients = {fmt: HeiderClient(*server.address, format=fmt) for fmt in ("json", "msgpack", "columnar")}
+        try:
+            results = {}
+            for fmt, client in clients.items():
+                response = client.send_query("SELECT * FROM t")
+                assert response["status"] == "ok"
+                results[fmt] = response["result"][0]
+                assert client.pool.idle[0].format == fmt
+
+                with client.execute("SELECT * FROM t WHERE id > 100", fetch_size=64) as cursor:
+                    assert [r["id"] for r in cursor] == list(range(101, 301))
+                assert client.send_query("get_len(t)")["result"] == [300, None]
+
+            assert results["json"] == results["msgpack"] == results["columnar"]
+            assert results["columnar"][3] == {"id": 4, "valor": 1.0, "name": "n4"}
+        finally:
+            for client in clients.values():
+                client.close()
+            server.shutdown()
+            thread.join()
+            db.close()
+
+
+
+
+def test_client_does_not_resend_after_the_request_went_out():
+    from HeiderDB.protocol import ProtocolError
+
+    listener = socket.create_server(("127.0.0.1", 0))
+    received = []
+    idle_closed = threading.Event()
+    ok = json.dumps({"status": "ok", "result": ["listo", None]})
+
+    def serve():
+        # 1ª conexión: responde y la cierra estando ociosa
+        conn, _ = listener.accept()
+        with conn:
+            received.append(recv_frame(conn).decode())
+            send_frame(conn, ok)
+        idle_closed.set()
+        # 2ª conexión: responde un pedido y se corta después de recibir el otro
+        conn, _ = listener.accept()
+        with conn:
+            received.append(recv_frame(conn).decode())
+            send_frame(conn, ok)
+            received.append(recv_frame(conn).decode())
+        # Un reintento llegaría por una conexión nueva
+        listener.settimeout(1)
+        try:
+            conn, _ = listener.accept()
+            with conn:
+                received.append(recv_frame(conn).decode())
+        except socket.timeout:
+            pass
+
+    thread = threading.Thread(target=serve)
+    thread.start()
+    client = HeiderClient(*listener.getsockname(), format="json", timeout=5)
+    try:
+        assert client.send_query("INSERT INTO t VALUES (1)")["status"] == "ok"
+        assert idle_closed.wait(5)
+        # La conexión ociosa que cerró el servidor se descarta antes de enviar
+        assert client.send_query("get_len(t)")["status"] == "ok"
+        # Si el corte llega después de enviar, no se reintenta
+        try:
+            client.send_query("DELETE FROM t WHERE id = 1")
+            assert False, "debía fallar"
+        except (OSError, ProtocolError):
+            pass
+        thread.join(timeout=5)
+        assert received == ["INSERT INTO t VALUES (1)", "get_len(t)", "DELETE FROM t WHERE id = 1"]
+    finally:
+        client.close()
+        thread.join(timeout=5)
+        listener.close()
@@ -0,0 +1,64 @@
+import os
+import sys
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from HeiderDB.database.database import Database
+
+
+def test_scan_projection_and_predicate():
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(data_dir=tmp)
+        for index_type in ["bplus_tree", "extendible_hash", "isam_sparse", "sequential"]:
+            name = f"s_{index_type}"
+            ok, msg = db.create_table(
+                name, {"id": "INT", "name": "VARCHAR(10)", "edad": "INT"}, "id", index_type=index_type
+            )
+            assert ok, msg
+            table = db.get_table(name)
+            for i in range(1, 41):
+                table.add({"id": i, "name": f"n{i}", "edad": i % 7})
+            table.remove("id", 10)
+
+            rows = list(table.scan(columns=["id"], predicate=("edad", ">=", 5)))
+            assert sorted(r["id"] for r in rows) == [i for i in range(1, 41) if i % 7 >= 5 and i != 10]
+            assert all(list(r) == ["id"] for r in rows)
+
+            rows = table.scan(predicate=lambda r: r["name"] == "n3")
+            assert [r["id"] for r in rows] == [3]
+            assert len(list(table.scan())) == 39
+        db.close()
+
+
+def test_select_top_stops_reading():
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(data_dir=tmp)
+        ok, msg = db.create_table("t", {"id": "INT", "name": "VARCHAR(10)"}, "id", index_type="bplus_tree")
+        assert ok, msg
+        table = db.get_table("t")
+        for i in range(1, 201):
+            table.add({"id": i, "name": f"n{i}"})
+
+        # Contar cuántos registros se leen realmente
+        read = []
+        iter_all = table.index.iter_all
+
+        def counting_iter_all():
+            for record in iter_all():
+                read.append(record["id"])
+                yield record
+
+        table.index.iter_all = counting_iter_all
+
+        rows, err = db.execute_query("SELECT TOP 5 FROM t")
+        assert err is None, err
+        assert [r["id"] for r in rows] == [1, 2, 3, 4, 5]
+        assert len(read) == 5
+
+        read.clear()
+        rows, err = db.execute_query("SELECT * FROM t WHERE name != 'n1'")
+        assert err is None, err
+        assert len(rows) == 199
+        assert len(read) == 200
+        db.close()
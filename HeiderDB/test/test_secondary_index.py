@@ -0,0 +1,85 @@
+import os
+import sys
+import random
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from HeiderDB.database.database import Database
+from HeiderDB.database.parser import parse_query
+
+CIUDADES = ["Lima", "Cusco", "Arequipa", "Piura", "Tacna"]
+
+
+def _fill(table, n):
+    for i in range(1, n + 1):
+        table.add({"id": i, "ciudad": CIUDADES[i % len(CIUDADES)], "edad": i % 60})
+
+
+def test_parse_create_index():
+    parsed = parse_query("CREATE INDEX idx_edad ON personas (edad) USING hash;")
+    assert parsed["type"] == "CREATE_INDEX"
+    assert parsed["index_type"] == "extendible_hash"
+    assert parse_query("CREATE INDEX i ON personas(edad)")["index_type"] == "bplus_tree"
+    assert parse_query("CREATE INDEX i ON personas(edad) USING rtree")["error_message"]
+
+
+def test_secondary_indexes_follow_inserts_and_deletes():
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(data_dir=tmp)
+        for index_type in ["bplus_tree", "extendible_hash", "isam_sparse", "sequential"]:
+            name = f"p_{index_type}"
+            ok, msg = db.create_table(
+                name, {"id": "INT", "ciudad": "VARCHAR(12)", "edad": "INT"}, "id",
+                index_type=index_type,
+            )
+            assert ok, msg
+            table = db.get_table(name)
+            _fill(table, 150)
+
+            _, err = db.execute_query(f"CREATE INDEX idx_edad ON {name} (edad) USING btree")
+            assert err is None, err
+            _, err = db.execute_query(f"CREATE INDEX idx_ciudad ON {name} (ciudad) USING hash")
+            assert err is None, err
+
+            # Los borrados en B+ Tree mueven registros dentro del .dat
+            ids = list(range(1, 151))
+            random.shuffle(ids)
+            for i in ids[:60]:
+                assert table.remove("id", i)
+            for i in range(200, 230):
+                table.add({"id": i, "ciudad": "Lima", "edad": 7})
+
+            all_records = table.get_all()
+            by_id = lambda rows: sorted(r["id"] for r in rows)
+
+            rows, err = db.execute_query(f"select * from {name} where ciudad = 'Lima'")
+            assert err is None
+            assert by_id(rows) == by_id(r for r in all_records if r["ciudad"] == "Lima")
+
+            rows, _ = db.execute_query(f"select * from {name} where edad between 5 and 9")
+            assert by_id(rows) == by_id(r for r in all_records if 5 <= r["edad"] <= 9)
+
+            rows, _ = db.execute_query(f"select * from {name} where edad > 50")
+            assert by_id(rows) == by_id(r for r in all_records if r["edad"] > 50)
+
+            rows, _ = db.execute_query(f"select * from {name} where edad <= 3")
+            assert by_id(rows) == by_id(r for r in all_records if r["edad"] <= 3)
+
+            rows, _ = db.select_from_table(["*"], name, {"column": "edad", "operator": "=", "value": 7})
+            assert by_id(rows) == by_id(r for r in all_records if r["edad"] == 7)
+
+        db.close()
+
+        # Los índices secundarios se reabren desde la metadata
+        db = Database(data_dir=tmp)
+        table = db.get_table("p_bplus_tree")
+        assert set(table.secondary_indexes) == {"edad", "ciudad"}
+        expected = by_id(r for r in table.get_all() if r["ciudad"] == "Cusco")
+        assert by_id(table.search("ciudad", "Cusco")) == expected
+
+        ok, msg = db.drop_table("p_bplus_tree")
+        assert ok, msg
+        for index in table.secondary_indexes.values():
+            assert not any(os.path.exists(path) for path in index.files())
+        db.close()
@@ -0,0 +1,115 @@
+import os
+import sys
+import pickle
+import tempfile
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from HeiderDB.database.indexes.tfidf_page_file import TfidfPageFile, MAGIC
+from HeiderDB.database.indexes.vector_index import VectorIndex
+from HeiderDB.test.test_vector_matrix import make_index
+
+
+def entry(doc_id, nnz):
+    return {
+        "id": doc_id,
+        "indices": np.arange(nnz, dtype=np.int32) * 3,
+        "values": np.linspace(0.5, 1.5, nnz, dtype=np.float32),
+    }
+
+
+def same_page(a, b):
+    assert a.keys() == b.keys()
+    for position in a:
+        assert a[position]["id"] == b[position]["id"]
+        assert np.array_equal(a[position]["indices"], b[position]["indices"])
+        assert np.allclose(a[position]["values"], b[position]["values"])
+
+
+def test_pages_are_overwritten_in_place_or_appended():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "pages.dat")
+        pages = TfidfPageFile(path)
+        page0 = {0: entry(7, 3), 1: entry("img_ñ", 0), 2: entry(2.5, 10)}
+        pages.write_page(0, page0)
+        pages.write_page(1, {0: entry(-1, 4)})
+        same_page(pages.read_page(0), page0)
+        assert pages.read_page(5) is None
+
+        # Si cabe se reescribe en el mismo offset
+        offset = pages.offsets[0][0]
+        page0[3] = entry(8, 2)
+        pages.write_page(0, page0)
+        assert pages.offsets[0][0] == offset
+
+        # Si crece de más se mueve al final
+        size = pages.size()
+        page0[4] = entry(9, 400)
+        pages.write_page(0, page0)
+        assert pages.offsets[0][0] == size
+        pages.close()
+
+        reopened = TfidfPageFile(path)
+        same_page(reopened.read_page(0), page0)
+        assert reopened.read_page(1)[0]["id"] == -1
+
+        before = reopened.size()
+        reopened.compact([0, 1])
+        assert reopened.size() < before
+        same_page(reopened.read_page(0), page0)
+        reopened.close()
+
+
+def test_vector_index_writes_pages_without_rewriting_file():
+    rng = np.random.default_rng(7)
+    with tempfile.TemporaryDirectory() as tmp:
+        vi = make_index(tmp)
+        writes = []
+        original = vi.tfidf_file.write_page
+        vi.tfidf_file.write_page = lambda page_id, vectors: (writes.append(page_id), original(page_id, vectors))
+
+        for i in range(200):
+            vi.add_vectors(i + 1, list(rng.random((6, 8)).astype(np.float32)), save_metadata=False)
+        vi.save()
+        # Cada página se escribe sola, y solo cuando sale del cache o en save()
+        assert len(writes) <= 2 * vi.get_page_count()
+
+        expected = vi.get_vector(150)
+        reopened = VectorIndex(vi.index_file, vi.metadata_file, page_size=16, cache_size=4, num_clusters=8)
+        assert np.allclose(reopened.get_vector(150), expected)
+
+        for i in range(1, 200, 2):
+            reopened.remove_vector(i)
+        reopened.compact_pages()
+        assert reopened.get_page_count() == 7
+        assert np.allclose(reopened.get_vector(150), expected)
+
+
+def test_legacy_pickle_file_is_migrated():
+    rng = np.random.default_rng(8)
+    with tempfile.TemporaryDirectory() as tmp:
+        vi = make_index(tmp)
+        for i in range(40):
+            vi.add_vectors(f"doc{i}", list(rng.random((6, 8)).astype(np.float32)))
+        vi.save()
+        expected = {f"doc{i}": vi.get_vector(f"doc{i}") for i in range(40)}
+
+        # Archivo con el formato anterior: páginas pickle con el vector denso
+        legacy = b""
+        for page_id in range(vi.next_tfidf_page_id):
+            vectors = {
+                position: {"id": e["id"], "tfidf_vector": vi._to_dense(e["indices"], e["values"])}
+                for position, e in vi.tfidf_file.read_page(page_id).items()
+            }
+            data = pickle.dumps(vectors)
+            legacy += len(data).to_bytes(8, "big") + data
+        vi.tfidf_file.close()
+        with open(vi.tfidf_vectors_file, "wb") as f:
+            f.write(legacy)
+
+        reopened = VectorIndex(vi.index_file, vi.metadata_file, page_size=16, cache_size=4, num_clusters=8)
+        with open(vi.tfidf_vectors_file, "rb") as f:
+            assert f.read(4) == MAGIC
+        for doc_id, vector in expected.items():
+            assert np.allclose(reopened.get_vector(doc_id), vector)
@@ -0,0 +1,105 @@
+import os
+import sys
+import json
+import tempfile
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from HeiderDB.database.indexes.vector_index import VectorIndex
+from HeiderDB.test.test_vector_matrix import make_index
+
+
+def reopen(vi):
+    return VectorIndex(vi.index_file, vi.metadata_file, page_size=16, cache_size=4, num_clusters=8)
+
+
+def test_doc_directory_fetches_one_page():
+    rng = np.random.default_rng(5)
+    with tempfile.TemporaryDirectory() as tmp:
+        vi = make_index(tmp)
+        for i in range(100):
+            vi.add_vectors(f"img{i}", list(rng.random((6, 8)).astype(np.float32)), save_metadata=False)
+        assert len(vi.tfidf_doc_directory) == 100
+        assert vi.get_page_count() > vi.cache_size
+
+        loaded = []
+        original = vi._load_tfidf_page
+
+        def counting(page_id):
+            loaded.append(page_id)
+            return original(page_id)
+
+        vi._load_tfidf_page = counting
+        page_id, _ = vi.tfidf_doc_directory["img90"]
+        assert vi.get_vector("img90") is not None
+        assert loaded == [page_id]
+        assert vi.get_vector("no_existe") is None
+
+        assert vi.remove_vector("img3")
+        assert "img3" not in vi.tfidf_doc_directory
+        assert not vi.remove_vector("img3")
+
+        # La posición liberada se reutiliza y el directorio apunta a ella
+        freed = vi.tfidf_doc_directory["img4"][0]
+        vi.add_vectors("img_nuevo", list(rng.random((6, 8)).astype(np.float32)))
+        assert vi.tfidf_doc_directory["img_nuevo"][0] <= freed
+        vi.save()
+
+
+def test_doc_directory_persists_and_rebuilds():
+    rng = np.random.default_rng(6)
+    with tempfile.TemporaryDirectory() as tmp:
+        vi = make_index(tmp)
+        for i in range(40):
+            vi.add_vectors(i + 1 if i % 2 else f"d{i}", list(rng.random((6, 8)).astype(np.float32)))
+        assert vi.remove_vector(6)
+        vi.save()
+        expected = dict(vi.tfidf_doc_directory)
+
+        reopened = reopen(vi)
+        assert reopened.tfidf_doc_directory == expected
+        assert np.allclose(reopened.get_vector(8), vi.get_vector(8))
+        with open(vi.metadata_file) as f:
+            metadata = json.load(f)
+        assert "tfidf_doc_directory" not in metadata
+
+        # Índice que guardaba el directorio en los metadatos
+        metadata["tfidf_doc_directory"] = [[doc_id, p, pos] for doc_id, (p, pos) in expected.items()]
+        with open(vi.metadata_file, "w") as f:
+            json.dump(metadata, f)
+        os.remove(vi.doc_directory_file)
+        assert reopen(vi).tfidf_doc_directory == expected
+
+        # Índice guardado antes de tener el directorio: se arma desde las páginas
+        del metadata["tfidf_doc_directory"]
+        with open(vi.metadata_file, "w") as f:
+            json.dump(metadata, f)
+        os.remove(vi.doc_directory_file)
+        assert reopen(vi).tfidf_doc_directory == expected
+
+
+def test_doc_directory_is_append_only():
+    rng = np.random.default_rng(7)
+    with tempfile.TemporaryDirectory() as tmp:
+        vi = make_index(tmp)
+        vi.tfidf_doc_directory.COMPACT_MIN_RECORDS = 16
+        for i in range(10):
+            vi.add_vectors(i, list(rng.random((6, 8)).astype(np.float32)))
+        size = os.path.getsize(vi.doc_directory_file)
+        vi.add_vectors(10, list(rng.random((6, 8)).astype(np.float32)))
+        # Un documento nuevo agrega un solo registro
+        assert os.path.getsize(vi.doc_directory_file) - size == size // 10
+
+        for _ in range(5):
+            vi.add_vectors(3, list(rng.random((6, 8)).astype(np.float32)))
+        assert vi.tfidf_doc_directory.records <= 2 * len(vi.tfidf_doc_directory)
+        expected = dict(vi.tfidf_doc_directory)
+        vi.save()
+
+        # Un registro a medio escribir se descarta al abrir
+        with open(vi.doc_directory_file, "ab") as f:
+            f.write(b"p\x01\x00")
+        reopened = reopen(vi)
+        assert reopened.tfidf_doc_directory == expected
+        assert reopened.total_vectors == len(reopened.matrix) == 11
@@ -0,0 +1,154 @@
+import os
+import sys
+import tempfile
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from HeiderDB.database.indexes.vector_index import VectorIndex
+
+
+class FakeExtractor:
+    """Descriptores aleatorios pero fijos por archivo, para no depender de SIFT"""
+
+    def __init__(self, dim=8):
+        self.dim = dim
+
+    def extract(self, path):
+        rng = np.random.default_rng(abs(hash(os.path.basename(path))) % (2 ** 32))
+        return list(rng.random((12, self.dim)).astype(np.float32))
+
+
+def make_index(tmp, num_clusters=8):
+    folder = os.path.join(tmp, "train")
+    os.makedirs(folder, exist_ok=True)
+    for i in range(10):
+        with open(os.path.join(folder, f"img_{i}.jpg"), "wb") as f:
+            f.write(b"x")
+    vi = VectorIndex(
+        os.path.join(tmp, "imgs.pkl"), os.path.join(tmp, "imgs_meta.json"),
+        page_size=16, cache_size=4, num_clusters=num_clusters,
+    )
+    vi.train_visual_vocabulary(folder, FakeExtractor())
+    return vi
+
+
+def brute_force(vi, query, k):
+    query_tfidf = vi._calculate_tfidf_vector(vi._create_tf_histogram(query))
+    distances = [
+        (vi._compute_cosine_distance(query_tfidf, vector), doc_id)
+        for doc_id, vector in vi._iter_tfidf_entries()
+    ]
+    return sorted(distances, key=lambda x: x[0])[:k]
+
+
+def check_same(vi, query, k):
+    results = vi.search_knn(query, k)
+    expected = brute_force(vi, query, k)
+    assert len(results) == len(expected)
+    assert np.allclose([d for _, d in results], [d for d, _ in expected], atol=1e-5)
+    # Los ids pueden cambiar de orden solo entre empates
+    for doc_id, distance in results:
+        assert abs(vi._compute_cosine_distance(
+            vi._calculate_tfidf_vector(vi._create_tf_histogram(query)), vi.get_vector(doc_id)
+        ) - distance) < 1e-5
+
+
+def test_search_knn_matches_per_document_cosine():
+    rng = np.random.default_rng(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        vi = make_index(tmp)
+        for i in range(300):
+            vi.add_vectors(i if i % 2 else f"doc{i}", list(rng.random((6, 8)).astype(np.float32)), save_metadata=False)
+
+        query = list(rng.random((6, 8)).astype(np.float32))
+        check_same(vi, query, 10)
+
+        for i in range(0, 300, 7):
+            assert vi.remove_vector(i if i % 2 else f"doc{i}", save_metadata=False)
+        check_same(vi, query, 10)
+        assert len(vi.search_knn(query, 1000)) == vi.total_vectors
+
+        # Las filas libres se reutilizan
+        rows = vi.matrix.capacity
+        vi.add_vectors("nuevo", query)
+        assert vi.matrix.capacity == rows
+        assert vi.search_knn(query, 1)[0][0] == "nuevo"
+        vi.save()
+
+
+def test_matrix_persists_and_rebuilds():
+    rng = np.random.default_rng(1)
+    with tempfile.TemporaryDirectory() as tmp:
+        vi = make_index(tmp)
+        for i in range(50):
+            vi.add_vectors(i + 1, list(rng.random((6, 8)).astype(np.float32)))
+        vi.remove_vector(10)
+        vi.save()
+        query = list(rng.random((6, 8)).astype(np.float32))
+        expected = vi.search_knn(query, 5)
+
+        reopened = VectorIndex(vi.index_file, vi.metadata_file, page_size=16, cache_size=4, num_clusters=8)
+        assert len(reopened.matrix) == 49
+        assert reopened.search_knn(query, 5) == expected
+
+        # Sin la matriz (índice creado antes de tenerla) se arma desde las páginas
+        for path in (vi.matrix.path, vi.matrix.norms_path, vi.matrix.ids_path):
+            os.remove(path)
+        rebuilt = VectorIndex(vi.index_file, vi.metadata_file, page_size=16, cache_size=4, num_clusters=8)
+        assert [d for _, d in rebuilt.search_knn(query, 5)] == [d for _, d in expected]
+
+
+def test_re_adding_a_document_replaces_it():
+    rng = np.random.default_rng(3)
+    with tempfile.TemporaryDirectory() as tmp:
+        vi = make_index(tmp)
+        for doc_id in range(3):
+            vi.add_vectors(doc_id, rng.random((12, 8)).astype(np.float32))
+        replacement = rng.random((12, 8)).astype(np.float32)
+        vi.add_vectors(1, replacement)
+        assert vi.total_vectors == len(vi.matrix) == 3
+        assert sum(1 for _ in vi._iter_sparse_entries()) == 3
+        assert np.allclose(vi.get_vector(1), vi._calculate_tfidf_vector(vi._create_tf_histogram(replacement)))
+        vi.save()
+
+        reopened = VectorIndex(vi.index_file, vi.metadata_file, page_size=16, cache_size=4, num_clusters=8)
+        assert reopened.total_vectors == len(reopened.matrix) == 3
+
+
+def index_files_on_disk(tmp):
+    found = []
+    for root, _, names in os.walk(tmp):
+        if os.path.basename(root) != "train":
+            found.extend(os.path.join(root, name) for name in names)
+    return set(found)
+
+
+def test_files_lists_everything_the_index_wrote():
+    rng = np.random.default_rng(4)
+    with tempfile.TemporaryDirectory() as tmp:
+        vi = make_index(tmp)
+        for doc_id in range(20):
+            vi.add_vectors(doc_id, rng.random((12, 8)).astype(np.float32))
+        vi.save()
+        assert os.path.exists(vi.matrix_file)
+        assert index_files_on_disk(tmp) <= set(vi.files())
+
+
+def test_close_releases_the_open_files():
+    rng = np.random.default_rng(6)
+    with tempfile.TemporaryDirectory() as tmp:
+        vi = make_index(tmp)
+        for doc_id in range(5):
+            vi.add_vectors(doc_id, rng.random((12, 8)).astype(np.float32), save_metadata=False)
+        query = rng.random((12, 8)).astype(np.float32)
+        expected = vi.search_knn(query, 3)
+        vi.close()
+        assert vi.matrix.matrix is None
+        assert vi.tfidf_file.file.closed and vi.tfidf_doc_directory.file.closed
+
+        # close() guardó lo pendiente
+        reopened = VectorIndex(vi.index_file, vi.metadata_file, page_size=16, cache_size=4, num_clusters=8)
+        assert reopened.total_vectors == len(reopened.matrix) == 5
+        assert reopened.search_knn(query, 3) == expected
+        reopened.close()
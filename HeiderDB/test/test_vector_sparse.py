@@ -0,0 +1,74 @@
+import os
+import sys
+import pickle
+import tempfile
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from HeiderDB.database.indexes.vector_index import VectorIndex
+from HeiderDB.test.test_vector_matrix import make_index
+
+
+def descriptors(rng, n=6):
+    return list(rng.random((n, 8)).astype(np.float32))
+
+
+def test_index_search_matches_brute_force():
+    rng = np.random.default_rng(2)
+    with tempfile.TemporaryDirectory() as tmp:
+        vi = make_index(tmp)
+        for i in range(200):
+            vi.add_vectors(i + 1, descriptors(rng, n=3), save_metadata=False)
+
+        # Las páginas guardan solo los clusters presentes en cada documento
+        doc_id, indices, values = next(vi._iter_sparse_entries())
+        assert len(indices) == len(values) <= 3
+        assert np.allclose(vi.get_vector(doc_id)[indices], values)
+
+        for _ in range(5):
+            query = descriptors(rng)
+            exact = vi.search_knn(query, 8)
+            indexed = vi.search_knn_with_index(query, k=8)
+            assert np.allclose([d for _, d in indexed], [d for _, d in exact], atol=1e-5)
+
+        # Limitando los clusters sigue devolviendo k resultados
+        assert len(vi.search_knn_with_index(descriptors(rng), k=8, clusters_to_check=1)) == 8
+
+
+def test_remove_updates_postings():
+    rng = np.random.default_rng(3)
+    with tempfile.TemporaryDirectory() as tmp:
+        vi = make_index(tmp)
+        for i in range(40):
+            vi.add_vectors(i + 1, descriptors(rng))
+        indices, _ = vi._get_sparse_vector(7)
+
+        assert vi.remove_vector(7)
+        for cluster_id in range(vi.num_clusters):
+            assert 7 not in vi._load_cluster_documents(cluster_id)
+        assert all(vi.cluster_document_count[c] >= 0 for c in indices.tolist())
+        assert 7 not in [doc_id for doc_id, _ in vi.search_knn_with_index(descriptors(rng), k=40)]
+
+
+def test_legacy_cluster_files_get_weights():
+    rng = np.random.default_rng(4)
+    with tempfile.TemporaryDirectory() as tmp:
+        vi = make_index(tmp)
+        for i in range(20):
+            vi.add_vectors(i + 1, descriptors(rng))
+        vi.save()
+        query = descriptors(rng)
+        expected = vi.search_knn_with_index(query, k=5)
+
+        # Formato anterior: cada página del cluster es una lista de doc_ids
+        for cluster_id in range(vi.num_clusters):
+            doc_ids = vi._load_cluster_documents(cluster_id)
+            page = pickle.dumps(doc_ids)
+            with open(vi._get_cluster_file_path(cluster_id), "wb") as f:
+                f.write(len(page).to_bytes(8, "big") + page)
+
+        reopened = VectorIndex(vi.index_file, vi.metadata_file, page_size=16, cache_size=4, num_clusters=8)
+        assert np.allclose(
+            [d for _, d in reopened.search_knn_with_index(query, k=5)], [d for _, d in expected]
+        )
@@ -0,0 +1,55 @@
+import os
+import sys
+import tempfile
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from HeiderDB.test.test_vector_matrix import make_index
+
+
+def loop_histogram(centers, descriptors):
+    # Implementación original, descriptor por descriptor
+    histogram = np.zeros(len(centers), dtype=np.int32)
+    for descriptor in descriptors:
+        histogram[np.argmin(np.linalg.norm(centers - descriptor, axis=1))] += 1
+    return histogram
+
+
+def check_assignment(vi, descriptors):
+    words = vi._assign_visual_words(descriptors)
+    distances = np.linalg.norm(vi.cluster_centers[None, :, :] - descriptors[:, None, :], axis=2)
+    # Solo puede diferir del argmin exacto en empates por redondeo float32
+    assert np.allclose(distances[np.arange(len(descriptors)), words], distances.min(axis=1), atol=1e-4)
+
+
+def test_histogram_matches_loop_assignment():
+    rng = np.random.default_rng(3)
+    with tempfile.TemporaryDirectory() as tmp:
+        vi = make_index(tmp)
+        descriptors = rng.random((2000, 8)).astype(np.float32)
+        assert np.array_equal(vi._create_tf_histogram(list(descriptors)), loop_histogram(vi.cluster_centers, descriptors))
+
+        # Bloques chicos dan lo mismo
+        vi.ASSIGN_CHUNK_BYTES = 4 * vi.num_clusters * 7
+        assert np.array_equal(vi._create_tf_histogram(descriptors), loop_histogram(vi.cluster_centers, descriptors))
+        check_assignment(vi, descriptors)
+
+        assert vi._create_tf_histogram([]).sum() == 0
+        assert vi._assign_to_nearest_cluster(descriptors[0]) == vi._assign_visual_words(descriptors[:1])[0]
+        ordered = vi._get_ordered_clusters(descriptors[0])
+        assert ordered[0][0] == vi._assign_to_nearest_cluster(descriptors[0])
+        assert [d for _, d in ordered] == sorted(d for _, d in ordered)
+
+
+def test_large_vocabulary_uses_kd_tree():
+    rng = np.random.default_rng(4)
+    with tempfile.TemporaryDirectory() as tmp:
+        vi = make_index(tmp)
+        vi.cluster_centers = rng.random((300, 8))
+        vi.num_clusters = 300
+        vi.KD_TREE_MIN_CLUSTERS = 100
+        descriptors = rng.random((500, 8)).astype(np.float32)
+        check_assignment(vi, descriptors)
+        assert vi._centers_cache[3] is not None
+        assert vi._create_tf_histogram(descriptors).sum() == 500
@@ -0,0 +1,74 @@
+import os
+import sys
+import tempfile
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from HeiderDB.database.indexes.descriptor_sampling import DescriptorReservoir
+from HeiderDB.database.indexes.vector_index import VectorIndex
+from HeiderDB.test.test_vector_matrix import FakeExtractor
+
+
+def make_folder(tmp, count):
+    folder = os.path.join(tmp, "train")
+    os.makedirs(folder, exist_ok=True)
+    for i in range(count):
+        with open(os.path.join(folder, f"img_{i}.jpg"), "wb") as f:
+            f.write(b"x")
+    return folder
+
+
+def new_index(tmp, num_clusters=8):
+    return VectorIndex(
+        os.path.join(tmp, "imgs.pkl"), os.path.join(tmp, "imgs_meta.json"),
+        page_size=16, cache_size=4, num_clusters=num_clusters,
+    )
+
+
+def test_reservoir_keeps_uniform_bounded_sample():
+    reservoir = DescriptorReservoir(1000, seed=1)
+    for start in range(0, 20000, 500):
+        reservoir.add(np.arange(start, start + 500, dtype=np.float32)[:, None])
+    sample = reservoir.get()[:, 0]
+    assert len(reservoir) == 1000 and reservoir.seen == 20000
+    assert len(np.unique(sample)) == 1000
+    # Cada mitad del flujo aporta más o menos la mitad de la muestra
+    assert 400 < (sample < 10000).sum() < 600
+
+    rows = reservoir.sample_rows(np.arange(50, dtype=np.float32)[:, None], 10)
+    assert len(rows) == 10 and len(np.unique(rows)) == 10
+
+
+def test_streaming_training_with_budget_and_checkpoint():
+    with tempfile.TemporaryDirectory() as tmp:
+        folder = make_folder(tmp, 30)
+        vi = new_index(tmp)
+        vi.VOCAB_BATCH_SIZE = 16
+        vi.VOCAB_CHECKPOINT_EVERY = 2
+        saved = []
+        original = vi._save_vocab_checkpoint
+        vi._save_vocab_checkpoint = lambda centers, done: (saved.append(done), original(centers, done))
+
+        vi.train_visual_vocabulary(folder, FakeExtractor(), workers=1, streaming=True, descriptor_budget=100)
+        assert vi.is_trained and vi.cluster_centers.shape == (8, 8)
+        assert saved and not os.path.exists(vi.vocab_checkpoint_file)
+
+        # Un checkpoint a medio camino se retoma desde sus centros
+        vi.VOCAB_BATCH_SIZE = 16
+        vi._save_vocab_checkpoint(np.full((8, 8), 0.5), 3)
+        assert vi._load_vocab_checkpoint(8, 8)[1] == 3
+        assert vi._load_vocab_checkpoint(4, 8) is None
+        vi.train_visual_vocabulary(folder, FakeExtractor(), workers=1, streaming=True, descriptor_budget=100)
+        assert not os.path.exists(vi.vocab_checkpoint_file)
+
+        vi.add_vectors(1, FakeExtractor().extract("a.jpg"))
+        assert vi.get_vector_count() == 1
+
+
+def test_small_sample_uses_full_kmeans():
+    with tempfile.TemporaryDirectory() as tmp:
+        vi = new_index(tmp)
+        vi.train_visual_vocabulary(make_folder(tmp, 5), FakeExtractor(), workers=1)
+        assert vi.cluster_centers.shape == (8, 8)
+        assert not os.path.exists(vi.vocab_checkpoint_file)
@@ -1,29 +1,20 @@
 from flask import Flask, render_template, request, jsonify
-import socket
 import json
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from HeiderDB.client import HeiderClient
 
 app = Flask(__name__)
 
 # Cliente para comunicarse con la base de datos HeiderDB
-class HeiderDBClient:
-    def __init__(self, host='localhost', port=54321):
-        self.host = host
-        self.port = port
+class HeiderDBClient(HeiderClient):
+    """Cliente para HeiderDB con conexiones persistentes compartidas entre requests"""
 
     def send_query(self, query):
+        """Envía una query a la base de datos y retorna la respuesta"""
         try:
-            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-                s.connect((self.host, self.port))
-                s.sendall(query.encode())
-                response = s.recv(65536).decode()  # Aumenta el buffer
-                print("[DEBUG] Respuesta cruda de la BD:")
-                print(response)
-                try:
-                    return json.loads(response)
-                except Exception as json_err:
-                    print("[ERROR] Fallo al decodificar JSON:", json_err)
-                    print("[ERROR] Respuesta cruda:", response)
-                    return {"status": "error", "message": str(json_err), "raw": response}
+            return super().send_query(query)
         except Exception as e:
             print(f"Error conectando a HeiderDB: {e}")
             return {"status": "error", "message": str(e)}
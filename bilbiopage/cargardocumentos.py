@@ -1,19 +1,17 @@
-import socket
 import json
 import pandas as pd
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from HeiderDB.client import HeiderClient
 
-class HeiderDBClient:
-    def __init__(self, host='localhost', port=54321):
-        self.host = host
-        self.port = port
+class HeiderDBClient(HeiderClient):
+    """Cliente para HeiderDB con conexiones persistentes compartidas entre requests"""
 
     def send_query(self, query):
+        """Envía una query a la base de datos y retorna la respuesta"""
         try:
-            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-                s.connect((self.host, self.port))
-                s.sendall(query.encode())
-                response = s.recv(8192).decode()
-                return json.loads(response)
+            return super().send_query(query)
         except Exception as e:
             print(f"Error conectando a HeiderDB: {e}")
             return {"status": "error", "message": str(e)}
@@ -5,12 +5,14 @@ import sys
 import shutil
 import uuid
 import json
-import socket
 from pathlib import Path
 from flask import Flask, request, jsonify, send_from_directory
 from flask_cors import CORS, cross_origin
 from werkzeug.utils import secure_filename
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from HeiderDB.client import HeiderClient
+
 app = Flask(__name__)
 CORS(app)
 
@@ -27,21 +29,13 @@ app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['STATIC_FOLDER'] = STATIC_FOLDER
 app.config['MAX_CONTENT_LENGTH'] = 50 * 1024 * 1024  # 50MB max file size
 
-class HeiderDBClient:
-    """Cliente para comunicarse con la base de datos HeiderDB"""
-    
-    def __init__(self, host='localhost', port=54321):
-        self.host = host
-        self.port = port
+class HeiderDBClient(HeiderClient):
+    """Cliente para HeiderDB con conexiones persistentes compartidas entre requests"""
 
     def send_query(self, query):
         """Envía una query a la base de datos y retorna la respuesta"""
         try:
-            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-                s.connect((self.host, self.port))
-                s.sendall(query.encode())
-                response = s.recv(8192).decode()  # Aumentamos el buffer para más datos
-                return json.loads(response)
+            return super().send_query(query)
         except Exception as e:
             print(f"Error conectando a HeiderDB: {e}")
             return {"status": "error", "message": str(e)}
@@ -3,13 +3,15 @@ import sys
 import shutil
 import uuid
 import json
-import socket
 import base64
 from pathlib import Path
 from flask import Flask, request, jsonify, send_from_directory
 from flask_cors import CORS, cross_origin
 from werkzeug.utils import secure_filename
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from HeiderDB.client import HeiderClient
+
 app = Flask(__name__)
 CORS(app)
 
@@ -25,46 +27,19 @@ app.config["STATIC_FOLDER"] = STATIC_FOLDER
 app.config["MAX_CONTENT_LENGTH"] = 16 * 1024 * 1024
 
 
-class HeiderDBClient:
-    def __init__(self, host="localhost", port=54321):
-        self.host = host
-        self.port = port
+class HeiderDBClient(HeiderClient):
+    """Cliente para HeiderDB con conexiones persistentes compartidas entre requests"""
 
     def send_query(self, query):
+        """Envía una query a la base de datos y retorna la respuesta"""
         try:
-            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-                s.settimeout(10)
-                s.connect((self.host, self.port))
-                s.sendall(query.encode())
-
-                response = b""
-                while True:
-                    data = s.recv(1024)
-                    if not data:
-                        break
-                    response += data
-                    if b"\n" in data or len(response) > 8192:
-                        break
-
-                response_str = response.decode("utf-8").strip()
-                print(f"Raw response: {response_str[:200]}...")
-
-                if not response_str:
-                    return {"status": "error", "message": "Empty response from server"}
-
-                return json.loads(response_str)
-        except json.JSONDecodeError as e:
-            print(f"JSON decode error: {e}")
-            print(
-                f"Response was: {response_str if 'response_str' in locals() else 'No response'}"
-            )
-            return {"status": "error", "message": f"Invalid JSON response: {str(e)}"}
+            return super().send_query(query)
         except Exception as e:
             print(f"Error conectando a HeiderDB: {e}")
             return {"status": "error", "message": str(e)}
 
 
-db_client = HeiderDBClient()
+db_client = HeiderDBClient(timeout=10)
 
 
 def allowed_file(filename):